@@ -24,10 +24,12 @@ from neutron_lib import constants
 from neutron_lib import context
 from neutron_lib import exceptions
 from neutron_lib import rpc as n_rpc
+from neutron_lib.utils import file as file_utils
 from oslo_concurrency import lockutils
 from oslo_config import cfg
 from oslo_log import log as logging
 import oslo_messaging
+from oslo_serialization import jsonutils
 from oslo_service import loopingcall
 from oslo_utils import fileutils
 from oslo_utils import importutils
@@ -101,6 +103,12 @@ class DhcpAgent(manager.Manager):
         # create dhcp dir to store dhcp info
         dhcp_dir = os.path.dirname("/%s/dhcp/" % self.conf.state_path)
         fileutils.ensure_tree(dhcp_dir, mode=0o755)
+        self._network_cache_file = os.path.join(dhcp_dir,
+                                                'network_cache.json')
+        self._use_networks_changes_rpc = True
+        # The networks loaded from the saved cache which are not configured
+        # yet by this run of the agent.
+        self._resumable_network_ids = set()
         self.dhcp_version = self.dhcp_driver_cls.check_version()
         self._populate_networks_cache()
         # keep track of mappings between networks and routers for
@@ -112,6 +120,8 @@ class DhcpAgent(manager.Manager):
         self._pool_size = DHCP_PROCESS_GREENLET_MIN
         self._pool = eventlet.GreenPool(size=self._pool_size)
         self._queue = queue.ResourceProcessingQueue()
+        # The ports waiting for a coalesced reload, by network id.
+        self._reload_ports = {}
 
     def init_host(self):
         self.sync_state()
@@ -122,9 +132,14 @@ class DhcpAgent(manager.Manager):
             existing_networks = self.dhcp_driver_cls.existing_dhcp_networks(
                 self.conf
             )
+            saved_networks = self._load_network_cache()
             for net_id in existing_networks:
-                net = dhcp.NetModel({"id": net_id, "subnets": [],
-                                     "non_local_subnets": [], "ports": []})
+                net = saved_networks.get(net_id)
+                if net:
+                    self._resumable_network_ids.add(net_id)
+                else:
+                    net = dhcp.NetModel({"id": net_id, "subnets": [],
+                                         "non_local_subnets": [], "ports": []})
                 self.cache.put(net)
         except NotImplementedError:
             # just go ahead with an empty networks cache
@@ -132,6 +147,28 @@ class DhcpAgent(manager.Manager):
                       "list of existing networks",
                       self.conf.dhcp_driver)
 
+    def _load_network_cache(self):
+        """Return the networks of the saved cache, by network id."""
+        if (not self.conf.persist_network_cache or
+                not os.path.exists(self._network_cache_file)):
+            return {}
+        try:
+            return NetworkCache.load(self._network_cache_file)
+        except Exception:
+            LOG.warning("Unable to load the networks cache from %s, all "
+                        "the networks will be configured again",
+                        self._network_cache_file, exc_info=True)
+            return {}
+
+    def _save_network_cache(self):
+        if not self.conf.persist_network_cache or not self.cache.changed:
+            return
+        try:
+            self.cache.save(self._network_cache_file)
+        except Exception:
+            LOG.exception("Unable to save the networks cache to %s",
+                          self._network_cache_file)
+
     def after_start(self):
         self.run()
         LOG.info("DHCP agent started")
@@ -155,6 +192,7 @@ class DhcpAgent(manager.Manager):
                                           self.dhcp_version,
                                           self.plugin_rpc)
             getattr(driver, action)(**action_kwargs)
+            self.cache.set_applied(network.id, True)
             return True
         except exceptions.Conflict:
             # No need to resync here, the agent will receive the event related
@@ -181,6 +219,7 @@ class DhcpAgent(manager.Manager):
             else:
                 LOG.exception('Unable to %(action)s dhcp for %(net_id)s.',
                               {'net_id': network.id, 'action': action})
+        self.cache.set_applied(network.id, False)
 
     def schedule_resync(self, reason, network_id=None):
         """Schedule a resync for a given network and reason. If no network is
@@ -205,10 +244,11 @@ class DhcpAgent(manager.Manager):
         known_network_ids = set(self.cache.get_network_ids())
 
         try:
-            active_networks = self.plugin_rpc.get_active_networks_info(
-                enable_dhcp_filter=False)
+            active_networks, unchanged_network_ids = (
+                self._get_active_networks(only_nets))
             LOG.info('All active networks have been fetched through RPC.')
             active_network_ids = set(network.id for network in active_networks)
+            active_network_ids |= unchanged_network_ids
             for deleted_id in known_network_ids - active_network_ids:
                 try:
                     self.disable_dhcp_helper(deleted_id)
@@ -221,11 +261,21 @@ class DhcpAgent(manager.Manager):
                 if (not only_nets or  # specifically resync all
                         network.id not in known_network_ids or  # missing net
                         network.id in only_nets):  # specific network to sync
+                    self._resumable_network_ids.discard(network.id)
                     pool.spawn(self.safe_configure_dhcp_for_network, network)
+            # the networks saved before a restart which did not change are
+            # still served with their existing configuration
+            for network_id in (unchanged_network_ids &
+                               self._resumable_network_ids):
+                self._resumable_network_ids.discard(network_id)
+                pool.spawn(self.safe_configure_dhcp_for_network,
+                           self.cache.get_network_by_id(network_id),
+                           action='resume')
             pool.waitall()
             # we notify all ports in case some were created while the agent
             # was down
             self.dhcp_ready_ports |= set(self.cache.get_port_ids(only_nets))
+            self._save_network_cache()
             LOG.info('Synchronizing state complete')
 
         except Exception as e:
@@ -236,6 +286,30 @@ class DhcpAgent(manager.Manager):
                 self.schedule_resync(e)
             LOG.exception('Unable to sync network state.')
 
+    def _get_active_networks(self, only_nets):
+        """Return the changed active networks and the ids of the others.
+
+        Unless persist_network_cache is enabled, all the active networks are
+        returned as changed. Otherwise, only the networks which are not in
+        only_nets and whose revisions did not change are left out.
+        """
+        if self.conf.persist_network_cache and self._use_networks_changes_rpc:
+            digests = dict(
+                (network_id, digest) for network_id, digest in
+                self.cache.get_revision_digests().items()
+                if network_id not in only_nets)
+            try:
+                return self.plugin_rpc.get_active_networks_changes(
+                    digests, enable_dhcp_filter=False)
+            except oslo_messaging.UnsupportedVersion:
+                LOG.warning('get_active_networks_changes rpc call not '
+                            'supported by the server, falling back to '
+                            'get_active_networks_info which fetches all the '
+                            'networks.')
+                self._use_networks_changes_rpc = False
+        return (self.plugin_rpc.get_active_networks_info(
+            enable_dhcp_filter=False), set())
+
     def _dhcp_ready_ports_loop(self):
         """Notifies the server of any ports that had reservations setup."""
         while True:
@@ -276,6 +350,7 @@ class DhcpAgent(manager.Manager):
                     self.conf.resync_throttle)(clear_periodic_resync_event)
                 throttled_clear_periodic_resync_event()
 
+            self._save_network_cache()
             if self.needs_resync_reasons:
                 # be careful to avoid a race with additions to list
                 # from other threads
@@ -309,24 +384,24 @@ class DhcpAgent(manager.Manager):
             self.configure_dhcp_for_network(network)
 
     @utils.exception_logger()
-    def safe_configure_dhcp_for_network(self, network):
+    def safe_configure_dhcp_for_network(self, network, action='enable'):
         try:
             network_id = network.get('id')
             LOG.info('Starting network %s dhcp configuration', network_id)
-            self.configure_dhcp_for_network(network)
+            self.configure_dhcp_for_network(network, action=action)
             LOG.info('Finished network %s dhcp configuration', network_id)
         except (exceptions.NetworkNotFound, RuntimeError):
             LOG.warning('Network %s may have been deleted and '
                         'its resources may have already been disposed.',
                         network.id)
 
-    def configure_dhcp_for_network(self, network):
+    def configure_dhcp_for_network(self, network, action='enable'):
         if not network.admin_state_up:
             return
 
         for subnet in network.subnets:
             if subnet.enable_dhcp:
-                if self.call_driver('enable', network):
+                if self.call_driver(action, network):
                     self.update_isolated_metadata_proxy(network)
                     self.cache.put(network)
                     # After enabling dhcp for network, mark all existing
@@ -562,10 +637,45 @@ class DhcpAgent(manager.Manager):
                           network.id, old_ips, new_ips)
                 driver_action = 'restart'
         self.cache.put_port(port)
+        if (driver_action == 'reload_allocations' and
+                self.conf.port_events_coalesce_interval):
+            self.cache.set_applied(network.id, False)
+            self._schedule_reload(network.id, port.id)
+            return
         self.call_driver(driver_action, network)
         self.dhcp_ready_ports.add(port.id)
         self.update_isolated_metadata_proxy(network)
 
+    def _schedule_reload(self, network_id, port_id=None):
+        """Reload the allocations of a network once its events coalesced.
+
+        The first port event of the network schedules the reload after
+        port_events_coalesce_interval, the following ones only wait for it.
+        """
+        pending = network_id in self._reload_ports
+        port_ids = self._reload_ports.setdefault(network_id, set())
+        if port_id:
+            port_ids.add(port_id)
+        if pending:
+            return
+        update = queue.ResourceUpdate(network_id, DEFAULT_PRIORITY,
+                                      action='_reload_allocations',
+                                      resource=network_id)
+        eventlet.spawn_after(self.conf.port_events_coalesce_interval,
+                             self._queue.add, update)
+
+    @_wait_if_syncing
+    def _reload_allocations(self, network_id):
+        port_ids = self._reload_ports.pop(network_id, set())
+        network = self.cache.get_network_by_id(network_id)
+        if not network:
+            return
+        LOG.debug("Reloading allocations of network %s after coalescing "
+                  "its port events", network_id)
+        self.call_driver('reload_allocations', network)
+        self.dhcp_ready_ports |= port_ids
+        self.update_isolated_metadata_proxy(network)
+
     def _is_port_on_this_agent(self, port):
         thishost = utils.get_dhcp_agent_device_id(
             port['network_id'], self.conf.host)
@@ -629,6 +739,9 @@ class DhcpAgent(manager.Manager):
             # (or acquire a reserved) port.
             self.call_driver('disable', network)
             self.schedule_resync("Agent port was deleted", port.network_id)
+        elif self.conf.port_events_coalesce_interval:
+            self.cache.set_applied(network.id, False)
+            self._schedule_reload(network.id)
         else:
             self.call_driver('reload_allocations', network)
             self.update_isolated_metadata_proxy(network)
@@ -707,6 +820,7 @@ class DhcpPluginApi(object):
         1.1 - Added get_active_networks_info, create_dhcp_port,
               and update_dhcp_port methods.
         1.5 - Added dhcp_ready_on_ports
+        1.7 - Added get_active_networks_changes
 
     """
 
@@ -734,6 +848,20 @@ class DhcpPluginApi(object):
                               host=self.host, **kwargs)
         return [dhcp.NetModel(n) for n in networks]
 
+    def get_active_networks_changes(self, revision_digests, **kwargs):
+        """Make a remote process call to retrieve changed network info.
+
+        :param revision_digests: the revision digests of the known networks
+        :returns: the networks which changed, and the set of the ids of the
+                  other active networks
+        """
+        cctxt = self.client.prepare(version='1.7')
+        changes = cctxt.call(self.context, 'get_active_networks_changes',
+                             host=self.host,
+                             revision_digests=revision_digests, **kwargs)
+        return ([dhcp.NetModel(n) for n in changes['networks']],
+                set(changes['unchanged_network_ids']))
+
     def get_network_info(self, network_id):
         """Make a remote process call to retrieve network info."""
         cctxt = self.client.prepare()
@@ -779,6 +907,11 @@ class NetworkCache(object):
         self.subnet_lookup = {}
         self.port_lookup = {}
         self.deleted_ports = set()
+        # Whether the networks changed since they were last saved.
+        self.changed = False
+        # The ids of the networks whose cached state was not applied by the
+        # driver, because their reload is pending or failed.
+        self.unapplied_network_ids = set()
 
     def is_port_message_stale(self, payload):
         orig = self.get_port_by_id(payload['id']) or {}
@@ -811,6 +944,7 @@ class NetworkCache(object):
             self.remove(self.cache[network.id])
 
         self.cache[network.id] = network
+        self.changed = True
 
         non_local_subnets = getattr(network, 'non_local_subnets', [])
         for subnet in (network.subnets + non_local_subnets):
@@ -821,6 +955,7 @@ class NetworkCache(object):
 
     def remove(self, network):
         del self.cache[network.id]
+        self.changed = True
 
         non_local_subnets = getattr(network, 'non_local_subnets', [])
         for subnet in (network.subnets + non_local_subnets):
@@ -839,6 +974,7 @@ class NetworkCache(object):
             network.ports.append(port)
 
         self.port_lookup[port.id] = network.id
+        self.changed = True
 
     def remove_port(self, port):
         network = self.get_network_by_port_id(port.id)
@@ -847,6 +983,7 @@ class NetworkCache(object):
             if network.ports[index] == port:
                 del network.ports[index]
                 del self.port_lookup[port.id]
+                self.changed = True
                 break
 
     def get_port_by_id(self, port_id):
@@ -856,6 +993,51 @@ class NetworkCache(object):
                 if port.id == port_id:
                     return port
 
+    def set_applied(self, network_id, applied):
+        """Record whether the cached state of a network was applied."""
+        if applied == (network_id in self.unapplied_network_ids):
+            if applied:
+                self.unapplied_network_ids.discard(network_id)
+            else:
+                self.unapplied_network_ids.add(network_id)
+            self.changed = True
+
+    def get_revision_digests(self):
+        """Return the revision digests of the networks, by network id.
+
+        The networks some revision numbers of which are unknown, or whose
+        cached state was not applied, are left out.
+        """
+        digests = {}
+        for network in self.cache.values():
+            if network.id in self.unapplied_network_ids:
+                continue
+            non_local_subnets = getattr(network, 'non_local_subnets', [])
+            digest = utils.get_network_revision_digest(
+                network, network.subnets + non_local_subnets, network.ports)
+            if digest:
+                digests[network.id] = digest
+        return digests
+
+    def save(self, filename):
+        """Save the networks to a file.
+
+        The networks whose cached state was not applied are left out, so that
+        they are configured again if the agent restarts.
+        """
+        networks = [network for network in self.cache.values()
+                    if network.id not in self.unapplied_network_ids]
+        file_utils.replace_file(filename, jsonutils.dumps(networks))
+        self.changed = False
+
+    @staticmethod
+    def load(filename):
+        """Return the networks saved to a file, by network id."""
+        with open(filename) as f:
+            networks = jsonutils.load(f)
+        return dict((network['id'], dhcp.NetModel(network))
+                    for network in networks)
+
     def get_state(self):
         net_ids = self.get_network_ids()
         num_nets = len(net_ids)
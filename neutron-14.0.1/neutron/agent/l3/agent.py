@@ -49,7 +49,9 @@ from neutron.agent.l3 import l3_agent_extension_api as l3_ext_api
 from neutron.agent.l3 import l3_agent_extensions_manager as l3_ext_manager
 from neutron.agent.l3 import legacy_router
 from neutron.agent.l3 import namespace_manager
+from neutron.agent.l3 import namespaces
 from neutron.agent.linux import external_process
+from neutron.agent.linux import ip_lib
 from neutron.agent.linux import pd
 from neutron.agent.linux import utils as linux_utils
 from neutron.agent.metadata import driver as metadata_driver
@@ -559,9 +561,20 @@ class L3NATAgent(ha.AgentMixin,
             self._process_updated_router(router)
 
     def _process_added_router(self, router):
+        # e.g. on an agent restart, the router may already be configured
+        resync = self.conf.resync_from_kernel_state and (
+            ip_lib.network_namespace_exists(namespaces.build_ns_name(
+                namespaces.NS_PREFIX, router['id'])))
         self._router_added(router['id'], router)
         ri = self.router_info[router['id']]
         ri.router = router
+        if resync:
+            with ri.resync_from_kernel_state():
+                self._process_new_router(ri, router)
+        else:
+            self._process_new_router(ri, router)
+
+    def _process_new_router(self, ri, router):
         ri.process()
         registry.notify(resources.ROUTER, events.AFTER_CREATE, self, router=ri)
         self.l3_ext_manager.add_router(self.context, router)
@@ -248,33 +248,42 @@ class DvrLocalRouter(dvr_router_base.DvrRouterBase):
 
     def _update_arp_entry(self, ip, mac, subnet_id, operation):
         """Add or delete arp entry into router namespace for the subnet."""
+        return self._update_arp_entries([(ip, mac)], subnet_id, operation)
+
+    def _update_arp_entries(self, arp_entries, subnet_id, operation):
+        """Add or delete arp entries into router namespace for the subnet.
+
+        The entries are updated by a single batch of operations.
+        """
         port = self._get_internal_port(subnet_id)
-        # update arp entry only if the subnet is attached to the router
-        if not port:
+        # update arp entries only if the subnet is attached to the router
+        if not port or not arp_entries:
             return False
 
         try:
-            # TODO(mrsmith): optimize the calls below for bulk calls
             interface_name = self.get_internal_device_name(port['id'])
             device = ip_lib.IPDevice(interface_name, namespace=self.ns_name)
             if device.exists():
-                if operation == 'add':
-                    device.neigh.add(ip, mac)
-                elif operation == 'delete':
-                    device.neigh.delete(ip, mac)
+                with device.batch() as batch:
+                    for ip, mac in arp_entries:
+                        if operation == 'add':
+                            batch.add_neigh_entry(ip, mac)
+                        elif operation == 'delete':
+                            batch.delete_neigh_entry(ip, mac)
                 return True
             else:
                 if operation == 'add':
-                    LOG.warning("Device %s does not exist so ARP entry "
+                    LOG.warning("Device %s does not exist so ARP entries "
                                 "cannot be updated, will cache "
                                 "information to be applied later "
                                 "when the device exists",
                                 device)
-                    self._cache_arp_entry(ip, mac, subnet_id, operation)
+                    for ip, mac in arp_entries:
+                        self._cache_arp_entry(ip, mac, subnet_id, operation)
                 return False
         except Exception:
             with excutils.save_and_reraise_exception():
-                LOG.exception("DVR: Failed updating arp entry")
+                LOG.exception("DVR: Failed updating arp entries")
 
     def _set_subnet_arp_info(self, subnet_id):
         """Set ARP info retrieved from Plugin for existing ports."""
@@ -285,13 +294,13 @@ class DvrLocalRouter(dvr_router_base.DvrRouterBase):
             lib_constants.ROUTER_INTERFACE_OWNERS +
             tuple(common_utils.get_dvr_allowed_address_pair_device_owners()))
 
+        arp_entries = []
         for p in subnet_ports:
             if p['device_owner'] not in ignored_device_owners:
                 for fixed_ip in p['fixed_ips']:
-                    self._update_arp_entry(fixed_ip['ip_address'],
-                                           p['mac_address'],
-                                           subnet_id,
-                                           'add')
+                    arp_entries.append((fixed_ip['ip_address'],
+                                        p['mac_address']))
+        self._update_arp_entries(arp_entries, subnet_id, 'add')
         self._process_arp_cache_for_internal_port(subnet_id)
 
     @staticmethod
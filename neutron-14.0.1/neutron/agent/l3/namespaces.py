@@ -92,20 +92,18 @@ class Namespace(object):
         # See networking (netdev) tree, file
         # Documentation/networking/ip-sysctl.txt for an explanation of
         # these sysctl values.
+        # The values are all written by a single sysctl run.
         ip_wrapper = self.ip_wrapper_root.ensure_namespace(self.name)
-        cmd = ['sysctl', '-w', 'net.ipv4.ip_forward=1']
-        ip_wrapper.netns.execute(cmd)
-        # 1. Reply only if the target IP address is local address configured
-        #    on the incoming interface; and
-        # 2. Always use the best local address
-        cmd = ['sysctl', '-w', 'net.ipv4.conf.all.arp_ignore=1']
-        ip_wrapper.netns.execute(cmd)
-        cmd = ['sysctl', '-w', 'net.ipv4.conf.all.arp_announce=2']
-        ip_wrapper.netns.execute(cmd)
+        cmd = ['sysctl', '-w', 'net.ipv4.ip_forward=1',
+               # 1. Reply only if the target IP address is local address
+               #    configured on the incoming interface; and
+               # 2. Always use the best local address
+               'net.ipv4.conf.all.arp_ignore=1',
+               'net.ipv4.conf.all.arp_announce=2']
         if self.use_ipv6:
-            cmd = ['sysctl', '-w',
-                   'net.ipv6.conf.all.forwarding=%d' % int(ipv6_forwarding)]
-            ip_wrapper.netns.execute(cmd)
+            cmd.append(
+                'net.ipv6.conf.all.forwarding=%d' % int(ipv6_forwarding))
+        ip_wrapper.netns.execute(cmd)
 
     def delete(self):
         try:
@@ -13,6 +13,7 @@
 #    under the License.
 
 import collections
+import contextlib
 
 import netaddr
 from neutron_lib import constants as lib_constants
@@ -83,6 +84,8 @@ class RouterInfo(object):
         self.centralized_port_forwarding_fip_set = set()
         self.fip_managed_by_port_forwardings = None
         self.qos_gateway_ips = set()
+        # The devices of the namespace by name, while resyncing from them
+        self._kernel_devices = None
 
     def initialize(self, process_monitor):
         """Initialize the router on the system.
@@ -103,6 +106,38 @@ class RouterInfo(object):
 
         self.router_namespace.create()
 
+    @contextlib.contextmanager
+    def resync_from_kernel_state(self):
+        """Context to process the router in its existing namespace.
+
+        The devices of the namespace and their IP addresses are read at once,
+        the internal ports whose device already matches the port are not
+        configured again, and the iptables rules are only applied when the
+        context ends.
+        """
+        self._kernel_devices = dict(
+            (device['name'], device)
+            for device in ip_lib.get_devices_info_with_ip(self.ns_name))
+        try:
+            with self.iptables_manager.defer_apply():
+                yield
+        finally:
+            self._kernel_devices = None
+
+    def _kernel_device_matches(self, interface_name, mac_address, ip_cidrs,
+                               mtu):
+        if not self._kernel_devices:
+            return False
+        device = self._kernel_devices.get(interface_name)
+        if (not device or not device['mac'] or
+                device['mac'].lower() != mac_address.lower() or
+                (mtu and device['mtu'] != mtu)):
+            return False
+        cidrs = set(ip_address['cidr']
+                    for ip_address in device['ip_addresses']
+                    if ip_address['scope'] == 'global')
+        return cidrs == set(ip_cidrs)
+
     def create_router_namespace_object(
             self, router_id, agent_conf, iface_driver, use_ipv6):
         return namespaces.RouterNamespace(
@@ -454,11 +489,17 @@ class RouterInfo(object):
                                 interface_name, prefix, mtu=None):
         LOG.debug("adding internal network: prefix(%s), port(%s)",
                   prefix, port_id)
+        ip_cidrs = common_utils.fixed_ip_cidrs(fixed_ips)
+        if ns_name == self.ns_name and self._kernel_device_matches(
+                interface_name, mac_address, ip_cidrs, mtu):
+            LOG.debug("Device %s is already configured for port %s",
+                      interface_name, port_id)
+            return
+
         self.driver.plug(network_id, port_id, interface_name, mac_address,
                          namespace=ns_name,
                          prefix=prefix, mtu=mtu)
 
-        ip_cidrs = common_utils.fixed_ip_cidrs(fixed_ips)
         self.driver.init_router_port(
             interface_name, ip_cidrs, namespace=ns_name)
         for fixed_ip in fixed_ips:
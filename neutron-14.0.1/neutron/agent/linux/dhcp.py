@@ -149,6 +149,14 @@ class DhcpBase(object):
         self.disable(retain_port=True, block=True)
         self.enable()
 
+    def resume(self):
+        """Resume the dhcp service for the network after an agent restart.
+
+        The network is known not to have changed since the service was last
+        configured for it, which drivers can use to keep it running as is.
+        """
+        self.enable()
+
     @abc.abstractproperty
     def active(self):
         """Boolean representing the running state of the DHCP server."""
@@ -305,6 +313,24 @@ class DhcpLocalProcess(DhcpBase):
         pass
 
 
+class NetworkHosts(object):
+    """The host entries and config files contents of a network.
+
+    They are kept across the reloads of the network when
+    dnsmasq_incremental_reload is enabled, a driver being created for each
+    of them.
+    """
+
+    def __init__(self):
+        # What the host entries of all the ports depend on.
+        self.key = None
+        # The revision number and host entries of the ports, by port id.
+        self.port_hosts = {}
+        # The contents last written to the config files, by kind.
+        self.files = {}
+        self.writes = 0
+
+
 class Dnsmasq(DhcpLocalProcess):
     # The ports that need to be opened when security policies are active
     # on the Neutron port used for DHCP.  These are provided as a convenience
@@ -321,6 +347,9 @@ class Dnsmasq(DhcpLocalProcess):
 
     _IS_DHCP_RELEASE6_SUPPORTED = None
 
+    # The NetworkHosts of the networks, by network id.
+    _NETWORK_HOSTS = {}
+
     @classmethod
     def check_version(cls):
         pass
@@ -468,13 +497,40 @@ class Dnsmasq(DhcpLocalProcess):
         or it's reloaded if the process is not running.
         """
 
-        self._output_config_files()
+        changed = self._output_config_files()
 
         pm = self._get_process_manager(
             cmd_callback=self._build_cmdline_callback)
 
-        pm.enable(reload_cfg=reload_with_HUP)
+        try:
+            pm.enable(reload_cfg=reload_with_HUP and changed)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                # Make sure that the files are written and dnsmasq is
+                # signaled again on the next reload.
+                self._forget_network_hosts()
+
+        self.process_monitor.register(uuid=self.network.id,
+                                      service_name=DNSMASQ_SERVICE_NAME,
+                                      monitored_process=pm)
+
+    def resume(self):
+        """Monitor the dnsmasq left running for the network, if any.
 
+        The running dnsmasq is restarted when its command line differs from
+        the one given by the current configuration, like on agent start.
+        """
+        if not self.active or not self.interface_name:
+            self.enable()
+            return
+        pm = self._get_process_manager(
+            cmd_callback=self._build_cmdline_callback)
+        cmd = self._build_cmdline_callback(pm.get_pid_file_name())
+        if pm.cmdline != ' '.join(cmd):
+            LOG.debug("Restarting the DHCP process of network %s, its "
+                      "command line changed", self.network.id)
+            self.enable()
+            return
         self.process_monitor.register(uuid=self.network.id,
                                       service_name=DNSMASQ_SERVICE_NAME,
                                       monitored_process=pm)
@@ -509,10 +565,41 @@ class Dnsmasq(DhcpLocalProcess):
             LOG.warning('DHCP release failed for %(cmd)s. '
                         'Reason: %(e)s', {'cmd': cmd, 'e': e})
 
+    def _get_network_hosts(self):
+        """Return the NetworkHosts of the network, or None if not kept."""
+        if not self.conf.dnsmasq_incremental_reload:
+            return None
+        return self._NETWORK_HOSTS.setdefault(self.network.id,
+                                              NetworkHosts())
+
+    def _forget_network_hosts(self):
+        self._NETWORK_HOSTS.pop(self.network.id, None)
+
+    def _remove_config_files(self):
+        self._forget_network_hosts()
+        super(Dnsmasq, self)._remove_config_files()
+
+    def _replace_config_file(self, kind, contents):
+        """Write a config file, unless it was last written with contents."""
+        filename = self.get_conf_file_name(kind)
+        network_hosts = self._get_network_hosts()
+        if network_hosts is None:
+            file_utils.replace_file(filename, contents)
+            return filename
+        if network_hosts.files.get(kind) != contents:
+            file_utils.replace_file(filename, contents)
+            network_hosts.files[kind] = contents
+            network_hosts.writes += 1
+        return filename
+
     def _output_config_files(self):
+        """Write the config files and return whether any of them changed."""
+        network_hosts = self._get_network_hosts()
+        writes = network_hosts.writes if network_hosts else None
         self._output_hosts_file()
         self._output_addn_hosts_file()
         self._output_opts_file()
+        return network_hosts is None or network_hosts.writes != writes
 
     def reload_allocations(self):
         """Rebuild the dnsmasq config and signal the dnsmasq to reload."""
@@ -593,38 +680,68 @@ class Dnsmasq(DhcpLocalProcess):
                        self._get_all_subnets(self.network)
                        if subnet.ip_version == 6)
 
+        network_hosts = self._get_network_hosts()
+        if network_hosts is None:
+            for port in self.network.ports:
+                for host_tuple in self._iter_port_hosts(port, v6_nets):
+                    yield host_tuple
+            return
+
+        # The host entries of a port are only built again when its revision
+        # changed, or when something they depend on changed for all ports.
+        key = (self.dns_domain,
+               sorted((subnet_id, subnet.ipv6_address_mode)
+                      for subnet_id, subnet in v6_nets.items()))
+        if network_hosts.key != key:
+            network_hosts.key = key
+            network_hosts.port_hosts = {}
+        port_hosts = {}
         for port in self.network.ports:
-            fixed_ips = self._sort_fixed_ips_for_dnsmasq(port.fixed_ips,
-                                                         v6_nets)
-            # Confirm whether Neutron server supports dns_name attribute in the
-            # ports API
-            dns_assignment = getattr(port, 'dns_assignment', None)
+            revision_number = getattr(port, 'revision_number', None)
+            cached = network_hosts.port_hosts.get(port.id)
+            if (revision_number is None or cached is None or
+                    cached[0] != revision_number):
+                cached = (revision_number,
+                          list(self._iter_port_hosts(port, v6_nets)))
+            if revision_number is not None:
+                port_hosts[port.id] = cached
+            for host_tuple in cached[1]:
+                yield host_tuple
+        # This also forgets the ports which were removed from the network.
+        network_hosts.port_hosts = port_hosts
+
+    def _iter_port_hosts(self, port, v6_nets):
+        """Iterate over the hosts of a port, see _iter_hosts."""
+        fixed_ips = self._sort_fixed_ips_for_dnsmasq(port.fixed_ips, v6_nets)
+        # Confirm whether Neutron server supports dns_name attribute in the
+        # ports API
+        dns_assignment = getattr(port, 'dns_assignment', None)
+        if dns_assignment:
+            dns_ip_map = {d.ip_address: d for d in dns_assignment}
+        for alloc in fixed_ips:
+            no_dhcp = False
+            no_opts = False
+            if alloc.subnet_id in v6_nets:
+                addr_mode = v6_nets[alloc.subnet_id].ipv6_address_mode
+                no_dhcp = addr_mode in (constants.IPV6_SLAAC,
+                                        constants.DHCPV6_STATELESS)
+                # we don't setup anything for SLAAC. It doesn't make sense
+                # to provide options for a client that won't use DHCP
+                no_opts = addr_mode == constants.IPV6_SLAAC
+
+            # If dns_name attribute is supported by ports API, return the
+            # dns_assignment generated by the Neutron server. Otherwise,
+            # generate hostname and fqdn locally (previous behaviour)
             if dns_assignment:
-                dns_ip_map = {d.ip_address: d for d in dns_assignment}
-            for alloc in fixed_ips:
-                no_dhcp = False
-                no_opts = False
-                if alloc.subnet_id in v6_nets:
-                    addr_mode = v6_nets[alloc.subnet_id].ipv6_address_mode
-                    no_dhcp = addr_mode in (constants.IPV6_SLAAC,
-                                            constants.DHCPV6_STATELESS)
-                    # we don't setup anything for SLAAC. It doesn't make sense
-                    # to provide options for a client that won't use DHCP
-                    no_opts = addr_mode == constants.IPV6_SLAAC
-
-                # If dns_name attribute is supported by ports API, return the
-                # dns_assignment generated by the Neutron server. Otherwise,
-                # generate hostname and fqdn locally (previous behaviour)
-                if dns_assignment:
-                    hostname = dns_ip_map[alloc.ip_address].hostname
-                    fqdn = dns_ip_map[alloc.ip_address].fqdn
-                else:
-                    hostname = 'host-%s' % alloc.ip_address.replace(
-                        '.', '-').replace(':', '-')
-                    fqdn = hostname
-                    if self.dns_domain:
-                        fqdn = '%s.%s' % (fqdn, self.dns_domain)
-                yield (port, alloc, hostname, fqdn, no_dhcp, no_opts)
+                hostname = dns_ip_map[alloc.ip_address].hostname
+                fqdn = dns_ip_map[alloc.ip_address].fqdn
+            else:
+                hostname = 'host-%s' % alloc.ip_address.replace(
+                    '.', '-').replace(':', '-')
+                fqdn = hostname
+                if self.dns_domain:
+                    fqdn = '%s.%s' % (fqdn, self.dns_domain)
+            yield (port, alloc, hostname, fqdn, no_dhcp, no_opts)
 
     def _get_port_extra_dhcp_opts(self, port):
         return getattr(port, edo_ext.EXTRADHCPOPTS, False)
@@ -740,7 +857,7 @@ class Dnsmasq(DhcpLocalProcess):
                 buf.write('%s,%s,%s\n' %
                           (port.mac_address, name, ip_address))
 
-        file_utils.replace_file(filename, buf.getvalue())
+        self._replace_config_file('host', buf.getvalue())
         LOG.debug('Done building host file %s', filename)
         return filename
 
@@ -939,18 +1056,14 @@ class Dnsmasq(DhcpLocalProcess):
             # order to obtain it in PTR responses.
             if alloc:
                 buf.write('%s\t%s %s\n' % (alloc.ip_address, fqdn, hostname))
-        addn_hosts = self.get_conf_file_name('addn_hosts')
-        file_utils.replace_file(addn_hosts, buf.getvalue())
-        return addn_hosts
+        return self._replace_config_file('addn_hosts', buf.getvalue())
 
     def _output_opts_file(self):
         """Write a dnsmasq compatible options file."""
         options, subnet_index_map = self._generate_opts_per_subnet()
         options += self._generate_opts_per_port(subnet_index_map)
 
-        name = self.get_conf_file_name('opts')
-        file_utils.replace_file(name, '\n'.join(options))
-        return name
+        return self._replace_config_file('opts', '\n'.join(options))
 
     def _generate_opts_per_subnet(self):
         options = []
@@ -92,6 +92,24 @@ class InvalidArgument(exceptions.NeutronException):
                 "provided.")
 
 
+class IpOperationFailed(exceptions.NeutronException):
+    message = _("Operation %(operation)s on device %(device)s failed: "
+                "%(reason)s")
+
+
+class IpOperationsBatchFailed(exceptions.NeutronException):
+    message = _("%(failed)d of the %(total)d operations run in namespace "
+                "%(namespace)s failed: %(errors)s")
+
+    def __init__(self, **kwargs):
+        # List of the (operation, device, exception) of the failures
+        self.errors = kwargs.pop('errors')
+        super(IpOperationsBatchFailed, self).__init__(
+            failed=len(self.errors),
+            errors='; '.join(str(error[2]) for error in self.errors),
+            **kwargs)
+
+
 class SubProcessBase(object):
     def __init__(self, namespace=None,
                  log_fail_as_error=True):
@@ -143,6 +161,9 @@ class IPWrapper(SubProcessBase):
     def device(self, name):
         return IPDevice(name, namespace=self.namespace)
 
+    def batch(self):
+        return IpOperationsBatch(namespace=self.namespace)
+
     def get_devices_info(self, exclude_loopback=True,
                          exclude_fb_tun_devices=True):
         devices = get_devices_info(self.namespace)
@@ -317,6 +338,10 @@ class IPDevice(SubProcessBase):
         """Return True if the device exists in the namespace."""
         return privileged.interface_exists(self.name, self.namespace)
 
+    def batch(self):
+        """Return a batch of operations on this device by default."""
+        return IpOperationsBatch(namespace=self.namespace, device=self.name)
+
     def delete_addr_and_conntrack_state(self, cidr):
         """Delete an address along with its conntrack state
 
@@ -964,6 +989,123 @@ def dump_neigh_entries(ip_version, device=None, namespace=None, **kwargs):
                                               **kwargs))
 
 
+class IpOperationsBatch(object):
+    """Address, link and neighbour operations run in one privileged call.
+
+    The operations are accumulated and run in order, within the namespace,
+    by a single call to the privsep daemon, each of them being run even if
+    a previous one failed. Used as a context manager, the operations are run
+    on exit and IpOperationsBatchFailed is raised if any of them failed:
+
+        with ip_lib.IPDevice(name, namespace=ns).batch() as batch:
+            batch.add_ip_address('10.0.0.1/24')
+            batch.set_link_up()
+    """
+
+    # The privileged exceptions which can be rebuilt from their message
+    _ERRORS = dict((error.__name__, error) for error in (
+        privileged.NetworkInterfaceNotFound,
+        privileged.InterfaceOperationNotSupported,
+        privileged.IpAddressAlreadyExists))
+
+    def __init__(self, namespace=None, device=None):
+        self.namespace = namespace
+        self.device = device
+        self.operations = []
+
+    def __len__(self):
+        return len(self.operations)
+
+    def _add(self, operation, device, **kwargs):
+        device = device or self.device
+        if not device:
+            raise InvalidArgument(parameter='device', value=device)
+        self.operations.append(
+            (operation, device[:constants.DEVICE_NAME_MAX_LEN], kwargs))
+
+    def add_ip_address(self, cidr, device=None, scope='global',
+                       add_broadcast=True):
+        net = netaddr.IPNetwork(cidr)
+        broadcast = None
+        if add_broadcast and net.version == 4:
+            broadcast = str(net.broadcast or net.ip)
+        self._add('add_ip_address', device, ip_version=net.version,
+                  ip_address=str(net.ip), prefixlen=net.prefixlen,
+                  scope=scope, broadcast=broadcast)
+
+    def delete_ip_address(self, cidr, device=None):
+        net = netaddr.IPNetwork(cidr)
+        self._add('delete_ip_address', device, ip_version=net.version,
+                  ip_address=str(net.ip), prefixlen=net.prefixlen)
+
+    def flush_ip_addresses(self, ip_version, device=None):
+        self._add('flush_ip_addresses', device, ip_version=ip_version)
+
+    def set_link_address(self, mac_address, device=None):
+        self._add('set_link_attribute', device, address=mac_address)
+
+    def set_link_mtu(self, mtu_size, device=None):
+        self._add('set_link_attribute', device, mtu=mtu_size)
+
+    def set_link_up(self, device=None):
+        self._add('set_link_attribute', device, state='up')
+
+    def set_link_down(self, device=None):
+        self._add('set_link_attribute', device, state='down')
+
+    def add_neigh_entry(self, ip_address, mac_address, device=None,
+                        **kwargs):
+        kwargs.update(ip_version=common_utils.get_ip_version(ip_address),
+                      ip_address=ip_address, mac_address=mac_address)
+        self._add('add_neigh_entry', device, **kwargs)
+
+    def delete_neigh_entry(self, ip_address, mac_address, device=None,
+                           **kwargs):
+        kwargs.update(ip_version=common_utils.get_ip_version(ip_address),
+                      ip_address=ip_address, mac_address=mac_address)
+        self._add('delete_neigh_entry', device, **kwargs)
+
+    def _make_error(self, operation, device, error):
+        if error is None:
+            return None
+        name, message = error
+        if name in self._ERRORS:
+            return self._ERRORS[name](message)
+        return IpOperationFailed(operation=operation, device=device,
+                                 reason=message)
+
+    def execute(self):
+        """Run the accumulated operations.
+
+        :return: a list with, for each operation in order, None if it
+                 succeeded or the exception of its failure
+        """
+        operations = self.operations
+        self.operations = []
+        if not operations:
+            return []
+        results = privileged.execute_batch(self.namespace, operations)
+        return [self._make_error(operation, device, error)
+                for (operation, device, _kwargs), error
+                in zip(operations, results)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            return
+        operations = self.operations
+        errors = [(operation, device, error)
+                  for (operation, device, _kwargs), error
+                  in zip(operations, self.execute())
+                  if error is not None]
+        if errors:
+            raise IpOperationsBatchFailed(namespace=self.namespace,
+                                          total=len(operations),
+                                          errors=errors)
+
+
 def create_network_namespace(namespace, **kwargs):
     """Create a network namespace.
 
@@ -1407,6 +1549,26 @@ def get_devices_with_ip(namespace, name=None, **kwargs):
     return retval
 
 
+def get_devices_info_with_ip(namespace):
+    """Return the devices of a namespace with their IP addresses.
+
+    Unlike get_devices_with_ip(), the IP addresses of all the devices are read
+    at once. Each device, as returned by get_devices_info(), has a list of
+    'ip_addresses' dictionaries with their 'cidr' and 'scope'.
+    """
+    devices = dict((device['index'], dict(device, ip_addresses=[]))
+                   for device in get_devices_info(namespace))
+    for ip_address in privileged.get_ip_addresses(namespace):
+        device = devices.get(ip_address['index'])
+        if device is None:
+            continue
+        cidr = common_utils.ip_to_cidr(get_attr(ip_address, 'IFA_ADDRESS'),
+                                       prefix=ip_address['prefixlen'])
+        device['ip_addresses'].append(
+            {'cidr': cidr, 'scope': IP_ADDRESS_SCOPE[ip_address['scope']]})
+    return list(devices.values())
+
+
 def get_devices_info(namespace, **kwargs):
     devices = privileged.get_link_devices(namespace, **kwargs)
     retval = {}
@@ -24,6 +24,7 @@ import difflib
 import os
 import re
 import sys
+import time
 
 from neutron_lib import exceptions
 from neutron_lib.exceptions import l3 as l3_exc
@@ -313,6 +314,9 @@ class IptablesManager(object):
         self.namespace = namespace
         self.iptables_apply_deferred = False
         self.wrap_name = binary_name[:16]
+        # The rules of the tables as last applied, and the time they were
+        # last read with iptables-save, by command
+        self._applied_state = {}
 
         self.ipv4 = {'filter': IptablesTable(binary_name=self.wrap_name)}
         self.ipv6 = {'filter': IptablesTable(binary_name=self.wrap_name)}
@@ -418,7 +422,14 @@ class IptablesManager(object):
 
     @contextlib.contextmanager
     def defer_apply(self):
-        """Defer apply context."""
+        """Defer apply context.
+
+        Within an already deferred apply, the rules are only applied when the
+        outer one ends.
+        """
+        if self.iptables_apply_deferred:
+            yield
+            return
         self.defer_apply_on()
         try:
             yield
@@ -458,7 +469,7 @@ class IptablesManager(object):
             first = self._apply_synchronized()
             if not cfg.CONF.AGENT.debug_iptables_rules:
                 return first
-            second = self._apply_synchronized()
+            second = self._apply_synchronized(verify=True)
             if second:
                 msg = (_("IPTables Rules did not converge. Diff: %s") %
                        '\n'.join(second))
@@ -529,57 +540,140 @@ class IptablesManager(object):
                   "following set of iptables rules:\n%s",
                   '\n'.join(log_lines))
 
-    def _apply_synchronized(self):
+    def _get_applied_state(self, cmd, verify):
+        """Return the rules of the tables as last applied, if still valid.
+
+        Returns None when the rules must be read with iptables-save, i.e.
+        when they were never applied, when verify is set or when they were
+        last read more than iptables_state_verify_interval seconds ago.
+        """
+        interval = cfg.CONF.AGENT.iptables_state_verify_interval
+        if verify or not interval or cmd not in self._applied_state:
+            return None
+        saved_at, state = self._applied_state[cmd]
+        if time.time() - saved_at >= interval:
+            return None
+        return state
+
+    def _save_state(self, cmd, tables):
+        """Run iptables-save and return the rules of the tables, or None.
+
+        None is returned if the namespace was deleted in the meantime.
+        """
+        args = ['%s-save' % (cmd,)]
+        if self.namespace:
+            args = ['ip', 'netns', 'exec', self.namespace] + args
+        try:
+            save_output = self.execute(args, run_as_root=True)
+        except RuntimeError:
+            # We could be racing with a cron job deleting namespaces.
+            # It is useless to try to apply iptables rules over and
+            # over again in a endless loop if the namespace does not
+            # exist.
+            with excutils.save_and_reraise_exception() as ctx:
+                if (self.namespace and not
+                        ip_lib.network_namespace_exists(self.namespace)):
+                    ctx.reraise = False
+                    LOG.error("Namespace %s was deleted during IPTables "
+                              "operations.", self.namespace)
+                    return None
+        all_lines = save_output.split('\n')
+        state = {}
+        for table_name in tables:
+            # isolate the lines of the table we are modifying
+            start, end = self._find_table(all_lines, table_name)
+            state[table_name] = all_lines[start:end]
+        return state
+
+    def _generate_commands(self, tables, state):
+        """Generate the commands to get from state to the current rules.
+
+        Returns the new state of the tables and the iptables-restore
+        commands to get to it.
+        """
+        new_state = {}
+        commands = []
+        # Traverse tables in sorted order for predictable dump output
+        for table_name in sorted(tables):
+            table = tables[table_name]
+            old_rules = state.get(table_name, [])
+            # generate the new table state we want
+            new_rules = self._modify_rules(old_rules, table, table_name)
+            new_state[table_name] = new_rules
+            # generate the iptables commands to get between the old state
+            # and the new state
+            changes = _generate_path_between_rules(old_rules, new_rules)
+            if changes:
+                # if there are changes to the table, we put on the header
+                # and footer that iptables-save needs
+                commands += (['# Generated by iptables_manager'] +
+                             ['*%s' % table_name] + changes +
+                             ['COMMIT', '# Completed by iptables_manager'])
+        return new_state, commands
+
+    def _only_wrapped_chains_changed(self, commands):
+        """Return whether commands only change the chains of this agent.
+
+        The rules of the other chains may have been changed by other
+        processes since they were last read, so their positions in the
+        applied state cannot be trusted.
+        """
+        prefix = '%s-' % self.wrap_name
+        for command in commands:
+            if command.startswith(':'):
+                chain = command[1:].split(' ', 1)[0]
+            elif command.startswith(('-I ', '-D ', '-X ')):
+                chain = command.split(' ', 2)[1]
+            else:
+                continue
+            if not chain.startswith(prefix):
+                return False
+        return True
+
+    def _apply_synchronized(self, verify=False):
         """Apply the current in-memory set of iptables rules.
 
         This will create a diff between the rules from the previous runs
         and replace them with the current set of rules.
         This happens atomically, thanks to iptables-restore.
 
+        The previous rules are read with iptables-save, unless they were
+        applied by this manager and iptables_state_verify_interval is set,
+        see _get_applied_state(), and only the chains of this agent change.
+
         Returns a list of the changes that were sent to iptables-save.
+
+        :param verify: read the previous rules with iptables-save.
         """
         s = [('iptables', self.ipv4)]
         if self.use_ipv6:
             s += [('ip6tables', self.ipv6)]
         all_commands = []  # variable to keep track all commands for return val
         for cmd, tables in s:
-            args = ['%s-save' % (cmd,)]
-            if self.namespace:
-                args = ['ip', 'netns', 'exec', self.namespace] + args
-            try:
-                save_output = self.execute(args, run_as_root=True)
-            except RuntimeError:
-                # We could be racing with a cron job deleting namespaces.
-                # It is useless to try to apply iptables rules over and
-                # over again in a endless loop if the namespace does not
-                # exist.
-                with excutils.save_and_reraise_exception() as ctx:
-                    if (self.namespace and not
-                            ip_lib.network_namespace_exists(self.namespace)):
-                        ctx.reraise = False
-                        LOG.error("Namespace %s was deleted during IPTables "
-                                  "operations.", self.namespace)
-                        return []
-            all_lines = save_output.split('\n')
-            commands = []
-            # Traverse tables in sorted order for predictable dump output
-            for table_name in sorted(tables):
-                table = tables[table_name]
-                # isolate the lines of the table we are modifying
-                start, end = self._find_table(all_lines, table_name)
-                old_rules = all_lines[start:end]
-                # generate the new table state we want
-                new_rules = self._modify_rules(old_rules, table, table_name)
-                # generate the iptables commands to get between the old state
-                # and the new state
-                changes = _generate_path_between_rules(old_rules, new_rules)
-                if changes:
-                    # if there are changes to the table, we put on the header
-                    # and footer that iptables-save needs
-                    commands += (['# Generated by iptables_manager'] +
-                                 ['*%s' % table_name] + changes +
-                                 ['COMMIT', '# Completed by iptables_manager'])
+            commands = None
+            state = self._get_applied_state(cmd, verify)
+            if state is not None:
+                saved_at = self._applied_state[cmd][0]
+                # _modify_rules() consumes the chains and rules to remove
+                removes = {name: (set(table.remove_chains),
+                                  list(table.remove_rules))
+                           for name, table in tables.items()}
+                new_state, commands = self._generate_commands(tables, state)
+                if not self._only_wrapped_chains_changed(commands):
+                    for name, table in tables.items():
+                        table.remove_chains, table.remove_rules = (
+                            removes[name])
+                    commands = None
+            if commands is None:
+                state = self._save_state(cmd, tables)
+                if state is None:
+                    return []
+                saved_at = time.time()
+                new_state, commands = self._generate_commands(tables, state)
+
             if not commands:
+                if cfg.CONF.AGENT.iptables_state_verify_interval:
+                    self._applied_state[cmd] = (saved_at, new_state)
                 continue
             all_commands += commands
 
@@ -592,8 +686,11 @@ class IptablesManager(object):
 
             err = self._run_restore(args, commands)
             if err:
+                self._applied_state.pop(cmd, None)
                 self._log_restore_err(err, commands)
                 raise err
+            if cfg.CONF.AGENT.iptables_state_verify_interval:
+                self._applied_state[cmd] = (saved_at, new_state)
 
         LOG.debug("IPTablesManager.apply completed with success. %d iptables "
                   "commands were issued", len(all_commands))
@@ -790,6 +887,8 @@ def _generate_path_between_rules(old_rules, new_rules):
             other_chains.append(chain)
 
     for chain in other_chains + sg_chains:
+        if old_by_chain[chain] == new_by_chain[chain]:
+            continue
         statements += _generate_chain_diff_iptables_commands(
             chain, old_by_chain[chain], new_by_chain[chain])
     # unreferenced chains get the axe
@@ -22,7 +22,9 @@ from neutron_lib.callbacks import events as callbacks_events
 from neutron_lib.callbacks import registry as callbacks_registry
 from neutron_lib.callbacks import resources as callbacks_resources
 from neutron_lib import constants as lib_const
+from oslo_config import cfg
 from oslo_log import log as logging
+from oslo_utils import excutils
 from oslo_utils import netutils
 
 from neutron._i18n import _
@@ -32,11 +34,14 @@ from neutron.agent.linux.openvswitch_firewall import exceptions
 from neutron.agent.linux.openvswitch_firewall import iptables
 from neutron.agent.linux.openvswitch_firewall import rules
 from neutron.common import constants
+from neutron.conf.agent import securitygroups_rpc as sg_cfg
 from neutron.plugins.ml2.drivers.openvswitch.agent.common import constants \
         as ovs_consts
 
 LOG = logging.getLogger(__name__)
 
+sg_cfg.register_securitygroups_opts()
+
 
 def _replace_register(flow_params, register_number, register_value):
     """Replace value from flows to given register number
@@ -57,6 +62,11 @@ def _replace_register(flow_params, register_number, register_value):
         pass
 
 
+def _get_flow_key(flow, ignore=()):
+    return tuple(sorted((key, str(value)) for key, value in flow.items()
+                        if key not in ignore))
+
+
 def create_reg_numbers(flow_params):
     """Replace reg_(port|net) values with defined register numbers"""
     _replace_register(flow_params, ovsfw_consts.REG_PORT, 'reg_port')
@@ -402,6 +412,11 @@ class OVSFirewallDriver(firewall.FirewallDriver):
         self.sg_to_delete = set()
         self._update_cookie = None
         self._deferred = False
+        # The flows installed for each port by port id, with
+        # [SECURITYGROUP]/incremental_port_flows
+        self._port_flows = {}
+        # The flows of a port while they are compiled
+        self._compiled_flows = None
         self.iptables_helper = iptables.Helper(self.int_br.br)
         self.iptables_helper.load_driver_if_needed()
         self._initialize_firewall()
@@ -413,6 +428,7 @@ class OVSFirewallDriver(firewall.FirewallDriver):
 
     def _init_firewall_callback(self, resource, event, trigger, **kwargs):
         LOG.info("Reinitialize Openvswitch firewall after OVS restart.")
+        self._port_flows.clear()
         self._initialize_firewall()
 
     def _initialize_firewall(self):
@@ -446,6 +462,9 @@ class OVSFirewallDriver(firewall.FirewallDriver):
         create_reg_numbers(kwargs)
         if isinstance(dl_type, int):
             kwargs['dl_type'] = "0x{:04x}".format(dl_type)
+        if self._compiled_flows is not None:
+            self._compiled_flows.append(kwargs)
+            return
         if self._update_cookie:
             kwargs['cookie'] = self._update_cookie
         if self._deferred:
@@ -595,10 +614,65 @@ class OVSFirewallDriver(firewall.FirewallDriver):
                       'err': tag_not_found})
 
     def _set_port_filters(self, of_port):
-        self.initialize_port_flows(of_port)
-        self.add_flows_from_rules(of_port)
+        if not cfg.CONF.SECURITYGROUP.incremental_port_flows:
+            self.initialize_port_flows(of_port)
+            self.add_flows_from_rules(of_port)
+            return
+        flows = self._compile_port_flows(of_port)
+        for flow in flows.values():
+            self._add_flow(**dict(flow))
+        self._port_flows[of_port.id] = flows
+        self.conj_ip_manager.update_flows_for_vlan(of_port.vlan_tag)
+
+    def _compile_port_flows(self, port):
+        """Return the flows of a port, without installing them.
+
+        The flows are returned in the order they are generated, by their
+        match and actions.
+        """
+        self._compiled_flows = []
+        try:
+            self.initialize_port_flows(port)
+            self._add_port_flows_from_rules(port)
+            flows = self._compiled_flows
+        finally:
+            self._compiled_flows = None
+        return collections.OrderedDict(
+            (_get_flow_key(flow), flow) for flow in flows)
+
+    def _update_port_flows(self, port):
+        """Only add and delete the flows of a port which changed."""
+        installed_flows = self._port_flows.pop(port.id)
+        flows = self._compile_port_flows(port)
+        for key, flow in flows.items():
+            if key not in installed_flows:
+                self._add_flow(**dict(flow))
+        # The flows with the match of a new flow are replaced when it is
+        # added, the others are deleted once the new flows are installed.
+        matches = set(_get_flow_key(flow, ignore=('actions',))
+                      for flow in flows.values())
+        stale_flows = []
+        for key, flow in installed_flows.items():
+            if key in flows:
+                continue
+            match = dict((field, value) for field, value in flow.items()
+                         if field != 'actions')
+            if _get_flow_key(match) not in matches:
+                match.setdefault('priority', 1)
+                stale_flows.append(dict(match, strict=True))
+        self.conj_ip_manager.update_flows_for_vlan(port.vlan_tag)
+        self.int_br.apply_flows()
+        if stale_flows:
+            self.int_br.br.do_action_flows('del', stale_flows,
+                                           self.int_br.use_bundle)
+        self._port_flows[port.id] = flows
 
     def _update_flows_for_port(self, of_port, old_of_port):
+        if (of_port.id in self._port_flows and
+                of_port.ofport == old_of_port.ofport and
+                cfg.CONF.SECURITYGROUP.incremental_port_flows):
+            self._update_port_flows(of_port)
+            return
         with self.update_cookie_context():
             self._set_port_filters(of_port)
         # Flush the flows caused by changes made to deferred bridge. The reason
@@ -622,6 +696,7 @@ class OVSFirewallDriver(firewall.FirewallDriver):
         if self.is_port_managed(port):
             of_port = self.get_ofport(port)
             self.delete_all_port_flows(of_port)
+            self._port_flows.pop(of_port.id, None)
             self.sg_port_map.remove_port(of_port)
             for sec_group in of_port.sec_groups:
                 self._schedule_sg_deletion_maybe(sec_group.id)
@@ -676,7 +751,12 @@ class OVSFirewallDriver(firewall.FirewallDriver):
     def filter_defer_apply_off(self):
         if self._deferred:
             self._cleanup_stale_sg()
-            self.int_br.apply_flows()
+            try:
+                self.int_br.apply_flows()
+            except Exception:
+                with excutils.save_and_reraise_exception():
+                    # The flows of the ports may not all be installed.
+                    self._port_flows.clear()
             self._deferred = False
 
     @property
@@ -1141,6 +1221,10 @@ class OVSFirewallDriver(firewall.FirewallDriver):
                     self._add_flow(**flow)
 
     def add_flows_from_rules(self, port):
+        self._add_port_flows_from_rules(port)
+        self.conj_ip_manager.update_flows_for_vlan(port.vlan_tag)
+
+    def _add_port_flows_from_rules(self, port):
         self._initialize_tracked_ingress(port)
         self._initialize_tracked_egress(port)
         LOG.debug('Creating flow rules for port %s that is port %d in OVS',
@@ -1157,8 +1241,6 @@ class OVSFirewallDriver(firewall.FirewallDriver):
 
         self._add_non_ip_conj_flows(port)
 
-        self.conj_ip_manager.update_flows_for_vlan(port.vlan_tag)
-
     def _create_rules_generator_for_port(self, port):
         for sec_group in port.sec_groups:
             for rule in sec_group.raw_rules:
@@ -92,6 +92,10 @@ class SecurityGroupAgentRpc(object):
         # Flag raised when a global refresh is needed
         self.global_refresh_firewall = False
         self._use_enhanced_rpc = None
+        # The revision numbers and rules of the security groups, when the
+        # server caches the compiled security groups and only sends the
+        # rules of the security groups whose revision changed.
+        self._security_group_rules = {}
 
     @property
     def use_enhanced_rpc(self):
@@ -139,8 +143,8 @@ class SecurityGroupAgentRpc(object):
             security_groups = {}
             security_group_member_ips = {}
             for i in range(0, len(device_ids), step):
-                devices_info = self.plugin_rpc.security_group_info_for_devices(
-                    self.context, list(device_ids)[i:i + step])
+                devices_info = self._get_security_group_info(
+                    list(device_ids)[i:i + step])
                 devices.update(devices_info['devices'])
                 security_groups.update(devices_info['security_groups'])
                 security_group_member_ips.update(devices_info['sg_member_ips'])
@@ -163,6 +167,38 @@ class SecurityGroupAgentRpc(object):
                     LOG.debug("Prepare port filter for %s", device['device'])
                     self.firewall.prepare_port_filter(device)
             self.firewall.process_trusted_ports(trusted_devices)
+        if self._security_group_rules:
+            self._prune_security_group_rules()
+
+    def _get_security_group_info(self, device_ids):
+        known_revisions = dict(
+            (sg_id, revision_rules[0])
+            for sg_id, revision_rules in self._security_group_rules.items())
+        if known_revisions:
+            devices_info = self.plugin_rpc.security_group_info_for_devices(
+                self.context, device_ids,
+                security_group_revisions=known_revisions)
+        else:
+            devices_info = self.plugin_rpc.security_group_info_for_devices(
+                self.context, device_ids)
+        # The server left out the rules of the security groups whose
+        # revision number is the one the agent knows.
+        security_groups = devices_info['security_groups']
+        for sg_id, revision in devices_info.get(
+                'security_group_revisions', {}).items():
+            if sg_id in security_groups:
+                self._security_group_rules[sg_id] = (revision,
+                                                     security_groups[sg_id])
+            else:
+                security_groups[sg_id] = self._security_group_rules[sg_id][1]
+        return devices_info
+
+    def _prune_security_group_rules(self):
+        sg_ids = set()
+        for device in self.firewall.ports.values():
+            sg_ids.update(device.get('security_groups', []))
+        for sg_id in set(self._security_group_rules) - sg_ids:
+            del self._security_group_rules[sg_id]
 
     def _update_security_group_info(self, security_groups,
                                     security_group_member_ips):
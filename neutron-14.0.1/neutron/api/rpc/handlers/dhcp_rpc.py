@@ -71,10 +71,11 @@ class DhcpRpcCallback(object):
     #     1.6 - Removed get_active_networks. It's not used by reference
     #           DHCP agent since Havana, so similar rationale for not bumping
     #           the major version as above applies here too.
+    #     1.7 - Added get_active_networks_changes.
 
     target = oslo_messaging.Target(
         namespace=n_const.RPC_NAMESPACE_DHCP_PLUGIN,
-        version='1.6')
+        version='1.7')
 
     def _get_active_networks(self, context, **kwargs):
         """Retrieve and return a list of the active networks."""
@@ -140,11 +141,67 @@ class DhcpRpcCallback(object):
         host = kwargs.get('host')
         LOG.debug('get_active_networks_info from %s', host)
         networks = self._get_active_networks(context, **kwargs)
+        return self._get_networks_info(
+            context, networks, host,
+            enable_dhcp_filter=kwargs.get('enable_dhcp_filter', True))
+
+    def get_active_networks_changes(self, context, **kwargs):
+        """Returns the networks/subnets/ports which changed in system.
+
+        :param revision_digests: the digests of the revision numbers of the
+               networks known by the agent, by network id, see
+               neutron.common.utils.get_network_revision_digest
+        :returns: {'networks': [the networks, with their subnets and ports,
+                                which are unknown or whose digest changed],
+                   'unchanged_network_ids': [the ids of the other active
+                                             networks]}
+        """
+        host = kwargs.get('host')
+        digests = kwargs.get('revision_digests') or {}
+        LOG.debug('get_active_networks_changes from %(host)s, knowing '
+                  '%(count)d networks', {'host': host,
+                                         'count': len(digests)})
+        networks = self._get_active_networks(context, **kwargs)
+        plugin = directory.get_plugin()
+        filters = {'network_id': [network['id'] for network in networks
+                                  if network['id'] in digests]}
+        subnets = ports = {}
+        if filters['network_id']:
+            subnets = self._group_by_network_id(plugin.get_subnets(
+                context, filters=filters,
+                fields=['id', 'network_id', 'revision_number', 'segment_id']))
+            ports = self._group_by_network_id(plugin.get_ports(
+                context, filters=filters,
+                fields=['id', 'network_id', 'revision_number']))
+        changed_networks = []
+        unchanged_network_ids = []
+        for network in networks:
+            network_subnets = subnets.get(network['id'], [])
+            digest = utils.get_network_revision_digest(
+                network, network_subnets, ports.get(network['id'], []))
+            # NOTE: the subnets of routed networks also depend on the
+            # segments of the host, they are always sent.
+            if (digest is not None and
+                    digest == digests.get(network['id']) and
+                    not any(subnet.get('segment_id')
+                            for subnet in network_subnets)):
+                unchanged_network_ids.append(network['id'])
+            else:
+                changed_networks.append(network)
+        return {'networks': self._get_networks_info(
+                    context, changed_networks, host,
+                    enable_dhcp_filter=kwargs.get('enable_dhcp_filter', True)),
+                'unchanged_network_ids': unchanged_network_ids}
+
+    def _get_networks_info(self, context, networks, host, enable_dhcp_filter):
+        """Add their subnets and ports to the networks."""
+        if not networks:
+            return networks
         plugin = directory.get_plugin()
         filters = {'network_id': [network['id'] for network in networks]}
         ports = plugin.get_ports(context, filters=filters)
         # default is to filter subnets based on 'enable_dhcp' flag
-        if kwargs.get('enable_dhcp_filter', True):
+        if enable_dhcp_filter:
             filters['enable_dhcp'] = [True]
         # NOTE(kevinbenton): we sort these because the agent builds tags
         # based on position in the list and has to restart the process if
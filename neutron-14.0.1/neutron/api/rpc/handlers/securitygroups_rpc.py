@@ -52,12 +52,18 @@ class SecurityGroupServerRpcApi(object):
         return cctxt.call(context, 'security_group_rules_for_devices',
                           devices=devices)
 
-    def security_group_info_for_devices(self, context, devices):
+    def security_group_info_for_devices(self, context, devices,
+                                        security_group_revisions=None):
         LOG.debug("Get security group information for devices via rpc %r",
                   devices)
-        cctxt = self.client.prepare(version='1.2')
+        if security_group_revisions is None:
+            cctxt = self.client.prepare(version='1.2')
+            return cctxt.call(context, 'security_group_info_for_devices',
+                              devices=devices)
+        cctxt = self.client.prepare(version='1.3')
         return cctxt.call(context, 'security_group_info_for_devices',
-                          devices=devices)
+                          devices=devices,
+                          security_group_revisions=security_group_revisions)
 
 
 class SecurityGroupServerRpcCallback(object):
@@ -71,10 +77,12 @@ class SecurityGroupServerRpcCallback(object):
     # API version history:
     #   1.1 - Initial version
     #   1.2 - security_group_info_for_devices introduced as an optimization
+    #   1.3 - security_group_info_for_devices takes the revision numbers of
+    #         the security groups known by the agent
 
     # NOTE: target must not be overridden in subclasses
     # to keep RPC API version consistent across plugins.
-    target = oslo_messaging.Target(version='1.2',
+    target = oslo_messaging.Target(version='1.3',
                                    namespace=constants.RPC_NAMESPACE_SECGROUP)
 
     @property
@@ -105,18 +113,29 @@ class SecurityGroupServerRpcCallback(object):
         """Return security group information for requested devices.
 
         :params devices: list of devices
+        :params security_group_revisions: the revision numbers of the
+                security groups whose rules the agent already knows
         :returns:
         sg_info{
           'security_groups': {sg_id: [rule1, rule2]}
           'sg_member_ips': {sg_id: {'IPv4': set(), 'IPv6': set()}}
           'devices': {device_id: {device_info}}
+          'security_group_revisions': {sg_id: revision_number}
         }
 
         Note that sets are serialized into lists by rpc code.
+        'security_group_revisions' is only returned when the server caches
+        the compiled security groups, see security_group_info_cache_size,
+        in which case the rules of the security groups whose revision number
+        did not change are left out of 'security_groups'.
         """
         devices_info = kwargs.get('devices')
         ports = self._get_devices_info(context, devices_info)
-        return self.plugin.security_group_info_for_ports(context, ports)
+        revisions = kwargs.get('security_group_revisions')
+        if revisions is None:
+            return self.plugin.security_group_info_for_ports(context, ports)
+        return self.plugin.security_group_info_for_ports(
+            context, ports, security_group_revisions=revisions)
 
 
 class SecurityGroupAgentRpcApiMixin(object):
@@ -228,7 +247,9 @@ class SecurityGroupServerAPIShim(sg_rpc_base.SecurityGroupInfoAPIMixin):
         registry.subscribe(self._handle_sg_member_update,
                            'Port', events.AFTER_UPDATE)
 
-    def security_group_info_for_devices(self, context, devices):
+    def security_group_info_for_devices(self, context, devices,
+                                        security_group_revisions=None):
+        # the local data is always complete, there are no deltas to send
         ports = self._get_devices_info(context, devices)
         result = self.security_group_info_for_ports(context, ports)
         return result
@@ -19,6 +19,7 @@
 """Utilities and helper functions."""
 
 import functools
+import hashlib
 import importlib
 import os
 import os.path
@@ -135,6 +136,28 @@ def get_dhcp_agent_device_id(network_id, host):
     return 'dhcp%s-%s' % (host_uuid, network_id)
 
 
+def get_network_revision_digest(network, subnets, ports):
+    """Return a digest of the revision numbers of a network and its parts.
+
+    :param network: the network dict
+    :param subnets: the dicts of all the subnets of the network
+    :param ports: the dicts of all the ports of the network
+    :returns: a digest which changes when any of them is changed, added or
+              removed, or None if one of them has no revision number.
+    """
+    revisions = [(network['id'], network.get('revision_number'))]
+    for resources in (subnets, ports):
+        revisions += sorted((resource['id'], resource.get('revision_number'))
+                            for resource in resources)
+    if any(revision[1] is None for revision in revisions):
+        return None
+    digest = hashlib.sha1()
+    for resource_id, revision_number in revisions:
+        digest.update(('%s:%s,' % (resource_id, revision_number)).encode(
+            'utf-8'))
+    return digest.hexdigest()
+
+
 class exception_logger(object):
     """Wrap a function and log raised exception
 
@@ -136,6 +136,14 @@ IPTABLES_OPTS = [
                        "of iptables-save. This option should not be turned "
                        "on for production systems because it imposes a "
                        "performance penalty.")),
+    cfg.IntOpt('iptables_state_verify_interval', default=0, min=0,
+               help=_("Interval, in seconds, at which the iptables rules "
+                      "are read back with iptables-save to compute the "
+                      "changes to apply. In between, the changes are "
+                      "computed against the rules applied previously, kept "
+                      "in memory, as long as they only touch the chains of "
+                      "the agent. The default, 0, reads the rules back on "
+                      "every apply.")),
 ]
 
 PROCESS_MONITOR_OPTS = [
@@ -68,7 +68,23 @@ DHCP_AGENT_OPTS = [
     cfg.IntOpt('num_sync_threads', default=4,
                help=_('Number of threads to use during sync process. '
                       'Should not exceed connection pool size configured on '
-                      'server.'))
+                      'server.')),
+    cfg.FloatOpt('port_events_coalesce_interval', default=0, min=0,
+                 help=_("Number of seconds during which the port events of a "
+                        "network are merged into a single reload of its DHCP "
+                        "server, counted from the first of them. Bursts of "
+                        "port events then result in one rewrite of the "
+                        "configuration of the DHCP server instead of one per "
+                        "event. If set to 0, the DHCP server is reloaded for "
+                        "each port event.")),
+    cfg.BoolOpt('persist_network_cache', default=False,
+                help=_("Save the networks, subnets and ports known by the "
+                       "DHCP agent to $state_path/dhcp/network_cache.json. "
+                       "On restart and resync, the agent then only fetches "
+                       "from the server and configures again the networks "
+                       "whose revision numbers, or the ones of their subnets "
+                       "and ports, changed since, and keeps serving the "
+                       "other ones with their existing configuration.")),
 ]
 
 DHCP_OPTS = [
@@ -110,6 +126,12 @@ DNSMASQ_OPTS = [
     cfg.IntOpt('dhcp_rebinding_time', default=0,
                help=_("DHCP rebinding time T2 (in seconds). If set to 0, it "
                       "will default to 7/8 of the lease time.")),
+    cfg.BoolOpt('dnsmasq_incremental_reload', default=False,
+                help=_("Keep the host entries of the ports of each network "
+                       "in memory, only building them again for the ports "
+                       "whose revision changed, and only rewrite the dnsmasq "
+                       "configuration files and signal dnsmasq to reload "
+                       "them when their contents changed.")),
 ]
 
 
@@ -98,6 +98,15 @@ OPTS = [
                help=_('Iptables mangle mark used to mark ingress from '
                       'external network. This mark will be masked with '
                       '0xffff so that only the lower 16 bits will be used.')),
+    cfg.BoolOpt('resync_from_kernel_state', default=False,
+                help=_("When adding a router whose namespace already "
+                       "exists, as on an agent restart, read the devices of "
+                       "the namespace and their IP addresses at once, do not "
+                       "configure again the internal ports whose device "
+                       "already has the MAC address, MTU and IP addresses of "
+                       "the port, and apply the iptables rules of the router "
+                       "once its processing is complete rather than at each "
+                       "step.")),
 ]
 
 
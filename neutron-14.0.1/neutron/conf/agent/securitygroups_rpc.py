@@ -36,7 +36,15 @@ security_group_opts = [
         default=True,
         help=_('Use ipset to speed-up the iptables based security groups. '
                'Enabling ipset support requires that ipset is installed on L2 '
-               'agent node.'))
+               'agent node.')),
+    cfg.BoolOpt(
+        'incremental_port_flows',
+        default=False,
+        help=_('With the openvswitch firewall driver, keep the flows '
+               'installed for each port in memory and, when a port is '
+               'updated, only add and delete the flows which changed '
+               'instead of installing all the flows of the port again and '
+               'deleting the previous ones.'))
 ]
 
 
@@ -121,6 +121,14 @@ core_opts = [
                help=_("Neutron IPAM (IP address management) driver to use. "
                       "By default, the reference implementation of the "
                       "Neutron IPAM driver is used.")),
+    cfg.BoolOpt('ipam_free_range_index', default=False,
+                help=_("If True, the reference IPAM driver keeps an index "
+                       "of the free address ranges of each subnet in the "
+                       "database and allocates addresses from it, instead "
+                       "of computing the free addresses from all the "
+                       "allocations of the subnet for each allocation. The "
+                       "index of a subnet is built on its first allocation "
+                       "and dropped when its allocation pools change.")),
     cfg.BoolOpt('vlan_transparent', default=False,
                 help=_('If True, then allow plugins that support it to '
                        'create VLAN transparent networks.')),
@@ -137,7 +145,19 @@ core_opts = [
                       'this value without modification. For overlay networks '
                       'such as VXLAN, neutron automatically subtracts the '
                       'overlay protocol overhead from this value. Defaults '
-                      'to 1500, the standard value for Ethernet.'))
+                      'to 1500, the standard value for Ethernet.')),
+    cfg.IntOpt('security_group_info_cache_size', default=0, min=0,
+               help=_('Number of security groups whose rules and member IP '
+                      'addresses are kept compiled by each RPC worker to '
+                      'answer the security group information requests of '
+                      'the agents. The compiled rules and members are '
+                      'reused as long as the revision numbers of the '
+                      'security group and of its member ports do not '
+                      'change, and the agents only get the rules of the '
+                      'security groups whose revision changed. This '
+                      'requires the revisions service plugin, which is '
+                      'loaded by default. 0, the default, disables the '
+                      'cache.'))
 ]
 
 core_cli_opts = [
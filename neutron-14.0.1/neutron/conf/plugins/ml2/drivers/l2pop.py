@@ -27,6 +27,15 @@ l2_population_options = [
                       'is deprecated in favor of direct RPC restart '
                       'state transfer and will be removed in a future '
                       'release.')),
+    cfg.FloatOpt('fdb_coalesce_interval', default=0, min=0,
+                 help=_('Interval in seconds during which the FDB entries '
+                        'notified to all the L2 agents are coalesced into '
+                        'one message per network, instead of sending one '
+                        'message per port event. This reduces the load on '
+                        'the message bus and on the agents when many ports '
+                        'are bound at once, at the cost of delaying the '
+                        'FDB updates by up to this interval. 0 disables '
+                        'the coalescing.')),
 ]
 
 
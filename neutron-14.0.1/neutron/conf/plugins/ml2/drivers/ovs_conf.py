@@ -132,6 +132,15 @@ agent_opts = [
                default=constants.DEFAULT_OVSDBMON_RESPAWN,
                help=_("The number of seconds to wait before respawning the "
                       "ovsdb monitor after losing communication with it.")),
+    cfg.IntOpt('port_reconciliation_interval', default=0, min=0,
+               help=_("When minimize_polling is enabled, the interval, in "
+                      "seconds, at which the agent compares all the ports "
+                      "of the integration bridge with the ports it has "
+                      "processed, and checks them for lost VLAN tags and "
+                      "changed ofports. In between, only the ports with "
+                      "ovsdb monitor events or updates from the server are "
+                      "looked at. The default, 0, checks all the ports "
+                      "every time there are events.")),
     cfg.ListOpt('tunnel_types', default=DEFAULT_TUNNEL_TYPES,
                 help=_("Network types supported by the agent "
                        "(gre, vxlan and/or geneve).")),
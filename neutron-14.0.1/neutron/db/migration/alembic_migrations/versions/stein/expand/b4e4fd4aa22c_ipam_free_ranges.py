@@ -0,0 +1,43 @@
+# Copyright 2019 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+from alembic import op
+import sqlalchemy as sa
+
+
+"""ipam free ranges
+
+Revision ID: b4e4fd4aa22c
+Revises: 9bfad3f1e780
+Create Date: 2019-03-18 10:12:37.284516
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'b4e4fd4aa22c'
+down_revision = '9bfad3f1e780'
+
+
+def upgrade():
+    op.create_table(
+        'ipamfreeranges',
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('ipam_subnet_id', sa.String(length=36), nullable=False),
+        sa.Column('first_ip', sa.String(length=64), nullable=False),
+        sa.Column('last_ip', sa.String(length=64), nullable=False),
+        sa.ForeignKeyConstraint(['ipam_subnet_id'],
+                                ['ipamsubnets.id'],
+                                ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'))
@@ -13,19 +13,24 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+
 import netaddr
 from neutron_lib.callbacks import events
 from neutron_lib.callbacks import registry
 from neutron_lib.callbacks import resources
 from neutron_lib import constants as const
 from neutron_lib.db import api as db_api
+from neutron_lib.plugins import directory
 from neutron_lib.utils import helpers
+from oslo_config import cfg
 
 from neutron._i18n import _
 from neutron.db.models import allowed_address_pair as aap_models
 from neutron.db.models import securitygroup as sg_models
 from neutron.db import models_v2
 from neutron.db import securitygroups_db as sg_db
+from neutron.db import standard_attr
 from neutron.extensions import securitygroup as ext_sg
 
 
@@ -161,7 +166,16 @@ class SecurityGroupInfoAPIMixin(object):
         return [self.get_port_from_device(context, device)
                 for device in devices]
 
-    def security_group_info_for_ports(self, context, ports):
+    def security_group_info_for_ports(self, context, ports,
+                                      security_group_revisions=None):
+        """Return the security group information of ports.
+
+        :param security_group_revisions: the revision numbers of the security
+        groups whose rules the caller already knows. The rules of those
+        security groups may be left out when their revision number did not
+        change, in which case the revision numbers of all the security groups
+        are returned as 'security_group_revisions'.
+        """
         sg_info = {'devices': ports,
                    'security_groups': {},
                    'sg_member_ips': {}}
@@ -188,19 +202,7 @@ class SecurityGroupInfoAPIMixin(object):
                     # this set will be serialized into a list by rpc code
                     remote_security_group_info[remote_gid][ethertype] = set()
 
-            direction = rule_in_db['direction']
-            rule_dict = {
-                'direction': direction,
-                'ethertype': ethertype}
-
-            for key in ('protocol', 'port_range_min', 'port_range_max',
-                        'remote_ip_prefix', 'remote_group_id'):
-                if rule_in_db.get(key) is not None:
-                    if key == 'remote_ip_prefix':
-                        direction_ip_prefix = DIRECTION_IP_PREFIX[direction]
-                        rule_dict[direction_ip_prefix] = rule_in_db[key]
-                        continue
-                    rule_dict[key] = rule_in_db[key]
+            rule_dict = self._make_rule_dict(rule_in_db)
             if security_group_id not in sg_info['security_groups']:
                 sg_info['security_groups'][security_group_id] = []
             if rule_dict not in sg_info['security_groups'][security_group_id]:
@@ -219,6 +221,22 @@ class SecurityGroupInfoAPIMixin(object):
 
         return self._get_security_group_member_ips(context, sg_info)
 
+    def _make_rule_dict(self, rule_in_db):
+        direction = rule_in_db['direction']
+        rule_dict = {
+            'direction': direction,
+            'ethertype': rule_in_db['ethertype']}
+
+        for key in ('protocol', 'port_range_min', 'port_range_max',
+                    'remote_ip_prefix', 'remote_group_id'):
+            if rule_in_db.get(key) is not None:
+                if key == 'remote_ip_prefix':
+                    direction_ip_prefix = DIRECTION_IP_PREFIX[direction]
+                    rule_dict[direction_ip_prefix] = rule_in_db[key]
+                    continue
+                rule_dict[key] = rule_in_db[key]
+        return rule_dict
+
     def _get_security_group_member_ips(self, context, sg_info):
         ips = self._select_ips_for_remote_group(
             context, sg_info['sg_member_ips'].keys())
@@ -312,20 +330,8 @@ class SecurityGroupInfoAPIMixin(object):
         rules_in_db = self._select_rules_for_ports(context, ports)
         for (port_id, rule_in_db) in rules_in_db:
             port = ports[port_id]
-            direction = rule_in_db['direction']
-            rule_dict = {
-                'security_group_id': rule_in_db['security_group_id'],
-                'direction': direction,
-                'ethertype': rule_in_db['ethertype'],
-            }
-            for key in ('protocol', 'port_range_min', 'port_range_max',
-                        'remote_ip_prefix', 'remote_group_id'):
-                if rule_in_db.get(key) is not None:
-                    if key == 'remote_ip_prefix':
-                        direction_ip_prefix = DIRECTION_IP_PREFIX[direction]
-                        rule_dict[direction_ip_prefix] = rule_in_db[key]
-                        continue
-                    rule_dict[key] = rule_in_db[key]
+            rule_dict = self._make_rule_dict(rule_in_db)
+            rule_dict['security_group_id'] = rule_in_db['security_group_id']
             port['security_group_rules'].append(rule_dict)
         self._apply_provider_rule(context, ports)
         return self._convert_remote_group_id_to_ip_prefix(context, ports)
@@ -352,10 +358,200 @@ class SecurityGroupInfoAPIMixin(object):
         raise NotImplementedError()
 
 
+class CompiledSecurityGroupCache(object):
+    """LRU cache of what was compiled for security groups at a version.
+
+    The version is whatever changes with what was compiled, e.g. the
+    revision number of the security group for its rules.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._entries = collections.OrderedDict()
+
+    def get(self, sg_id, version):
+        entry = self._entries.pop(sg_id, None)
+        if entry is None:
+            return None
+        self._entries[sg_id] = entry
+        return entry[1] if entry[0] == version else None
+
+    def set(self, sg_id, version, value):
+        self._entries.pop(sg_id, None)
+        self._entries[sg_id] = (version, value)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+
 class SecurityGroupServerRpcMixin(SecurityGroupInfoAPIMixin,
                                   SecurityGroupServerNotifierRpcMixin):
     """Server-side RPC mixin using DB for SG notifications and responses."""
 
+    _sg_rules_cache = None
+    _sg_member_ips_cache = None
+
+    def security_group_info_for_ports(self, context, ports,
+                                      security_group_revisions=None):
+        size = cfg.CONF.security_group_info_cache_size
+        # The rules of a security group bump its revision number only when
+        # the revisions service plugin is loaded.
+        if (not size or not ports or
+                not directory.get_plugin('revision_plugin')):
+            return super(SecurityGroupServerRpcMixin,
+                         self).security_group_info_for_ports(context, ports)
+        if not self._sg_rules_cache or self._sg_rules_cache.size != size:
+            self._sg_rules_cache = CompiledSecurityGroupCache(size)
+            self._sg_member_ips_cache = CompiledSecurityGroupCache(size)
+        with db_api.CONTEXT_READER.using(context):
+            return self._compiled_security_group_info_for_ports(
+                context, ports, security_group_revisions or {})
+
+    def _compiled_security_group_info_for_ports(self, context, ports,
+                                                security_group_revisions):
+        """Return the security group information of ports from the cache.
+
+        The rules of the security groups are compiled once per revision
+        number of the security group, and the member IP addresses of the
+        remote groups once per set of revision numbers of their ports, so
+        that the agents all asking for the same security groups after a
+        change cost a single compilation.
+        """
+        bindings = self._select_sg_revisions_for_ports(context, ports)
+        revisions = dict((sg_id, revision)
+                         for _port_id, sg_id, revision in bindings)
+        compiled = {}
+        for sg_id, revision in revisions.items():
+            compiled[sg_id] = self._sg_rules_cache.get(sg_id, revision)
+        stale_sg_ids = [sg_id for sg_id, value in compiled.items()
+                        if value is None]
+        if stale_sg_ids:
+            compiled.update(self._compile_security_group_rules(
+                context, stale_sg_ids, revisions))
+
+        remote_ethertypes = collections.defaultdict(set)
+        for _rules, remote_groups in compiled.values():
+            for remote_gid, ethertype in remote_groups:
+                remote_ethertypes[remote_gid].add(ethertype)
+        member_ips = self._get_compiled_member_ips(context,
+                                                   list(remote_ethertypes))
+
+        sg_info = {'devices': ports,
+                   'security_groups': {},
+                   'sg_member_ips': {},
+                   'security_group_revisions': revisions}
+        for port_id, sg_id, _revision in bindings:
+            rules, remote_groups = compiled[sg_id]
+            if not rules:
+                continue
+            source_groups = ports[port_id].setdefault(
+                'security_group_source_groups', [])
+            for remote_gid, _ethertype in remote_groups:
+                if remote_gid not in source_groups:
+                    source_groups.append(remote_gid)
+        for sg_id, revision in revisions.items():
+            if security_group_revisions.get(sg_id) != revision:
+                sg_info['security_groups'][sg_id] = list(compiled[sg_id][0])
+        for remote_gid, ethertypes in remote_ethertypes.items():
+            # these sets will be serialized into lists by rpc code
+            sg_info['sg_member_ips'][remote_gid] = dict(
+                (ethertype, set(member_ips[remote_gid][ethertype]))
+                for ethertype in ethertypes)
+        # the provider rules do not belong to any security group, so these
+        # rules still reside in sg_info['devices'] [port_id]
+        self._apply_provider_rule(context, sg_info['devices'])
+        return sg_info
+
+    def _compile_security_group_rules(self, context, sg_ids, revisions):
+        compiled = dict((sg_id, ([], [])) for sg_id in sg_ids)
+        for rule_in_db in self._select_rules_for_security_groups(context,
+                                                                 sg_ids):
+            rules, remote_groups = compiled[rule_in_db['security_group_id']]
+            rule_dict = self._make_rule_dict(rule_in_db)
+            if rule_dict not in rules:
+                rules.append(rule_dict)
+            remote_gid = rule_in_db.get('remote_group_id')
+            remote_group = (remote_gid, rule_in_db['ethertype'])
+            if remote_gid and remote_group not in remote_groups:
+                remote_groups.append(remote_group)
+        for sg_id, value in compiled.items():
+            self._sg_rules_cache.set(sg_id, revisions[sg_id], value)
+        return compiled
+
+    def _get_compiled_member_ips(self, context, remote_group_ids):
+        if not remote_group_ids:
+            return {}
+        versions = self._select_member_revisions_for_remote_groups(
+            context, remote_group_ids)
+        member_ips = {}
+        for remote_gid in remote_group_ids:
+            member_ips[remote_gid] = self._sg_member_ips_cache.get(
+                remote_gid, versions[remote_gid])
+        stale_gids = [remote_gid for remote_gid, value in member_ips.items()
+                      if value is None]
+        if not stale_gids:
+            return member_ips
+        ips = self._select_ips_for_remote_group(context, stale_gids)
+        for remote_gid in stale_gids:
+            ips_by_ethertype = {const.IPv4: set(), const.IPv6: set()}
+            for ip in ips[remote_gid]:
+                ethertype = 'IPv%d' % netaddr.IPNetwork(ip).version
+                ips_by_ethertype[ethertype].add(ip)
+            self._sg_member_ips_cache.set(remote_gid, versions[remote_gid],
+                                          ips_by_ethertype)
+            member_ips[remote_gid] = ips_by_ethertype
+        return member_ips
+
+    @db_api.retry_if_session_inactive()
+    def _select_sg_revisions_for_ports(self, context, ports):
+        """Return (port_id, sg_id, sg revision number) tuples for ports."""
+        sg_binding_port = sg_models.SecurityGroupPortBinding.port_id
+        sg_binding_sgid = sg_models.SecurityGroupPortBinding.security_group_id
+        sg_revision = standard_attr.StandardAttribute.revision_number
+
+        query = context.session.query(sg_binding_port, sg_binding_sgid,
+                                      sg_revision)
+        query = query.join(sg_models.SecurityGroup,
+                           sg_models.SecurityGroup.id == sg_binding_sgid)
+        query = query.join(standard_attr.StandardAttribute,
+                           standard_attr.StandardAttribute.id ==
+                           sg_models.SecurityGroup.standard_attr_id)
+        query = query.filter(sg_binding_port.in_(ports.keys()))
+        return query.all()
+
+    @db_api.retry_if_session_inactive()
+    def _select_rules_for_security_groups(self, context, sg_ids):
+        query = context.session.query(sg_models.SecurityGroupRule)
+        query = query.filter(
+            sg_models.SecurityGroupRule.security_group_id.in_(sg_ids))
+        return query.all()
+
+    @db_api.retry_if_session_inactive()
+    def _select_member_revisions_for_remote_groups(self, context,
+                                                   remote_group_ids):
+        """Return the version of the member IP addresses of remote groups.
+
+        The fixed IPs, allowed address pairs and security groups of a port
+        all bump its revision number, so the member IP addresses of a
+        remote group only change with the revision numbers of its ports.
+        """
+        members = dict((remote_gid, set()) for remote_gid in remote_group_ids)
+        sg_binding_port = sg_models.SecurityGroupPortBinding.port_id
+        sg_binding_sgid = sg_models.SecurityGroupPortBinding.security_group_id
+        port_revision = standard_attr.StandardAttribute.revision_number
+
+        query = context.session.query(sg_binding_sgid, sg_binding_port,
+                                      port_revision)
+        query = query.join(models_v2.Port,
+                           models_v2.Port.id == sg_binding_port)
+        query = query.join(standard_attr.StandardAttribute,
+                           standard_attr.StandardAttribute.id ==
+                           models_v2.Port.standard_attr_id)
+        query = query.filter(sg_binding_sgid.in_(remote_group_ids))
+        for security_group_id, port_id, revision in query:
+            members[security_group_id].add((port_id, revision))
+        return dict((remote_gid, frozenset(ports))
+                    for remote_gid, ports in members.items())
+
     @db_api.retry_if_session_inactive()
     def _select_sg_ids_for_ports(self, context, ports):
         if not ports:
@@ -13,9 +13,12 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from neutron_lib.db import api as db_api
 from oslo_utils import uuidutils
 
 from neutron.common import constants as const
+from neutron.ipam.drivers.neutrondb_ipam import db_models
+from neutron.objects import base as base_obj
 from neutron.objects import ipam as ipam_objs
 
 # Database operations for Neutron's DB-backed IPAM driver
@@ -96,6 +99,65 @@ class IpamSubnetManager(object):
         return ipam_objs.IpamAllocationPool.get_objects(
             context, ipam_subnet_id=self._ipam_subnet_id)
 
+    def list_free_ranges(self, context, limit=None, **kwargs):
+        """Return free ranges of the subnet.
+
+        :param context: neutron api request context
+        :param limit: the maximum number of free ranges to return, or None
+            to return all of them. They are sorted by their first address as
+            a string, not numerically: this only makes the page stable, any
+            page of free ranges is fine to pick addresses from.
+        :returns: a list of IpamFreeRange OVO objects
+        """
+        pager = None
+        if limit:
+            pager = base_obj.Pager(sorts=[('first_ip', True)], limit=limit)
+        return ipam_objs.IpamFreeRange.get_objects(
+            context, _pager=pager, ipam_subnet_id=self._ipam_subnet_id,
+            **kwargs)
+
+    def free_ranges_exist(self, context):
+        """Return whether the free ranges of the subnet are indexed."""
+        return ipam_objs.IpamFreeRange.objects_exist(
+            context, ipam_subnet_id=self._ipam_subnet_id)
+
+    def create_free_range(self, context, first_ip, last_ip):
+        """Create a free range for the subnet.
+
+        :param first_ip: string expressing the start of the range
+        :param last_ip: string expressing the end of the range
+        :return: the newly created free range object.
+        """
+        free_range = ipam_objs.IpamFreeRange(
+            context, ipam_subnet_id=self._ipam_subnet_id, first_ip=first_ip,
+            last_ip=last_ip)
+        free_range.create()
+        return free_range
+
+    def delete_free_range(self, context, free_range):
+        """Remove a free range, if it was not deleted since it was loaded.
+
+        :param free_range: the IpamFreeRange object to delete, as loaded
+        :returns: number of deleted free ranges, 0 if the free range was
+            deleted since it was loaded, i.e. by a concurrent allocation.
+        """
+        # NOTE: the free range is deleted with a single statement, so that
+        # the number of deleted rows tells whether a concurrent transaction
+        # deleted it first.
+        with db_api.CONTEXT_WRITER.using(context):
+            query = context.session.query(db_models.IpamFreeRange).filter_by(
+                id=free_range.id, first_ip=str(free_range.first_ip),
+                last_ip=str(free_range.last_ip))
+            return query.delete(synchronize_session=False)
+
+    def delete_free_ranges(self, context):
+        """Remove all free ranges for the current subnet.
+
+        :param context: neutron api request context
+        """
+        ipam_objs.IpamFreeRange.delete_objects(
+            context, ipam_subnet_id=self._ipam_subnet_id)
+
     def check_unique_allocation(self, context, ip_address):
         """Validate that the IP address on the subnet is not in use."""
         return not ipam_objs.IpamAllocation.objects_exist(
@@ -114,6 +176,18 @@ class IpamSubnetManager(object):
         return ipam_objs.IpamAllocation.get_objects(
             context, ipam_subnet_id=self._ipam_subnet_id, status=status)
 
+    def list_allocated_ips(self, context, ip_addresses):
+        """Return the addresses of a list which are allocated.
+
+        :param context: neutron api request context
+        :param ip_addresses: the addresses to look up, as strings
+        :returns: a set of the allocated addresses, as strings
+        """
+        return set(str(allocation.ip_address) for allocation in
+                   ipam_objs.IpamAllocation.get_objects(
+                       context, ipam_subnet_id=self._ipam_subnet_id,
+                       ip_address=ip_addresses))
+
     def create_allocation(self, context, ip_address,
                           status=const.IPAM_ALLOCATION_STATUS_ALLOCATED):
         """Create an IP allocation entry.
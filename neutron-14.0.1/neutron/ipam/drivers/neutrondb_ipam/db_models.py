@@ -43,6 +43,25 @@ class IpamAllocationPool(model_base.BASEV2, model_base.HasId):
         return "%s - %s" % (self.first_ip, self.last_ip)
 
 
+class IpamFreeRange(model_base.BASEV2, model_base.HasId):
+    """A range of addresses of a subnet which may be allocated.
+
+    The free ranges of a subnet index the addresses of its allocation pools
+    which are not allocated, so that the driver does not have to compute
+    them from all the allocations of the subnet.
+    """
+
+    ipam_subnet_id = sa.Column(sa.String(36),
+                               sa.ForeignKey('ipamsubnets.id',
+                                             ondelete="CASCADE"),
+                               nullable=False)
+    first_ip = sa.Column(sa.String(64), nullable=False)
+    last_ip = sa.Column(sa.String(64), nullable=False)
+
+    def __repr__(self):
+        return "%s - %s" % (self.first_ip, self.last_ip)
+
+
 class IpamSubnet(model_base.BASEV2, model_base.HasId):
     """Association between IPAM entities and neutron subnets.
 
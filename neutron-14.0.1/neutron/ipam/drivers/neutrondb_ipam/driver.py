@@ -19,6 +19,7 @@ import random
 import netaddr
 from neutron_lib import exceptions as n_exc
 from neutron_lib.plugins import directory
+from oslo_config import cfg
 from oslo_db import exception as db_exc
 from oslo_log import log
 from oslo_utils import uuidutils
@@ -36,6 +37,38 @@ LOG = log.getLogger(__name__)
 MAX_WIN = 1000
 MULTIPLIER = 100
 MAX_WIN_MULTI = MAX_WIN * MULTIPLIER
+# The free ranges are split at these boundaries around the allocated
+# addresses, so that concurrent allocations picked in the same window update
+# different free ranges.
+FREE_RANGE_BLOCK = 64
+# The number of free ranges loaded to pick addresses from.
+FREE_RANGE_ROWS = 128
+FREE_RANGE_ATTEMPTS = 3
+
+
+def _split_free_range(first, last, taken):
+    """Return the ranges left of a free range once addresses are taken.
+
+    :param first: the first address of the free range, as an integer
+    :param last: the last address of the free range, as an integer
+    :param taken: the addresses taken in the free range, as integers
+    :returns: a list of (first, last) tuples, split at the block boundaries
+        around the taken addresses.
+    """
+    bounds = set()
+    for ip in taken:
+        block = ip - ip % FREE_RANGE_BLOCK
+        bounds.update((block, block + FREE_RANGE_BLOCK))
+    ranges = []
+    start = first
+    for ip in sorted(taken) + [last + 1]:
+        for bound in sorted(b for b in bounds if start < b < ip):
+            ranges.append((start, bound - 1))
+            start = bound
+        if start < ip:
+            ranges.append((start, ip - 1))
+        start = ip + 1
+    return ranges
 
 
 class NeutronDbSubnet(ipam_base.Subnet):
@@ -159,6 +192,9 @@ class NeutronDbSubnet(ipam_base.Subnet):
 
     def _generate_ips(self, context, prefer_next=False, num_addresses=1):
         """Generate a set of IPs from the set of available addresses."""
+        if cfg.CONF.ipam_free_range_index:
+            return self._allocate_from_free_ranges(context, prefer_next,
+                                                   num_addresses)
         allocated_ips = []
         requested_num_addresses = num_addresses
 
@@ -228,6 +264,200 @@ class NeutronDbSubnet(ipam_base.Subnet):
         raise ipam_exc.IpAddressGenerationFailure(
                   subnet_id=self.subnet_manager.neutron_id)
 
+    def _build_free_ranges(self, context):
+        """Index the free ranges of the subnet from its allocations."""
+        self.subnet_manager.delete_free_ranges(context)
+        ip_allocations = netaddr.IPSet(
+            [netaddr.IPAddress(allocation.ip_address)
+             for allocation in self.subnet_manager.list_allocations(context)])
+        free_ranges = []
+        for ip_pool in self.subnet_manager.list_pools(context):
+            ip_set = netaddr.IPSet()
+            ip_set.add(netaddr.IPRange(ip_pool.first_ip, ip_pool.last_ip))
+            av_set = ip_set.difference(ip_allocations)
+            for ip_range in av_set.iter_ipranges():
+                free_ranges.append(self.subnet_manager.create_free_range(
+                    context, str(ip_range[0]), str(ip_range[-1])))
+        return free_ranges
+
+    @staticmethod
+    def _free_ranges_size(free_ranges):
+        return sum(int(free_range.last_ip) - int(free_range.first_ip) + 1
+                   for free_range in free_ranges)
+
+    def _get_free_ranges(self, context, prefer_next, num_addresses):
+        """Return the free ranges to allocate addresses from.
+
+        Only the first free ranges of the subnet, in the order of their first
+        address as a string, are loaded, unless the next addresses are
+        preferred or they are not enough. The free ranges are indexed from
+        the allocations of the subnet when there are none, or they are still
+        not enough.
+        """
+        limit = None if prefer_next else FREE_RANGE_ROWS
+        free_ranges = self.subnet_manager.list_free_ranges(context,
+                                                           limit=limit)
+        size = self._free_ranges_size(free_ranges)
+        if size < num_addresses and len(free_ranges) == limit:
+            free_ranges = self.subnet_manager.list_free_ranges(context)
+            size = self._free_ranges_size(free_ranges)
+        if size < num_addresses:
+            free_ranges = self._build_free_ranges(context)
+            size = self._free_ranges_size(free_ranges)
+        if size < num_addresses:
+            raise ipam_exc.IpAddressGenerationFailure(
+                subnet_id=self.subnet_manager.neutron_id)
+        if prefer_next:
+            free_ranges.sort(key=lambda free_range: int(free_range.first_ip))
+        return free_ranges
+
+    @staticmethod
+    def _pick_from_free_ranges(free_ranges, prefer_next, num_addresses):
+        """Pick addresses from free ranges, as integers."""
+        spans = [(int(free_range.first_ip), int(free_range.last_ip))
+                 for free_range in free_ranges]
+        if prefer_next:
+            offsets = range(num_addresses)
+        else:
+            size = sum(last - first + 1 for first, last in spans)
+            window = min(size, MAX_WIN)
+            if num_addresses > 1:
+                window = min(size, num_addresses * MULTIPLIER, MAX_WIN_MULTI)
+                # Hand out a contiguous range if a free range in the window
+                # is big enough.
+                contiguous = []
+                start = 0
+                for first, last in spans:
+                    if start >= window:
+                        break
+                    if last - first + 1 >= num_addresses:
+                        contiguous.append((first, last))
+                    start += last - first + 1
+                if contiguous:
+                    first, last = random.choice(contiguous)
+                    first += random.randint(
+                        0, min(last - first + 1 - num_addresses, MAX_WIN))
+                    return list(range(first, first + num_addresses))
+            offsets = sorted(random.sample(range(window), num_addresses))
+        ips = []
+        start = 0
+        spans = iter(spans)
+        first, last = next(spans)
+        for offset in offsets:
+            while offset - start > last - first:
+                start += last - first + 1
+                first, last = next(spans)
+            ips.append(first + offset - start)
+        return ips
+
+    def _take_from_free_ranges(self, context, free_ranges, ips):
+        """Remove addresses from the free ranges they were picked from.
+
+        The free ranges are replaced by the ranges left around the addresses.
+
+        :raises: RetryRequest if one of the free ranges was deleted since it
+            was loaded, i.e. a concurrent allocation took addresses from it.
+        """
+        for free_range in free_ranges:
+            first = int(free_range.first_ip)
+            last = int(free_range.last_ip)
+            taken = [ip for ip in ips if first <= ip <= last]
+            if not taken:
+                continue
+            version = free_range.first_ip.version
+            left = [(netaddr.IPAddress(start, version).format(),
+                     netaddr.IPAddress(end, version).format())
+                    for start, end in _split_free_range(first, last, taken)]
+            if not self.subnet_manager.delete_free_range(context,
+                                                         free_range):
+                raise db_exc.RetryRequest(
+                    ipam_exc.IpAddressGenerationFailure(
+                        subnet_id=self.subnet_manager.neutron_id))
+            for first_ip, last_ip in left:
+                self.subnet_manager.create_free_range(context, first_ip,
+                                                      last_ip)
+
+    def _allocate_from_free_ranges(self, context, prefer_next=False,
+                                   num_addresses=1):
+        """Take a set of IPs from the free ranges of the subnet.
+
+        The addresses allocated by other means, like the specific addresses
+        or the addresses allocated while the free ranges were not
+        maintained, are only dropped from the free ranges when they are
+        picked.
+        """
+        pools = [(int(ip_pool.first_ip), int(ip_pool.last_ip))
+                 for ip_pool in self.subnet_manager.list_pools(context)]
+        for attempt in range(FREE_RANGE_ATTEMPTS):
+            free_ranges = self._get_free_ranges(context, prefer_next,
+                                                num_addresses)
+            version = free_ranges[0].first_ip.version
+            ips = self._pick_from_free_ranges(free_ranges, prefer_next,
+                                              num_addresses)
+            ip_addresses = [netaddr.IPAddress(ip, version).format()
+                            for ip in ips]
+            stale_ips = [
+                ip for ip in ips
+                if not any(first <= ip <= last for first, last in pools)]
+            allocated_ips = self.subnet_manager.list_allocated_ips(
+                context, ip_addresses)
+            stale_ips += [ip for ip, ip_address in zip(ips, ip_addresses)
+                          if ip_address in allocated_ips]
+            if stale_ips:
+                if attempt:
+                    # Too many addresses of the free ranges were allocated
+                    # by other means, index them again.
+                    self._build_free_ranges(context)
+                else:
+                    self._take_from_free_ranges(context, free_ranges,
+                                                stale_ips)
+                continue
+            self._take_from_free_ranges(context, free_ranges, ips)
+            return ip_addresses
+        raise ipam_exc.IpAddressGenerationFailure(
+            subnet_id=self.subnet_manager.neutron_id)
+
+    def _release_to_free_ranges(self, context, address):
+        """Give an address back to the free ranges of the subnet.
+
+        The address is merged with the free ranges next to it, unless they
+        are in another block. Nothing is done if the address is not in an
+        allocation pool, if the free ranges of the subnet are not indexed or
+        if the address is already in a free range, like the specific
+        addresses which were never taken out of them.
+        """
+        ip_address = netaddr.IPAddress(address)
+        ip = int(ip_address)
+        if not any(int(ip_pool.first_ip) <= ip <= int(ip_pool.last_ip)
+                   for ip_pool in self.subnet_manager.list_pools(context)):
+            return
+        free_ranges = self.subnet_manager.list_free_ranges(context)
+        if not free_ranges:
+            return
+        if any(int(free_range.first_ip) <= ip <= int(free_range.last_ip)
+               for free_range in free_ranges):
+            return
+        first_ip = last_ip = ip_address.format()
+        adjacent = []
+        for free_range in free_ranges:
+            if ip % FREE_RANGE_BLOCK and int(free_range.last_ip) == ip - 1:
+                adjacent.append(free_range)
+            elif ((ip + 1) % FREE_RANGE_BLOCK and
+                    int(free_range.first_ip) == ip + 1):
+                adjacent.append(free_range)
+        for free_range in adjacent:
+            if free_range.last_ip < ip_address:
+                first_ip = str(free_range.first_ip)
+            else:
+                last_ip = str(free_range.last_ip)
+            if not self.subnet_manager.delete_free_range(context,
+                                                         free_range):
+                raise db_exc.RetryRequest(
+                    ipam_exc.IpAddressAllocationNotFound(
+                        subnet_id=self.subnet_manager.neutron_id,
+                        ip_address=address))
+        self.subnet_manager.create_free_range(context, first_ip, last_ip)
+
     def allocate(self, address_request):
         # NOTE(pbondar): Ipam driver is always called in context of already
         # running transaction, which is started on create_port or upper level.
@@ -295,6 +525,8 @@ class NeutronDbSubnet(ipam_base.Subnet):
             raise ipam_exc.IpAddressAllocationNotFound(
                 subnet_id=self.subnet_manager.neutron_id,
                 ip_address=address)
+        if cfg.CONF.ipam_free_range_index:
+            self._release_to_free_ranges(self._context, address)
 
     def _no_pool_changes(self, context, pools):
         """Check if pool updates in db are required."""
@@ -310,6 +542,9 @@ class NeutronDbSubnet(ipam_base.Subnet):
         if self._no_pool_changes(self._context, pools):
             return
         self.subnet_manager.delete_allocation_pools(self._context)
+        # The free ranges are indexed again from the new pools on the next
+        # allocation.
+        self.subnet_manager.delete_free_ranges(self._context)
         self.create_allocation_pools(self.subnet_manager, self._context, pools,
                                      cidr)
         self._pools = pools
@@ -58,6 +58,43 @@ class IpamAllocationPool(base.NeutronDbObject):
         return result
 
 
+@base.NeutronObjectRegistry.register
+class IpamFreeRange(base.NeutronDbObject):
+    # Version 1.0: Initial version
+    VERSION = '1.0'
+
+    db_model = db_models.IpamFreeRange
+
+    foreign_keys = {'IpamSubnet': {'ipam_subnet_id': 'id'}}
+
+    fields = {
+        'id': common_types.UUIDField(),
+        'ipam_subnet_id': common_types.UUIDField(),
+        'first_ip': obj_fields.IPAddressField(),
+        'last_ip': obj_fields.IPAddressField(),
+    }
+
+    fields_no_update = ['ipam_subnet_id']
+
+    @classmethod
+    def modify_fields_from_db(cls, db_obj):
+        result = super(IpamFreeRange, cls).modify_fields_from_db(db_obj)
+        if 'first_ip' in result:
+            result['first_ip'] = netaddr.IPAddress(result['first_ip'])
+        if 'last_ip' in result:
+            result['last_ip'] = netaddr.IPAddress(result['last_ip'])
+        return result
+
+    @classmethod
+    def modify_fields_to_db(cls, fields):
+        result = super(IpamFreeRange, cls).modify_fields_to_db(fields)
+        if 'first_ip' in result:
+            result['first_ip'] = cls.filter_to_str(result['first_ip'])
+        if 'last_ip' in result:
+            result['last_ip'] = cls.filter_to_str(result['last_ip'])
+        return result
+
+
 @base.NeutronObjectRegistry.register
 class IpamAllocation(base.NeutronDbObject):
     # Version 1.0: Initial version
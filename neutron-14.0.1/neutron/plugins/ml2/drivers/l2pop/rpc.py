@@ -14,15 +14,22 @@
 #    under the License.
 
 import collections
+import copy
 
 from neutron_lib.agent import topics
 from neutron_lib import rpc as n_rpc
+from oslo_config import cfg
 from oslo_log import log as logging
 import oslo_messaging
 
+from neutron.conf.plugins.ml2.drivers import l2pop as config
+from neutron.notifiers import batch_notifier
+
 
 LOG = logging.getLogger(__name__)
 
+config.register_l2_population_opts()
+
 
 PortInfo = collections.namedtuple("PortInfo", "mac_address ip_address")
 
@@ -36,6 +43,89 @@ class L2populationAgentNotifyAPI(object):
                                                         topics.UPDATE)
         target = oslo_messaging.Target(topic=topic, version='1.0')
         self.client = n_rpc.get_client(target)
+        self._batch_notifier = None
+        # Counters of the fanout notifications requested and of the casts
+        # actually sent for them, once coalesced
+        self.fanout_notifications = 0
+        self.fanout_casts = 0
+        if cfg.CONF.l2pop.fdb_coalesce_interval:
+            self._batch_notifier = batch_notifier.BatchNotifier(
+                cfg.CONF.l2pop.fdb_coalesce_interval,
+                self._send_coalesced_fanouts)
+
+    @staticmethod
+    def _merge_fdb_entries(merged_entries, fdb_entries):
+        """Merge the fdb_entries of a network into merged_entries.
+
+        The ports of each agent are appended to the ones already merged, in
+        order and without duplicates. Nothing is merged and False is
+        returned if a network was notified with another segment, so that
+        the entries are sent in their own message.
+        """
+        for network_id, values in fdb_entries.items():
+            merged = merged_entries.get(network_id)
+            if merged and (
+                    merged.get('segment_id') != values.get('segment_id') or
+                    merged.get('network_type') != values.get('network_type')):
+                return False
+        for network_id, values in fdb_entries.items():
+            merged = merged_entries.setdefault(
+                network_id, dict(values, ports={}))
+            for agent_ip, ports in values.get('ports', {}).items():
+                merged_ports = merged['ports'].setdefault(agent_ip, [])
+                for port in ports:
+                    if port not in merged_ports:
+                        merged_ports.append(port)
+        return True
+
+    @staticmethod
+    def _get_network_ids(method, fdb_entries):
+        if method == 'update_fdb_entries':
+            return set(fdb_entries.get('chg_ip', {}))
+        return set(fdb_entries)
+
+    def _coalesce_fanout(self, casts, context, method, fdb_entries):
+        network_ids = self._get_network_ids(method, fdb_entries)
+        if method in ('add_fdb_entries', 'remove_fdb_entries'):
+            for cast in reversed(casts):
+                if (cast[1] == method and
+                        self._merge_fdb_entries(cast[2], fdb_entries)):
+                    return
+                if network_ids & self._get_network_ids(cast[1], cast[2]):
+                    # The notifications of a network must keep their order
+                    break
+        casts.append((context, method, copy.deepcopy(fdb_entries)))
+
+    def _send_coalesced_fanouts(self, notifications):
+        """Send the fanout notifications queued during an interval.
+
+        The add_fdb_entries and remove_fdb_entries notifications are merged
+        into the last cast of the same method, unless a notification with
+        another method was queued in between for one of their networks.
+        """
+        casts = []
+        for context, method, fdb_entries in notifications:
+            self._coalesce_fanout(casts, context, method, fdb_entries)
+
+        self.fanout_notifications += len(notifications)
+        self.fanout_casts += len(casts)
+        LOG.debug('Coalesced %(notifications)d l2population notifications '
+                  'into %(casts)d fanout casts, %(saved)d casts saved so far',
+                  {'notifications': len(notifications),
+                   'casts': len(casts),
+                   'saved': self.fanout_notifications - self.fanout_casts})
+        for context, method, fdb_entries in casts:
+            try:
+                self._notification_fanout(context, method, fdb_entries)
+            except Exception:
+                LOG.exception('Failed to notify l2population agents with '
+                              'the message %s', method)
+
+    def _fanout(self, context, method, fdb_entries):
+        if self._batch_notifier:
+            self._batch_notifier.queue_event((context, method, fdb_entries))
+        else:
+            self._notification_fanout(context, method, fdb_entries)
 
     def _notification_fanout(self, context, method, fdb_entries):
         LOG.debug('Fanout notify l2population agents at %(topic)s '
@@ -64,8 +154,7 @@ class L2populationAgentNotifyAPI(object):
                 self._notification_host(context, 'add_fdb_entries',
                                         fdb_entries, host)
             else:
-                self._notification_fanout(context, 'add_fdb_entries',
-                                          fdb_entries)
+                self._fanout(context, 'add_fdb_entries', fdb_entries)
 
     def remove_fdb_entries(self, context, fdb_entries, host=None):
         if fdb_entries:
@@ -73,8 +162,7 @@ class L2populationAgentNotifyAPI(object):
                 self._notification_host(context, 'remove_fdb_entries',
                                         fdb_entries, host)
             else:
-                self._notification_fanout(context, 'remove_fdb_entries',
-                                          fdb_entries)
+                self._fanout(context, 'remove_fdb_entries', fdb_entries)
 
     def update_fdb_entries(self, context, fdb_entries, host=None):
         if fdb_entries:
@@ -82,5 +170,4 @@ class L2populationAgentNotifyAPI(object):
                 self._notification_host(context, 'update_fdb_entries',
                                         fdb_entries, host)
             else:
-                self._notification_fanout(context, 'update_fdb_entries',
-                                          fdb_entries)
+                self._fanout(context, 'update_fdb_entries', fdb_entries)
@@ -186,6 +186,8 @@ class OVSNeutronAgent(l2population_rpc.L2populationRpcCallBackTunnelMixin,
         self.network_ports = collections.defaultdict(set)
         # keeps association between ports and ofports to detect ofport change
         self.vifname_to_ofport_map = {}
+        # ofports of the ports added by the last ovsdb monitor events
+        self.added_port_ofports = {}
         self.setup_rpc()
         self.bridge_mappings = self._parse_bridge_mappings(
             ovs_conf.bridge_mappings)
@@ -208,6 +210,9 @@ class OVSNeutronAgent(l2population_rpc.L2populationRpcCallBackTunnelMixin,
         self.ovsdb_monitor_respawn_interval = (
             agent_conf.ovsdb_monitor_respawn_interval or
             constants.DEFAULT_OVSDBMON_RESPAWN)
+        self.port_reconciliation_interval = (
+            agent_conf.port_reconciliation_interval)
+        self.last_port_reconciliation = None
         self.local_ip = ovs_conf.local_ip
         self.tunnel_count = 0
         self.vxlan_udp_port = agent_conf.vxlan_udp_port
@@ -568,32 +573,46 @@ class OVSNeutronAgent(l2population_rpc.L2populationRpcCallBackTunnelMixin,
     def _tunnel_port_lookup(self, network_type, remote_ip):
         return self.tun_br_ofports[network_type].get(remote_ip)
 
-    def fdb_add(self, context, fdb_entries):
-        LOG.debug("fdb_add received")
+    def _get_remote_agent_ports(self, fdb_entries):
+        remote_agent_ports = []
         for lvm, agent_ports in self.get_agent_ports(fdb_entries):
             agent_ports.pop(self.local_ip, None)
             if len(agent_ports):
-                if not self.enable_distributed_routing:
-                    with self.tun_br.deferred() as deferred_br:
-                        self.fdb_add_tun(context, deferred_br, lvm,
-                                         agent_ports, self._tunnel_port_lookup)
-                else:
-                    self.fdb_add_tun(context, self.tun_br, lvm,
+                remote_agent_ports.append((lvm, agent_ports))
+        return remote_agent_ports
+
+    def fdb_add(self, context, fdb_entries):
+        LOG.debug("fdb_add received")
+        remote_agent_ports = self._get_remote_agent_ports(fdb_entries)
+        if not remote_agent_ports:
+            return
+        # The flows of all the networks of the message, which may coalesce
+        # the entries of many ports, are applied in one batch
+        if not self.enable_distributed_routing:
+            with self.tun_br.deferred() as deferred_br:
+                for lvm, agent_ports in remote_agent_ports:
+                    self.fdb_add_tun(context, deferred_br, lvm,
                                      agent_ports, self._tunnel_port_lookup)
+        else:
+            for lvm, agent_ports in remote_agent_ports:
+                self.fdb_add_tun(context, self.tun_br, lvm,
+                                 agent_ports, self._tunnel_port_lookup)
 
     def fdb_remove(self, context, fdb_entries):
         LOG.debug("fdb_remove received")
-        for lvm, agent_ports in self.get_agent_ports(fdb_entries):
-            agent_ports.pop(self.local_ip, None)
-            if len(agent_ports):
-                if not self.enable_distributed_routing:
-                    with self.tun_br.deferred() as deferred_br:
-                        self.fdb_remove_tun(context, deferred_br, lvm,
-                                            agent_ports,
-                                            self._tunnel_port_lookup)
-                else:
-                    self.fdb_remove_tun(context, self.tun_br, lvm,
-                                        agent_ports, self._tunnel_port_lookup)
+        remote_agent_ports = self._get_remote_agent_ports(fdb_entries)
+        if not remote_agent_ports:
+            return
+        if not self.enable_distributed_routing:
+            with self.tun_br.deferred() as deferred_br:
+                for lvm, agent_ports in remote_agent_ports:
+                    self.fdb_remove_tun(context, deferred_br, lvm,
+                                        agent_ports,
+                                        self._tunnel_port_lookup)
+        else:
+            for lvm, agent_ports in remote_agent_ports:
+                self.fdb_remove_tun(context, self.tun_br, lvm,
+                                    agent_ports, self._tunnel_port_lookup)
 
     def add_fdb_flow(self, br, port_info, remote_ip, lvm, ofport):
         if port_info == n_const.FLOODING_ENTRY:
@@ -1306,11 +1325,14 @@ class OVSNeutronAgent(l2population_rpc.L2populationRpcCallBackTunnelMixin,
                 br.set_db_attribute('Interface', phys_if_name,
                                     'options', {'peer': int_if_name})
 
-    def update_stale_ofport_rules(self):
+    def update_stale_ofport_rules(self, port_info=None):
         # ARP spoofing rules and drop-flow upon port-delete
         # use ofport-based rules
         previous = self.vifname_to_ofport_map
-        current = self.int_br.get_vif_port_to_ofport_map()
+        if port_info is None:
+            current = self.int_br.get_vif_port_to_ofport_map()
+        else:
+            current = self._get_vif_port_to_ofport_map(previous, port_info)
 
         # if any ofport numbers have changed, re-process the devices as
         # added ports so any rules based on ofport numbers are updated.
@@ -1326,6 +1348,22 @@ class OVSNeutronAgent(l2population_rpc.L2populationRpcCallBackTunnelMixin,
         self.vifname_to_ofport_map = current
         return moved_ports
 
+    def _get_vif_port_to_ofport_map(self, previous, port_info):
+        """Update the port to ofport map with the ports added and removed.
+
+        The ofports of the added ports are taken from the ovsdb monitor
+        events, the other ports keep the ofport they had until the next port
+        reconciliation.
+        """
+        current = dict(previous)
+        for port_id in port_info['removed']:
+            current.pop(port_id, None)
+        for port_id in port_info['added']:
+            ofport = self.added_port_ofports.get(port_id)
+            if ofport not in (None, ovs_lib.INVALID_OFPORT):
+                current[port_id] = ofport
+        return current
+
     @staticmethod
     def _get_ofport_moves(current, previous):
         """Returns a list of moved ports.
@@ -1391,6 +1429,7 @@ class OVSNeutronAgent(l2population_rpc.L2populationRpcCallBackTunnelMixin,
         ancillary_port_info['current'] = ancillary_ports
 
         ports_not_ready_yet = set()
+        self.added_port_ofports = {}
         # if a port was added and then removed or viceversa since the agent
         # can't know the order of the operations, check the status of the port
         # to determine if the port was added or deleted
@@ -1414,7 +1453,7 @@ class OVSNeutronAgent(l2population_rpc.L2populationRpcCallBackTunnelMixin,
             cur_ancillary_ports |= bridge.get_vif_port_set()
         cur_ancillary_ports |= ancillary_port_info['current']
 
-        def _process_port(port, ports, ancillary_ports):
+        def _process_port(port, ports, ancillary_ports, ofports=None):
             # check 'iface-id' is set otherwise is not a port
             # the agent should care about
             if 'attached-mac' in port.get('external_ids', []):
@@ -1431,6 +1470,8 @@ class OVSNeutronAgent(l2population_rpc.L2populationRpcCallBackTunnelMixin,
                         ancillary_ports.add(iface_id)
                     else:
                         ports.add(iface_id)
+                        if ofports is not None:
+                            ofports[iface_id] = port['ofport']
         if old_ports_not_ready:
             old_ports_not_ready_attrs = self.int_br.get_ports_attributes(
                 'Interface', columns=['name', 'external_ids', 'ofport'],
@@ -1448,7 +1489,8 @@ class OVSNeutronAgent(l2population_rpc.L2populationRpcCallBackTunnelMixin,
 
         for port in events['added']:
             _process_port(port, port_info['added'],
-                          ancillary_port_info['added'])
+                          ancillary_port_info['added'],
+                          self.added_port_ofports)
         for port in events['removed']:
             _process_port(port, port_info['removed'],
                           ancillary_port_info['removed'])
@@ -1459,7 +1501,10 @@ class OVSNeutronAgent(l2population_rpc.L2populationRpcCallBackTunnelMixin,
 
         if updated_ports is None:
             updated_ports = set()
-        updated_ports.update(self.check_changed_vlans())
+        # The VLAN tags of all the ports are otherwise checked by the port
+        # reconciliations.
+        if not self.port_reconciliation_interval:
+            updated_ports.update(self.check_changed_vlans())
 
         if updated_ports:
             # Some updated ports might have been removed in the
@@ -1990,15 +2035,28 @@ class OVSNeutronAgent(l2population_rpc.L2populationRpcCallBackTunnelMixin,
             LOG.info("Cleaning stale %s flows", self.tun_br.br_name)
             self.tun_br.cleanup_flows()
 
-    def process_port_info(self, start, polling_manager, sync, ovs_restarted,
-                          ports, ancillary_ports, updated_ports_copy,
-                          consecutive_resyncs, ports_not_ready_yet,
-                          failed_devices, failed_ancillary_devices):
+    def _port_reconciliation_needed(self):
+        if not self.port_reconciliation_interval:
+            return False
+        return (time.time() - self.last_port_reconciliation >=
+                self.port_reconciliation_interval)
+
+    @staticmethod
+    def _use_ports_events(polling_manager, sync, reconcile=False):
         # There are polling managers that don't have get_events, e.g.
         # AlwaysPoll used by windows implementations
         # REVISIT (rossella_s) This needs to be reworked to hide implementation
         # details regarding polling in BasePollingManager subclasses
-        if sync or not (hasattr(polling_manager, 'get_events')):
+        return (not (sync or reconcile) and
+                hasattr(polling_manager, 'get_events'))
+
+    def process_port_info(self, start, polling_manager, sync, ovs_restarted,
+                          ports, ancillary_ports, updated_ports_copy,
+                          consecutive_resyncs, ports_not_ready_yet,
+                          failed_devices, failed_ancillary_devices,
+                          reconcile=False):
+        if not self._use_ports_events(polling_manager, sync, reconcile):
+            self.last_port_reconciliation = time.time()
             if sync:
                 LOG.info("Agent out of sync with plugin!")
                 consecutive_resyncs = consecutive_resyncs + 1
@@ -2161,6 +2219,7 @@ class OVSNeutronAgent(l2population_rpc.L2populationRpcCallBackTunnelMixin,
         failed_devices = {'added': set(), 'removed': set()}
         failed_ancillary_devices = {'added': set(), 'removed': set()}
         failed_devices_retries_map = {}
+        self.last_port_reconciliation = time.time()
         while self._check_and_handle_signal():
             if self.fullsync:
                 LOG.info("rpc_loop doing a full sync.")
@@ -2197,8 +2256,9 @@ class OVSNeutronAgent(l2population_rpc.L2populationRpcCallBackTunnelMixin,
             devices_need_retry = (any(failed_devices.values()) or
                                   any(failed_ancillary_devices.values()) or
                                   ports_not_ready_yet)
+            reconcile = self._port_reconciliation_needed()
             if (self._agent_has_updates(polling_manager) or sync or
-                    devices_need_retry):
+                    devices_need_retry or reconcile):
                 try:
                     LOG.debug("Agent rpc_loop - iteration:%(iter_num)d - "
                               "starting polling. Elapsed:%(elapsed).3f",
@@ -2212,18 +2272,29 @@ class OVSNeutronAgent(l2population_rpc.L2populationRpcCallBackTunnelMixin,
                     self.updated_ports = set()
                     activated_bindings_copy = self.activated_bindings
                     self.activated_bindings = set()
+                    # Between port reconciliations, only the ports of the
+                    # ovsdb monitor events are looked at.
+                    changed_ports_only = (
+                        self.port_reconciliation_interval and
+                        self._use_ports_events(polling_manager, sync,
+                                               reconcile))
                     (port_info, ancillary_port_info, consecutive_resyncs,
                      ports_not_ready_yet) = (self.process_port_info(
                             start, polling_manager, sync, ovs_restarted,
                             ports, ancillary_ports, updated_ports_copy,
                             consecutive_resyncs, ports_not_ready_yet,
-                            failed_devices, failed_ancillary_devices))
+                            failed_devices, failed_ancillary_devices,
+                            reconcile=reconcile))
                     sync = False
                     self.process_deleted_ports(port_info)
                     self.process_deactivated_bindings(port_info)
                     self.process_activated_bindings(port_info,
                                                     activated_bindings_copy)
-                    ofport_changed_ports = self.update_stale_ofport_rules()
+                    if changed_ports_only:
+                        ofport_changed_ports = self.update_stale_ofport_rules(
+                            port_info)
+                    else:
+                        ofport_changed_ports = self.update_stale_ofport_rules()
                     if ofport_changed_ports:
                         port_info.setdefault('updated', set()).update(
                             ofport_changed_ports)
@@ -522,6 +522,115 @@ def list_netns(**kwargs):
     return netns.listnetns(**kwargs)
 
 
+def _batch_add_ip_address(ip, idx, device, ip_version, ip_address, prefixlen,
+                          scope, broadcast=None):
+    try:
+        ip.addr('add', index=idx, address=ip_address, mask=prefixlen,
+                family=_IP_VERSION_FAMILY_MAP[ip_version],
+                broadcast=broadcast, scope=_get_scope_name(scope))
+    except NetlinkError as e:
+        if e.code == errno.EEXIST:
+            raise IpAddressAlreadyExists(ip=ip_address, device=device)
+        raise
+
+
+def _batch_delete_ip_address(ip, idx, device, ip_version, ip_address,
+                             prefixlen):
+    try:
+        ip.addr('delete', index=idx, address=ip_address, mask=prefixlen,
+                family=_IP_VERSION_FAMILY_MAP[ip_version])
+    except NetlinkError as e:
+        if e.code == errno.EADDRNOTAVAIL:
+            return
+        raise
+
+
+def _batch_flush_ip_addresses(ip, idx, device, ip_version):
+    ip.flush_addr(index=idx, family=_IP_VERSION_FAMILY_MAP[ip_version])
+
+
+def _batch_set_link_attribute(ip, idx, device, **attributes):
+    ip.link('set', index=idx, **attributes)
+
+
+def _batch_add_neigh_entry(ip, idx, device, ip_version, ip_address,
+                           mac_address, **kwargs):
+    ip.neigh('replace', ifindex=idx, dst=ip_address, lladdr=mac_address,
+             family=_IP_VERSION_FAMILY_MAP[ip_version],
+             state=ndmsg.states['permanent'], **kwargs)
+
+
+def _batch_delete_neigh_entry(ip, idx, device, ip_version, ip_address,
+                              mac_address, **kwargs):
+    try:
+        ip.neigh('delete', ifindex=idx, dst=ip_address, lladdr=mac_address,
+                 family=_IP_VERSION_FAMILY_MAP[ip_version], **kwargs)
+    except NetlinkError as e:
+        if e.code == errno.ENOENT:
+            return
+        raise
+
+
+_BATCH_OPERATIONS = {
+    'add_ip_address': _batch_add_ip_address,
+    'delete_ip_address': _batch_delete_ip_address,
+    'flush_ip_addresses': _batch_flush_ip_addresses,
+    'set_link_attribute': _batch_set_link_attribute,
+    'add_neigh_entry': _batch_add_neigh_entry,
+    'delete_neigh_entry': _batch_delete_neigh_entry,
+}
+
+
+def _run_batch_operation(ip, link_ids, namespace, operation, device, kwargs):
+    if device not in link_ids:
+        try:
+            link_ids[device] = ip.link_lookup(ifname=device)[0]
+        except IndexError:
+            raise NetworkInterfaceNotFound(device=device, namespace=namespace)
+    try:
+        _BATCH_OPERATIONS[operation](ip, link_ids[device], device, **kwargs)
+    except NetlinkError as e:
+        _translate_ip_device_exception(e, device, namespace)
+        raise
+
+
+@privileged.default.entrypoint
+# NOTE(slaweq): Because of issue with pyroute2.NetNS objects running in threads
+# we need to lock this function to workaround this issue.
+# For details please check https://bugs.launchpad.net/neutron/+bug/1811515
+@lockutils.synchronized("privileged-ip-lib")
+def execute_batch(namespace, operations):
+    """Run a list of address, link and neighbour operations in a namespace.
+
+    All the operations are run with the same netlink socket, opened once in
+    the namespace, and each of them is run even if a previous one failed.
+
+    :param namespace: The name of the namespace in which to run the
+                      operations
+    :param operations: a list of (operation, device, kwargs) tuples, the
+                       operation being one of the keys of _BATCH_OPERATIONS
+                       and kwargs its arguments besides the device
+    :return: a list with, for each operation, None if it succeeded or the
+             (exception class name, message) of its failure
+    """
+    results = []
+    try:
+        with get_iproute(namespace) as ip:
+            link_ids = {}
+            for operation, device, kwargs in operations:
+                try:
+                    _run_batch_operation(ip, link_ids, namespace, operation,
+                                         device, kwargs)
+                    results.append(None)
+                except Exception as e:
+                    results.append((e.__class__.__name__, str(e)))
+    except OSError as e:
+        if e.errno == errno.ENOENT:
+            raise NetworkNamespaceNotFound(netns_name=namespace)
+        raise
+    return results
+
+
 def make_serializable(value):
     """Make a pyroute2 object serializable
 
@@ -15,6 +15,7 @@
 
 import collections
 import copy
+import os
 import sys
 import uuid
 
@@ -323,12 +324,14 @@ class TestDhcpAgent(base.BaseTestCase):
         network = mock.Mock()
         network.id = '1'
         dhcp = dhcp_agent.DhcpAgent(cfg.CONF)
+        dhcp.cache.unapplied_network_ids.add('1')
         self.assertTrue(dhcp.call_driver('foo', network))
         self.driver.assert_called_once_with(cfg.CONF,
                                             mock.ANY,
                                             mock.ANY,
                                             mock.ANY,
                                             mock.ANY)
+        self.assertEqual(set(), dhcp.cache.unapplied_network_ids)
 
     def _test_call_driver_failure(self, exc=None,
                                   trace_level='exception', expected_sync=True):
@@ -345,6 +348,7 @@ class TestDhcpAgent(base.BaseTestCase):
                                                 mock.ANY,
                                                 mock.ANY)
             self.assertEqual(expected_sync, schedule_resync.called)
+        self.assertEqual({'1'}, dhcp.cache.unapplied_network_ids)
 
     def test_call_driver_ip_address_generation_failure(self):
         error = oslo_messaging.RemoteError(
@@ -411,6 +415,82 @@ class TestDhcpAgent(base.BaseTestCase):
             self._test_sync_state_helper(known_net_ids, active_net_ids)
             w.assert_called_once_with()
 
+    def test_sync_state_network_changes(self):
+        cfg.CONF.set_override('persist_network_cache', True)
+        changed_network = mock.Mock(id='a')
+        resumed_network = mock.Mock(id='b')
+        with mock.patch(DHCP_PLUGIN) as plug:
+            mock_plugin = mock.Mock()
+            mock_plugin.get_active_networks_changes.return_value = (
+                [changed_network], {'b', 'c'})
+            plug.return_value = mock_plugin
+
+            dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+            dhcp._resumable_network_ids = {'a', 'b'}
+            attrs_to_mock = dict((a, mock.DEFAULT)
+                                 for a in ['disable_dhcp_helper', 'cache',
+                                           'safe_configure_dhcp_for_network',
+                                           '_save_network_cache'])
+
+            with mock.patch.multiple(dhcp, **attrs_to_mock) as mocks:
+                mocks['cache'].get_network_ids.return_value = ['b', 'c', 'd']
+                mocks['cache'].get_network_by_id.return_value = (
+                    resumed_network)
+                mocks['cache'].get_revision_digests.return_value = {
+                    'b': 'digest-b', 'c': 'digest-c'}
+                mocks['cache'].get_port_ids.return_value = []
+                dhcp.sync_state()
+
+                get_changes = mock_plugin.get_active_networks_changes
+                get_changes.assert_called_once_with(
+                    {'b': 'digest-b', 'c': 'digest-c'},
+                    enable_dhcp_filter=False)
+                self.assertFalse(mock_plugin.get_active_networks_info.called)
+                mocks['disable_dhcp_helper'].assert_called_once_with('d')
+                mocks['safe_configure_dhcp_for_network'].assert_has_calls(
+                    [mock.call(changed_network),
+                     mock.call(resumed_network, action='resume')])
+                self.assertEqual(
+                    2, mocks['safe_configure_dhcp_for_network'].call_count)
+                mocks['_save_network_cache'].assert_called_once_with()
+                self.assertEqual(set(), dhcp._resumable_network_ids)
+
+    def test_sync_state_network_changes_for_one_network(self):
+        cfg.CONF.set_override('persist_network_cache', True)
+        with mock.patch(DHCP_PLUGIN) as plug:
+            mock_plugin = mock.Mock()
+            mock_plugin.get_active_networks_changes.return_value = ([], set())
+            plug.return_value = mock_plugin
+
+            dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+            with mock.patch.object(dhcp, 'cache') as cache:
+                cache.get_network_ids.return_value = []
+                cache.get_revision_digests.return_value = {
+                    'a': 'digest-a', 'b': 'digest-b'}
+                cache.get_port_ids.return_value = []
+                dhcp.sync_state(['a'])
+
+            mock_plugin.get_active_networks_changes.assert_called_once_with(
+                {'b': 'digest-b'}, enable_dhcp_filter=False)
+
+    def test_sync_state_network_changes_not_supported(self):
+        cfg.CONF.set_override('persist_network_cache', True)
+        with mock.patch(DHCP_PLUGIN) as plug:
+            mock_plugin = mock.Mock()
+            mock_plugin.get_active_networks_changes.side_effect = (
+                oslo_messaging.UnsupportedVersion('1.7'))
+            mock_plugin.get_active_networks_info.return_value = []
+            plug.return_value = mock_plugin
+
+            dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+            dhcp.sync_state()
+            dhcp.sync_state()
+
+            self.assertEqual(
+                1, mock_plugin.get_active_networks_changes.call_count)
+            self.assertEqual(
+                2, mock_plugin.get_active_networks_info.call_count)
+
     def test_sync_state_for_all_networks_plugin_error(self):
         with mock.patch(DHCP_PLUGIN) as plug:
             mock_plugin = mock.Mock()
@@ -569,6 +649,83 @@ class TestDhcpAgent(base.BaseTestCase):
 
         self.assertEqual(set(networks), set(dhcp.cache.get_network_ids()))
 
+    def test_populate_cache_on_start_from_saved_cache(self):
+        cfg.CONF.set_override('persist_network_cache', True)
+        self.driver.existing_dhcp_networks.return_value = ['aaa', 'bbb']
+        saved_network = dhcp.NetModel({'id': 'aaa', 'subnets': [],
+                                       'non_local_subnets': [],
+                                       'ports': [fake_port1]})
+        with mock.patch.object(os.path, 'exists', return_value=True), \
+                mock.patch.object(dhcp_agent.NetworkCache, 'load',
+                                  return_value={'aaa': saved_network,
+                                                'ccc': fake_network}):
+            agent = dhcp_agent.DhcpAgent(HOSTNAME)
+
+        self.assertEqual({'aaa', 'bbb'}, set(agent.cache.get_network_ids()))
+        self.assertIs(saved_network, agent.cache.get_network_by_id('aaa'))
+        self.assertEqual([], agent.cache.get_network_by_id('bbb').ports)
+        self.assertEqual({'aaa'}, agent._resumable_network_ids)
+
+    def test_populate_cache_on_start_from_corrupted_cache(self):
+        cfg.CONF.set_override('persist_network_cache', True)
+        self.driver.existing_dhcp_networks.return_value = ['aaa']
+        with mock.patch.object(os.path, 'exists', return_value=True), \
+                mock.patch.object(dhcp_agent.NetworkCache, 'load',
+                                  side_effect=ValueError), \
+                mock.patch.object(dhcp_agent.LOG, 'warning') as log:
+            agent = dhcp_agent.DhcpAgent(HOSTNAME)
+
+        self.assertTrue(log.called)
+        self.assertEqual(['aaa'], list(agent.cache.get_network_ids()))
+        self.assertEqual(set(), agent._resumable_network_ids)
+
+    def test_save_network_cache(self):
+        cfg.CONF.set_override('persist_network_cache', True)
+        agent = dhcp_agent.DhcpAgent(HOSTNAME)
+        with mock.patch.object(agent, 'cache') as cache:
+            cache.changed = False
+            agent._save_network_cache()
+            self.assertFalse(cache.save.called)
+            cache.changed = True
+            agent._save_network_cache()
+            cache.save.assert_called_once_with(agent._network_cache_file)
+
+    @mock.patch.object(eventlet, 'spawn_after')
+    def test_restart_with_pending_reload(self, spawn_after):
+        cfg.CONF.set_override('persist_network_cache', True)
+        cfg.CONF.set_override('port_events_coalesce_interval', 2)
+        state_path = self.get_temp_file_path('state')
+        os.mkdir(state_path)
+        os.mkdir(os.path.join(state_path, 'dhcp'))
+        cfg.CONF.set_override('state_path', state_path)
+        network = copy.deepcopy(fake_network)
+        agent = dhcp_agent.DhcpAgent(HOSTNAME)
+        agent.cache.put(network)
+        agent._save_network_cache()
+
+        # The network is not saved while the reload of a port update is
+        # pending, so the agent configures it again if it restarts.
+        agent.reload_allocations(fake_port2, network)
+        self.assertTrue(spawn_after.called)
+        agent._save_network_cache()
+        self.assertNotIn(network.id, agent.cache.get_revision_digests())
+        self.driver.existing_dhcp_networks.return_value = [network.id]
+        restarted_agent = dhcp_agent.DhcpAgent(HOSTNAME)
+        self.assertEqual(set(), restarted_agent._resumable_network_ids)
+        self.assertEqual(
+            [], restarted_agent.cache.get_network_by_id(network.id).ports)
+
+        # It is saved again once the reload is applied.
+        with mock.patch.object(agent, 'update_isolated_metadata_proxy'):
+            agent._reload_allocations(network.id)
+        agent._save_network_cache()
+        restarted_agent = dhcp_agent.DhcpAgent(HOSTNAME)
+        self.assertEqual({network.id}, restarted_agent._resumable_network_ids)
+        self.assertEqual(
+            [fake_port1.id, fake_port2.id],
+            [port.id for port in
+             restarted_agent.cache.get_network_by_id(network.id).ports])
+
     def test_none_interface_driver(self):
         cfg.CONF.set_override('interface_driver', None)
         self.assertRaises(SystemExit, dhcp.DeviceManager,
@@ -1164,6 +1321,46 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
                                                      fake_network)
             self.assertTrue(ump.called)
 
+    @mock.patch.object(eventlet, 'spawn_after')
+    def test_reload_allocations_coalesced(self, spawn_after):
+        cfg.CONF.set_override('port_events_coalesce_interval', 2)
+        self.cache.get_port_by_id.return_value = fake_port2
+        self.cache.get_network_by_id.return_value = fake_network
+        with mock.patch.object(
+                self.dhcp, 'update_isolated_metadata_proxy') as ump:
+            self.dhcp.reload_allocations(fake_port2, fake_network)
+            self.dhcp.reload_allocations(fake_port1, fake_network)
+            self.assertFalse(self.call_driver.called)
+            self.assertFalse(ump.called)
+            spawn_after.assert_called_once_with(2, self.dhcp._queue.add,
+                                                mock.ANY)
+            update = spawn_after.call_args[0][2]
+            self.assertEqual('_reload_allocations', update.action)
+            self.assertEqual(fake_network.id, update.resource)
+
+            self.dhcp._queue.add(update)
+            self.dhcp._process_resource_update()
+            self.call_driver.assert_called_once_with('reload_allocations',
+                                                     fake_network)
+            ump.assert_called_once_with(fake_network)
+        self.assertEqual({fake_port1.id, fake_port2.id},
+                         self.dhcp.dhcp_ready_ports)
+        self.assertEqual({}, self.dhcp._reload_ports)
+
+    @mock.patch.object(eventlet, 'spawn_after')
+    def test_reload_allocations_coalesced_agents_port_ip_change(
+            self, spawn_after):
+        cfg.CONF.set_override('port_events_coalesce_interval', 2)
+        self.cache.get_port_by_id.return_value = fake_port1
+        port = dhcp.DictModel(copy.deepcopy(fake_port1))
+        port['device_id'] = utils.get_dhcp_agent_device_id(
+            port.network_id, self.dhcp.conf.host)
+        port['fixed_ips'][0]['ip_address'] = '172.9.9.99'
+        with mock.patch.object(self.dhcp, 'update_isolated_metadata_proxy'):
+            self.dhcp.reload_allocations(port, fake_network)
+        self.call_driver.assert_called_once_with('restart', fake_network)
+        self.assertFalse(spawn_after.called)
+
     def test_port_create_end(self):
         self.reload_allocations_p = mock.patch.object(self.dhcp,
                                                       'reload_allocations')
@@ -1290,6 +1487,22 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
                 [mock.call.call_driver('reload_allocations', fake_network)])
             self.assertTrue(ump.called)
 
+    @mock.patch.object(eventlet, 'spawn_after')
+    def test_port_delete_end_coalesced(self, spawn_after):
+        cfg.CONF.set_override('port_events_coalesce_interval', 2)
+        payload = dict(port_id=fake_port2.id, network_id=fake_network.id,
+                       priority=FAKE_PRIORITY)
+        self.cache.get_network_by_id.return_value = fake_network
+        self.cache.get_port_by_id.return_value = fake_port2
+
+        self.dhcp.port_delete_end(None, payload)
+        self.dhcp._process_resource_update()
+        self.cache.assert_has_calls([mock.call.remove_port(fake_port2)])
+        self.assertFalse(self.call_driver.called)
+        spawn_after.assert_called_once_with(2, self.dhcp._queue.add,
+                                            mock.ANY)
+        self.assertEqual({fake_network.id: set()}, self.dhcp._reload_ports)
+
     def test_port_delete_end_unknown_port(self):
         payload = dict(port_id='unknown', network_id='unknown',
                        priority=FAKE_PRIORITY)
@@ -1473,6 +1686,54 @@ class TestNetworkCache(base.BaseTestCase):
         self.assertEqual(set([fake_port2['id']]),
                          set(nc.get_port_ids([fake_port2.network_id, 'net2'])))
 
+    def test_get_revision_digests(self):
+        nc = dhcp_agent.NetworkCache()
+        net = dhcp.NetModel(dict(id='net-with-revisions', revision_number=1,
+                                 subnets=[dict(id='s1', revision_number=1)],
+                                 non_local_subnets=[],
+                                 ports=[dict(id='p1', revision_number=3)]))
+        nc.put(net)
+        nc.put(fake_network)
+        self.assertEqual(
+            {net.id: utils.get_network_revision_digest(
+                net, net.subnets, net.ports)},
+            nc.get_revision_digests())
+
+    def test_save_and_load(self):
+        nc = dhcp_agent.NetworkCache()
+        nc.put(fake_network)
+        self.assertTrue(nc.changed)
+        filename = self.get_temp_file_path('network_cache.json')
+        nc.save(filename)
+        self.assertFalse(nc.changed)
+
+        networks = dhcp_agent.NetworkCache.load(filename)
+        self.assertEqual([fake_network.id], list(networks))
+        network = networks[fake_network.id]
+        self.assertIsInstance(network, dhcp.NetModel)
+        self.assertEqual(fake_network.namespace, network.namespace)
+        self.assertEqual([port.id for port in fake_network.ports],
+                         [port.id for port in network.ports])
+        self.assertEqual(fake_network.subnets[0].cidr,
+                         network.subnets[0].cidr)
+
+    def test_save_unapplied_network(self):
+        nc = dhcp_agent.NetworkCache()
+        nc.put(fake_network)
+        filename = self.get_temp_file_path('network_cache.json')
+        nc.save(filename)
+
+        nc.set_applied(fake_network.id, False)
+        self.assertTrue(nc.changed)
+        nc.save(filename)
+        self.assertEqual({}, dhcp_agent.NetworkCache.load(filename))
+
+        nc.set_applied(fake_network.id, True)
+        self.assertTrue(nc.changed)
+        nc.save(filename)
+        self.assertEqual([fake_network.id],
+                         list(dhcp_agent.NetworkCache.load(filename)))
+
     def test_put_port(self):
         fake_net = dhcp.NetModel(
             dict(id=FAKE_NETWORK_UUID,
@@ -2448,6 +2448,28 @@ class TestBasicRouterOperations(BasicRouterOperationsFramework):
         agent.network_update(None, network=network)
         self.assertEqual(1, agent._queue.add.call_count)
 
+    def _test_process_added_router_resync(self, enabled, ns_exists):
+        self.conf.set_override('resync_from_kernel_state', enabled)
+        router = l3_test_common.prepare_router_data()
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        with mock.patch.object(ip_lib, 'network_namespace_exists',
+                               return_value=ns_exists),\
+                mock.patch.object(l3router.RouterInfo,
+                                  'resync_from_kernel_state') as resync,\
+                mock.patch.object(l3router.RouterInfo, 'process') as process:
+            agent._process_added_router(router)
+        process.assert_called_once_with()
+        self.assertEqual(enabled and ns_exists, resync.called)
+
+    def test_process_added_router_resync_from_kernel_state(self):
+        self._test_process_added_router_resync(True, True)
+
+    def test_process_added_router_resync_no_namespace(self):
+        self._test_process_added_router_resync(True, False)
+
+    def test_process_added_router_resync_disabled(self):
+        self._test_process_added_router_resync(False, True)
+
     def test_create_router_namespace(self):
         self.mock_ip.ensure_namespace.return_value = self.mock_ip
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
@@ -2455,15 +2477,13 @@ class TestBasicRouterOperations(BasicRouterOperationsFramework):
             'qrouter-bar', self.conf, agent.driver, agent.use_ipv6)
         ns.create()
 
-        calls = [mock.call(['sysctl', '-w', 'net.ipv4.ip_forward=1']),
-                 mock.call(['sysctl', '-w', 'net.ipv4.conf.all.arp_ignore=1']),
-                 mock.call(
-                     ['sysctl', '-w', 'net.ipv4.conf.all.arp_announce=2'])]
+        cmd = ['sysctl', '-w', 'net.ipv4.ip_forward=1',
+               'net.ipv4.conf.all.arp_ignore=1',
+               'net.ipv4.conf.all.arp_announce=2']
         if agent.use_ipv6:
-            calls.append(mock.call(
-                ['sysctl', '-w', 'net.ipv6.conf.all.forwarding=1']))
+            cmd.append('net.ipv6.conf.all.forwarding=1')
 
-        self.mock_ip.netns.execute.assert_has_calls(calls)
+        self.mock_ip.netns.execute.assert_called_once_with(cmd)
 
     def test_destroy_namespace(self):
         namespace = 'qrouter-bar'
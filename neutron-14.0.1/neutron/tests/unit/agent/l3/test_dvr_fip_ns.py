@@ -203,10 +203,10 @@ class TestDvrFipNs(base.BaseTestCase):
     @mock.patch.object(ip_lib.IpNetnsCommand, 'exists')
     def _test_create(self, old_kernel, exists, execute, IPTables):
         exists.return_value = True
-        # There are up to six sysctl calls - two to enable forwarding,
-        # two for arp_ignore and arp_announce, and two for ip_nonlocal_bind
-        execute.side_effect = [None, None, None, None,
-                               RuntimeError if old_kernel else None, None]
+        # There are up to three sysctl calls - one to enable forwarding,
+        # arp_ignore and arp_announce, and two for ip_nonlocal_bind
+        execute.side_effect = [None, RuntimeError if old_kernel else None,
+                               None]
 
         self.fip_ns._iptables_manager = IPTables()
         self.fip_ns.create()
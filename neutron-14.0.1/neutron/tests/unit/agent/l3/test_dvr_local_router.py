@@ -522,14 +522,36 @@ class TestDvrRouterOperations(base.BaseTestCase):
                                '_process_arp_cache_for_internal_port') as parp:
             ri._set_subnet_arp_info(subnet_id)
         self.assertEqual(1, parp.call_count)
-        self.mock_ip_dev.neigh.add.assert_called_once_with(
+        batch = self.mock_ip_dev.batch.return_value.__enter__.return_value
+        batch.add_neigh_entry.assert_called_once_with(
             '1.2.3.4', '00:11:22:33:44:55')
+        self.assertFalse(self.mock_ip_dev.neigh.add.called)
 
         # Test negative case
         router['distributed'] = False
         ri._set_subnet_arp_info(subnet_id)
         self.mock_ip_dev.neigh.add.never_called()
 
+    def test__set_subnet_arp_info_device_not_ready(self):
+        ri = self._create_router(mock.MagicMock())
+        subnet_id = _uuid()
+        ri._get_internal_port = mock.Mock(return_value={'id': _uuid()})
+        self.plugin_api.get_ports_by_subnet.return_value = [
+            {'mac_address': '00:11:22:33:44:55',
+             'device_owner': 'compute:nova',
+             'fixed_ips': [{'ip_address': '1.2.3.4',
+                            'subnet_id': subnet_id}]}]
+        self.mock_ip_dev.exists.return_value = False
+
+        ri._set_subnet_arp_info(subnet_id)
+
+        self.assertFalse(self.mock_ip_dev.batch.called)
+        self.assertEqual(
+            set([dvr_router.Arp_entry(ip='1.2.3.4', mac='00:11:22:33:44:55',
+                                      subnet_id=subnet_id,
+                                      operation='add')]),
+            ri._pending_arp_set)
+
     def test_add_arp_entry(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         router = l3_test_common.prepare_router_data(num_internal_ports=2)
@@ -544,7 +566,8 @@ class TestDvrRouterOperations(base.BaseTestCase):
         agent._router_added(router['id'], router)
         agent.add_arp_entry(None, payload)
         agent.router_deleted(None, router['id'])
-        self.mock_ip_dev.neigh.add.assert_called_once_with(
+        batch = self.mock_ip_dev.batch.return_value.__enter__.return_value
+        batch.add_neigh_entry.assert_called_once_with(
             '1.7.23.11', '00:11:22:33:44:55')
 
     def test_add_arp_entry_no_routerinfo(self):
@@ -590,7 +613,7 @@ class TestDvrRouterOperations(base.BaseTestCase):
         self.assertTrue(arp_cache.called)
         arp_cache.assert_called_once_with(mock.ANY, mock.ANY,
                                           subnet_id, 'add')
-        self.assertFalse(rtrdev.neigh.add.called)
+        self.assertFalse(rtrdev.return_value.batch.called)
 
     def test__process_arp_cache_for_internal_port(self):
         ri, subnet_id = self._setup_test_for_arp_entry_cache()
@@ -626,7 +649,8 @@ class TestDvrRouterOperations(base.BaseTestCase):
         agent.add_arp_entry(None, payload)
         # now delete it
         agent.del_arp_entry(None, payload)
-        self.mock_ip_dev.neigh.delete.assert_called_once_with(
+        batch = self.mock_ip_dev.batch.return_value.__enter__.return_value
+        batch.delete_neigh_entry.assert_called_once_with(
             '1.5.25.15', '00:44:33:22:11:55')
         agent.router_deleted(None, router['id'])
 
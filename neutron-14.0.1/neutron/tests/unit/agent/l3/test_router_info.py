@@ -231,6 +231,39 @@ class TestRouterInfo(base.BaseTestCase):
             initial_internal_ports + [updated_port],
             ri.internal_ports)
 
+    def test_resync_from_kernel_state(self):
+        ri = router_info.RouterInfo(mock.Mock(), _uuid(), {}, **self.ri_kwargs)
+        ri.driver = mock.Mock()
+        devices = [{'name': 'qr-aaa', 'mac': 'CA:FE:CA:FE:CA:01', 'mtu': 1500,
+                    'ip_addresses': [{'cidr': '10.0.0.1/24',
+                                      'scope': 'global'},
+                                     {'cidr': 'fe80::1/64',
+                                      'scope': 'link'}]}]
+        configured_ips = [{'ip_address': '10.0.0.1', 'prefixlen': 24}]
+        new_ips = [{'ip_address': '10.0.1.1', 'prefixlen': 24}]
+        with mock.patch.object(ip_lib, 'get_devices_info_with_ip',
+                               return_value=devices),\
+                mock.patch.object(ip_lib, 'send_ip_addr_adv_notif') as garp,\
+                mock.patch.object(ri.iptables_manager, '_apply') as apply:
+            with ri.resync_from_kernel_state():
+                ri._internal_network_added(
+                    ri.ns_name, 'net-id', 'port-id-1', configured_ips,
+                    'ca:fe:ca:fe:ca:01', 'qr-aaa', 'qr-', mtu=1500)
+                ri._internal_network_added(
+                    ri.ns_name, 'net-id', 'port-id-2', new_ips,
+                    'ca:fe:ca:fe:ca:02', 'qr-bbb', 'qr-', mtu=1500)
+                ri.iptables_manager.apply()
+                self.assertFalse(apply.called)
+            apply.assert_called_once_with()
+
+        ri.driver.plug.assert_called_once_with(
+            'net-id', 'port-id-2', 'qr-bbb', 'ca:fe:ca:fe:ca:02',
+            namespace=ri.ns_name, prefix='qr-', mtu=1500)
+        ri.driver.init_router_port.assert_called_once_with(
+            'qr-bbb', ['10.0.1.1/24'], namespace=ri.ns_name)
+        garp.assert_called_once_with(ri.ns_name, 'qr-bbb', '10.0.1.1')
+        self.assertIsNone(ri._kernel_devices)
+
 
 class BasicRouterTestCaseFramework(base.BaseTestCase):
     def _create_router(self, router=None, **kwargs):
@@ -17,6 +17,7 @@ from neutron_lib.callbacks import events as callbacks_events
 from neutron_lib.callbacks import registry as callbacks_registry
 from neutron_lib.callbacks import resources as callbacks_resources
 from neutron_lib import constants
+from oslo_config import cfg
 import testtools
 
 from neutron.agent.common import ovs_lib
@@ -630,6 +631,64 @@ class TestOVSFirewallDriver(base.BaseTestCase):
             self.firewall.update_port_filter(port_dict)
         self.assertEqual(2, self.mock_bridge.apply_flows.call_count)
 
+    def test_update_port_filter_incremental_port_flows(self):
+        cfg.CONF.set_override('incremental_port_flows', True,
+                              group='SECURITYGROUP')
+        port_dict = {'device': 'port-id',
+                     'security_groups': [1]}
+        self._prepare_security_group()
+        self.firewall.prepare_port_filter(port_dict)
+        self.assertIn('port-id', self.firewall._port_flows)
+        self.mock_bridge.reset_mock()
+
+        # Nothing changed
+        self.firewall.update_port_filter(port_dict)
+        self.assertFalse(self.mock_bridge.br.add_flow.called)
+        self.assertFalse(self.mock_bridge.br.delete_flows.called)
+        self.assertFalse(self.mock_bridge.br.do_action_flows.called)
+
+        port_dict['security_groups'] = [2]
+        self.firewall.update_port_filter(port_dict)
+        self.assertFalse(self.mock_bridge.br.delete_flows.called)
+        self.mock_bridge.br.add_flow.assert_any_call(
+            actions='resubmit(,{:d})'.format(
+                ovs_consts.ACCEPT_OR_INGRESS_TABLE),
+            dl_type="0x{:04x}".format(n_const.ETHERTYPE_IP),
+            nw_proto=constants.PROTO_NUM_UDP,
+            priority=77,
+            ct_state=ovsfw_consts.OF_STATE_NEW_NOT_ESTABLISHED,
+            reg5=self.port_ofport,
+            table=ovs_consts.RULES_EGRESS_TABLE)
+        action, stale_flows, use_bundle = (
+            self.mock_bridge.br.do_action_flows.call_args[0])
+        self.assertEqual('del', action)
+        self.assertTrue(stale_flows)
+        for flow in stale_flows:
+            self.assertTrue(flow['strict'])
+            self.assertNotIn('actions', flow)
+        self.assertIn(ovs_consts.RULES_INGRESS_TABLE,
+                      [flow['table'] for flow in stale_flows])
+
+    def test_update_port_filter_incremental_port_flows_ofport_changed(self):
+        cfg.CONF.set_override('incremental_port_flows', True,
+                              group='SECURITYGROUP')
+        port_dict = {'device': 'port-id',
+                     'security_groups': [1]}
+        self._prepare_security_group()
+        self.firewall.prepare_port_filter(port_dict)
+        self.fake_ovs_port.ofport = 2
+        with mock.patch.object(self.firewall,
+                               '_update_port_flows') as update_port_flows:
+            self.firewall.update_port_filter(port_dict)
+        self.assertFalse(update_port_flows.called)
+        self.assertTrue(self.mock_bridge.br.delete_flows.called)
+
+    def test_ovs_restart_clears_port_flows(self):
+        self.firewall._port_flows['port-id'] = {}
+        self.firewall._init_firewall_callback(
+            callbacks_resources.AGENT, callbacks_events.OVS_RESTARTED, None)
+        self.assertEqual({}, self.firewall._port_flows)
+
     def test_remove_port_filter(self):
         port_dict = {'device': 'port-id',
                      'security_groups': [1]}
@@ -1108,6 +1108,8 @@ class TestDhcpBase(TestBase):
         c = SubClass()
         c.restart()
         self.assertEqual(c.called, ['disable True True', 'enable'])
+        c.resume()
+        self.assertEqual(c.called, ['disable True True', 'enable', 'enable'])
 
 
 class TestDhcpLocalProcess(TestBase):
@@ -2026,6 +2028,136 @@ class TestDnsmasq(TestBase):
             mock.call(exp_opt_name, exp_opt_data),
         ])
 
+    def _get_incremental_network(self):
+        self.conf.set_override('dnsmasq_incremental_reload', True)
+        mock.patch.dict(dhcp.Dnsmasq._NETWORK_HOSTS, clear=True).start()
+        net = FakeDualNetwork()
+        for port in net.ports:
+            port.revision_number = 1
+        self.useFixture(tools.OpenFixture('/dhcp/%s/host' % net.id))
+        self.useFixture(tools.OpenFixture('/dhcp/%s/interface' % net.id,
+                                          'tapdancingmice'))
+        return net
+
+    def test_reload_allocations_incremental_unchanged(self):
+        net = self._get_incremental_network()
+        self._get_dnsmasq(net).reload_allocations()
+        self.assertEqual(3, self.safe.call_count)
+        self.external_process().enable.assert_called_once_with(
+            reload_cfg=True)
+
+        self.safe.reset_mock()
+        self.external_process().enable.reset_mock()
+        self._get_dnsmasq(net).reload_allocations()
+        self.assertFalse(self.safe.called)
+        self.external_process().enable.assert_called_once_with(
+            reload_cfg=False)
+
+    def test_reload_allocations_incremental_changed(self):
+        (exp_host_name, exp_host_data,
+         exp_addn_name, exp_addn_data,
+         exp_opt_name, exp_opt_data,) = self._test_reload_allocation_data
+        net = self._get_incremental_network()
+        self._get_dnsmasq(net).reload_allocations()
+
+        self.safe.reset_mock()
+        self.external_process().enable.reset_mock()
+        net.ports[0].mac_address = '00:00:80:aa:bb:dd'
+        net.ports[0].revision_number = 2
+        self._get_dnsmasq(net).reload_allocations()
+        self.safe.assert_called_once_with(
+            exp_host_name, exp_host_data.replace('00:00:80:aa:bb:cc',
+                                                 '00:00:80:aa:bb:dd'))
+        self.external_process().enable.assert_called_once_with(
+            reload_cfg=True)
+
+    def test_reload_allocations_incremental_enable_fails(self):
+        net = self._get_incremental_network()
+        self.external_process().enable.side_effect = RuntimeError
+        self.assertRaises(RuntimeError,
+                          self._get_dnsmasq(net).reload_allocations)
+
+        self.safe.reset_mock()
+        self.external_process().enable.reset_mock()
+        self.external_process().enable.side_effect = None
+        self._get_dnsmasq(net).reload_allocations()
+        self.assertEqual(3, self.safe.call_count)
+        self.external_process().enable.assert_called_once_with(
+            reload_cfg=True)
+
+    def test_iter_hosts_incremental(self):
+        net = self._get_incremental_network()
+        dm = self._get_dnsmasq(net)
+        with mock.patch.object(dm, '_iter_port_hosts',
+                               wraps=dm._iter_port_hosts) as iter_port_hosts:
+            expected = list(dm._iter_hosts())
+            self.assertEqual(4, iter_port_hosts.call_count)
+
+            iter_port_hosts.reset_mock()
+            self.assertEqual(expected, list(dm._iter_hosts()))
+            self.assertFalse(iter_port_hosts.called)
+
+            net.ports[1].revision_number = 2
+            self.assertEqual(expected, list(dm._iter_hosts()))
+            iter_port_hosts.assert_called_once_with(net.ports[1], mock.ANY)
+
+            iter_port_hosts.reset_mock()
+            dm.dns_domain = 'example.com'
+            list(dm._iter_hosts())
+            self.assertEqual(4, iter_port_hosts.call_count)
+
+        removed = net.ports.pop()
+        list(dm._iter_hosts())
+        self.assertNotIn(
+            removed.id, dhcp.Dnsmasq._NETWORK_HOSTS[net.id].port_hosts)
+
+    def test_disable_forgets_network_hosts(self):
+        net = self._get_incremental_network()
+        self._get_dnsmasq(net).reload_allocations()
+        self.assertIn(net.id, dhcp.Dnsmasq._NETWORK_HOSTS)
+        self._get_dnsmasq(net)._remove_config_files()
+        self.assertNotIn(net.id, dhcp.Dnsmasq._NETWORK_HOSTS)
+
+    def _test_resume(self, active, interface_name,
+                     cmdline='dnsmasq --no-hosts'):
+        attrs_to_mock = dict((a, mock.DEFAULT) for a in
+                             ['active', 'interface_name', 'enable',
+                              '_build_cmdline_callback'])
+        with mock.patch.multiple(dhcp.Dnsmasq, **attrs_to_mock) as mocks:
+            mocks['active'].__get__ = mock.Mock(return_value=active)
+            mocks['interface_name'].__get__ = mock.Mock(
+                return_value=interface_name)
+            mocks['_build_cmdline_callback'].return_value = [
+                'dnsmasq', '--no-hosts']
+            self.external_process.return_value.cmdline = cmdline
+            dm = self._get_dnsmasq(FakeDualNetwork())
+            dm.resume()
+            return mocks['enable'], dm.process_monitor
+
+    def test_resume(self):
+        enable, process_monitor = self._test_resume(True, 'tap0')
+        self.assertFalse(enable.called)
+        self.assertFalse(self.safe.called)
+        process_monitor.register.assert_called_once_with(
+            uuid=FakeDualNetwork().id,
+            service_name=dhcp.DNSMASQ_SERVICE_NAME,
+            monitored_process=self.external_process.return_value)
+
+    def test_resume_not_active(self):
+        enable, process_monitor = self._test_resume(False, 'tap0')
+        enable.assert_called_once_with()
+        self.assertFalse(process_monitor.register.called)
+
+    def test_resume_no_interface(self):
+        enable, process_monitor = self._test_resume(True, None)
+        enable.assert_called_once_with()
+
+    def test_resume_cmdline_changed(self):
+        enable, process_monitor = self._test_resume(
+            True, 'tap0', cmdline='dnsmasq --no-hosts --no-resolv')
+        enable.assert_called_once_with()
+        self.assertFalse(process_monitor.register.called)
+
     def test_release_unused_leases(self):
         dnsmasq = self._get_dnsmasq(FakeDualNetwork())
 
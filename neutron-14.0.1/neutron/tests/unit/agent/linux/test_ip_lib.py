@@ -1632,6 +1632,93 @@ class TestIpNeighCommand(TestIPCmdBase):
         self._assert_sudo([4], ('flush', 'to', '192.168.0.1'))
 
 
+class TestIpOperationsBatch(base.BaseTestCase):
+    def setUp(self):
+        super(TestIpOperationsBatch, self).setUp()
+        self.addCleanup(privileged.default.set_client_mode, True)
+        privileged.default.set_client_mode(False)
+        self.mock_netns = mock.patch.object(pyroute2, 'NetNS').start()
+        self.netns = self.mock_netns.return_value.__enter__.return_value
+        self.netns.link_lookup.side_effect = (
+            lambda ifname: {'tap0': [1]}.get(ifname, []))
+        self.device = ip_lib.IPDevice('tap0', namespace='ns')
+
+    def test_execute(self):
+        batch = self.device.batch()
+        batch.add_ip_address('192.168.45.1/24')
+        batch.set_link_up()
+        batch.add_neigh_entry('192.168.45.100', 'cc:dd:ee:ff:ab:cd')
+        batch.delete_ip_address('2001:db8::1/64')
+
+        self.assertEqual([None, None, None, None], batch.execute())
+        self.assertEqual(0, len(batch))
+        self.mock_netns.assert_called_once_with('ns', flags=0)
+        self.netns.link_lookup.assert_called_once_with(ifname='tap0')
+        self.netns.assert_has_calls([
+            mock.call.addr('add', index=1, address='192.168.45.1', mask=24,
+                           family=socket.AF_INET, broadcast='192.168.45.255',
+                           scope=0),
+            mock.call.link('set', index=1, state='up'),
+            mock.call.neigh('replace', ifindex=1, dst='192.168.45.100',
+                            lladdr='cc:dd:ee:ff:ab:cd', family=socket.AF_INET,
+                            state=ndmsg.states['permanent']),
+            mock.call.addr('delete', index=1, address='2001:db8::1',
+                           mask=64, family=socket.AF_INET6)])
+
+    def test_execute_no_operations(self):
+        self.assertEqual([], self.device.batch().execute())
+        self.assertFalse(self.mock_netns.called)
+
+    def test_execute_errors(self):
+        self.netns.addr.side_effect = [
+            NetlinkError(errno.EEXIST), NetlinkError(errno.EINVAL)]
+        batch = ip_lib.IPWrapper(namespace='ns').batch()
+        batch.add_ip_address('192.168.45.1/24', 'tap0')
+        batch.set_link_up('tap1')
+        batch.add_ip_address('192.168.46.1/24', 'tap0')
+        batch.set_link_mtu(1450, 'tap0')
+
+        errors = batch.execute()
+        self.assertIsInstance(errors[0], ip_lib.IpAddressAlreadyExists)
+        self.assertIsInstance(errors[1], ip_lib.NetworkInterfaceNotFound)
+        self.assertIsInstance(errors[2], ip_lib.IpOperationFailed)
+        self.assertIsNone(errors[3])
+        self.netns.link.assert_called_once_with('set', index=1, mtu=1450)
+
+    def test_context_manager_raises_on_errors(self):
+        self.netns.neigh.side_effect = [NetlinkError(errno.ENODEV), None]
+        try:
+            with self.device.batch() as batch:
+                batch.add_neigh_entry('192.168.45.100', 'cc:dd:ee:ff:ab:cd')
+                batch.delete_neigh_entry('192.168.45.101',
+                                         'cc:dd:ee:ff:ab:ce')
+            self.fail('IpOperationsBatchFailed not raised')
+        except ip_lib.IpOperationsBatchFailed as e:
+            self.assertEqual(1, len(e.errors))
+            self.assertEqual(('add_neigh_entry', 'tap0'), e.errors[0][:2])
+            self.assertIsInstance(e.errors[0][2],
+                                  ip_lib.NetworkInterfaceNotFound)
+        self.assertEqual(2, self.netns.neigh.call_count)
+
+    def test_context_manager_not_run_on_exception(self):
+        with testtools.ExpectedException(ValueError):
+            with self.device.batch() as batch:
+                batch.set_link_down()
+                raise ValueError()
+        self.assertFalse(self.mock_netns.called)
+
+    def test_nonexistent_namespace(self):
+        self.mock_netns.side_effect = OSError(errno.ENOENT, None)
+        batch = self.device.batch()
+        batch.set_link_address('cc:dd:ee:ff:ab:cd')
+        with testtools.ExpectedException(ip_lib.NetworkNamespaceNotFound):
+            batch.execute()
+
+    def test_no_device(self):
+        batch = ip_lib.IPWrapper(namespace='ns').batch()
+        self.assertRaises(ip_lib.InvalidArgument, batch.set_link_up)
+
+
 class TestArpPing(TestIPCmdBase):
     @mock.patch.object(ip_lib, 'IPWrapper')
     @mock.patch('eventlet.spawn_n')
@@ -2062,3 +2149,21 @@ class GetDevicesInfoTestCase(base.BaseTestCase):
             break
         else:
             self.fail('No VETH device found')
+
+    @mock.patch.object(priv_lib, 'get_ip_addresses')
+    def test_get_devices_info_with_ip(self, mock_get_ip_addresses):
+        self.mock_getdevs.return_value = (self.DEVICE_DUMMY, )
+        mock_get_ip_addresses.return_value = (
+            {'index': 2, 'prefixlen': 24, 'scope': 0,
+             'attrs': (('IFA_ADDRESS', '192.168.10.20'), )},
+            {'index': 2, 'prefixlen': 64, 'scope': 253,
+             'attrs': (('IFA_ADDRESS', 'fe80::1'), )},
+            {'index': 7, 'prefixlen': 8, 'scope': 254,
+             'attrs': (('IFA_ADDRESS', '127.0.0.1'), )})
+        ret = ip_lib.get_devices_info_with_ip('namespace')
+        self.assertEqual(1, len(ret))
+        self.assertEqual('int_01', ret[0]['name'])
+        self.assertEqual([{'cidr': '192.168.10.20/24', 'scope': 'global'},
+                          {'cidr': 'fe80::1/64', 'scope': 'link'}],
+                         ret[0]['ip_addresses'])
+        mock_get_ip_addresses.assert_called_once_with('namespace')
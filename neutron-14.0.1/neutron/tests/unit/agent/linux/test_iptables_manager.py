@@ -444,6 +444,16 @@ class IptablesManagerStateFulTestCase(IptablesManagerBaseTestCase):
             with self.iptables.defer_apply():
                 pass
 
+    def test_defer_apply_nested(self):
+        self.iptables._apply = mock.Mock()
+        with self.iptables.defer_apply():
+            with self.iptables.defer_apply():
+                self.iptables.apply()
+            self.assertFalse(self.iptables._apply.called)
+            self.assertTrue(self.iptables.iptables_apply_deferred)
+        self.iptables._apply.assert_called_once_with()
+        self.assertFalse(self.iptables.iptables_apply_deferred)
+
     def test_add_and_remove_chain(self):
         filter_dump_mod = FILTER_WITH_RULES_TEMPLATE % IPTABLES_ARG
 
@@ -993,6 +1003,64 @@ class IptablesManagerStateFulTestCase(IptablesManagerBaseTestCase):
         self.assertEqual(num_calls, self.execute.call_count)
         tools.verify_mock_calls(self.execute, expected_calls_and_values)
 
+    def _get_save_calls(self):
+        return [call for call in self.execute.call_args_list
+                if call[0][0][-1].endswith('-save')]
+
+    def test_apply_with_applied_state(self):
+        cfg.CONF.set_override('iptables_state_verify_interval', 3600,
+                              'AGENT')
+        self.execute.return_value = ''
+        self.iptables.ipv4['filter'].add_chain('filter')
+        self.iptables.apply()
+        self.assertEqual(2 if self.use_ipv6 else 1,
+                         len(self._get_save_calls()))
+
+        # Only the chain which changed is sent to iptables-restore, without
+        # reading the rules back
+        self.execute.reset_mock()
+        self.iptables.ipv4['filter'].add_rule('filter', '-j DROP')
+        self.iptables.apply()
+        self.execute.assert_called_once_with(
+            ['iptables-restore', '-n'],
+            process_input='\n'.join([
+                '# Generated by iptables_manager', '*filter',
+                '-I %(bn)s-filter 1 -j DROP' % IPTABLES_ARG, 'COMMIT',
+                '# Completed by iptables_manager', '']),
+            run_as_root=True, log_fail_as_error=False)
+
+        # Nothing is done when nothing changed
+        self.execute.reset_mock()
+        self.iptables.apply()
+        self.execute.assert_not_called()
+
+    def test_apply_with_applied_state_other_chain(self):
+        cfg.CONF.set_override('iptables_state_verify_interval', 3600,
+                              'AGENT')
+        self.execute.return_value = ''
+        self.iptables.apply()
+
+        # The rules are read back to change a chain of another agent
+        self.execute.reset_mock()
+        self.iptables.ipv4['filter'].add_rule('FORWARD', '-j DROP',
+                                              wrap=False)
+        self.iptables.apply()
+        self.assertEqual(1, len(self._get_save_calls()))
+
+    @mock.patch.object(iptables_manager.time, 'time')
+    def test_apply_with_applied_state_expired(self, mock_time):
+        cfg.CONF.set_override('iptables_state_verify_interval', 3600,
+                              'AGENT')
+        self.execute.return_value = ''
+        mock_time.return_value = 1000
+        self.iptables.apply()
+
+        self.execute.reset_mock()
+        mock_time.return_value = 4600
+        self.iptables.apply()
+        self.assertEqual(2 if self.use_ipv6 else 1,
+                         len(self._get_save_calls()))
+
     def test_get_traffic_counters_chain_notexists(self):
         with mock.patch.object(iptables_manager, "LOG") as log:
             acc = self.iptables.get_traffic_counters('chain1')
@@ -271,6 +271,96 @@ class SGServerRpcCallBackTestCase(test_sg.SecurityGroupDBTestCase):
             self.assertEqual(expected, sg_info['security_groups'])
             self._delete('ports', port_id)
 
+    def test_security_group_info_for_devices_cached(self):
+        cfg.CONF.set_override('security_group_info_cache_size', 10)
+        plugin = directory.get_plugin()
+        with self.network() as n,\
+                self.subnet(n),\
+                self.security_group() as sg1,\
+                self.security_group() as sg2:
+            sg1_id = sg1['security_group']['id']
+            sg2_id = sg2['security_group']['id']
+            rule = self._build_security_group_rule(
+                sg1_id, 'ingress', const.PROTO_NAME_TCP, '22', '22',
+                remote_group_id=sg2_id)
+            res = self._create_security_group_rule(self.fmt, rule)
+            self.assertEqual(webob.exc.HTTPCreated.code, res.status_int)
+            res = self._create_port(
+                self.fmt, n['network']['id'],
+                security_groups=[sg1_id])
+            port_id = self.deserialize(self.fmt, res)['port']['id']
+            ctx = context.get_admin_context()
+            with mock.patch.object(
+                    plugin, '_select_rules_for_security_groups',
+                    wraps=plugin._select_rules_for_security_groups
+            ) as select_rules:
+                sg_info = self.rpc.security_group_info_for_devices(
+                    ctx, devices=[port_id])
+                revisions = sg_info['security_group_revisions']
+                self.assertEqual([sg1_id], list(revisions))
+                self.assertEqual(3, len(sg_info['security_groups'][sg1_id]))
+
+                sg_info = self.rpc.security_group_info_for_devices(
+                    ctx, devices=[port_id],
+                    security_group_revisions=revisions)
+                self.assertEqual({}, sg_info['security_groups'])
+                self.assertEqual(
+                    [sg2_id],
+                    sg_info['devices'][port_id][
+                        'security_group_source_groups'])
+                self.assertEqual(1, select_rules.call_count)
+
+                rule = self._build_security_group_rule(
+                    sg1_id, 'ingress', const.PROTO_NAME_TCP, '23', '23')
+                res = self._create_security_group_rule(self.fmt, rule)
+                self.assertEqual(webob.exc.HTTPCreated.code, res.status_int)
+                sg_info = self.rpc.security_group_info_for_devices(
+                    ctx, devices=[port_id],
+                    security_group_revisions=revisions)
+                self.assertGreater(
+                    sg_info['security_group_revisions'][sg1_id],
+                    revisions[sg1_id])
+                self.assertEqual(4, len(sg_info['security_groups'][sg1_id]))
+                self.assertEqual(2, select_rules.call_count)
+            self._delete('ports', port_id)
+
+    def test_security_group_info_for_devices_cached_member_ips(self):
+        cfg.CONF.set_override('security_group_info_cache_size', 10)
+        with self.network() as n,\
+                self.subnet(n),\
+                self.security_group() as sg1,\
+                self.security_group() as sg2:
+            sg1_id = sg1['security_group']['id']
+            sg2_id = sg2['security_group']['id']
+            rule = self._build_security_group_rule(
+                sg1_id, 'ingress', const.PROTO_NAME_TCP, '22', '22',
+                remote_group_id=sg2_id)
+            res = self._create_security_group_rule(self.fmt, rule)
+            self.assertEqual(webob.exc.HTTPCreated.code, res.status_int)
+            res1 = self._create_port(
+                self.fmt, n['network']['id'],
+                security_groups=[sg1_id])
+            port_id1 = self.deserialize(self.fmt, res1)['port']['id']
+            ctx = context.get_admin_context()
+            sg_info = self.rpc.security_group_info_for_devices(
+                ctx, devices=[port_id1])
+            self.assertEqual({sg2_id: {const.IPv4: set()}},
+                             sg_info['sg_member_ips'])
+
+            res2 = self._create_port(
+                self.fmt, n['network']['id'],
+                security_groups=[sg2_id])
+            port2 = self.deserialize(self.fmt, res2)['port']
+            sg_info = self.rpc.security_group_info_for_devices(
+                ctx, devices=[port_id1],
+                security_group_revisions=sg_info['security_group_revisions'])
+            self.assertEqual(
+                {sg2_id: {const.IPv4: set(
+                    [port2['fixed_ips'][0]['ip_address']])}},
+                sg_info['sg_member_ips'])
+            self._delete('ports', port_id1)
+            self._delete('ports', port2['id'])
+
     @contextlib.contextmanager
     def _port_with_addr_pairs_and_security_group(self):
         plugin_obj = directory.get_plugin()
@@ -1087,6 +1177,42 @@ class SecurityGroupAgentEnhancedRpcTestCase(
         self.agent.refresh_firewall([])
         self.assertFalse(self.firewall.called)
 
+    def test_refresh_firewall_with_security_group_revisions(self):
+        member_ips = {'fake_sgid2': {'IPv4': [], 'IPv6': []}}
+        rpc = self.agent.plugin_rpc
+        rpc.security_group_info_for_devices.side_effect = [
+            {'security_groups': {
+                'fake_sgid1': [{'remote_group_id': 'fake_sgid2'}],
+                'fake_sgid2': []},
+             'sg_member_ips': member_ips,
+             'devices': self.firewall.ports,
+             'security_group_revisions': {'fake_sgid1': 1,
+                                          'fake_sgid2': 1}},
+            {'security_groups': {'fake_sgid2': [{'direction': 'ingress'}]},
+             'sg_member_ips': member_ips,
+             'devices': self.firewall.ports,
+             'security_group_revisions': {'fake_sgid1': 1,
+                                          'fake_sgid2': 2}}]
+        self.agent._use_enhanced_rpc = True
+        self.agent.prepare_devices_filter(['fake_device'])
+        self.agent.refresh_firewall(['fake_device'])
+        rpc.security_group_info_for_devices.assert_has_calls([
+            mock.call(None, ['fake_device']),
+            mock.call(None, ['fake_device'],
+                      security_group_revisions={'fake_sgid1': 1,
+                                                'fake_sgid2': 1})])
+        # the rules of fake_sgid1 did not change and were not sent again
+        self.firewall.update_security_group_rules.assert_has_calls([
+            mock.call('fake_sgid1', [{'remote_group_id': 'fake_sgid2'}]),
+            mock.call('fake_sgid2', []),
+            mock.call('fake_sgid1', [{'remote_group_id': 'fake_sgid2'}]),
+            mock.call('fake_sgid2', [{'direction': 'ingress'}])],
+            any_order=True)
+        self.assertEqual({'fake_sgid1': 1, 'fake_sgid2': 2},
+                         dict((sg_id, revision_rules[0]) for
+                              sg_id, revision_rules in
+                              self.agent._security_group_rules.items()))
+
 
 class SecurityGroupAgentRpcWithDeferredRefreshTestCase(
     SecurityGroupAgentRpcTestCase):
@@ -118,6 +118,67 @@ class TestDhcpRpcCallback(base.BaseTestCase):
     def test_get_active_networks_info_enable_dhcp_filter_true(self):
         self._test_get_active_networks_info_enable_dhcp_filter(True)
 
+    def test_get_active_networks_changes(self):
+        networks = [{'id': 'a', 'revision_number': 1},
+                    {'id': 'b', 'revision_number': 1},
+                    {'id': 'c', 'revision_number': 1}]
+        self.plugin.get_networks.return_value = networks
+        subnets = [{'network_id': 'a', 'id': 's1', 'revision_number': 1},
+                   {'network_id': 'b', 'id': 's2', 'revision_number': 1}]
+        ports = [{'network_id': 'a', 'id': 'p1', 'revision_number': 1},
+                 {'network_id': 'b', 'id': 'p2', 'revision_number': 2}]
+        self.plugin.get_subnets.return_value = subnets
+        self.plugin.get_ports.return_value = ports
+        digests = {
+            'a': utils.get_network_revision_digest(networks[0], subnets[:1],
+                                                   ports[:1]),
+            'b': utils.get_network_revision_digest(
+                networks[1], subnets[1:],
+                [{'network_id': 'b', 'id': 'p2', 'revision_number': 1}])}
+
+        changes = self.callbacks.get_active_networks_changes(
+            mock.Mock(), host='host', revision_digests=digests,
+            enable_dhcp_filter=False)
+
+        self.assertEqual(['a'], changes['unchanged_network_ids'])
+        self.assertEqual(['b', 'c'],
+                         [network['id'] for network in changes['networks']])
+        self.assertEqual([subnets[1]], changes['networks'][0]['subnets'])
+        self.assertEqual([ports[1]], changes['networks'][0]['ports'])
+        self.plugin.get_ports.assert_any_call(
+            mock.ANY, filters={'network_id': ['a', 'b']},
+            fields=['id', 'network_id', 'revision_number'])
+        self.plugin.get_ports.assert_called_with(
+            mock.ANY, filters={'network_id': ['b', 'c']})
+
+    def test_get_active_networks_changes_routed_network(self):
+        networks = [{'id': 'a', 'revision_number': 1}]
+        self.plugin.get_networks.return_value = networks
+        subnets = [{'network_id': 'a', 'id': 's1', 'revision_number': 1,
+                    'segment_id': 'seg1'}]
+        self.plugin.get_subnets.return_value = subnets
+        self.plugin.get_ports.return_value = []
+        digests = {'a': utils.get_network_revision_digest(networks[0],
+                                                          subnets, [])}
+
+        changes = self.callbacks.get_active_networks_changes(
+            mock.Mock(), host='host', revision_digests=digests)
+
+        self.assertEqual([], changes['unchanged_network_ids'])
+        self.assertEqual(['a'],
+                         [network['id'] for network in changes['networks']])
+
+    def test_get_active_networks_changes_nothing_known(self):
+        self.plugin.get_networks.return_value = [{'id': 'a'}]
+        changes = self.callbacks.get_active_networks_changes(
+            mock.Mock(), host='host', revision_digests={},
+            enable_dhcp_filter=False)
+        self.assertEqual([], changes['unchanged_network_ids'])
+        self.assertEqual(['a'],
+                         [network['id'] for network in changes['networks']])
+        self.plugin.get_ports.assert_called_once_with(
+            mock.ANY, filters={'network_id': ['a']})
+
     def _test__port_action_with_failures(self, exc=None, action=None):
         port = {
             'network_id': 'foo_network_id',
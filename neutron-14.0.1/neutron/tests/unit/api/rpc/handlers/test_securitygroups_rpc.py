@@ -41,6 +41,23 @@ class SecurityGroupServerRpcApiTestCase(base.BaseTestCase):
                     'security_group_rules_for_devices',
                     devices=['fake_device'])
 
+    def test_security_group_info_for_devices_with_revisions(self):
+        rpcapi = securitygroups_rpc.SecurityGroupServerRpcApi('fake_topic')
+
+        with mock.patch.object(rpcapi.client, 'call') as rpc_mock,\
+                mock.patch.object(rpcapi.client, 'prepare') as prepare_mock:
+            prepare_mock.return_value = rpcapi.client
+            rpcapi.security_group_info_for_devices(
+                'context', ['fake_device'],
+                security_group_revisions={'fake_sgid': 1})
+
+            prepare_mock.assert_called_once_with(version='1.3')
+            rpc_mock.assert_called_once_with(
+                    'context',
+                    'security_group_info_for_devices',
+                    devices=['fake_device'],
+                    security_group_revisions={'fake_sgid': 1})
+
 
 class SGAgentRpcCallBackMixinTestCase(base.BaseTestCase):
 
@@ -174,6 +174,37 @@ class TestExceptionLogger(base.BaseTestCase):
         self.assertTrue(logger.called)
 
 
+class TestGetNetworkRevisionDigest(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestGetNetworkRevisionDigest, self).setUp()
+        self.network = {'id': 'net', 'revision_number': 1}
+        self.subnets = [{'id': 's1', 'revision_number': 1},
+                        {'id': 's2', 'revision_number': 3}]
+        self.ports = [{'id': 'p1', 'revision_number': 2},
+                      {'id': 'p2', 'revision_number': 5}]
+        self.digest = utils.get_network_revision_digest(
+            self.network, self.subnets, self.ports)
+
+    def test_order_independent(self):
+        self.assertEqual(self.digest, utils.get_network_revision_digest(
+            self.network, self.subnets[::-1], self.ports[::-1]))
+
+    def test_revision_changed(self):
+        self.ports[1]['revision_number'] = 6
+        self.assertNotEqual(self.digest, utils.get_network_revision_digest(
+            self.network, self.subnets, self.ports))
+
+    def test_port_removed(self):
+        self.assertNotEqual(self.digest, utils.get_network_revision_digest(
+            self.network, self.subnets, self.ports[:1]))
+
+    def test_unknown_revision(self):
+        del self.subnets[0]['revision_number']
+        self.assertIsNone(utils.get_network_revision_digest(
+            self.network, self.subnets, self.ports))
+
+
 class TestDvrServices(base.BaseTestCase):
 
     def _test_is_dvr_serviced(self, device_owner, expected):
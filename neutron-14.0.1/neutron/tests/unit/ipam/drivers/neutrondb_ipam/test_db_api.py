@@ -112,3 +112,36 @@ class TestIpamSubnetManager(testlib_api.SqlTestCase):
         alloc_exists = ipam_obj.IpamAllocation.objects_exist(
             self.ctx, ipam_subnet_id=self.ipam_subnet_id)
         self.assertFalse(alloc_exists)
+
+    def test_list_allocated_ips(self):
+        ips = ['1.2.3.4', '1.2.3.6', '1.2.3.7']
+        for ip in ips:
+            self.subnet_manager.create_allocation(self.ctx, ip)
+        self.assertEqual(
+            set(['1.2.3.4', '1.2.3.7']),
+            self.subnet_manager.list_allocated_ips(
+                self.ctx, ['1.2.3.4', '1.2.3.5', '1.2.3.7']))
+
+    def test_list_free_ranges_limit(self):
+        for pool in self.multi_pool:
+            self.subnet_manager.create_free_range(self.ctx, *pool)
+        free_ranges = self.subnet_manager.list_free_ranges(self.ctx,
+                                                           limit=1)
+        self.assertEqual(1, len(free_ranges))
+        self.assertTrue(self.subnet_manager.free_ranges_exist(self.ctx))
+
+    def test_delete_free_range(self):
+        free_range = self.subnet_manager.create_free_range(
+            self.ctx, *self.single_pool)
+        self.assertEqual(1, self.subnet_manager.delete_free_range(
+            self.ctx, free_range))
+        # The free range was deleted since it was loaded
+        self.assertEqual(0, self.subnet_manager.delete_free_range(
+            self.ctx, free_range))
+        self.assertFalse(self.subnet_manager.free_ranges_exist(self.ctx))
+
+    def test_delete_free_ranges(self):
+        for pool in self.multi_pool:
+            self.subnet_manager.create_free_range(self.ctx, *pool)
+        self.subnet_manager.delete_free_ranges(self.ctx)
+        self.assertFalse(self.subnet_manager.free_ranges_exist(self.ctx))
@@ -19,6 +19,7 @@ from neutron_lib import constants
 from neutron_lib import context
 from neutron_lib import exceptions as n_exc
 from neutron_lib.plugins import directory
+from oslo_config import cfg
 from oslo_utils import uuidutils
 
 from neutron.common import constants as n_const
@@ -26,6 +27,7 @@ from neutron.ipam.drivers.neutrondb_ipam import driver
 from neutron.ipam import exceptions as ipam_exc
 from neutron.ipam import requests as ipam_req
 from neutron.objects import ipam as ipam_obj
+from neutron.tests import base
 from neutron.tests.unit.db import test_db_base_plugin_v2 as test_db_plugin
 from neutron.tests.unit import testlib_api
 
@@ -484,3 +486,135 @@ class TestNeutronDbIpamSubnet(testlib_api.SqlTestCase,
         pools = [netaddr.IPRange('192.168.10.20', '192.168.10.41'),
                  netaddr.IPRange('192.168.10.50', '192.168.10.60')]
         self.assertTrue(self._test__no_pool_changes(pools))
+
+    def _get_free_ips(self, ipam_subnet):
+        free_ips = netaddr.IPSet()
+        for free_range in ipam_subnet.subnet_manager.list_free_ranges(
+                self.ctx):
+            free_ips.add(netaddr.IPRange(free_range.first_ip,
+                                         free_range.last_ip))
+        return free_ips
+
+    def test_allocate_any_address_free_range_index(self):
+        cfg.CONF.set_override('ipam_free_range_index', True)
+        ipam_subnet = self._create_and_allocate_ipam_subnet(
+            '10.0.0.0/24', ip_version=constants.IP_VERSION_4)[0]
+        ip_address = ipam_subnet.allocate(ipam_req.AnyAddressRequest)
+        pool = netaddr.IPSet(netaddr.IPRange('10.0.0.2', '10.0.0.254'))
+        self.assertIn(netaddr.IPAddress(ip_address), pool)
+        pool.remove(ip_address)
+        self.assertEqual(pool, self._get_free_ips(ipam_subnet))
+
+    def test_allocate_any_address_free_range_index_exhausted_pools_fails(
+            self):
+        cfg.CONF.set_override('ipam_free_range_index', True)
+        ipam_subnet = self._create_and_allocate_ipam_subnet(
+            '192.168.0.0/30', ip_version=constants.IP_VERSION_4)[0]
+        self.assertEqual('192.168.0.2',
+                         ipam_subnet.allocate(ipam_req.AnyAddressRequest))
+        self.assertRaises(ipam_exc.IpAddressGenerationFailure,
+                          ipam_subnet.allocate,
+                          ipam_req.AnyAddressRequest)
+
+    def test_allocate_any_address_free_range_index_skips_allocated(self):
+        cfg.CONF.set_override('ipam_free_range_index', True)
+        ipam_subnet = self._create_and_allocate_ipam_subnet(
+            '192.168.0.0/29', ip_version=constants.IP_VERSION_4)[0]
+        ip_addresses = [ipam_subnet.allocate(ipam_req.AnyAddressRequest)]
+        # The specific addresses are not taken from the free ranges
+        for ip_address in ('192.168.0.3', '192.168.0.4', '192.168.0.5'):
+            if ip_address not in ip_addresses:
+                ipam_subnet.allocate(
+                    ipam_req.SpecificAddressRequest(ip_address))
+                ip_addresses.append(ip_address)
+        for i in range(5 - len(ip_addresses)):
+            ip_addresses.append(
+                ipam_subnet.allocate(ipam_req.AnyAddressRequest))
+        self.assertEqual(['192.168.0.%d' % i for i in range(2, 7)],
+                         sorted(ip_addresses))
+        self.assertRaises(ipam_exc.IpAddressGenerationFailure,
+                          ipam_subnet.allocate,
+                          ipam_req.AnyAddressRequest)
+
+    def test_bulk_allocate_free_range_index_contiguous(self):
+        cfg.CONF.set_override('ipam_free_range_index', True)
+        ipam_subnet = self._create_and_allocate_ipam_subnet(
+            '192.168.0.0/24', ip_version=constants.IP_VERSION_4)[0]
+        ip_addresses = ipam_subnet.bulk_allocate(
+            ipam_req.BulkAddressRequest(10))
+        ips = [int(netaddr.IPAddress(ip_address))
+               for ip_address in ip_addresses]
+        self.assertEqual(list(range(ips[0], ips[0] + 10)), ips)
+
+    def test_prefernext_allocate_free_range_index(self):
+        cfg.CONF.set_override('ipam_free_range_index', True)
+        allocation_pools = [{'start': '192.168.0.15', 'end': '192.168.0.20'},
+                            {'start': '192.168.0.5', 'end': '192.168.0.9'}]
+        ipam_subnet = self._create_and_allocate_ipam_subnet(
+            '192.168.0.0/24', allocation_pools=allocation_pools,
+            ip_version=constants.IP_VERSION_4)[0]
+        self.assertEqual(
+            '192.168.0.5',
+            ipam_subnet.allocate(ipam_req.PreferNextAddressRequest()))
+
+    def test_deallocate_free_range_index(self):
+        cfg.CONF.set_override('ipam_free_range_index', True)
+        ipam_subnet = self._create_and_allocate_ipam_subnet(
+            '10.0.0.0/24', ip_version=constants.IP_VERSION_4)[0]
+        ip_addresses = ipam_subnet.bulk_allocate(
+            ipam_req.BulkAddressRequest(3))
+        free_ips = self._get_free_ips(ipam_subnet)
+        for ip_address in ip_addresses:
+            ipam_subnet.deallocate(ip_address)
+            free_ips.add(ip_address)
+            self.assertEqual(free_ips, self._get_free_ips(ipam_subnet))
+        # The released addresses are merged with the free ranges next to
+        # them in their block
+        self.assertLessEqual(
+            len(ipam_subnet.subnet_manager.list_free_ranges(self.ctx)), 3)
+
+    def test_deallocate_specific_address_free_range_index(self):
+        cfg.CONF.set_override('ipam_free_range_index', True)
+        ipam_subnet = self._create_and_allocate_ipam_subnet(
+            '10.0.0.0/24', ip_version=constants.IP_VERSION_4)[0]
+        ip_address = ipam_subnet.allocate(
+            ipam_req.PreferNextAddressRequest())
+        self.assertEqual('10.0.0.2', ip_address)
+        free_ips = self._get_free_ips(ipam_subnet)
+        # The specific address is not taken from the free ranges, so it is
+        # not given back to them either
+        ipam_subnet.allocate(ipam_req.SpecificAddressRequest('10.0.0.100'))
+        ipam_subnet.deallocate('10.0.0.100')
+        free_ranges = ipam_subnet.subnet_manager.list_free_ranges(self.ctx)
+        self.assertEqual(free_ips, self._get_free_ips(ipam_subnet))
+        self.assertEqual(free_ips.size,
+                         ipam_subnet._free_ranges_size(free_ranges))
+
+    def test_update_allocation_pools_drops_free_ranges(self):
+        cfg.CONF.set_override('ipam_free_range_index', True)
+        cidr = '10.0.0.0/24'
+        ipam_subnet = self._create_and_allocate_ipam_subnet(cidr)[0]
+        ipam_subnet.allocate(ipam_req.AnyAddressRequest)
+        ipam_subnet.update_allocation_pools(
+            [netaddr.IPRange('10.0.0.100', '10.0.0.101')],
+            netaddr.IPNetwork(cidr))
+        self.assertFalse(
+            ipam_subnet.subnet_manager.free_ranges_exist(self.ctx))
+        ip_address = ipam_subnet.allocate(ipam_req.AnyAddressRequest)
+        self.assertIn(ip_address, ['10.0.0.100', '10.0.0.101'])
+
+
+class TestSplitFreeRange(base.BaseTestCase):
+
+    def test_split_free_range(self):
+        self.assertEqual([(0, 9), (11, 63), (64, 255)],
+                         driver._split_free_range(0, 255, [10]))
+
+    def test_split_free_range_contiguous(self):
+        self.assertEqual([(0, 63), (64, 69), (73, 127), (128, 1000)],
+                         driver._split_free_range(0, 1000, [70, 71, 72]))
+
+    def test_split_free_range_edges(self):
+        self.assertEqual([(3, 63), (64, 254)],
+                         driver._split_free_range(2, 254, [2]))
+        self.assertEqual([], driver._split_free_range(100, 100, [100]))
@@ -52,6 +52,27 @@ class IpamAllocationPoolDbObjectTestCase(obj_test_base.BaseDbObjectTestCase,
         self._ipam_subnet.create()
 
 
+class IpamFreeRangeObjectIfaceTestCase(obj_test_base.BaseObjectIfaceTestCase):
+
+    _test_class = ipam.IpamFreeRange
+
+
+class IpamFreeRangeDbObjectTestCase(obj_test_base.BaseDbObjectTestCase,
+                                    testlib_api.SqlTestCase):
+
+    _test_class = ipam.IpamFreeRange
+
+    def setUp(self):
+        super(IpamFreeRangeDbObjectTestCase, self).setUp()
+        self._create_test_ipam_subnet()
+        self.update_obj_fields({'ipam_subnet_id': self._ipam_subnet['id']})
+
+    def _create_test_ipam_subnet(self):
+        attrs = self.get_random_object_fields(obj_cls=ipam.IpamSubnet)
+        self._ipam_subnet = ipam.IpamSubnet(self.context, **attrs)
+        self._ipam_subnet.create()
+
+
 class IpamAllocationObjectIfaceTestCase(obj_test_base.BaseObjectIfaceTestCase):
 
     _test_class = ipam.IpamAllocation
@@ -49,6 +49,7 @@ object_data = {
     'IPAllocationPool': '1.0-371016a6480ed0b4299319cb46d9215d',
     'IpamAllocation': '1.0-ace65431abd0a7be84cc4a5f32d034a3',
     'IpamAllocationPool': '1.0-c4fa1460ed1b176022ede7af7d1510d5',
+    'IpamFreeRange': '1.0-c4fa1460ed1b176022ede7af7d1510d5',
     'IpamSubnet': '1.0-713de401682a70f34891e13af645fa08',
     'L3HARouterAgentPortBinding': '1.0-d1d7ee13f35d56d7e225def980612ee5',
     'L3HARouterNetwork': '1.0-87acea732853f699580179a94d2baf91',
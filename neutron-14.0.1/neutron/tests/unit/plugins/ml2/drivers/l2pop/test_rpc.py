@@ -0,0 +1,145 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from neutron_lib import constants as n_const
+
+from neutron.plugins.ml2.drivers.l2pop import rpc as l2pop_rpc
+from neutron.tests import base
+
+PORT1 = l2pop_rpc.PortInfo('fa:16:3e:00:00:01', '10.0.0.1')
+PORT2 = l2pop_rpc.PortInfo('fa:16:3e:00:00:02', '10.0.0.2')
+PORT3 = l2pop_rpc.PortInfo('fa:16:3e:00:00:03', '10.0.0.3')
+
+
+def fdb_entries(network_id, agent_ip, ports, segment_id=1):
+    return {network_id: {'segment_id': segment_id,
+                         'network_type': 'vxlan',
+                         'ports': {agent_ip: list(ports)}}}
+
+
+class TestL2populationAgentNotifyAPI(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestL2populationAgentNotifyAPI, self).setUp()
+        self.context = mock.Mock()
+
+    def _get_notifier(self, interval):
+        self.config(fdb_coalesce_interval=interval, group='l2pop')
+        notifier = l2pop_rpc.L2populationAgentNotifyAPI()
+        self.fanout = mock.patch.object(notifier,
+                                        '_notification_fanout').start()
+        return notifier
+
+    def test_fanout_not_coalesced_by_default(self):
+        notifier = self._get_notifier(0)
+        entries = fdb_entries('net1', '1.1.1.1', [PORT1])
+        notifier.add_fdb_entries(self.context, entries)
+        self.fanout.assert_called_once_with(
+            self.context, 'add_fdb_entries', entries)
+
+    def test_fanout_queued_when_coalesced(self):
+        notifier = self._get_notifier(1)
+        entries = fdb_entries('net1', '1.1.1.1', [PORT1])
+        with mock.patch.object(notifier._batch_notifier,
+                               'queue_event') as queue_event,\
+                mock.patch.object(notifier, '_notification_host') as host:
+            notifier.remove_fdb_entries(self.context, entries)
+            notifier.add_fdb_entries(self.context, entries, host='host1')
+        queue_event.assert_called_once_with(
+            (self.context, 'remove_fdb_entries', entries))
+        self.assertFalse(self.fanout.called)
+        host.assert_called_once_with(
+            self.context, 'add_fdb_entries', entries, 'host1')
+
+    def test_send_coalesced_fanouts_merges_networks(self):
+        notifier = self._get_notifier(1)
+        notifications = [
+            (self.context, 'add_fdb_entries',
+             fdb_entries('net1', '1.1.1.1', [n_const.FLOODING_ENTRY, PORT1])),
+            (self.context, 'add_fdb_entries',
+             fdb_entries('net1', '1.1.1.1', [n_const.FLOODING_ENTRY, PORT2])),
+            (self.context, 'add_fdb_entries',
+             fdb_entries('net1', '2.2.2.2', [PORT3])),
+            (self.context, 'add_fdb_entries',
+             fdb_entries('net2', '1.1.1.1', [PORT1], segment_id=2))]
+        notifier._send_coalesced_fanouts(notifications)
+        expected = fdb_entries('net1', '1.1.1.1',
+                               [n_const.FLOODING_ENTRY, PORT1, PORT2])
+        expected['net1']['ports']['2.2.2.2'] = [PORT3]
+        expected.update(fdb_entries('net2', '1.1.1.1', [PORT1],
+                                    segment_id=2))
+        self.fanout.assert_called_once_with(
+            self.context, 'add_fdb_entries', expected)
+        self.assertEqual([n_const.FLOODING_ENTRY, PORT1],
+                         notifications[0][2]['net1']['ports']['1.1.1.1'])
+        self.assertEqual(4, notifier.fanout_notifications)
+        self.assertEqual(1, notifier.fanout_casts)
+
+    def test_send_coalesced_fanouts_keeps_order(self):
+        notifier = self._get_notifier(1)
+        add1 = fdb_entries('net1', '1.1.1.1', [PORT1])
+        add2 = fdb_entries('net1', '1.1.1.1', [PORT2])
+        remove = fdb_entries('net1', '1.1.1.1', [PORT1])
+        update = {'chg_ip': {'net1': {'1.1.1.1': {'after': [PORT3]}}}}
+        add3 = fdb_entries('net1', '1.1.1.1', [PORT1])
+        notifier._send_coalesced_fanouts([
+            (self.context, 'add_fdb_entries', add1),
+            (self.context, 'add_fdb_entries', add2),
+            (self.context, 'remove_fdb_entries', remove),
+            (self.context, 'update_fdb_entries', update),
+            (self.context, 'add_fdb_entries', add3)])
+        self.fanout.assert_has_calls([
+            mock.call(self.context, 'add_fdb_entries',
+                      fdb_entries('net1', '1.1.1.1', [PORT1, PORT2])),
+            mock.call(self.context, 'remove_fdb_entries', remove),
+            mock.call(self.context, 'update_fdb_entries', update),
+            mock.call(self.context, 'add_fdb_entries', add3)])
+        self.assertEqual(4, self.fanout.call_count)
+        self.assertEqual(5, notifier.fanout_notifications)
+        self.assertEqual(4, notifier.fanout_casts)
+
+    def test_send_coalesced_fanouts_other_network_in_between(self):
+        notifier = self._get_notifier(1)
+        add1 = fdb_entries('net1', '1.1.1.1', [PORT1])
+        remove = fdb_entries('net2', '1.1.1.1', [PORT3])
+        add2 = fdb_entries('net1', '1.1.1.1', [PORT2])
+        notifier._send_coalesced_fanouts([
+            (self.context, 'add_fdb_entries', add1),
+            (self.context, 'remove_fdb_entries', remove),
+            (self.context, 'add_fdb_entries', add2)])
+        self.fanout.assert_has_calls([
+            mock.call(self.context, 'add_fdb_entries',
+                      fdb_entries('net1', '1.1.1.1', [PORT1, PORT2])),
+            mock.call(self.context, 'remove_fdb_entries', remove)])
+        self.assertEqual(2, self.fanout.call_count)
+
+    def test_send_coalesced_fanouts_segment_changed(self):
+        notifier = self._get_notifier(1)
+        add1 = fdb_entries('net1', '1.1.1.1', [PORT1])
+        add2 = fdb_entries('net1', '1.1.1.1', [PORT2], segment_id=2)
+        notifier._send_coalesced_fanouts([
+            (self.context, 'add_fdb_entries', add1),
+            (self.context, 'add_fdb_entries', add2)])
+        self.fanout.assert_has_calls([
+            mock.call(self.context, 'add_fdb_entries', add1),
+            mock.call(self.context, 'add_fdb_entries', add2)])
+
+    def test_send_coalesced_fanouts_cast_failure(self):
+        notifier = self._get_notifier(1)
+        self.fanout.side_effect = [Exception, None]
+        remove = fdb_entries('net1', '1.1.1.1', [PORT1])
+        add = fdb_entries('net1', '1.1.1.1', [PORT2])
+        notifier._send_coalesced_fanouts([
+            (self.context, 'remove_fdb_entries', remove),
+            (self.context, 'add_fdb_entries', add)])
+        self.assertEqual(2, self.fanout.call_count)
@@ -531,6 +531,39 @@ class TestOvsNeutronAgent(object):
                                         set(), expected_ports,
                                         expected_ancillary, updated_ports)
 
+    def test_process_port_events_port_reconciliation_no_vlan_check(self):
+        self.agent.port_reconciliation_interval = 60
+        events = {'added': [], 'removed': []}
+        with mock.patch.object(self.agent,
+                               'check_changed_vlans') as check_vlans:
+            port_info = self.agent.process_ports_events(
+                events, {1, 2}, set(), set(),
+                {'added': set(), 'removed': set()},
+                {'added': set(), 'removed': set()}, {2})[0]
+        self.assertFalse(check_vlans.called)
+        self.assertEqual({2}, port_info['updated'])
+
+    def test_process_port_info_port_reconciliation(self):
+        polling_manager = mock.Mock()
+        failed_devices = {'added': set(), 'removed': set()}
+        with mock.patch.object(self.agent, 'scan_ports',
+                               return_value={}) as scan_ports:
+            self.agent.process_port_info(
+                time.time(), polling_manager, False, False, {1}, set(),
+                set(), 0, set(), failed_devices, failed_devices,
+                reconcile=True)
+        scan_ports.assert_called_once_with({1}, False, set())
+        self.assertFalse(polling_manager.get_events.called)
+        self.assertIsNotNone(self.agent.last_port_reconciliation)
+
+    def test_port_reconciliation_needed(self):
+        self.assertFalse(self.agent._port_reconciliation_needed())
+        self.agent.port_reconciliation_interval = 60
+        self.agent.last_port_reconciliation = time.time()
+        self.assertFalse(self.agent._port_reconciliation_needed())
+        self.agent.last_port_reconciliation -= 60
+        self.assertTrue(self.agent._port_reconciliation_needed())
+
     def test_process_port_events_ignores_removed_port_if_never_added(self):
         events = {'added': [],
                   'removed': [{'name': 'port2', 'ofport': 2,
@@ -622,6 +655,7 @@ class TestOvsNeutronAgent(object):
 
     def test_process_port_events_returns_port_changes(self):
         self._test_process_port_events_with_updated_ports(set())
+        self.assertEqual({3: 3}, self.agent.added_port_ofports)
 
     def test_process_port_events_finds_known_updated_ports(self):
         self._test_process_port_events_with_updated_ports({4})
@@ -1670,6 +1704,29 @@ class TestOvsNeutronAgent(object):
             ]
             tun_br.assert_has_calls(expected_calls)
 
+    def test_fdb_add_flows_two_networks(self):
+        self._prepare_l2_pop_ofports()
+        fdb_entry = {'net1':
+                     {'network_type': 'gre',
+                      'segment_id': 'tun1',
+                      'ports':
+                      {'2.2.2.2':
+                       [l2pop_rpc.PortInfo(FAKE_MAC, FAKE_IP1)]}},
+                     'net2':
+                     {'network_type': 'gre',
+                      'segment_id': 'tun2',
+                      'ports':
+                      {'1.1.1.1':
+                       [l2pop_rpc.PortInfo(FAKE_MAC, FAKE_IP2)]}}}
+
+        with mock.patch.object(self.agent, 'tun_br', autospec=True) as tun_br:
+            self.agent.fdb_add(None, fdb_entry)
+            tun_br.deferred.assert_called_once_with()
+            deferred_br = tun_br.deferred().__enter__()
+            deferred_br.install_unicast_to_tun.assert_has_calls([
+                mock.call('vlan1', 'seg1', '2', FAKE_MAC),
+                mock.call('vlan2', 'seg2', '1', FAKE_MAC)], any_order=True)
+
     def test_fdb_del_flows(self):
         self._prepare_l2_pop_ofports()
         fdb_entry = {'net2':
@@ -2292,6 +2349,27 @@ class TestOvsNeutronAgent(object):
             self.agent.int_br.delete_arp_spoofing_protection.called)
         self.assertEqual([], ofport_changed_ports)
 
+    def test_update_stale_ofport_rules_from_port_info(self):
+        self.agent.prevent_arp_spoofing = True
+        self.agent.vifname_to_ofport_map = {'port1': 1, 'port2': 2}
+        self.agent.added_port_ofports = {'port3': 3, 'port4': -1}
+        self.agent.int_br = mock.Mock()
+        port_info = {'current': {'port2', 'port3'},
+                     'added': {'port3', 'port4'},
+                     'removed': {'port1'}}
+        ofport_changed_ports = self.agent.update_stale_ofport_rules(
+            port_info)
+        self.assertFalse(self.agent.int_br.get_vif_port_to_ofport_map.called)
+        self.assertFalse(self.agent.int_br.get_vifs_by_ids.called)
+        self.assertEqual(
+            [mock.call(port=1)],
+            self.agent.int_br.delete_arp_spoofing_protection.mock_calls)
+        self.assertEqual([mock.call(in_port=1)],
+                         self.agent.int_br.uninstall_flows.mock_calls)
+        self.assertEqual({'port2': 2, 'port3': 3},
+                         self.agent.vifname_to_ofport_map)
+        self.assertEqual([], ofport_changed_ports)
+
     def test__setup_tunnel_port_while_new_mapping_is_added(self):
         """Test setup_tunnel_port while adding a new mapping
 
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Measure the port events of a network the dnsmasq DHCP driver sustains.
+
+A network with a number of ports is served by the dnsmasq driver, writing its
+config files to a temporary directory, against a fake dnsmasq process. A
+stream of port updates is then processed, half of them only bumping the
+revision of the port (as a status update does) and half of them also
+changing its MAC address, either:
+
+* full: building the host entries of all the ports, rewriting the config
+  files and signaling dnsmasq for every event, as when
+  [DEFAULT]/dnsmasq_incremental_reload is disabled.
+* incremental: only building the host entries of the updated port, and only
+  rewriting the config files and signaling dnsmasq when they changed, with
+  [DEFAULT]/dnsmasq_incremental_reload enabled.
+* coalesced: as incremental, reloading once per burst of events, as the
+  agent does with [DEFAULT]/port_events_coalesce_interval set.
+
+The events per second, and the config files written and the HUP signals sent
+per event are reported.
+
+Run like:
+
+    python tools/benchmarks/dhcp_reload.py --ports 100 1000 5000
+"""
+
+from __future__ import print_function
+
+import argparse
+import collections
+import shutil
+import tempfile
+import time
+
+import mock
+from oslo_config import cfg
+
+from neutron.agent import dhcp_agent
+from neutron.agent.linux import dhcp
+
+NETWORK_ID = 'cccccccc-cccc-cccc-cccc-cccccccccccc'
+SUBNET_ID = 'dddddddd-dddd-dddd-dddd-dddddddddddd'
+
+
+class FakeDnsmasq(object):
+    """Counts the reloads of dnsmasq and the config files written."""
+
+    def __init__(self):
+        self.calls = collections.Counter()
+
+    def replace_file(self, filename, contents, *args, **kwargs):
+        self.calls['writes'] += 1
+        with open(filename, 'w') as f:
+            f.write(contents)
+
+    def enable(self, cmd_callback=None, reload_cfg=False):
+        if reload_cfg:
+            self.calls['HUP'] += 1
+
+    def start(self):
+        mock.patch('neutron.agent.linux.dhcp.DeviceManager').start()
+        process_manager = mock.patch(
+            'neutron.agent.linux.external_process.ProcessManager').start()
+        process_manager.return_value.enable.side_effect = self.enable
+        mock.patch('neutron_lib.utils.file.replace_file',
+                   side_effect=self.replace_file).start()
+
+    def stop(self):
+        mock.patch.stopall()
+
+
+def mac_address(port, generation):
+    return 'fa:16:%02x:%02x:%02x:%02x' % (
+        generation & 0xff, port >> 16 & 0xff, port >> 8 & 0xff, port & 0xff)
+
+
+def make_port(port):
+    return dhcp.DictModel({
+        'id': 'port-%d' % port,
+        'network_id': NETWORK_ID,
+        'device_owner': 'compute:nova',
+        'mac_address': mac_address(port, 0),
+        'extra_dhcp_opts': [],
+        'revision_number': 1,
+        'fixed_ips': [{'subnet_id': SUBNET_ID,
+                       'ip_address': '10.%d.%d.%d' % (
+                           port >> 16 & 0xff, port >> 8 & 0xff,
+                           port & 0xff)}]})
+
+
+def make_network(ports):
+    return dhcp.NetModel({
+        'id': NETWORK_ID,
+        'subnets': [{'id': SUBNET_ID,
+                     'network_id': NETWORK_ID,
+                     'ip_version': 4,
+                     'cidr': '10.0.0.0/8',
+                     'gateway_ip': '10.0.0.1',
+                     'enable_dhcp': True,
+                     'dns_nameservers': [],
+                     'host_routes': []}],
+        'ports': [make_port(port + 2) for port in range(ports)]})
+
+
+def run(mode, ports, events, burst):
+    cfg.CONF.set_override('dnsmasq_incremental_reload', mode != 'full')
+    if mode != 'coalesced':
+        burst = 1
+    fake = FakeDnsmasq()
+    fake.start()
+    try:
+        network = make_network(ports)
+        driver = dhcp.Dnsmasq(cfg.CONF, network, mock.Mock())
+        driver.interface_name = 'tap0'
+        driver.reload_allocations()
+
+        fake.calls.clear()
+        start = time.time()
+        for event in range(events):
+            port = network.ports[event % ports]
+            port.revision_number += 1
+            if event % 2:
+                port.mac_address = mac_address(event % ports + 2,
+                                               port.revision_number)
+            if (event + 1) % burst == 0 or event + 1 == events:
+                # A new driver is created by the agent for each reload.
+                dhcp.Dnsmasq(cfg.CONF, network,
+                             mock.Mock()).reload_allocations()
+        elapsed = time.time() - start
+    finally:
+        fake.stop()
+        dhcp.Dnsmasq._NETWORK_HOSTS.clear()
+        cfg.CONF.clear_override('dnsmasq_incremental_reload')
+    events = float(events)
+    return (events / elapsed, fake.calls['writes'] / events,
+            fake.calls['HUP'] / events)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--ports', type=int, nargs='+',
+                        default=[100, 1000, 5000],
+                        help='Numbers of ports of the network to benchmark')
+    parser.add_argument('--events', type=int, default=100,
+                        help='Number of port events for each measure')
+    parser.add_argument('--burst', type=int, default=20,
+                        help='Number of port events coalesced into a reload')
+    args = parser.parse_args()
+    dhcp_agent.register_options(cfg.CONF)
+    cfg.CONF([], project='neutron')
+    confs_dir = tempfile.mkdtemp()
+    cfg.CONF.set_override('dhcp_confs', confs_dir)
+
+    print('%6s %12s %12s %14s %10s' % ('ports', 'mode', 'events/s',
+                                       'writes/event', 'HUP/event'))
+    try:
+        for ports in args.ports:
+            for mode in ('full', 'incremental', 'coalesced'):
+                rate, writes, hups = run(mode, ports, args.events, args.burst)
+                print('%6d %12s %12.1f %14.2f %10.2f' % (
+                    ports, mode, rate, writes, hups))
+    finally:
+        shutil.rmtree(confs_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Count the privileged calls and netlink sessions used to wire a router.
+
+The internal ports of a router are wired in its namespace, each of them
+getting an address, its MTU, its link set up and the ARP entries of the
+other ports of its subnet, as the L3 agent does for a DVR router, against
+fake netlink sessions, either:
+
+* per-call: running each operation with its own privileged call, as
+  IPDevice.addr, IPDevice.link and IPDevice.neigh do.
+* batch: accumulating the operations of the router in an IpOperationsBatch
+  run by a single privileged call.
+
+The privileged calls, the netlink sessions opened in the namespace and the
+time, including a simulated cost of each privileged call and of each
+session opened, are reported per router.
+
+Run like:
+
+    python tools/benchmarks/ip_lib_batch.py --ports 10 50 --arp 20
+"""
+
+from __future__ import print_function
+
+import argparse
+import collections
+import time
+
+import mock
+import pyroute2
+
+from neutron.agent.linux import ip_lib
+from neutron import privileged
+from neutron.privileged.agent.linux import ip_lib as priv_lib
+
+NAMESPACE = 'qrouter-cccccccc-cccc-cccc-cccc-cccccccccccc'
+PRIVILEGED_CALLS = ('add_ip_address', 'set_link_attribute',
+                    'add_neigh_entry', 'execute_batch')
+
+
+class FakeNetlink(object):
+    """Counts the privileged calls and the netlink sessions opened."""
+
+    def __init__(self, call_cost, session_cost):
+        self.calls = collections.Counter()
+        self.call_cost = call_cost
+        self.session_cost = session_cost
+
+    def netns(self, namespace, flags=0):
+        self.calls['sessions'] += 1
+        time.sleep(self.session_cost)
+        session = mock.MagicMock()
+        session.__enter__.return_value.link_lookup.return_value = [2]
+        return session
+
+    def privileged(self, func):
+        def call(*args, **kwargs):
+            self.calls['privileged'] += 1
+            time.sleep(self.call_cost)
+            return func(*args, **kwargs)
+        return call
+
+    def start(self):
+        privileged.default.set_client_mode(False)
+        mock.patch.object(pyroute2, 'NetNS', side_effect=self.netns).start()
+        for name in PRIVILEGED_CALLS:
+            mock.patch.object(
+                priv_lib, name,
+                side_effect=self.privileged(getattr(priv_lib, name))).start()
+
+    def stop(self):
+        mock.patch.stopall()
+        privileged.default.set_client_mode(True)
+
+
+def router_ports(ports, arp):
+    for port in range(ports):
+        neighbours = [('10.%d.0.%d' % (port, neighbour + 10),
+                       'fa:16:3e:%02x:00:%02x' % (port, neighbour))
+                      for neighbour in range(arp)]
+        yield 'qr-%d' % port, '10.%d.0.1/24' % port, neighbours
+
+
+def wire_per_call(ports, arp):
+    for name, cidr, neighbours in router_ports(ports, arp):
+        device = ip_lib.IPDevice(name, namespace=NAMESPACE)
+        device.addr.add(cidr)
+        device.link.set_mtu(1450)
+        device.link.set_up()
+        for ip_address, mac_address in neighbours:
+            device.neigh.add(ip_address, mac_address)
+
+
+def wire_batch(ports, arp):
+    with ip_lib.IPWrapper(namespace=NAMESPACE).batch() as batch:
+        for name, cidr, neighbours in router_ports(ports, arp):
+            batch.add_ip_address(cidr, name)
+            batch.set_link_mtu(1450, name)
+            batch.set_link_up(name)
+            for ip_address, mac_address in neighbours:
+                batch.add_neigh_entry(ip_address, mac_address, name)
+
+
+def run(mode, routers, ports, arp, call_cost, session_cost):
+    fake = FakeNetlink(call_cost, session_cost)
+    fake.start()
+    try:
+        wire = wire_batch if mode == 'batch' else wire_per_call
+        start = time.time()
+        for router in range(routers):
+            wire(ports, arp)
+        elapsed = time.time() - start
+    finally:
+        fake.stop()
+    routers = float(routers)
+    return (fake.calls['privileged'] / routers,
+            fake.calls['sessions'] / routers, elapsed / routers * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--ports', type=int, nargs='+', default=[10, 50],
+                        help='Numbers of internal ports per router')
+    parser.add_argument('--arp', type=int, default=20,
+                        help='Number of ARP entries per port')
+    parser.add_argument('--routers', type=int, default=5,
+                        help='Number of routers wired for each measure')
+    parser.add_argument('--call-cost', type=float, default=0.0002,
+                        help='Seconds of a privsep daemon round-trip')
+    parser.add_argument('--session-cost', type=float, default=0.002,
+                        help='Seconds to open a netlink session in a '
+                             'namespace')
+    args = parser.parse_args()
+
+    print('%6s %6s %10s %12s %10s %12s' % ('ports', 'arp', 'mode',
+                                           'privileged', 'sessions',
+                                           'time (ms)'))
+    for ports in args.ports:
+        for mode in ('per-call', 'batch'):
+            calls, sessions, elapsed = run(mode, args.routers, ports,
+                                           args.arp, args.call_cost,
+                                           args.session_cost)
+            print('%6d %6d %10s %12.1f %10.1f %12.1f' % (
+                ports, args.arp, mode, calls, sessions, elapsed))
+
+
+if __name__ == '__main__':
+    main()
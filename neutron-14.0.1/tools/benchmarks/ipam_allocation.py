@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Measure the allocation of addresses by the neutron DB IPAM driver.
+
+All the addresses of an IPv4 subnet are allocated one by one, in a SQLite
+memory database, either:
+
+* ipset: computing the free addresses from all the allocations of the
+  subnet on every allocation, as when [DEFAULT]/ipam_free_range_index is
+  disabled.
+* index: taking the addresses from the free ranges of the subnet, with
+  [DEFAULT]/ipam_free_range_index enabled.
+
+The time per allocation is reported for each quarter of the subnet being
+filled.
+
+Run like:
+
+    python tools/benchmarks/ipam_allocation.py --prefixlen 24 22 20
+"""
+
+from __future__ import print_function
+
+import argparse
+import time
+
+import netaddr
+from neutron_lib import context
+from neutron_lib.db import api as db_api
+from oslo_config import cfg
+from oslo_utils import uuidutils
+
+from neutron.ipam.drivers.neutrondb_ipam import driver
+from neutron.ipam import requests as ipam_req
+from neutron.tests.unit import testlib_api
+
+
+def run(mode, prefixlen):
+    cfg.CONF.set_override('ipam_free_range_index', mode == 'index')
+    cidr = netaddr.IPNetwork('10.0.0.0/%d' % prefixlen)
+    pool = netaddr.IPRange(cidr[2], cidr[-2])
+    times = []
+    with testlib_api.StaticSqlFixture():
+        ctx = context.get_admin_context()
+        subnet_request = ipam_req.SpecificSubnetRequest(
+            uuidutils.generate_uuid(), uuidutils.generate_uuid(), cidr,
+            gateway_ip=cidr[1], allocation_pools=[pool])
+        with db_api.CONTEXT_WRITER.using(ctx):
+            ipam_subnet = driver.NeutronDbSubnet.create_from_subnet_request(
+                subnet_request, ctx)
+        for quarter in range(4):
+            count = (pool.size * (quarter + 1) // 4 -
+                     pool.size * quarter // 4)
+            start = time.time()
+            for i in range(count):
+                with db_api.CONTEXT_WRITER.using(ctx):
+                    ipam_subnet.allocate(ipam_req.AnyAddressRequest())
+            times.append((time.time() - start) / count * 1000)
+    cfg.CONF.clear_override('ipam_free_range_index')
+    return pool.size, times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--prefixlen', type=int, nargs='+',
+                        default=[24, 22, 20],
+                        help='Prefix lengths of the subnets to benchmark')
+    args = parser.parse_args()
+    cfg.CONF([], project='neutron')
+
+    print('%10s %8s %10s %10s %10s %10s' % ('addresses', 'mode', '0-25%',
+                                            '25-50%', '50-75%', '75-100%'))
+    for prefixlen in args.prefixlen:
+        for mode in ('ipset', 'index'):
+            size, times = run(mode, prefixlen)
+            print('%10d %8s %10.2f %10.2f %10.2f %10.2f' % (
+                (size, mode) + tuple(times)))
+    print('(time per allocation in ms)')
+
+
+if __name__ == '__main__':
+    main()
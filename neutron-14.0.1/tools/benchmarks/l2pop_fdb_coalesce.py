@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Count the fanout messages sent by L2 population when many ports come up.
+
+A number of ports of the same network come up on a number of hosts, and the
+FDB entries of each of them are notified to all the L2 agents as the L2
+population mechanism driver does, the ports of a few networks going down
+meanwhile, either:
+
+* per-port: casting one message per port event, as when
+  [l2pop]/fdb_coalesce_interval is 0.
+* coalesced: merging the notifications queued during an interval into one
+  message per method and network, with [l2pop]/fdb_coalesce_interval set.
+
+The fanout casts, the casts saved and the FDB entries per cast are reported.
+
+Run like:
+
+    python tools/benchmarks/l2pop_fdb_coalesce.py --ports 100 500 --hosts 10
+"""
+
+from __future__ import print_function
+
+import argparse
+
+import mock
+from neutron_lib import constants as n_const
+from oslo_config import cfg
+
+from neutron.plugins.ml2.drivers.l2pop import rpc as l2pop_rpc
+
+NETWORK_ID = 'cccccccc-cccc-cccc-cccc-cccccccccccc'
+
+
+def port_info(port):
+    return l2pop_rpc.PortInfo(
+        'fa:16:3e:%02x:%02x:%02x' % (port >> 16 & 0xff, port >> 8 & 0xff,
+                                     port & 0xff),
+        '10.%d.%d.%d' % (port >> 16 & 0xff, port >> 8 & 0xff, port & 0xff))
+
+
+def fdb_entries(network_id, agent_ip, ports):
+    return {network_id: {'segment_id': 1001,
+                         'network_type': 'vxlan',
+                         'ports': {agent_ip: ports}}}
+
+
+def notifications(ports, hosts, down_every):
+    for port in range(ports):
+        agent_ip = '192.168.0.%d' % (port % hosts + 1)
+        entries = [port_info(port)]
+        if port < hosts:
+            # The first port of each host also adds its flooding entry
+            entries.insert(0, n_const.FLOODING_ENTRY)
+        yield 'add_fdb_entries', fdb_entries(NETWORK_ID, agent_ip, entries)
+        if down_every and port % down_every == down_every - 1:
+            yield 'remove_fdb_entries', fdb_entries(
+                'network-%d' % port, agent_ip, [port_info(port)])
+
+
+def run(mode, ports, hosts, burst, down_every):
+    cfg.CONF.set_override('fdb_coalesce_interval',
+                          1 if mode == 'coalesced' else 0, 'l2pop')
+    with mock.patch('neutron_lib.rpc.get_client'):
+        notifier = l2pop_rpc.L2populationAgentNotifyAPI()
+    casts = []
+    notifier._notification_fanout = (
+        lambda context, method, fdb_entries: casts.append(fdb_entries))
+    context = mock.Mock()
+    pending = []
+    for method, entries in notifications(ports, hosts, down_every):
+        if mode == 'coalesced':
+            # Flush as the batch notifier does once per interval
+            pending.append((context, method, entries))
+            if len(pending) == burst:
+                notifier._send_coalesced_fanouts(pending)
+                pending = []
+        else:
+            getattr(notifier, method)(context, entries)
+    if pending:
+        notifier._send_coalesced_fanouts(pending)
+    cfg.CONF.clear_override('fdb_coalesce_interval', 'l2pop')
+    entries = sum(len(ports)
+                  for fdb in casts
+                  for values in fdb.values()
+                  for ports in values['ports'].values())
+    saved = notifier.fanout_notifications - notifier.fanout_casts
+    return len(casts), saved, float(entries) / len(casts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--ports', type=int, nargs='+', default=[100, 500],
+                        help='Numbers of ports coming up to benchmark')
+    parser.add_argument('--hosts', type=int, default=10,
+                        help='Number of hosts the ports are bound to')
+    parser.add_argument('--burst', type=int, default=100,
+                        help='Number of notifications queued per interval')
+    parser.add_argument('--down-every', type=int, default=50,
+                        help='Number of ports up per port of another '
+                             'network going down, 0 for none')
+    args = parser.parse_args()
+    cfg.CONF([], project='neutron')
+
+    print('%6s %6s %10s %8s %8s %14s' % ('ports', 'hosts', 'mode', 'casts',
+                                         'saved', 'entries/cast'))
+    for ports in args.ports:
+        for mode in ('per-port', 'coalesced'):
+            casts, saved, entries = run(mode, ports, args.hosts, args.burst,
+                                        args.down_every)
+            print('%6d %6d %10s %8d %8d %14.1f' % (
+                ports, args.hosts, mode, casts, saved, entries))
+
+
+if __name__ == '__main__':
+    main()
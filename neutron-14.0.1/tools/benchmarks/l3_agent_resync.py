@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Count the operations run by the L3 agent to set up its routers on restart.
+
+A number of legacy routers, each with some internal ports, are initialized
+and processed as the L3 agent does when they are added, against fake
+namespaces whose devices are already configured for the ports, either:
+
+* full: configuring every router from scratch, as when
+  [DEFAULT]/resync_from_kernel_state is disabled.
+* resync: reading the devices of each namespace with one netlink dump and
+  only configuring the ports which do not match their device, with
+  [DEFAULT]/resync_from_kernel_state enabled.
+
+The commands run in the namespaces, the ports plugged, the gratuitous ARPs
+sent, the iptables-restore runs and the time are reported per router.
+
+Run like:
+
+    python tools/benchmarks/l3_agent_resync.py --routers 10 100 --ports 10
+"""
+
+from __future__ import print_function
+
+import argparse
+import collections
+import time
+
+import mock
+from neutron_lib import constants as lib_constants
+from oslo_config import cfg
+
+from neutron.agent.l3 import legacy_router
+from neutron.common import utils as common_utils
+from neutron.conf.agent import common as agent_config
+from neutron.conf.agent.l3 import config as l3_config
+from neutron.tests.common import l3_test_common
+
+
+class FakeKernel(object):
+    """Counts the operations run to configure the routers."""
+
+    def __init__(self):
+        self.calls = collections.Counter()
+        self.devices = {}
+
+    def execute(self, cmd, *args, **kwargs):
+        if any(arg.startswith('iptables-restore') for arg in cmd):
+            self.calls['iptables-restore'] += 1
+        return ''
+
+    def get_devices_info_with_ip(self, namespace):
+        self.calls['netlink dumps'] += 1
+        return self.devices.get(namespace, [])
+
+    def start(self):
+        ip_wrapper = mock.patch(
+            'neutron.agent.linux.ip_lib.IPWrapper').start()
+        self.netns_execute = (
+            ip_wrapper.return_value.ensure_namespace.return_value.
+            netns.execute)
+        self.garp = mock.patch(
+            'neutron.agent.linux.ip_lib.send_ip_addr_adv_notif').start()
+        mock.patch('neutron.agent.linux.ip_lib.IPDevice').start()
+        mock.patch('neutron.agent.linux.ip_lib.device_exists',
+                   return_value=True).start()
+        mock.patch('neutron.agent.linux.ip_lib.get_devices_info_with_ip',
+                   side_effect=self.get_devices_info_with_ip).start()
+        mock.patch('neutron.agent.linux.ra.DaemonMonitor').start()
+        mock.patch('neutron.agent.linux.utils.execute',
+                   side_effect=self.execute).start()
+
+    def stop(self):
+        mock.patch.stopall()
+
+
+def make_conf():
+    conf = agent_config.setup_conf()
+    l3_config.register_l3_agent_config_opts(l3_config.OPTS, conf)
+    agent_config.register_interface_opts(conf)
+    agent_config.register_process_monitor_opts(conf)
+    agent_config.register_external_process_opts(conf)
+    agent_config.register_ra_opts(conf)
+    return conf
+
+
+def kernel_devices(ri):
+    """Return the devices already configured for the router ports."""
+    return [{'name': ri.get_internal_device_name(port['id']),
+             'mac': port['mac_address'],
+             'mtu': port['mtu'],
+             'ip_addresses': [
+                 {'cidr': cidr, 'scope': 'global'}
+                 for cidr in common_utils.fixed_ip_cidrs(port['fixed_ips'])]}
+            for port in ri.router[lib_constants.INTERFACE_KEY]]
+
+
+def run(mode, routers, ports):
+    kernel = FakeKernel()
+    kernel.start()
+    try:
+        conf = make_conf()
+        driver = mock.Mock()
+        ris = []
+        for i in range(routers):
+            router = l3_test_common.prepare_router_data(
+                enable_gw=False, num_internal_ports=ports)
+            ri = legacy_router.LegacyRouter(
+                mock.Mock(), router['id'], router, agent_conf=conf,
+                interface_driver=driver, use_ipv6=False)
+            kernel.devices[ri.ns_name] = kernel_devices(ri)
+            ris.append(ri)
+
+        start = time.time()
+        for ri in ris:
+            ri.initialize(mock.Mock())
+            if mode == 'resync':
+                with ri.resync_from_kernel_state():
+                    ri.process()
+            else:
+                ri.process()
+        elapsed = time.time() - start
+    finally:
+        kernel.stop()
+    routers = float(routers)
+    return (kernel.netns_execute.call_count / routers,
+            kernel.calls['netlink dumps'] / routers,
+            driver.plug.call_count / routers,
+            kernel.garp.call_count / routers,
+            kernel.calls['iptables-restore'] / routers,
+            elapsed / routers * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--routers', type=int, nargs='+', default=[10, 100],
+                        help='Numbers of routers to benchmark')
+    parser.add_argument('--ports', type=int, default=10,
+                        help='Number of internal ports per router')
+    args = parser.parse_args()
+    cfg.CONF([], project='neutron')
+
+    print('%8s %6s %8s %10s %14s %8s %8s %18s %12s' % (
+        'routers', 'ports', 'mode', 'netns cmds', 'netlink dumps', 'plugs',
+        'garps', 'iptables-restore', 'time (ms)'))
+    for routers in args.routers:
+        for mode in ('full', 'resync'):
+            cmds, dumps, plugs, garps, restores, elapsed = run(
+                mode, routers, args.ports)
+            print('%8d %6d %8s %10.1f %14.1f %8.1f %8.1f %18.1f %12.2f' % (
+                routers, args.ports, mode, cmds, dumps, plugs, garps,
+                restores, elapsed))
+
+
+if __name__ == '__main__':
+    main()
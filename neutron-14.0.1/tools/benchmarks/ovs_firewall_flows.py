@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Measure the flows sent by the openvswitch firewall to update its ports.
+
+A number of ports on the same network share a security group with a number
+of rules, one of them allowing the members of another security group. A rule
+is then added to the security group and all the ports are updated, as the
+agent does when the rules of a security group change, either:
+
+* replace: installing all the flows of each port again and deleting the
+  previous ones, as when [SECURITYGROUP]/incremental_port_flows is
+  disabled.
+* incremental: only adding and deleting the flows of each port which
+  changed, with [SECURITYGROUP]/incremental_port_flows enabled.
+
+The flows added, the flow deletions, the ovs-ofctl runs and the time are
+reported for the update of all the ports.
+
+Run like:
+
+    python tools/benchmarks/ovs_firewall_flows.py --ports 100 --rules 200
+"""
+
+from __future__ import print_function
+
+import argparse
+import collections
+import time
+
+from neutron_lib import constants
+from oslo_config import cfg
+
+from neutron.agent.common import ovs_lib
+from neutron.agent.linux.openvswitch_firewall import firewall
+
+
+class FakeBridge(object):
+    """Counts the flows sent to the integration bridge."""
+
+    br_name = 'br-int'
+
+    def __init__(self, ports):
+        self.calls = collections.Counter()
+        self.vif_ports = dict(
+            ('port-%d' % port, ovs_lib.VifPort(
+                'tap%d' % port, port + 1, 'port-%d' % port,
+                'fa:16:3e:%02x:%02x:%02x' % (
+                    port >> 16 & 0xff, port >> 8 & 0xff, port & 0xff),
+                self))
+            for port in range(ports))
+
+    def add_protocols(self, *protocols):
+        pass
+
+    def deferred(self, **kwargs):
+        return ovs_lib.DeferredOVSBridge(self, **kwargs)
+
+    def do_action_flows(self, action, kwargs_list, use_bundle=False):
+        self.calls['ovs-ofctl'] += 1
+        self.calls[action] += len(kwargs_list)
+
+    def add_flow(self, **kwargs):
+        self.do_action_flows('add', [kwargs])
+
+    def delete_flows(self, **kwargs):
+        self.do_action_flows('del', [kwargs])
+
+    def get_vif_port_by_id(self, port_id):
+        return self.vif_ports.get(port_id)
+
+    def get_port_name_list(self):
+        return []
+
+    def db_get_val(self, table, record, column, **kwargs):
+        return {'tag': 1}
+
+    def request_cookie(self):
+        return 1
+
+    def unset_cookie(self, cookie):
+        pass
+
+
+def make_rules(count):
+    rules = [{'ethertype': constants.IPv4,
+              'direction': constants.INGRESS_DIRECTION,
+              'remote_group_id': 'remote-sg'}]
+    for rule in range(count - 1):
+        rules.append({'ethertype': constants.IPv4,
+                      'protocol': constants.PROTO_NAME_TCP,
+                      'direction': constants.INGRESS_DIRECTION,
+                      'port_range_min': 1000 + rule,
+                      'port_range_max': 1000 + rule})
+    return rules
+
+
+def run(mode, ports, rules):
+    cfg.CONF.set_override('incremental_port_flows', mode == 'incremental',
+                          'SECURITYGROUP')
+    bridge = FakeBridge(ports)
+    driver = firewall.OVSFirewallDriver(bridge)
+    sg_rules = make_rules(rules)
+    driver.update_security_group_rules('sg', sg_rules)
+    driver.update_security_group_members(
+        'remote-sg', {constants.IPv4: ['10.1.0.%d' % (member + 1)
+                                       for member in range(10)]})
+    port_dicts = [{'device': 'port-%d' % port,
+                   'security_groups': ['sg'],
+                   'fixed_ips': ['10.0.%d.%d' % (port // 250,
+                                                 port % 250 + 1)]}
+                  for port in range(ports)]
+    with driver.defer_apply():
+        for port_dict in port_dicts:
+            driver.prepare_port_filter(port_dict)
+
+    bridge.calls.clear()
+    sg_rules.append({'ethertype': constants.IPv4,
+                     'protocol': constants.PROTO_NAME_UDP,
+                     'direction': constants.INGRESS_DIRECTION,
+                     'port_range_min': 53,
+                     'port_range_max': 53})
+    driver.update_security_group_rules('sg', sg_rules)
+    start = time.time()
+    with driver.defer_apply():
+        for port_dict in port_dicts:
+            driver.update_port_filter(port_dict)
+    elapsed = time.time() - start
+    cfg.CONF.clear_override('incremental_port_flows', 'SECURITYGROUP')
+    return (bridge.calls['add'], bridge.calls['del'],
+            bridge.calls['ovs-ofctl'], elapsed * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--ports', type=int, nargs='+', default=[100],
+                        help='Numbers of ports to benchmark')
+    parser.add_argument('--rules', type=int, default=200,
+                        help='Number of rules of the security group')
+    args = parser.parse_args()
+    cfg.CONF([], project='neutron')
+
+    print('%6s %6s %12s %12s %12s %10s %12s' % ('ports', 'rules', 'mode',
+                                                'flows added',
+                                                'deletions', 'ofctl runs',
+                                                'time (ms)'))
+    for ports in args.ports:
+        for mode in ('replace', 'incremental'):
+            added, deleted, runs, elapsed = run(mode, ports, args.rules)
+            print('%6d %6d %12s %12d %12d %10d %12.1f' % (
+                ports, args.rules, mode, added, deleted, runs, elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -22,6 +22,7 @@ import posixpath
 from oslo_log import log as logging
 from oslo_serialization import base64
 from oslo_serialization import jsonutils
+from oslo_utils import encodeutils
 from oslo_utils import timeutils
 import six
 
@@ -541,23 +542,11 @@ class InstanceMetadata(object):
                            CONF.dhcp_domain)
 
     def lookup(self, path):
-        if path == "" or path[0] != "/":
-            path = posixpath.normpath("/" + path)
-        else:
-            path = posixpath.normpath(path)
-
         # Set default mimeType. It will be modified only if there is a change
         self.set_mimetype(MIME_TYPE_TEXT_PLAIN)
 
-        # fix up requests, prepending /ec2 to anything that does not match
-        path_tokens = path.split('/')[1:]
-        if path_tokens[0] not in ("ec2", "openstack"):
-            if path_tokens[0] == "":
-                # request for /
-                path_tokens = ["ec2"]
-            else:
-                path_tokens = ["ec2"] + path_tokens
-            path = "/" + "/".join(path_tokens)
+        path_tokens = _path_tokens(path)
+        path = "/" + "/".join(path_tokens)
 
         # all values of 'path' input starts with '/' and have no trailing /
 
@@ -633,6 +622,82 @@ class InstanceMetadata(object):
             yield ('%s/%s/%s' % ("openstack", CONTENT_DIR, cid), content)
 
 
+class RenderedMetadata(object):
+    """Instance metadata with the responses to its paths rendered at once.
+
+    Every metadata path which does not return a callable is rendered when
+    the object is created, so that cached metadata is served without being
+    rendered again on each request. The other paths are looked up in the
+    instance metadata. The random seed of meta_data.json is not cached, a
+    new one is generated for each response.
+    """
+
+    def __init__(self, meta_data):
+        self.meta_data = meta_data
+        self.instance = meta_data.instance
+        self.uuid = meta_data.uuid
+        self.address = meta_data.address
+        self.responses = {}
+        self.seeded_metadata = {}
+
+        self._add_response(['ec2'], meta_data.lookup('/ec2'))
+        for version in VERSIONS + ['latest']:
+            self._add_ec2_responses(['ec2', version],
+                                    meta_data.get_ec2_metadata(version))
+
+        self._add_response(['openstack'], meta_data.lookup('/openstack'))
+        # The paths other than meta_data.json do not depend on the version,
+        # and some of them call external services, so render them once.
+        shared = {}
+        for version in OPENSTACK_VERSIONS + ['latest']:
+            names = meta_data.lookup('/openstack/%s' % version)
+            self._add_response(['openstack', version], names)
+            for name in names:
+                path_tokens = ['openstack', version, name]
+                if name in shared:
+                    self.responses['/'.join(path_tokens)] = shared[name]
+                    continue
+                try:
+                    data = meta_data.lookup('/'.join(path_tokens))
+                except InvalidMetadataPath:
+                    continue
+                if callable(data):
+                    continue
+                if name == MD_JSON_NAME:
+                    metadata = jsonutils.loads(data)
+                    if metadata.pop('random_seed', None) is not None:
+                        self.seeded_metadata['/'.join(path_tokens)] = metadata
+                        continue
+                response = self._add_response(path_tokens, data,
+                                              meta_data.get_mimetype())
+                if name != MD_JSON_NAME:
+                    shared[name] = response
+
+    def _add_response(self, path_tokens, data,
+                      mimetype=MIME_TYPE_TEXT_PLAIN):
+        response = (encodeutils.to_utf8(ec2_md_print(data)), mimetype)
+        self.responses['/'.join(path_tokens)] = response
+        return response
+
+    def _add_ec2_responses(self, path_tokens, data):
+        self._add_response(path_tokens, data)
+        if isinstance(data, dict):
+            for key, value in data.items():
+                if key != '_name':
+                    self._add_ec2_responses(path_tokens + [key], value)
+
+    def get_response(self, path):
+        """Return the rendered body and mimetype of a path, or None."""
+        path = '/'.join(_path_tokens(path))
+        metadata = self.seeded_metadata.get(path)
+        if metadata is not None:
+            metadata = dict(metadata,
+                            random_seed=base64.encode_as_text(os.urandom(512)))
+            return (jsonutils.dump_as_bytes(metadata),
+                    MIME_TYPE_APPLICATION_JSON)
+        return self.responses.get(path)
+
+
 class RouteConfiguration(object):
     """Routes metadata paths to request handlers."""
 
@@ -701,6 +766,24 @@ def get_metadata_by_instance_id(instance_id, address, ctxt=None):
         return InstanceMetadata(instance, address)
 
 
+def _path_tokens(path):
+    """Return the tokens of a metadata path, starting with its tree."""
+    if path == "" or path[0] != "/":
+        path = posixpath.normpath("/" + path)
+    else:
+        path = posixpath.normpath(path)
+
+    # fix up requests, prepending /ec2 to anything that does not match
+    path_tokens = path.split('/')[1:]
+    if path_tokens[0] not in ("ec2", "openstack"):
+        if path_tokens[0] == "":
+            # request for /
+            path_tokens = ["ec2"]
+        else:
+            path_tokens = ["ec2"] + path_tokens
+    return path_tokens
+
+
 def _format_instance_mapping(ctxt, instance):
     bdms = objects.BlockDeviceMappingList.get_by_instance_uuid(
             ctxt, instance.uuid)
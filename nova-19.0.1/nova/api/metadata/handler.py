@@ -18,6 +18,7 @@
 import hashlib
 import hmac
 import os
+import time
 
 from oslo_log import log as logging
 from oslo_utils import encodeutils
@@ -34,6 +35,7 @@ import nova.conf
 from nova import context as nova_context
 from nova import exception
 from nova.i18n import _
+from nova import metadata_cache
 from nova.network.neutronv2 import api as neutronapi
 
 CONF = nova.conf.CONF
@@ -52,10 +54,63 @@ class MetadataRequestHandler(wsgi.Application):
                         "the metadata information returned by the proxy "
                         "cannot be trusted")
 
+    def _get_rendered_metadata(self, address, instance_id=None):
+        """Get the rendered metadata of an instance from the metadata cache.
+
+        On a cache miss, the metadata is loaded and rendered, and cached
+        until the instance changes, see [api]/metadata_cache_invalidation.
+        """
+        if instance_id is None:
+            data = metadata_cache.get_by_address(address)
+        else:
+            data = metadata_cache.get_by_instance_id(instance_id)
+        if data is not None:
+            metadata_cache.STATS.hit()
+            return data
+
+        start = time.time()
+        try:
+            if instance_id is None:
+                meta_data = self._get_metadata_by_address(address)
+            else:
+                meta_data = base.get_metadata_by_instance_id(instance_id,
+                                                             address)
+        except exception.NotFound:
+            return None
+        data = base.RenderedMetadata(meta_data)
+        metadata_cache.store(data)
+        metadata_cache.STATS.miss(time.time() - start)
+        LOG.debug('Rendered the metadata of instance %(uuid)s, metadata '
+                  'cache stats: %(stats)s',
+                  {'uuid': data.uuid,
+                   'stats': metadata_cache.STATS.get_stats()})
+        return data
+
+    @staticmethod
+    def _get_metadata_by_address(address):
+        # NOTE: the instance of the address may have been cached by the
+        # compute service which spawned it, or when its metadata was last
+        # rendered, but the address may belong to another instance since.
+        instance_uuid = metadata_cache.get_instance_uuid(address)
+        if instance_uuid is not None:
+            try:
+                meta_data = base.get_metadata_by_instance_id(instance_uuid,
+                                                             address)
+            except exception.NotFound:
+                pass
+            else:
+                ip_info = meta_data.ip_info
+                if address in ip_info['fixed_ips'] + ip_info['fixed_ip6s']:
+                    return meta_data
+        return base.get_metadata_by_address(address)
+
     def get_metadata_by_remote_address(self, address):
         if not address:
             raise exception.FixedIpNotFoundForAddress(address=address)
 
+        if metadata_cache.enabled():
+            return self._get_rendered_metadata(address)
+
         cache_key = 'metadata-%s' % address
         data = self._cache.get(cache_key)
         if data:
@@ -73,6 +128,9 @@ class MetadataRequestHandler(wsgi.Application):
         return data
 
     def get_metadata_by_instance_id(self, instance_id, address):
+        if metadata_cache.enabled():
+            return self._get_rendered_metadata(address, instance_id)
+
         cache_key = 'metadata-%s' % instance_id
         data = self._cache.get(cache_key)
         if data:
@@ -119,6 +177,13 @@ class MetadataRequestHandler(wsgi.Application):
         if meta_data is None:
             raise webob.exc.HTTPNotFound()
 
+        if isinstance(meta_data, base.RenderedMetadata):
+            response = meta_data.get_response(req.path_info)
+            if response is not None:
+                req.response.body, req.response.content_type = response
+                return req.response
+            meta_data = meta_data.meta_data
+
         try:
             data = meta_data.lookup(req.path_info)
         except base.InvalidMetadataPath:
@@ -2323,6 +2323,92 @@ class PlacementCommands(object):
         return return_code
 
 
+class QuotaCommands(object):
+    """Commands for the quota usage counters."""
+
+    @action_description(
+        _("Compares the usage counters of projects and users with the "
+          "instances, cores and ram counted in the cells and reports the "
+          "counters which drifted. Requires the [api_database] section of "
+          "the nova configuration file to be populated."))
+    @args('--project-id', metavar='<project_id>', dest='project_id',
+          help='The project to check. Defaults to all the projects which '
+               'have usage counters.')
+    @args('--fix', action='store_true', dest='fix', default=False,
+          help='Reset the counters which drifted to the counts.')
+    @args('--verbose', action='store_true', dest='verbose', default=False,
+          help='Provide verbose output during execution.')
+    def check_usage_counters(self, project_id=None, fix=False,
+                             verbose=False):
+        """Checks the usage counters against the actual usage
+
+        The usage counters are only used when [quota]/usage_counters is
+        enabled.
+
+        NOTE: The usage of each project and user checked is counted in all
+        the cells in which the project has instances, so this command could
+        cause a non-negligible load on the cell databases and therefore is
+        recommended to be run during maintenance windows.
+
+        Return codes:
+
+        * 0: The counters match the usage
+        * 1: Counters drifted from the usage, and were reset if --fix was
+          specified
+        * 2: The usage of a project could not be counted in all the cells
+        """
+        ctxt = context.get_admin_context()
+        output = lambda msg: None
+        if verbose:
+            output = lambda msg: print(msg)
+        if project_id:
+            project_ids = [project_id]
+        else:
+            project_ids = objects.Quotas.get_usage_counter_project_ids(ctxt)
+
+        field_names = [_('Project ID'), _('User ID'), _('Resource'),
+                       _('Counter'), _('Usage')]
+        t = prettytable.PrettyTable(field_names)
+        drifted = incomplete = False
+        for project_id in project_ids:
+            output(_('Checking project: %s') % project_id)
+            counters = objects.Quotas.get_all_usage_counters(ctxt, project_id)
+            # The counters of the project itself have a None user_id.
+            for user_id in sorted(counters, key=lambda _user: _user or ''):
+                counts, complete = quota._instances_cores_ram_count_in_cells(
+                    ctxt, project_id, user_id=user_id)
+                if not complete:
+                    print(_('Unable to count the usage of project %s in all '
+                            'the cells, skipping it.') % project_id)
+                    incomplete = True
+                    break
+                scope = 'user' if user_id else 'project'
+                mismatches = [
+                    resource for resource in quota.INSTANCE_RESOURCES
+                    if counters[user_id].get(resource) !=
+                    counts[scope][resource]]
+                for resource in mismatches:
+                    counter = counters[user_id].get(resource)
+                    t.add_row([project_id, user_id or '',
+                               resource, '' if counter is None else counter,
+                               counts[scope][resource]])
+                if mismatches:
+                    drifted = True
+                    if fix:
+                        objects.Quotas.reset_usage_counters(
+                            ctxt, project_id, {scope: counts[scope]},
+                            user_id=user_id)
+                        output(_('Reset the usage counters of project '
+                                 '%(project)s and user %(user)s') %
+                               {'project': project_id, 'user': user_id})
+
+        if drifted:
+            print(t)
+        if incomplete:
+            return 2
+        return 1 if drifted else 0
+
+
 CATEGORIES = {
     'api_db': ApiDbCommands,
     'cell': CellCommands,
@@ -2330,7 +2416,8 @@ CATEGORIES = {
     'db': DbCommands,
     'floating': FloatingIpCommands,
     'network': NetworkCommands,
-    'placement': PlacementCommands
+    'placement': PlacementCommands,
+    'quota': QuotaCommands,
 }
 
 
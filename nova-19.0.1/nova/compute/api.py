@@ -62,6 +62,7 @@ from nova import exception_wrapper
 from nova import hooks
 from nova.i18n import _
 from nova import image
+from nova import metadata_cache
 from nova import network
 from nova.network import model as network_model
 from nova.network.security_group import openstack_driver
@@ -76,6 +77,7 @@ from nova.pci import request as pci_request
 from nova.policies import servers as servers_policies
 import nova.policy
 from nova import profiler
+from nova import quota
 from nova import rpc
 from nova.scheduler.client import query
 from nova.scheduler.client import report
@@ -2025,6 +2027,8 @@ class API(base.Base):
                         with compute_utils.notify_about_instance_delete(
                                 self.notifier, context, instance):
                             instance.destroy()
+                        self._update_deleted_usage_counters(
+                            context, instance, instance.vm_state)
                     except exception.InstanceNotFound:
                         pass
                     # The instance was deleted or is already gone.
@@ -2098,6 +2102,8 @@ class API(base.Base):
                             if delete_type != 'soft_delete'
                             else 'delete'):
                         instance.destroy()
+                    self._update_deleted_usage_counters(
+                        context, instance, instance.vm_state)
                     LOG.info('Instance deleted and does not have host '
                              'field, its vm_state is %(state)s.',
                              {'state': instance.vm_state},
@@ -2311,7 +2317,16 @@ class API(base.Base):
         im.queued_for_delete = qfd
         im.save()
 
+    @staticmethod
+    def _update_deleted_usage_counters(context, instance, vm_state):
+        # NOTE: Soft deleted instances are not counted in the cells, see
+        # InstanceList._get_counts_in_db(), so they were already removed
+        # from the usage counters when they were soft deleted.
+        if vm_state != vm_states.SOFT_DELETED:
+            quota.update_instance_usage_counters(context, instance, sign=-1)
+
     def _do_delete(self, context, instance, bdms, local=False):
+        vm_state = instance.vm_state
         if local:
             instance.vm_state = vm_states.DELETED
             instance.task_state = None
@@ -2321,8 +2336,10 @@ class API(base.Base):
             self.compute_rpcapi.terminate_instance(context, instance, bdms,
                                                    delete_type='delete')
         self._update_queued_for_deletion(context, instance, True)
+        self._update_deleted_usage_counters(context, instance, vm_state)
 
     def _do_force_delete(self, context, instance, bdms, local=False):
+        vm_state = instance.vm_state
         if local:
             instance.vm_state = vm_states.DELETED
             instance.task_state = None
@@ -2332,8 +2349,10 @@ class API(base.Base):
             self.compute_rpcapi.terminate_instance(context, instance, bdms,
                                                    delete_type='force_delete')
         self._update_queued_for_deletion(context, instance, True)
+        self._update_deleted_usage_counters(context, instance, vm_state)
 
     def _do_soft_delete(self, context, instance, bdms, local=False):
+        vm_state = instance.vm_state
         if local:
             instance.vm_state = vm_states.SOFT_DELETED
             instance.task_state = None
@@ -2342,6 +2361,9 @@ class API(base.Base):
         else:
             self.compute_rpcapi.soft_delete_instance(context, instance)
         self._update_queued_for_deletion(context, instance, True)
+        # NOTE: The instance is not counted in the cells anymore once it is
+        # soft deleted, nor once it is reclaimed or deleted afterwards.
+        self._update_deleted_usage_counters(context, instance, vm_state)
 
     # NOTE(maoy): we allow delete to be called no matter what vm_state says.
     @check_instance_lock
@@ -2397,6 +2419,7 @@ class API(base.Base):
             instance.deleted_at = None
             instance.save(expected_task_state=[None])
         self._update_queued_for_deletion(context, instance, False)
+        quota.update_instance_usage_counters(context, instance)
 
     @check_instance_lock
     @check_instance_state(task_state=None,
@@ -3576,6 +3599,9 @@ class API(base.Base):
         self.compute_rpcapi.revert_resize(context, instance,
                                           migration,
                                           migration.dest_compute)
+        quota.update_resize_usage_counters(context, instance,
+                                           instance.old_flavor,
+                                           instance.flavor)
 
     @check_instance_lock
     @check_instance_cell
@@ -3766,6 +3792,10 @@ class API(base.Base):
                 flavor=new_instance_type,
                 clean_shutdown=clean_shutdown,
                 request_spec=request_spec)
+        if not same_instance_type:
+            quota.update_resize_usage_counters(context, instance,
+                                               new_instance_type,
+                                               current_instance_type)
 
     @check_instance_lock
     @check_instance_state(vm_state=[vm_states.ACTIVE, vm_states.STOPPED,
@@ -6139,6 +6169,7 @@ class SecurityGroupAPI(base.Base, security_group_base.SecurityGroupBase):
         self.db.instance_add_security_group(context.elevated(),
                                             instance_uuid,
                                             security_group['id'])
+        metadata_cache.invalidate(instance_uuid)
         if instance.host:
             self.compute_rpcapi.refresh_instance_security_rules(
                     context, instance, instance.host)
@@ -6160,6 +6191,7 @@ class SecurityGroupAPI(base.Base, security_group_base.SecurityGroupBase):
         self.db.instance_remove_security_group(context.elevated(),
                                                instance_uuid,
                                                security_group['id'])
+        metadata_cache.invalidate(instance_uuid)
         if instance.host:
             self.compute_rpcapi.refresh_instance_security_rules(
                     context, instance, instance.host)
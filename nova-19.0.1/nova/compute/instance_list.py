@@ -12,6 +12,7 @@
 
 import copy
 
+from nova import cache_utils
 from nova.compute import multi_cell_list
 import nova.conf
 from nova import context
@@ -23,6 +24,11 @@ from nova.objects import instance as instance_obj
 
 CONF = nova.conf.CONF
 
+# Cache of the cell UUIDs in which a project has mapped instances, keyed by
+# project ID. Created on first use when
+# CONF.api.instance_list_per_project_cells_cache_ttl is set.
+_PROJECT_CELLS_CACHE = None
+
 
 class InstanceSortContext(multi_cell_list.RecordSortContext):
     def __init__(self, sort_keys, sort_dirs):
@@ -132,6 +138,44 @@ def get_instance_list_cells_batch_size(limit, cells):
     return max(min(batch_size, limit), 100)
 
 
+def _get_project_cells_cache():
+    global _PROJECT_CELLS_CACHE
+    if _PROJECT_CELLS_CACHE is None:
+        _PROJECT_CELLS_CACHE = cache_utils.get_client(
+            expiration_time=CONF.api.instance_list_per_project_cells_cache_ttl)
+    return _PROJECT_CELLS_CACHE
+
+
+def get_project_cell_mappings(ctx, project_id):
+    """Return the CellMappings in which a project has mapped instances.
+
+    The result is cached for CONF.api.instance_list_per_project_cells_cache_ttl
+    seconds, if set. Only the cell UUIDs are cached, the CellMapping objects
+    are taken from the global list of cells.
+
+    :param ctx: The RequestContext to use for the API database query
+    :param project_id: The project ID to look up the cells for
+    :returns: A list of CellMapping objects
+    """
+    if not CONF.api.instance_list_per_project_cells_cache_ttl:
+        return objects.CellMappingList.get_by_project_id(ctx, project_id)
+
+    cache = _get_project_cells_cache()
+    cache_key = 'instance_list_cells-%s' % project_id
+    cell_uuids = cache.get(cache_key)
+    if cell_uuids is not None:
+        context.load_cells()
+        cells_by_uuid = {cell.uuid: cell for cell in context.CELLS}
+        if all(cell_uuid in cells_by_uuid for cell_uuid in cell_uuids):
+            return [cells_by_uuid[cell_uuid] for cell_uuid in cell_uuids]
+        # NOTE: This is a cell we do not know about yet, which is only
+        # possible if it was created after we loaded the cells.
+
+    cell_mappings = objects.CellMappingList.get_by_project_id(ctx, project_id)
+    cache.set(cache_key, [cell.uuid for cell in cell_mappings])
+    return cell_mappings
+
+
 def get_instance_objects_sorted(ctx, filters, limit, marker, expected_attrs,
                                 sort_keys, sort_dirs, cell_down_support=False):
     """Return a list of instances and information about down cells.
@@ -149,8 +193,7 @@ def get_instance_objects_sorted(ctx, filters, limit, marker, expected_attrs,
     if query_cell_subset and not ctx.is_admin:
         # We are not admin, and configured to only query the subset of cells
         # we could possibly have instances in.
-        cell_mappings = objects.CellMappingList.get_by_project_id(
-            ctx, ctx.project_id)
+        cell_mappings = get_project_cell_mappings(ctx, ctx.project_id)
     else:
         # Either we are admin, or configured to always hit all cells,
         # so don't limit the list to a subset.
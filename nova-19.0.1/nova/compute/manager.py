@@ -77,6 +77,7 @@ from nova import hooks
 from nova.i18n import _
 from nova import image
 from nova import manager
+from nova import metadata_cache
 from nova import network
 from nova.network import base_api as base_net_api
 from nova.network import model as network_model
@@ -1759,6 +1760,19 @@ class ComputeManager(manager.Manager):
         instance.launched_at = timeutils.utcnow()
         configdrive.update_instance(instance)
 
+    def _cache_metadata_addresses(self, instance, network_info):
+        """Cache the instance of the fixed addresses of an active instance
+        for the metadata API.
+        """
+        try:
+            metadata_cache.store_addresses(
+                instance.uuid,
+                [ip['address'] for ip in network_info.fixed_ips()])
+        except Exception:
+            # The metadata API looks the addresses up in any case.
+            LOG.warning('Failed to cache the addresses of the instance for '
+                        'the metadata API', exc_info=True, instance=instance)
+
     def _update_scheduler_instance_info(self, context, instance):
         """Sends an InstanceList with created or updated Instance objects to
         the Scheduler client.
@@ -2387,6 +2401,8 @@ class ComputeManager(manager.Manager):
                     phase=fields.NotificationPhase.ERROR, exception=e,
                     bdms=block_device_mapping, tb=tb)
 
+        if metadata_cache.shared():
+            self._cache_metadata_addresses(instance, network_info)
         self._update_scheduler_instance_info(context, instance)
         self._notify_about_instance_usage(context, instance, 'create.end',
                 extra_usage_info={'message': _('Success')},
@@ -13,6 +13,7 @@
 import abc
 import copy
 import heapq
+import time
 
 import eventlet
 import six
@@ -23,6 +24,7 @@ import nova.conf
 from nova import context
 from nova import exception
 from nova.i18n import _
+from nova import utils
 
 LOG = logging.getLogger(__name__)
 
@@ -114,6 +116,64 @@ def query_wrapper(ctx, fn, *args, **kwargs):
             return
 
 
+class CellPrefetcher(object):
+    """Fetches records from a cell in a greenthread of its own.
+
+    The records generated by fn are buffered in a bounded queue, so that the
+    cell keeps querying its next batch while the records are being merged
+    with the ones of the other cells, without fetching more than queue_size
+    records ahead. Like query_wrapper(), iterating a prefetcher yields the
+    usual sentinel objects wrapped in RecordWrapper objects instead of
+    raising if the cell fails or does not respond within the timeout.
+    """
+    _END = object()
+
+    def __init__(self, ctx, cell_mapping, timeout, queue_size, fn, *args,
+                 **kwargs):
+        self.cell_uuid = cell_mapping.uuid
+        self._deadline = time.time() + timeout
+        self._queue = eventlet.queue.LightQueue(queue_size)
+        with context.target_cell(ctx, cell_mapping) as cctx:
+            self._ctx = cctx
+        self._thread = utils.spawn(self._produce, fn, *args, **kwargs)
+
+    def _produce(self, fn, *args, **kwargs):
+        try:
+            for record in fn(self._ctx, *args, **kwargs):
+                self._queue.put(record)
+        except exception.CellTimeout:
+            self._queue.put(RecordWrapper(self._ctx, None,
+                                          context.did_not_respond_sentinel))
+        except Exception as e:
+            # Only log the exception traceback for non-nova exceptions.
+            if not isinstance(e, exception.NovaException):
+                LOG.exception('Error gathering result from cell %s',
+                              self.cell_uuid)
+            self._queue.put(RecordWrapper(self._ctx, None,
+                                          e.__class__(e.args)))
+        self._queue.put(self._END)
+
+    def __iter__(self):
+        while True:
+            try:
+                record = self._queue.get(
+                    timeout=max(self._deadline - time.time(), 0))
+            except eventlet.queue.Empty:
+                LOG.warning('Timed out waiting for response from cell %s',
+                            self.cell_uuid)
+                self.stop()
+                yield RecordWrapper(self._ctx, None,
+                                    context.did_not_respond_sentinel)
+                return
+            if record is self._END:
+                return
+            yield record
+
+    def stop(self):
+        """Stops querying the cell if it is still running."""
+        self._thread.kill()
+
+
 @six.add_metaclass(abc.ABCMeta)
 class CrossCellLister(object):
     """An implementation of a cross-cell efficient lister.
@@ -378,6 +438,22 @@ class CrossCellLister(object):
                            'total': return_count,
                            'limit': limit or 'no'})
 
+        prefetchers = []
+        if CONF.api.instance_list_cells_prefetch:
+            # NOTE: Each cell is queried concurrently by its prefetcher,
+            # which translates failures and timeouts to sentinels the same
+            # way query_wrapper() does below.
+            cells = self.cells
+            if not cells:
+                context.load_cells()
+                cells = context.CELLS
+            queue_size = self.batch_size or limit or None
+            prefetchers = [
+                CellPrefetcher(ctx, cell, CONF.api.instance_list_cell_timeout,
+                               queue_size, do_query)
+                for cell in cells]
+            results = {prefetcher.cell_uuid: prefetcher
+                       for prefetcher in prefetchers}
         # NOTE(danms): The calls to do_query() will return immediately
         # with a generator. There is no point in us checking the
         # results for failure or timeout since we have not actually
@@ -385,7 +461,7 @@ class CrossCellLister(object):
         # below. The query_wrapper() utility handles inline
         # translation of failures and timeouts to sentinels which will
         # be generated and consumed just like any normal result below.
-        if self.cells:
+        elif self.cells:
             results = context.scatter_gather_cells(ctx, self.cells,
                                                    context.CELL_TIMEOUT,
                                                    query_wrapper, do_query)
@@ -393,6 +469,20 @@ class CrossCellLister(object):
             results = context.scatter_gather_all_cells(ctx,
                                                        query_wrapper, do_query)
 
+        try:
+            for record in self._merge_results(results, limit,
+                                              cell_down_support):
+                yield record
+        finally:
+            # NOTE: Stop the cells still fetching records we do not need
+            # anymore, either because the limit was reached or because the
+            # caller stopped iterating.
+            for prefetcher in prefetchers:
+                prefetcher.stop()
+
+    def _merge_results(self, results, limit, cell_down_support):
+        """Merge sort the records generated by each cell."""
+
         # If a limit was provided, it was passed to the per-cell query
         # routines.  That means we have NUM_CELLS * limit items across
         # results. So, we need to consume from that limit below and
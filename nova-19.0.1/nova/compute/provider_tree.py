@@ -42,6 +42,13 @@ ProviderData = collections.namedtuple(
     'ProviderData', ['uuid', 'name', 'generation', 'parent_uuid', 'inventory',
                      'traits', 'aggregates'])
 
+# The fields of a provider whose changes are tracked, so that only the changed
+# ones need to be flushed to placement.
+INVENTORY = 'inventory'
+TRAITS = 'traits'
+AGGREGATES = 'aggregates'
+_TRACKED_FIELDS = frozenset([INVENTORY, TRAITS, AGGREGATES])
+
 
 class _Provider(object):
     """Represents a resource provider in the tree. All operations against the
@@ -64,6 +71,9 @@ class _Provider(object):
         self.traits = set()
         # Set of aggregate UUIDs
         self.aggregates = set()
+        # Set of the tracked fields changed since the provider was last marked
+        # clean. A new provider has never been flushed, so all are changed.
+        self.dirty = set(_TRACKED_FIELDS)
 
     @classmethod
     def from_dict(cls, pdict):
@@ -111,6 +121,15 @@ class _Provider(object):
                     return subchild
         return None
 
+    def get_providers(self):
+        """Returns a list, in top-down traversal order, of this provider and
+        all its descendants.
+        """
+        ret = [self]
+        for child in self.children.values():
+            ret.extend(child.get_providers())
+        return ret
+
     def add_child(self, provider):
         self.children[provider.uuid] = provider
 
@@ -171,6 +190,7 @@ class _Provider(object):
             LOG.debug('Updating inventory in ProviderTree for provider %s '
                       'with inventory: %s', self.uuid, inventory)
             self.inventory = copy.deepcopy(inventory)
+            self.dirty.add(INVENTORY)
             return True
         LOG.debug('Inventory has not changed in ProviderTree for provider: %s',
                   self.uuid)
@@ -188,6 +208,7 @@ class _Provider(object):
         self._update_generation(generation, 'update_traits')
         if self.have_traits_changed(new):
             self.traits = set(new)  # create a copy of the new traits
+            self.dirty.add(TRAITS)
             return True
         return False
 
@@ -213,6 +234,7 @@ class _Provider(object):
         self._update_generation(generation, 'update_aggregates')
         if self.have_aggregates_changed(new):
             self.aggregates = set(new)  # create a copy of the new aggregates
+            self.dirty.add(AGGREGATES)
             return True
         return False
 
@@ -454,6 +476,33 @@ class ProviderTree(object):
             parent_node.add_child(p)
             return p.uuid
 
+    def mark_clean(self):
+        """Marks the tracked fields of all the providers in the tree as
+        unchanged, so that the changes made to the tree from now on can be
+        retrieved with get_dirty_fields().
+
+        This is done on the copy of the report client's cache handed to the
+        virt driver, which is then flushed to placement by only sending the
+        fields the driver changed.
+        """
+        with self.lock:
+            for root in self.roots:
+                for provider in root.get_providers():
+                    provider.dirty.clear()
+
+    def get_dirty_fields(self, name_or_uuid):
+        """Returns the set of the tracked fields (INVENTORY, TRAITS and
+        AGGREGATES) of the specified provider which changed since the tree was
+        last marked clean. All the fields of a provider added to the tree since
+        then are considered changed.
+
+        :raises: ValueError if a provider with name_or_uuid was not found in
+                 the tree.
+        :param name_or_uuid: Either name or UUID of the resource provider.
+        """
+        with self.lock:
+            return set(self._find_with_lock(name_or_uuid).dirty)
+
     def has_inventory(self, name_or_uuid):
         """Returns True if the provider identified by name_or_uuid has any
         inventory records at all.
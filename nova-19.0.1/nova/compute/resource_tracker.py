@@ -20,6 +20,7 @@ model.
 """
 import collections
 import copy
+import time
 
 from keystoneauth1 import exceptions as ks_exc
 import os_resource_classes as orc
@@ -147,6 +148,9 @@ class ResourceTracker(object):
         monitor_handler = monitors.MonitorHandler(self)
         self.monitors = monitor_handler.monitors
         self.old_resources = collections.defaultdict(objects.ComputeNode)
+        # Dict, keyed by nodename, of the time the node's resource providers
+        # were last reported to placement.
+        self.placement_update_time = {}
         self.query_client = query.SchedulerQueryClient()
         self.reportclient = report.SchedulerReportClient()
         self.ram_allocation_ratio = CONF.ram_allocation_ratio
@@ -674,6 +678,7 @@ class ResourceTracker(object):
         self.stats.pop(nodename, None)
         self.compute_nodes.pop(nodename, None)
         self.old_resources.pop(nodename, None)
+        self.placement_update_time.pop(nodename, None)
 
     def _get_host_metrics(self, context, nodename):
         """Get the metrics from monitors and
@@ -820,8 +825,9 @@ class ResourceTracker(object):
         # but it is. This should be changed in ComputeNode
         cn.metrics = jsonutils.dumps(metrics)
 
-        # update the compute_node
-        self._update(context, cn, startup=startup)
+        # update the compute_node, always reporting to placement so that any
+        # changes coalesced since the last report are flushed.
+        self._update(context, cn, startup=startup, coalesce=False)
         LOG.debug('Compute_service record updated for %(host)s:%(node)s',
                   {'host': self.host, 'node': nodename})
 
@@ -1008,8 +1014,25 @@ class ResourceTracker(object):
         self.reportclient.update_from_provider_tree(context, prov_tree,
                                                     allocations=allocs)
 
-    def _update(self, context, compute_node, startup=False):
-        """Update partial stats locally and populate them to Scheduler."""
+    def _placement_update_coalesced(self, nodename):
+        """Returns whether the node's resource providers were reported to
+        placement less than CONF.compute.provider_update_coalesce_window
+        seconds ago, in which case reporting them again can be left to the
+        next report.
+        """
+        window = CONF.compute.provider_update_coalesce_window
+        if not window or nodename not in self.placement_update_time:
+            return False
+        return time.time() - self.placement_update_time[nodename] < window
+
+    def _update(self, context, compute_node, startup=False, coalesce=True):
+        """Update partial stats locally and populate them to Scheduler.
+
+        :param coalesce: If True, reporting to placement is skipped when the
+                         node was reported less than
+                         CONF.compute.provider_update_coalesce_window seconds
+                         ago.
+        """
         if self._resource_change(compute_node):
             # If the compute_node's resource changed, update to DB.
             # NOTE(jianghuaw): Once we completely move to use get_inventory()
@@ -1017,7 +1040,14 @@ class ResourceTracker(object):
             # At the moment we still need this check and save compute_node.
             compute_node.save()
 
-        self._update_to_placement(context, compute_node, startup)
+        nodename = compute_node.hypervisor_hostname
+        if (coalesce and not startup and
+                self._placement_update_coalesced(nodename)):
+            LOG.debug("Coalescing the update of the resource providers of "
+                      "node %s with the next one.", nodename)
+        else:
+            self._update_to_placement(context, compute_node, startup)
+            self.placement_update_time[nodename] = time.time()
 
         if self.pci_tracker:
             self.pci_tracker.save(context)
@@ -14,11 +14,13 @@
 
 """Handles database requests from other nova services."""
 
+import collections
 import contextlib
 import copy
 import functools
 import sys
 
+import eventlet.semaphore
 from oslo_config import cfg
 from oslo_log import log as logging
 import oslo_messaging as messaging
@@ -49,6 +51,7 @@ from nova import objects
 from nova.objects import base as nova_object
 from nova.objects import fields
 from nova import profiler
+from nova import quota
 from nova import rpc
 from nova.scheduler.client import query
 from nova.scheduler.client import report
@@ -214,6 +217,41 @@ def obj_target_cell(obj, cell):
             yield target
 
 
+class _StageTimings(object):
+    """Times the successive stages of a task, for logging."""
+
+    def __init__(self):
+        self._stages = []
+        self._watch = timeutils.StopWatch()
+        self._watch.start()
+
+    def mark(self, stage):
+        """Record the time elapsed since the previous stage ended."""
+        self._stages.append((stage, self._watch.elapsed()))
+        self._watch.restart()
+
+    def __str__(self):
+        return ', '.join('%s: %.3fs' % stage for stage in self._stages)
+
+
+class _InstanceBuild(object):
+    """The state of the build of an instance of a multi-create request,
+    from the selection of its host to the cast to that host.
+    """
+
+    def __init__(self, build_request, request_spec, host, host_list,
+                 instance, cell, filter_properties):
+        self.build_request = build_request
+        self.request_spec = request_spec
+        self.host = host
+        self.host_list = host_list
+        self.instance = instance
+        self.cell = cell
+        self.filter_properties = filter_properties
+        self.bdms = None
+        self.tags = None
+
+
 @profiler.trace_cls("rpc")
 class ComputeTaskManager(base.Base):
     """Namespace for compute methods.
@@ -1248,6 +1286,7 @@ class ComputeTaskManager(base.Base):
         for instance in instances_by_uuid.values():
             with obj_target_cell(instance, cell0) as cctxt:
                 instance.create()
+                quota.update_instance_usage_counters(context, instance)
 
                 # NOTE(mnaser): In order to properly clean-up volumes after
                 #               being buried in cell0, we need to store BDMs.
@@ -1339,6 +1378,7 @@ class ComputeTaskManager(base.Base):
                                      admin_password, injected_files,
                                      requested_networks, block_device_mapping,
                                      tags=None):
+        timings = _StageTimings()
         # Add all the UUIDs for the instances
         instance_uuids = [spec.instance_uuid for spec in request_specs]
         try:
@@ -1351,14 +1391,22 @@ class ComputeTaskManager(base.Base):
                                 block_device_mapping=block_device_mapping,
                                 tags=tags)
             return
+        timings.mark('schedule')
 
         host_mapping_cache = {}
         cell_mapping_cache = {}
-        instances = []
         host_az = {}  # host=az cache to optimize multi-create
 
-        for (build_request, request_spec, host_list) in six.moves.zip(
-                build_requests, request_specs, host_lists):
+        def _create_instance(args):
+            """Create the instance of a build request in the cell of the
+            selected host.
+
+            :param args: the (build request, request spec, host list) of the
+                instance
+            :returns: the created instance, or None if it was buried in cell0
+                or its build request was deleted
+            """
+            build_request, request_spec, host_list = args
             instance = build_request.get_new_instance(context)
             # host_list is a list of one or more Selection objects, the first
             # of which has been selected and its resources claimed.
@@ -1379,8 +1427,7 @@ class ComputeTaskManager(base.Base):
                         block_device_mapping=block_device_mapping,
                         tags=tags)
                     # This is a placeholder in case the quota recheck fails.
-                    instances.append(None)
-                    continue
+                    return None
             else:
                 host_mapping = host_mapping_cache[host.service_host]
 
@@ -1396,21 +1443,32 @@ class ComputeTaskManager(base.Base):
                 # the build request is gone so we're done for this instance
                 LOG.debug('While scheduling instance, the build request '
                           'was already deleted.', instance=instance)
-                # This is a placeholder in case the quota recheck fails.
-                instances.append(None)
                 self.report_client.delete_allocation_for_instance(
                     context, instance.uuid)
-                continue
-            else:
-                if host.service_host not in host_az:
-                    host_az[host.service_host] = (
-                        availability_zones.get_host_availability_zone(
-                            context, host.service_host))
-                instance.availability_zone = host_az[host.service_host]
-                with obj_target_cell(instance, cell):
-                    instance.create()
-                    instances.append(instance)
-                    cell_mapping_cache[instance.uuid] = cell
+                # This is a placeholder in case the quota recheck fails.
+                return None
+            if host.service_host not in host_az:
+                host_az[host.service_host] = (
+                    availability_zones.get_host_availability_zone(
+                        context, host.service_host))
+            instance.availability_zone = host_az[host.service_host]
+            with obj_target_cell(instance, cell):
+                instance.create()
+                cell_mapping_cache[instance.uuid] = cell
+            quota.update_instance_usage_counters(context, instance)
+            return instance
+
+        # NOTE: The instances are created concurrently but, as when they
+        # were created one after another, if creating any of them fails the
+        # request fails before any instance is built.
+        results = self._run_concurrently(
+            _create_instance,
+            six.moves.zip(build_requests, request_specs, host_lists))
+        for _args, exc_info in results:
+            if exc_info:
+                six.reraise(*exc_info)
+        instances = [instance for instance, _exc_info in results]
+        timings.mark('create')
 
         # NOTE(melwitt): We recheck the quota after creating the
         # objects to prevent users from allocating more resources
@@ -1420,7 +1478,7 @@ class ComputeTaskManager(base.Base):
         if CONF.quota.recheck_quota:
             try:
                 compute_utils.check_num_instances_quota(
-                    context, instance.flavor, 0, 0,
+                    context, build_requests[0].instance.flavor, 0, 0,
                     orig_num_req=len(build_requests))
             except exception.TooManyInstances as exc:
                 with excutils.save_and_reraise_exception():
@@ -1429,7 +1487,9 @@ class ComputeTaskManager(base.Base):
                                                   request_specs,
                                                   block_device_mapping, tags,
                                                   cell_mapping_cache)
+            timings.mark('quota recheck')
 
+        builds = []
         zipped = six.moves.zip(build_requests, request_specs, host_lists,
                               instances)
         for (build_request, request_spec, host_list, instance) in zipped:
@@ -1437,7 +1497,6 @@ class ComputeTaskManager(base.Base):
                 # Skip placeholders that were buried in cell0 or had their
                 # build requests deleted by the user before instance create.
                 continue
-            cell = cell_mapping_cache[instance.uuid]
             # host_list is a list of one or more Selection objects, the first
             # of which has been selected and its resources claimed.
             host = host_list.pop(0)
@@ -1461,61 +1520,176 @@ class ComputeTaskManager(base.Base):
                     self._cleanup_build_artifacts(
                         context, exc, instances, build_requests, request_specs,
                         block_device_mapping, tags, cell_mapping_cache)
+            builds.append(_InstanceBuild(
+                build_request, request_spec, host, host_list, instance,
+                cell_mapping_cache[instance.uuid], filter_props))
+        timings.mark('provider mapping')
+
+        # NOTE: From here on the builds are independent of each other: a
+        # failure to build one instance does not stop the others, and the
+        # first failure is re-raised once they are all done.
+        failures = []
+
+        def _collect_failures(results):
+            completed = []
+            for build, exc_info in results:
+                if exc_info:
+                    LOG.error('Failed to build instance',
+                              exc_info=exc_info, instance=build.instance)
+                    failures.append(exc_info)
+                else:
+                    completed.append(build)
+            return completed
+
+        builds = _collect_failures(self._run_concurrently(
+            functools.partial(self._create_build_records,
+                              block_device_mapping=block_device_mapping,
+                              tags=tags),
+            builds))
+        timings.mark('records')
+
+        # Update mapping for instances. Normally this check is guarded by
+        # a try/except but if we're here we know that a newer nova-api
+        # handled the build process and would have created the mappings.
+        # NOTE(mdbooth): To avoid an incomplete instance record being
+        #                returned by the API, the instance mapping must be
+        #                created after the instance record is complete in
+        #                the cell, and before the build request is
+        #                destroyed.
+        builds_by_cell = collections.OrderedDict()
+        for build in builds:
+            builds_by_cell.setdefault(build.cell.uuid, []).append(build)
+        builds = []
+        for cell_builds in builds_by_cell.values():
+            try:
+                objects.InstanceMappingList.set_cell_mapping_bulk(
+                    context, [build.instance.uuid for build in cell_builds],
+                    cell_builds[0].cell)
+            except Exception:
+                # NOTE: The bulk update is all or nothing, map the instances
+                # one at a time so that only the builds which fail to be
+                # mapped are failed.
+                LOG.debug('Failed to map %d instances to cell %s at once, '
+                          'mapping them one at a time.', len(cell_builds),
+                          cell_builds[0].cell.uuid, exc_info=True)
+                builds.extend(_collect_failures(self._run_concurrently(
+                    functools.partial(self._map_instance_to_cell, context),
+                    cell_builds)))
+            else:
+                builds.extend(cell_builds)
+        timings.mark('mappings')
+
+        built = _collect_failures(self._run_concurrently(
+            functools.partial(self._cast_build, context, image=image,
+                              admin_password=admin_password,
+                              injected_files=injected_files,
+                              requested_networks=requested_networks),
+            builds))
+        timings.mark('cast')
+
+        LOG.debug('Built %(count)d of %(total)d instances, stage timings: '
+                  '%(timings)s',
+                  {'count': len([build for build in built if build]),
+                   'total': len(build_requests), 'timings': timings})
+        if failures:
+            six.reraise(*failures[0])
 
-            # TODO(melwitt): Maybe we should set_target_cell on the contexts
-            # once we map to a cell, and remove these separate with statements.
-            with obj_target_cell(instance, cell) as cctxt:
-                # send a state update notification for the initial create to
-                # show it going from non-existent to BUILDING
-                # This can lazy-load attributes on instance.
-                notifications.send_update_with_states(cctxt, instance, None,
-                        vm_states.BUILDING, None, None, service="conductor")
-                objects.InstanceAction.action_start(
-                    cctxt, instance.uuid, instance_actions.CREATE,
-                    want_result=False)
-                instance_bdms = self._create_block_device_mapping(
-                    cell, instance.flavor, instance.uuid, block_device_mapping)
-                instance_tags = self._create_tags(cctxt, instance.uuid, tags)
-
-            # TODO(Kevin Zheng): clean this up once instance.create() handles
-            # tags; we do this so the instance.create notification in
-            # build_and_run_instance in nova-compute doesn't lazy-load tags
-            instance.tags = instance_tags if instance_tags \
-                else objects.TagList()
-
-            # Update mapping for instance. Normally this check is guarded by
-            # a try/except but if we're here we know that a newer nova-api
-            # handled the build process and would have created the mapping
-            inst_mapping = objects.InstanceMapping.get_by_instance_uuid(
-                context, instance.uuid)
-            inst_mapping.cell_mapping = cell
-            inst_mapping.save()
+    @staticmethod
+    def _run_concurrently(func, items):
+        """Call func for each of the items, for at most
+        [conductor]/instance_build_concurrency items at a time.
 
-            if not self._delete_build_request(
-                    context, build_request, instance, cell, instance_bdms,
-                    instance_tags):
-                # The build request was deleted before/during scheduling so
-                # the instance is gone and we don't have anything to build for
-                # this one.
-                continue
+        :returns: a list of (result, exc_info) tuples in the order of the
+            items. If func raised an exception for an item, the tuple is
+            (item, exc_info), otherwise exc_info is None.
+        """
+        semaphore = eventlet.semaphore.Semaphore(
+            CONF.conductor.instance_build_concurrency)
 
-            # NOTE(danms): Compute RPC expects security group names or ids
-            # not objects, so convert this to a list of names until we can
-            # pass the objects.
-            legacy_secgroups = [s.identifier
-                                for s in request_spec.security_groups]
-            with obj_target_cell(instance, cell) as cctxt:
-                self.compute_rpcapi.build_and_run_instance(
-                    cctxt, instance=instance, image=image,
-                    request_spec=request_spec,
-                    filter_properties=filter_props,
-                    admin_password=admin_password,
-                    injected_files=injected_files,
-                    requested_networks=requested_networks,
-                    security_groups=legacy_secgroups,
-                    block_device_mapping=instance_bdms,
-                    host=host.service_host, node=host.nodename,
-                    limits=host.limits, host_list=host_list)
+        def _call(item):
+            with semaphore:
+                try:
+                    return func(item), None
+                except Exception:
+                    return item, sys.exc_info()
+
+        threads = [utils.spawn(_call, item) for item in items]
+        return [thread.wait() for thread in threads]
+
+    @staticmethod
+    def _map_instance_to_cell(context, build):
+        """Map the instance of a build to the cell it was created in.
+
+        :returns: the build
+        """
+        inst_mapping = objects.InstanceMapping.get_by_instance_uuid(
+            context, build.instance.uuid)
+        inst_mapping.cell_mapping = build.cell
+        inst_mapping.save()
+        return build
+
+    def _create_build_records(self, build, block_device_mapping, tags):
+        """Create the records of an instance build in its cell.
+
+        :returns: the build, with its block device mappings and tags set
+        """
+        instance = build.instance
+        # TODO(melwitt): Maybe we should set_target_cell on the contexts
+        # once we map to a cell, and remove these separate with statements.
+        with obj_target_cell(instance, build.cell) as cctxt:
+            # send a state update notification for the initial create to
+            # show it going from non-existent to BUILDING
+            # This can lazy-load attributes on instance.
+            notifications.send_update_with_states(cctxt, instance, None,
+                    vm_states.BUILDING, None, None, service="conductor")
+            objects.InstanceAction.action_start(
+                cctxt, instance.uuid, instance_actions.CREATE,
+                want_result=False)
+            build.bdms = self._create_block_device_mapping(
+                build.cell, instance.flavor, instance.uuid,
+                block_device_mapping)
+            build.tags = self._create_tags(cctxt, instance.uuid, tags)
+
+        # TODO(Kevin Zheng): clean this up once instance.create() handles
+        # tags; we do this so the instance.create notification in
+        # build_and_run_instance in nova-compute doesn't lazy-load tags
+        instance.tags = build.tags if build.tags else objects.TagList()
+        return build
+
+    def _cast_build(self, context, build, image, admin_password,
+                    injected_files, requested_networks):
+        """Delete the build request of an instance and cast its build to the
+        selected compute host.
+
+        :returns: the build, or None if its build request was already deleted
+        """
+        instance = build.instance
+        if not self._delete_build_request(
+                context, build.build_request, instance, build.cell,
+                build.bdms, build.tags):
+            # The build request was deleted before/during scheduling so
+            # the instance is gone and we don't have anything to build for
+            # this one.
+            return None
+
+        # NOTE(danms): Compute RPC expects security group names or ids
+        # not objects, so convert this to a list of names until we can
+        # pass the objects.
+        legacy_secgroups = [s.identifier
+                            for s in build.request_spec.security_groups]
+        with obj_target_cell(instance, build.cell) as cctxt:
+            self.compute_rpcapi.build_and_run_instance(
+                cctxt, instance=instance, image=image,
+                request_spec=build.request_spec,
+                filter_properties=build.filter_properties,
+                admin_password=admin_password,
+                injected_files=injected_files,
+                requested_networks=requested_networks,
+                security_groups=legacy_secgroups,
+                block_device_mapping=build.bdms,
+                host=build.host.service_host, node=build.host.nodename,
+                limits=build.host.limits, host_list=build.host_list)
+        return build
 
     def _cleanup_build_artifacts(self, context, exc, instances, build_requests,
                                  request_specs, block_device_mappings, tags,
@@ -1602,8 +1776,10 @@ class ComputeTaskManager(base.Base):
                 with compute_utils.notify_about_instance_delete(
                         self.notifier, cctxt, instance,
                         source=fields.NotificationSource.CONDUCTOR):
+                    destroyed = False
                     try:
                         instance.destroy()
+                        destroyed = True
                     except exception.InstanceNotFound:
                         pass
                     except exception.ObjectActionError:
@@ -1612,8 +1788,12 @@ class ComputeTaskManager(base.Base):
                         try:
                             instance.refresh()
                             instance.destroy()
+                            destroyed = True
                         except exception.InstanceNotFound:
                             pass
+            if destroyed:
+                quota.update_instance_usage_counters(context, instance,
+                                                     sign=-1)
             for bdm in instance_bdms:
                 with obj_target_cell(bdm, cell):
                     try:
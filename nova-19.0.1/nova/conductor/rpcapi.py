@@ -241,6 +241,11 @@ class ConductorAPI(object):
                           args=args, kwargs=kwargs)
 
     def object_action(self, context, objinst, objmethod, args, kwargs):
+        # NOTE: With cells v1, the instance saved is also synced to the other
+        # cells, so it has to be sent whole.
+        if (objmethod == 'save' and CONF.conductor.object_save_deltas and
+                not CONF.cells.enable):
+            objinst = objinst.obj_save_delta()
         cctxt = self.client.prepare()
         return cctxt.call(context, 'object_action', objinst=objinst,
                           objmethod=objmethod, args=args, kwargs=kwargs)
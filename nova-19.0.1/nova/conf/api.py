@@ -195,6 +195,38 @@ metadata caching is disabled entirely; this is generally not recommended for
 performance reasons. Increasing this setting should improve response times
 of the metadata API when under heavy load. Higher values may increase memory
 usage, and result in longer times for host metadata changes to take effect.
+"""),
+    cfg.BoolOpt("metadata_cache_invalidation",
+        default=False,
+        help="""
+Keep the metadata of the instances cached until the instances change.
+
+By default, the metadata API caches the metadata of an instance when it is
+first requested, and every metadata path is rendered again on each request.
+When this option is enabled, all the metadata paths of an instance are
+rendered at once by the metadata API on the first request, and the cached
+responses are served without accessing the database or the network service.
+The cached metadata is invalidated by the services changing the instance:
+when its fields or its network information are updated, when security groups
+are added to or removed from it, or when it is deleted.
+
+The metadata cache must be shared by the metadata API, API, conductor and
+compute services, see the ``[cache]`` section, for the invalidation to reach
+the metadata API. The compute services then also cache the instance of the
+fixed addresses of the instances they spawn, which saves the metadata API a
+lookup in the network service on the first request. Without a shared
+cache, only the changes made by the metadata API itself, like the setting of
+the instance password, invalidate the cached metadata.
+
+The ``metadata_cache_expiration`` option still limits the time the metadata
+is cached, e.g. for block device mapping changes to be visible, and can be
+raised when this option is enabled. This option has no effect when the cache
+is disabled.
+
+Related options:
+
+* metadata_cache_expiration
+* [cache]/enabled
 """),
     cfg.BoolOpt("local_metadata_per_cell",
                 default=False,
@@ -328,6 +360,56 @@ Related options:
 
 * instance_list_cells_batch_strategy
 * max_limit
+"""),
+    cfg.BoolOpt("instance_list_cells_prefetch",
+        default=False,
+        help="""
+When enabled, each cell database is queried by a greenthread of its own during
+instance list operations, so that the next batch of records of every cell is
+fetched concurrently while the results are being merged. At most one batch per
+cell is fetched ahead of the merge, and the cell queries are stopped as soon as
+the requested number of records has been returned.
+
+When disabled, the batches are fetched from each cell in turn as the merge
+needs them.
+
+Related options:
+
+* instance_list_cells_batch_strategy
+* instance_list_cell_timeout
+"""),
+    cfg.IntOpt("instance_list_cell_timeout",
+        min=1,
+        default=60,
+        help="""
+Maximum time in seconds to wait for the records of a cell database during
+instance list operations when ``instance_list_cells_prefetch`` is enabled.
+
+A cell which did not return all the needed records within this time is
+considered down and handled as defined by
+``list_records_by_skipping_down_cells``: either the request fails or the
+results of the other cells are returned.
+
+Related options:
+
+* instance_list_cells_prefetch
+* list_records_by_skipping_down_cells
+"""),
+    cfg.IntOpt("instance_list_per_project_cells_cache_ttl",
+        min=0,
+        default=0,
+        help="""
+Time in seconds to cache the cells in which a tenant has mapped instances.
+
+When ``instance_list_per_project_cells`` is enabled, the cells to query are
+looked up in the API database before each list. Caching them for a short time
+saves this query when a tenant pages through its instances, at the cost of not
+listing the instances of a cell where the tenant had none before until the
+cached value expires. A value of 0 disables the cache.
+
+Related options:
+
+* instance_list_per_project_cells
 """),
     cfg.BoolOpt("list_records_by_skipping_down_cells",
         default=True,
@@ -725,6 +725,58 @@ process, causing it to be repopulated the next time the data is accessed.
 Possible values:
 
 * Any positive integer in seconds, or zero to disable refresh.
+"""),
+    cfg.IntOpt('resource_provider_association_refresh_jitter',
+        default=0,
+        min=0,
+        mutable=True,
+        help="""
+Maximum random offset, in seconds, applied to the refresh of the
+nova-compute-side cache of the compute node resource provider's inventories,
+aggregates, and traits.
+
+Each time the cache of a provider is refreshed, its next refresh is scheduled
+up to this many seconds earlier than ``resource_provider_association_refresh``
+seconds later, at random. This spreads the refreshes of compute services
+which were started at the same time, such as after a fleet-wide upgrade,
+which would otherwise all query the placement service at the same time.
+
+Possible values:
+
+* Zero, the default, to refresh the cache exactly every
+  ``resource_provider_association_refresh`` seconds.
+* Any positive integer in seconds. Values greater than
+  ``resource_provider_association_refresh`` are capped to it.
+
+Related options:
+
+* ``resource_provider_association_refresh``
+"""),
+    cfg.IntOpt('provider_update_coalesce_window',
+        default=0,
+        min=0,
+        help="""
+Window, in seconds, during which changes to the compute node resources are
+coalesced before being reported to the placement service.
+
+Claims, such as those made when instances are built, moved or deleted, update
+the compute node resources and report the compute node resource providers to
+placement. When this option is set, a claim made less than this many seconds
+after the previous report does not report to placement itself; its changes are
+reported together with the next report, which happens with the next claim made
+after the window or, at the latest, with the next
+``update_resources_interval`` periodic task. This reduces the number of times
+the provider tree is computed by the virt driver and compared with placement
+during bursts of claims.
+
+Possible values:
+
+* Zero, the default, to report to placement on every claim.
+* Any positive integer in seconds.
+
+Related options:
+
+* ``[DEFAULT] update_resources_interval``
 """),
    cfg.StrOpt('cpu_shared_set',
         help="""
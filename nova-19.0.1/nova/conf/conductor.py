@@ -31,6 +31,43 @@ ALL_OPTS = [
         help="""
 Number of workers for OpenStack Conductor service. The default will be the
 number of CPUs available.
+"""),
+    cfg.IntOpt(
+        'instance_build_concurrency',
+        default=10,
+        min=1,
+        help="""
+Maximum number of instances of a single multi-create request whose build
+steps are run concurrently by conductor.
+
+Once the instances of a request are scheduled, conductor creates their
+records in the cells, updates their instance mappings and casts the build to
+the selected compute hosts. Those per-instance steps are run concurrently for
+up to this number of instances at a time.
+
+Possible values:
+
+* 1: Build the instances one after another.
+* Any integer greater than 1.
+"""),
+    cfg.BoolOpt(
+        'object_save_deltas',
+        default=False,
+        help="""
+Send only the changed fields of the objects saved through conductor.
+
+Services without database access, like nova-compute, save their objects by
+sending them to conductor, which saves them and sends the resulting changes
+back. When enabled, only the changed fields of the objects which support it,
+like instances, are sent along with what is needed to find them in the
+database, instead of the whole objects. This reduces the size of the RPC
+messages and the time spent serializing them.
+
+This is ignored when cells v1 is enabled.
+
+Related options:
+
+* ``[cells]/enable``
 """),
 ]
 
@@ -833,6 +833,32 @@ Related options:
 
 * ``virt_type`` must be set to ``kvm`` or ``qemu``.
 * ``ram_allocation_ratio`` must be set to 1.0.
+"""),
+    cfg.IntOpt('domain_stats_cache_ttl',
+               default=0,
+               min=0,
+               help="""
+Number of seconds the host and domain statistics collected from libvirt are
+cached for.
+
+The statistics of all the domains running on the host are collected with a
+single bulk query. When this option is greater than 0 the result of that
+query, and the host hardware information, are reused by the periodic tasks
+and the diagnostics API until they are older than this number of seconds,
+instead of querying libvirt again for each of them. Usage reported to the
+scheduler may then be up to this number of seconds old.
+
+Possible values:
+
+* 0: Do not cache the statistics (default). The domain statistics are still
+  collected in bulk by the periodic tasks.
+* Any positive integer in seconds.
+
+Related options:
+
+* ``[DEFAULT] update_resources_interval``: it makes little sense for the
+  statistics to be cached for longer than the periodic resource update
+  interval.
 """),
 ]
 
@@ -924,6 +950,38 @@ libvirt_imagecache_opts = [
                                  'Data integrity can be checked at the block '
                                  'or filesystem level.',
                help='How frequently to checksum base images'),
+    cfg.ListOpt('image_cache_prefetch_images',
+                default=[],
+                help="""
+List of IDs of images to prefetch to the image cache of the compute host.
+
+The image cache manager downloads the listed images to the image cache
+directory, ``$instances_path/$image_cache_subdirectory_name``, when they are
+missing there, and never removes them as unused. The first boot of an
+instance from one of these images on the host then does not wait for the
+image to be downloaded from the image service. The images are downloaded
+concurrently, in the background of the periodic task of the image cache
+manager.
+
+The images are downloaded with the credentials of the ``[service_user]``
+section, which must be allowed to download them, and are not prefetched
+when the disks of the instances are not backed by the image cache, i.e.
+when ``images_type`` is ``rbd``.
+
+Possible values:
+
+* A list of image IDs. The default is an empty list, i.e. the images are only
+  downloaded when an instance is booted from them.
+
+Related options:
+
+* ``[DEFAULT] image_cache_manager_interval``: the images are prefetched by
+  the periodic task of the image cache manager, and are not prefetched when
+  it is disabled.
+* ``[compute] max_concurrent_disk_ops``: the number of images downloaded
+  concurrently is limited by this option.
+* ``[service_user]``: the credentials used to download the images.
+"""),
 ]
 
 libvirt_lvm_opts = [
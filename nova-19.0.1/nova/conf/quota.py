@@ -293,6 +293,47 @@ impossible for a user to exceed their quota with the caveat that it will,
 however, be possible for a REST API user to be rejected with a 403 response in
 the event of a collision close to reaching their quota limit, even if the user
 has enough quota available when they made the request.
+"""),
+    cfg.BoolOpt('usage_counters',
+        default=False,
+        help="""
+Count the instances, cores and ram usage from counters in the API database.
+
+By default, the instances, cores and ram used by a project and user are
+counted from the instances of all the cells in which the project has instances
+whenever quota is checked, e.g. when creating or resizing servers. When
+enabled, they are read from usage counters stored in the API database instead,
+which are updated when instances are created, deleted and resized.
+
+The counters are reconciled against the counts from the cells when they are
+older than ``usage_counters_max_age`` seconds. The ``nova-manage quota
+check_usage_counters`` command reports, and optionally fixes, the counters
+which drifted from the counts.
+
+Related options:
+
+* ``usage_counters_max_age``
+"""),
+    cfg.IntOpt('usage_counters_max_age',
+        default=600,
+        min=0,
+        help="""
+Number of seconds after which the usage counters are reconciled.
+
+When the usage counters of a project are read and are older than this, they
+are discarded and the usage is counted from the cells again, which resets the
+counters. This bounds how long the counters can drift from the actual usage,
+e.g. when soft deleted instances are reclaimed, which does not update the
+counters, or when a resize fails.
+
+Possible values:
+
+* 0: Never reconcile the counters when they are read.
+* A positive integer: The maximum age of the counters, in seconds.
+
+Related options:
+
+* ``usage_counters``
 """),
 ]
 
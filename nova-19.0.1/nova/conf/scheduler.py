@@ -663,6 +663,89 @@ Possible values:
 Related options:
 
 * aggregate_image_properties_isolation_namespace
+"""),
+    cfg.BoolOpt("host_state_cache",
+        default=False,
+        help="""
+Keep a long-lived cache of host states in the scheduler.
+
+By default, the scheduler loads the compute node and service records of every
+candidate host from the cell databases and builds new host state objects for
+each scheduling request. When this option is enabled, the host states are kept
+between requests and only the compute nodes which were created, updated or
+deleted since the previous request are loaded from the cell databases.
+
+Resources consumed by a scheduling request are then kept in the cached host
+state until the compute node reports its resource usage again.
+
+This option is only used by the FilterScheduler and its subclasses; if you use
+a different scheduler, this option has no effect.
+
+Related options:
+
+* host_state_cache_full_sync_interval
+"""),
+    cfg.IntOpt("host_state_cache_full_sync_interval",
+        default=600,
+        min=60,
+        help="""
+Interval in seconds between full reloads of the host state cache.
+
+The host state cache is refreshed from compute node changes on each scheduling
+request. As a safety net against missed changes, all the compute nodes of a
+cell are reloaded when this interval has elapsed since the last full load of
+that cell. The full loads also release the resources consumed by scheduling
+requests older than this interval on the compute nodes which did not report
+their usage since, e.g. because the build never reached them.
+
+This option is only used by the FilterScheduler and its subclasses; if you use
+a different scheduler, this option has no effect. Also note that this setting
+only has an effect if the 'host_state_cache' option is enabled.
+
+Related options:
+
+* host_state_cache
+"""),
+    cfg.BoolOpt("columnar_scheduling",
+        default=False,
+        help="""
+Evaluate the filters and weighers over all the hosts at once.
+
+When this option is enabled, the host states are viewed as columns of numpy
+arrays and the filters and weighers providing a vectorized implementation
+(such as the RamFilter, CoreFilter, DiskFilter,
+AggregateInstanceExtraSpecsFilter and the RAM, CPU, disk and IO ops weighers)
+evaluate all the candidate hosts with a few array operations instead of once
+per host. The other filters and weighers are run per host as usual.
+
+This requires the numpy library to be installed; if it is not, this option is
+ignored.
+
+This option is only used by the FilterScheduler and its subclasses; if you use
+a different scheduler, this option has no effect.
+"""),
+    cfg.IntOpt("numa_fit_cache_size",
+        default=0,
+        min=0,
+        help="""
+Number of NUMA topology fits kept per host by the NUMATopologyFilter.
+
+Fitting the NUMA topology requested by an instance onto the NUMA topology of a
+host is the most expensive check of the NUMATopologyFilter, notably for hosts
+with many NUMA nodes and for requests with pinned CPUs, huge pages or PCI
+devices. When this option is set, the filter keeps the result of the fits of
+the latest distinct requests for each host, and reuses them until the NUMA
+topology or the PCI devices of the host change, either because the compute
+node reported its resource usage or because a scheduling request consumed
+resources from the host.
+
+This option is only used by the FilterScheduler and its subclasses; if you use
+a different scheduler, this option has no effect.
+
+Possible values:
+
+* 0, the default, to fit the topologies on every request
+* A positive integer, the number of fits kept per host
 """)]
 
 metrics_group = cfg.OptGroup(name="metrics",
@@ -0,0 +1,162 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Cache of the rendered metadata of the instances.
+
+When [api]/metadata_cache_invalidation is enabled, the rendered metadata of
+an instance is cached under the instance uuid, and the instance uuid under the
+address the metadata was rendered for. The services changing the instances
+invalidate their cached metadata through this module, which is why it lives
+outside of the metadata API and must not depend on it. Only the metadata API
+renders the metadata, since it depends on its configuration, e.g. for the
+vendor data; the compute services only cache the instance of the fixed
+addresses of the instances they spawn.
+"""
+
+from oslo_log import log as logging
+from oslo_utils import encodeutils
+
+from nova import cache_utils
+import nova.conf
+
+CONF = nova.conf.CONF
+LOG = logging.getLogger(__name__)
+
+# The fields of the instances which are exposed through their metadata.
+INSTANCE_FIELDS = frozenset([
+    'availability_zone', 'deleted', 'device_metadata', 'display_name',
+    'ec2_ids', 'flavor', 'hostname', 'image_ref', 'info_cache', 'kernel_id',
+    'key_data', 'key_name', 'keypairs', 'launch_index', 'metadata',
+    'project_id', 'ramdisk_id', 'reservation_id', 'security_groups',
+    'system_metadata', 'user_data'])
+
+_CLIENT = None
+
+
+def enabled():
+    """Return whether the rendered metadata of the instances is cached."""
+    return (CONF.api.metadata_cache_invalidation and
+            CONF.api.metadata_cache_expiration > 0)
+
+
+def shared():
+    """Return whether the cache is shared with the metadata API."""
+    return enabled() and CONF.cache.enabled
+
+
+def _get_client():
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = cache_utils.get_client(
+            expiration_time=CONF.api.metadata_cache_expiration)
+    return _CLIENT
+
+
+def _instance_key(instance_uuid):
+    return 'metadata-instance-%s' % encodeutils.safe_decode(instance_uuid)
+
+
+def _address_key(address):
+    return 'metadata-address-%s' % address
+
+
+def get_by_instance_id(instance_id):
+    """Return the cached metadata of an instance, or None."""
+    return _get_client().get(_instance_key(instance_id))
+
+
+def get_instance_uuid(address):
+    """Return the uuid of the instance cached for an address, or None."""
+    return _get_client().get(_address_key(address))
+
+
+def get_by_address(address):
+    """Return the cached metadata rendered for an address, or None."""
+    instance_uuid = get_instance_uuid(address)
+    if instance_uuid is None:
+        return None
+    meta_data = _get_client().get(_instance_key(instance_uuid))
+    # The address may have been rendered again for another address of the
+    # instance, or may now belong to another instance.
+    if meta_data is None or meta_data.address != address:
+        return None
+    return meta_data
+
+
+def store(meta_data):
+    """Cache the rendered metadata of an instance.
+
+    :param meta_data: a nova.api.metadata.base.RenderedMetadata
+    """
+    client = _get_client()
+    client.set(_instance_key(meta_data.uuid), meta_data)
+    if meta_data.address:
+        client.set(_address_key(meta_data.address), meta_data.uuid)
+
+
+def store_addresses(instance_uuid, addresses):
+    """Cache the instance the fixed addresses of an instance belong to.
+
+    The metadata API still renders the metadata on the first request, but
+    does not need to look up the instance of the requesting address.
+    """
+    client = _get_client()
+    for address in addresses:
+        client.set(_address_key(address), instance_uuid)
+
+
+def invalidate(instance_uuid, changes=None):
+    """Drop the cached metadata of an instance.
+
+    :param instance_uuid: the uuid of the instance
+    :param changes: the names of the changed fields of the instance, if
+                    only some fields changed; the metadata is only dropped
+                    when one of them is exposed through the metadata.
+    """
+    if not enabled():
+        return
+    if changes is not None and INSTANCE_FIELDS.isdisjoint(changes):
+        return
+    try:
+        _get_client().delete(_instance_key(instance_uuid))
+    except Exception:
+        # The cached metadata will expire in any case.
+        LOG.warning('Failed to invalidate the cached metadata of instance '
+                    '%s', instance_uuid, exc_info=True)
+
+
+class CacheStats(object):
+    """Metrics about the metadata cache of a metadata API worker."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.render_time = 0.0
+
+    def hit(self):
+        self.hits += 1
+
+    def miss(self, render_time):
+        self.misses += 1
+        self.render_time += render_time
+
+    def get_stats(self):
+        """Returns a dict of metrics about the usage of the cache."""
+        requests = self.hits + self.misses
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': float(self.hits) / requests if requests else 0.0,
+                'render_time_ms': (self.render_time * 1000 / self.misses
+                                   if self.misses else 0.0)}
+
+
+STATS = CacheStats()
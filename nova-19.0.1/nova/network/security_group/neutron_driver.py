@@ -26,6 +26,7 @@ from webob import exc
 
 from nova import exception
 from nova.i18n import _
+from nova import metadata_cache
 from nova.network.neutronv2 import api as neutronapi
 from nova.network.security_group import security_group_base
 from nova import utils
@@ -488,6 +489,7 @@ class SecurityGroupAPI(security_group_base.SecurityGroupBase):
             except Exception:
                 with excutils.save_and_reraise_exception():
                     LOG.exception("Neutron Error:")
+        metadata_cache.invalidate(instance.uuid)
 
     def remove_from_instance(self, context, instance, security_group_name):
         """Remove the security group associated with the instance."""
@@ -542,6 +544,7 @@ class SecurityGroupAPI(security_group_base.SecurityGroupBase):
             except Exception:
                 with excutils.save_and_reraise_exception():
                     LOG.exception("Neutron Error:")
+        metadata_cache.invalidate(instance.uuid)
         if not found_security_group:
             msg = (_("Security group %(security_group_name)s not associated "
                      "with the instance %(instance)s") %
@@ -82,6 +82,70 @@ NovaObjectDictCompat = ovoo_base.VersionedObjectDictCompat
 NovaTimestampObject = ovoo_base.TimestampedObject
 
 
+def _is_inherited(cls, base, name):
+    """Return True if cls does not override the method name of base."""
+    method = getattr(cls, name)
+    base_method = getattr(base, name)
+    return (getattr(method, '__func__', method) is
+            getattr(base_method, '__func__', base_method))
+
+
+def _is_passthrough(field, name):
+    """Return True if the field's conversion name is a no-op.
+
+    This is the case of the fields of simple types, like strings, integers
+    or booleans, whose primitive is the value itself.
+    """
+    return (_is_inherited(type(field), obj_fields.Field, name) and
+            _is_inherited(type(field._type), obj_fields.FieldType, name))
+
+
+class _ObjectSerializer(object):
+    """The primitive conversion of the fields of an object class.
+
+    This is compiled once from the field schema of the class and spares the
+    per-field conversion calls for the fields of simple types, whose
+    primitive is the value itself.
+    """
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.to_plan = []
+        self.from_plan = {}
+        for name, field in fields.items():
+            attrname = get_attrname(name)
+            self.to_plan.append(
+                (name, attrname, field,
+                 _is_passthrough(field, 'to_primitive')))
+            self.from_plan[name] = (
+                attrname, field, _is_passthrough(field, 'from_primitive'))
+
+    def to_primitive(self, obj):
+        primitive = {}
+        for name, attrname, field, passthrough in self.to_plan:
+            try:
+                value = getattr(obj, attrname)
+            except AttributeError:
+                continue
+            if not passthrough:
+                value = field.to_primitive(obj, name, value)
+            primitive[name] = value
+        return primitive
+
+    def from_primitive(self, obj, objdata):
+        from_plan = self.from_plan
+        for name, value in objdata.items():
+            try:
+                attrname, field, passthrough = from_plan[name]
+            except KeyError:
+                continue
+            if not passthrough:
+                value = field.from_primitive(obj, name, value)
+            # NOTE: This is what setting the field does, without the change
+            # tracking that is reset once the object is loaded anyway.
+            setattr(obj, attrname, field.coerce(obj, name, value))
+
+
 class NovaObject(ovoo_base.VersionedObject):
     """Base class and object factory.
 
@@ -95,6 +159,84 @@ class NovaObject(ovoo_base.VersionedObject):
     OBJ_SERIAL_NAMESPACE = 'nova_object'
     OBJ_PROJECT_NAMESPACE = 'nova'
 
+    # NOTE: The fields sent along with the changed ones when the object is
+    # saved remotely in delta mode, see obj_save_delta(). This is what save()
+    # needs to find the object, and None means that the object is always sent
+    # whole.
+    OBJ_DELTA_FIELDS = None
+
+    # NOTE: The serializers compiled for each class, see _obj_serializer()
+    _obj_serializers = {}
+
+    # NOTE: This is nova-specific
+    @classmethod
+    def _obj_serializer(cls):
+        serializer = cls._obj_serializers.get(cls)
+        # NOTE: Tests may replace the fields of a class, recompile then.
+        if serializer is None or serializer.fields is not cls.fields:
+            serializer = _ObjectSerializer(cls.fields)
+            cls._obj_serializers[cls] = serializer
+        return serializer
+
+    def obj_to_primitive(self, target_version=None, version_manifest=None):
+        """Simple base-case dehydration.
+
+        This overrides the oslo.versionedobjects implementation with a fast
+        path for the most common case, where the object is serialized at its
+        own version, using the serializer compiled for its class.
+        """
+        if target_version is not None and target_version != self.VERSION:
+            return super(NovaObject, self).obj_to_primitive(
+                target_version=target_version,
+                version_manifest=version_manifest)
+        primitive = self._obj_serializer().to_primitive(self)
+        obj = {self._obj_primitive_key('name'): self.obj_name(),
+               self._obj_primitive_key('namespace'): (
+                   self.OBJ_PROJECT_NAMESPACE),
+               self._obj_primitive_key('version'): self.VERSION,
+               self._obj_primitive_key('data'): primitive}
+        changes = [field for field in self.obj_what_changed()
+                   if field in primitive]
+        if changes:
+            obj[self._obj_primitive_key('changes')] = changes
+        return obj
+
+    @classmethod
+    def _obj_from_primitive(cls, context, objver, primitive):
+        self = cls()
+        self._context = context
+        self.VERSION = objver
+        objdata = cls._obj_primitive_field(primitive, 'data')
+        changes = cls._obj_primitive_field(primitive, 'changes', [])
+        cls._obj_serializer().from_primitive(self, objdata)
+        self._changed_fields = set([x for x in changes if x in self.fields])
+        return self
+
+    # NOTE: This is nova-specific
+    def obj_save_delta(self):
+        """Return the part of this object needed to save it remotely.
+
+        The returned copy of the object only has the changed fields and the
+        ones listed in OBJ_DELTA_FIELDS set, with the same changes, which is
+        what is needed to save it. The values of the fields are shared with
+        this object rather than copied.
+
+        If the class does not support saving deltas, i.e. OBJ_DELTA_FIELDS is
+        None, the object itself is returned.
+        """
+        if self.OBJ_DELTA_FIELDS is None:
+            return self
+        changes = self.obj_what_changed()
+        delta = self.__class__()
+        delta._context = self._context
+        delta.VERSION = self.VERSION
+        for name in changes.union(self.OBJ_DELTA_FIELDS):
+            attrname = get_attrname(name)
+            if hasattr(self, attrname):
+                setattr(delta, attrname, getattr(self, attrname))
+        delta._changed_fields = changes
+        return delta
+
     # NOTE(ndipanov): This is nova-specific
     @staticmethod
     def should_migrate_data():
@@ -463,6 +463,29 @@ class ComputeNodeList(base.ObjectListBase, base.NovaObject):
         return base.obj_make_list(context, cls(context), objects.ComputeNode,
                                   db_computes)
 
+    @staticmethod
+    @db.select_db_reader_mode
+    def _db_compute_node_get_all_changed_since(context, changed_since):
+        # NOTE: Deleted records are returned as well so that callers keeping
+        # a copy of the compute nodes can tell which ones were removed.
+        model = models.ComputeNode
+        db_computes = sa_api.model_query(
+            context, model, read_deleted='yes').filter(
+                or_(model.created_at >= changed_since,
+                    model.updated_at >= changed_since,
+                    model.deleted_at >= changed_since)).all()
+        return db_computes
+
+    @classmethod
+    def get_all_changed_since(cls, context, changed_since):
+        """Return the ComputeNode records created, updated or deleted since
+        the given datetime, including the deleted ones.
+        """
+        db_computes = cls._db_compute_node_get_all_changed_since(
+            context, changed_since)
+        return base.obj_make_list(context, cls(context), objects.ComputeNode,
+                                  db_computes)
+
     @staticmethod
     @db.select_db_reader_mode
     def _db_compute_node_get_by_hv_type(context, hv_type):
@@ -35,6 +35,7 @@ from nova.db.sqlalchemy import api as db_api
 from nova.db.sqlalchemy import models
 from nova import exception
 from nova.i18n import _
+from nova import metadata_cache
 from nova.network import model as network_model
 from nova import notifications
 from nova import objects
@@ -116,6 +117,10 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
     # Version 2.4: Added trusted_certs
     VERSION = '2.4'
 
+    # NOTE: save() finds the instance by uuid, and needs the cell name to
+    # tell whether the changes are synced between cells.
+    OBJ_DELTA_FIELDS = ('id', 'uuid', 'cell_name')
+
     fields = {
         'id': fields.IntegerField(),
 
@@ -632,6 +637,7 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
         except exception.ConstraintNotMet:
             raise exception.ObjectActionError(action='destroy',
                                               reason='host changed')
+        metadata_cache.invalidate(self.uuid)
         if cell_type == 'compute':
             cells_api = cells_rpcapi.CellsAPI()
             cells_api.instance_destroy_at_top(self._context, stale_instance)
@@ -813,6 +819,7 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
         if not updates:
             if cells_update_from_api:
                 _handle_cell_update_from_api()
+            metadata_cache.invalidate(self.uuid, changes)
             return
 
         # Cleaned needs to be turned back into an int here
@@ -843,6 +850,7 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
                 columns_to_join=_expected_cols(expected_attrs))
         self._from_db_object(context, self, inst_ref,
                              expected_attrs=expected_attrs)
+        metadata_cache.invalidate(self.uuid, changes)
 
         if cells_update_from_api:
             _handle_cell_update_from_api()
@@ -18,6 +18,7 @@ from nova.cells import opts as cells_opts
 from nova.cells import rpcapi as cells_rpcapi
 from nova.db import api as db
 from nova import exception
+from nova import metadata_cache
 from nova.objects import base
 from nova.objects import fields
 
@@ -94,6 +95,7 @@ class InstanceInfoCache(base.NovaPersistentObject, base.NovaObject):
                                                self.instance_uuid,
                                                {'network_info': nw_info_json})
             self._from_db_object(self._context, self, rv)
+            metadata_cache.invalidate(self.instance_uuid)
             if update_cells:
                 # Send a copy of ourselves before updates are applied so
                 # that cells can tell what changed.
@@ -353,6 +353,35 @@ class InstanceMappingList(base.ObjectListBase, base.NovaObject):
     def destroy_bulk(cls, context, instance_uuids):
         return cls._destroy_bulk_in_db(context, instance_uuids)
 
+    @staticmethod
+    @db_api.api_context_manager.writer
+    def _set_cell_mapping_bulk_in_db(context, instance_uuids, cell_id):
+        query = context.session.query(api_models.InstanceMapping).filter(
+                api_models.InstanceMapping.instance_uuid.in_(instance_uuids))
+        updated = query.update({'cell_id': cell_id},
+                               synchronize_session=False)
+        if updated != len(instance_uuids):
+            found = set(mapping.instance_uuid for mapping in query.all())
+            missing = set(instance_uuids) - found
+            raise exception.InstanceMappingNotFound(
+                uuid=', '.join(sorted(missing)))
+
+    @classmethod
+    def set_cell_mapping_bulk(cls, context, instance_uuids, cell_mapping):
+        """Map the given instances to a cell with a single update.
+
+        :param context: the API database request context
+        :param instance_uuids: the UUIDs of the instances to map
+        :param cell_mapping: the CellMapping of the cell the instances were
+            created in
+        :raises: InstanceMappingNotFound if any of the instances has no
+            mapping, in which case none of them is updated
+        """
+        instance_uuids = list(set(instance_uuids))
+        if instance_uuids:
+            cls._set_cell_mapping_bulk_in_db(context, instance_uuids,
+                                             cell_mapping.id)
+
     @staticmethod
     @db_api.api_context_manager.reader
     def _get_not_deleted_by_cell_and_project_from_db(context, cell_uuid,
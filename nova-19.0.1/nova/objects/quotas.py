@@ -13,8 +13,12 @@
 #    under the License.
 
 import collections
+import datetime
 
 from oslo_db import exception as db_exc
+from oslo_utils import timeutils
+from sqlalchemy import or_
+from sqlalchemy.sql import null
 
 from nova.db import api as db
 from nova.db.sqlalchemy import api as db_api
@@ -250,6 +254,73 @@ class Quotas(base.NovaObject):
         if not result:
             raise exception.QuotaClassNotFound(class_name=class_name)
 
+    @staticmethod
+    @db_api.api_context_manager.reader
+    def _get_usages_from_db(context, project_id, resources=None,
+                            user_id=None, all_users=False):
+        query = context.session.query(api_models.QuotaUsage).\
+                        filter_by(project_id=project_id)
+        if resources is not None:
+            query = query.filter(
+                api_models.QuotaUsage.resource.in_(resources))
+        if user_id:
+            query = query.filter(
+                or_(api_models.QuotaUsage.user_id == null(),
+                    api_models.QuotaUsage.user_id == user_id))
+        elif not all_users:
+            query = query.filter(api_models.QuotaUsage.user_id == null())
+        return query.all()
+
+    @staticmethod
+    @db_api.api_context_manager.reader
+    def _get_usage_project_ids_from_db(context):
+        rows = context.session.query(api_models.QuotaUsage.project_id).\
+                        filter(api_models.QuotaUsage.user_id == null()).\
+                        distinct().\
+                        all()
+        return [row.project_id for row in rows]
+
+    @staticmethod
+    @db_api.api_context_manager.writer
+    def _reset_usages_in_db(context, project_id, counts, user_id=None):
+        for scope, scope_user_id in (('project', None), ('user', user_id)):
+            if scope not in counts:
+                continue
+            # NOTE: There's no unique constraint on the QuotaUsage model, so
+            # replace the rows rather than updating them, which also takes
+            # care of any duplicate left by a concurrent reset.
+            context.session.query(api_models.QuotaUsage).\
+                        filter_by(project_id=project_id).\
+                        filter_by(user_id=scope_user_id).\
+                        filter(api_models.QuotaUsage.resource.in_(
+                            list(counts[scope]))).\
+                        delete(synchronize_session=False)
+            for resource, in_use in counts[scope].items():
+                usage_ref = api_models.QuotaUsage()
+                usage_ref.project_id = project_id
+                usage_ref.user_id = scope_user_id
+                usage_ref.resource = resource
+                usage_ref.in_use = in_use
+                usage_ref.reserved = 0
+                context.session.add(usage_ref)
+
+    @staticmethod
+    @db_api.api_context_manager.writer
+    def _update_usages_in_db(context, project_id, user_id, deltas):
+        # NOTE: The counters of the project and of the user are updated in a
+        # single transaction. Missing counters are not created, they will be
+        # when the usage is counted next.
+        for resource, delta in deltas.items():
+            if not delta:
+                continue
+            context.session.query(api_models.QuotaUsage).\
+                        filter_by(project_id=project_id).\
+                        filter_by(resource=resource).\
+                        filter(or_(api_models.QuotaUsage.user_id == null(),
+                                   api_models.QuotaUsage.user_id == user_id)).\
+                        update({'in_use': api_models.QuotaUsage.in_use +
+                                delta}, synchronize_session=False)
+
     # TODO(melwitt): Remove this method in version 2.0 of the object.
     @base.remotable
     def reserve(self, expire=None, project_id=None, user_id=None,
@@ -475,6 +546,90 @@ class Quotas(base.NovaObject):
             main_db_quotas_dict[k] = v
         return main_db_quotas_dict
 
+    # NOTE: The following methods are not remotable either, the usage
+    # counters are only stored in the api database.
+    @classmethod
+    def get_usage_counters(cls, context, project_id, resources, user_id=None,
+                           max_age=0):
+        """Get the usage counters of resources for a project and user.
+
+        :param context: The request context for database access
+        :param project_id: The project_id of the counters
+        :param resources: The names of the resources of the counters
+        :param user_id: The user_id of the counters, if the counters of the
+                        user are needed along with the ones of the project
+        :param max_age: If not 0, the maximum age in seconds of the counters
+        :returns: A dict containing the project-scoped counts and user-scoped
+                  counts if user_id is specified, in the same format as the
+                  counting functions of the countable quota resources, or
+                  None if any of the counters is missing, duplicated or older
+                  than max_age.
+        """
+        rows = cls._get_usages_from_db(context, project_id,
+                                       resources=resources, user_id=user_id)
+        counts = {'project': {}}
+        if user_id:
+            counts['user'] = {}
+        if len(rows) != len(resources) * len(counts):
+            return None
+        if max_age:
+            oldest = timeutils.utcnow() - datetime.timedelta(seconds=max_age)
+        for row in rows:
+            # NOTE: The counters are created when they are reconciled and
+            # only updated afterwards, so they are as old as their creation.
+            if max_age and row.created_at < oldest:
+                return None
+            scope = 'user' if row.user_id else 'project'
+            counts[scope][row.resource] = row.in_use
+        if any(len(scope_counts) != len(resources)
+               for scope_counts in counts.values()):
+            return None
+        return counts
+
+    @classmethod
+    def get_all_usage_counters(cls, context, project_id):
+        """Get all the usage counters of a project and its users.
+
+        :returns: A dict of {user_id: {resource: in_use}}, where the counters
+                  of the project itself have a None user_id.
+        """
+        counters = collections.defaultdict(dict)
+        for row in cls._get_usages_from_db(context, project_id,
+                                           all_users=True):
+            counters[row.user_id][row.resource] = row.in_use
+        return dict(counters)
+
+    @classmethod
+    def get_usage_counter_project_ids(cls, context):
+        """Get the IDs of the projects which have usage counters."""
+        return cls._get_usage_project_ids_from_db(context)
+
+    @classmethod
+    def reset_usage_counters(cls, context, project_id, counts, user_id=None):
+        """Reset the usage counters of a project and user to counts.
+
+        :param context: The request context for database access
+        :param project_id: The project_id of the counters
+        :param counts: A dict containing the project-scoped counts and
+                       user-scoped counts if user_id is specified, as returned
+                       by the counting functions of the countable quota
+                       resources
+        :param user_id: The user_id of the user-scoped counts
+        """
+        cls._reset_usages_in_db(context, project_id, counts, user_id=user_id)
+
+    @classmethod
+    def update_usage_counters(cls, context, project_id, user_id, deltas):
+        """Apply deltas to the usage counters of a project and user.
+
+        :param context: The request context for database access
+        :param project_id: The project_id of the counters
+        :param user_id: The user_id of the counters
+        :param deltas: A dict of {resource_name: delta, ...} to add to the
+                       counters
+        """
+        cls._update_usages_in_db(context, project_id, user_id, deltas)
+
 
 @base.NovaObjectRegistry.register
 class QuotasNoOp(Quotas):
@@ -14,7 +14,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import copy
+import collections
 
 from oslo_config import cfg
 from oslo_log import log as logging
@@ -31,6 +31,15 @@ CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
 
 
+def _freeze(value):
+    """Return a hashable version of a PCI request spec."""
+    if isinstance(value, dict):
+        return frozenset((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
 class PciDeviceStats(object):
 
     """PCI devices summary information.
@@ -57,14 +66,76 @@ class PciDeviceStats(object):
 
     pool_keys = ['product_id', 'vendor_id', 'numa_node', 'dev_type']
 
+    # The properties the pools are indexed by, in the order they are looked
+    # up in the specs of the requests.
+    index_keys = ('product_id', 'vendor_id', 'physical_network')
+
     def __init__(self, stats=None, dev_filter=None):
         super(PciDeviceStats, self).__init__()
         # NOTE(sbauza): Stats are a PCIDevicePoolList object
         self.pools = [pci_pool.to_dict()
                       for pci_pool in stats] if stats else []
         self.pools.sort(key=lambda item: len(item))
-        self.dev_filter = dev_filter or whitelist.Whitelist(
-            CONF.pci.passthrough_whitelist)
+        self._dev_filter = dev_filter
+        self._reset_index()
+
+    @property
+    def dev_filter(self):
+        # NOTE: The whitelist is only needed to add or remove devices, which
+        # the stats of the scheduler never do, so it is parsed on first use.
+        if self._dev_filter is None:
+            self._dev_filter = whitelist.Whitelist(
+                CONF.pci.passthrough_whitelist)
+        return self._dev_filter
+
+    def _reset_index(self):
+        """Drop the index of the pools, once pools are added or removed."""
+        self._index = None
+        self._spec_matches = {}
+
+    def _get_index(self):
+        """Return the positions of the pools by their indexed properties."""
+        if self._index is None:
+            self._index = collections.defaultdict(list)
+            for position, pool in enumerate(self.pools):
+                for key in self.index_keys:
+                    value = pool.get(key)
+                    if isinstance(value, six.string_types):
+                        self._index[(key, value.lower())].append(position)
+        return self._index
+
+    def _match_spec(self, request_specs):
+        """Return the positions of the pools matching any of the specs.
+
+        The pools are looked up in the index by the first indexed property
+        of each spec, if any, so only these candidates are matched against
+        the specs. The result is cached until pools are added or removed.
+        """
+        try:
+            specs_key = _freeze(request_specs)
+            positions = self._spec_matches.get(specs_key)
+        except TypeError:
+            specs_key = positions = None
+        if positions is not None:
+            return positions
+
+        index = self._get_index()
+        candidates = set()
+        for spec in request_specs:
+            for key in self.index_keys:
+                value = spec.get(key)
+                if isinstance(value, six.string_types):
+                    candidates.update(index.get((key, value.lower()), ()))
+                    break
+            else:
+                candidates = range(len(self.pools))
+                break
+        positions = [position for position in sorted(candidates)
+                     if utils.pci_device_prop_match(self.pools[position],
+                                                    request_specs)]
+        if specs_key is not None:
+            self._spec_matches[specs_key] = positions
+        return positions
 
     def _equal_properties(self, dev, entry, matching_keys):
         return all(dev.get(prop) == entry.get(prop)
@@ -115,6 +186,7 @@ class PciDeviceStats(object):
                 dev_pool['devices'] = []
                 self.pools.append(dev_pool)
                 self.pools.sort(key=lambda item: len(item))
+                self._reset_index()
                 pool = dev_pool
             pool['count'] += 1
             pool['devices'].append(dev)
@@ -123,7 +195,8 @@ class PciDeviceStats(object):
     def _decrease_pool_count(pool_list, pool, count=1):
         """Decrement pool's size by count.
 
-        If pool becomes empty, remove pool from pool_list.
+        If pool becomes empty, remove pool from pool_list. The index of the
+        pools must then be reset if pool_list is self.pools.
         """
         if pool['count'] > count:
             pool['count'] -= count
@@ -142,7 +215,10 @@ class PciDeviceStats(object):
                 raise exception.PciDevicePoolEmpty(
                     compute_node_id=dev.compute_node_id, address=dev.address)
             pool['devices'].remove(dev)
+            num_pools = len(self.pools)
             self._decrease_pool_count(self.pools, pool)
+            if len(self.pools) != num_pools:
+                self._reset_index()
 
     def get_free_devs(self):
         free_devs = []
@@ -216,10 +292,15 @@ class PciDeviceStats(object):
             except exception.PciDeviceNotFound:
                 return
 
-    @staticmethod
-    def _filter_pools_for_spec(pools, request_specs):
-        return [pool for pool in pools
-                if utils.pci_device_prop_match(pool, request_specs)]
+    def _filter_pools_for_spec(self, pools, request_specs):
+        """Filter out pools which do not match any of the specs.
+
+        :param pools: self.pools, or a list of copies of its pools in the
+            same order.
+        :param request_specs: A list of PCI device property requirements.
+        """
+        return [pools[position]
+                for position in self._match_spec(request_specs)]
 
     @classmethod
     def _filter_pools_for_numa_cells(cls, pools, numa_cells, numa_policy,
@@ -246,12 +327,11 @@ class PciDeviceStats(object):
         # NOTE(stephenfin): We may wish to change the default policy at a later
         # date
         requested_policy = numa_policy or fields.PCINUMAAffinityPolicy.LEGACY
-        numa_cell_ids = [cell.id for cell in numa_cells]
+        numa_cell_ids = set(cell.id for cell in numa_cells)
 
         # filter out pools which numa_node is not included in numa_cell_ids
         filtered_pools = [
-            pool for pool in pools if any(utils.pci_device_prop_match(
-                pool, [{'numa_node': cell}]) for cell in numa_cell_ids)]
+            pool for pool in pools if pool.get('numa_node') in numa_cell_ids]
 
         # we can't apply a less strict policy than the one requested, so we
         # need to return if we've demanded a NUMA affinity of REQUIRED.
@@ -265,12 +345,11 @@ class PciDeviceStats(object):
         # case None is reported in 'pci_device.numa_node'. The LEGACY policy
         # allows us to use these devices so we include None in the list of
         # suitable NUMA cells.
-        numa_cell_ids.append(None)
+        numa_cell_ids.add(None)
 
         # filter out pools which numa_node is not included in numa_cell_ids
         filtered_pools = [
-            pool for pool in pools if any(utils.pci_device_prop_match(
-                pool, [{'numa_node': cell}]) for cell in numa_cell_ids)]
+            pool for pool in pools if pool.get('numa_node') in numa_cell_ids]
 
         # once again, we can't apply a less strict policy than the one
         # requested, so we need to return if we've demanded a NUMA affinity of
@@ -310,7 +389,9 @@ class PciDeviceStats(object):
         If ``numa_cells`` is provided then NUMA locality may be taken into
         account, depending on the value of ``request.numa_policy``.
 
-        :param pools: A list of PCI device pool dicts
+        :param pools: self.pools, or a list of copies of its pools in the
+            same order. The devices are consumed from these pools, which are
+            kept even when emptied.
         :param request: An InstancePCIRequest object describing the type,
             quantity and required NUMA affinity of device(s) we want..
         :param numa_cells: A list of InstanceNUMACell objects whose ``id``
@@ -348,7 +429,9 @@ class PciDeviceStats(object):
             return False
         else:
             for pool in matching_pools:
-                count = self._decrease_pool_count(pools, pool, count)
+                num_alloc = min(pool['count'], count)
+                pool['count'] -= num_alloc
+                count -= num_alloc
                 if not count:
                     break
         return True
@@ -371,7 +454,9 @@ class PciDeviceStats(object):
         """
         # note (yjiang5): this function has high possibility to fail,
         # so no exception should be triggered for performance reason.
-        pools = copy.deepcopy(self.pools)
+        # Only the counts of the pools are changed by _apply_request(), so
+        # the devices do not need to be copied.
+        pools = [dict(pool) for pool in self.pools]
         return all(self._apply_request(pools, r, numa_cells) for r in requests)
 
     def apply_requests(self, requests, numa_cells=None):
@@ -391,8 +476,18 @@ class PciDeviceStats(object):
         :raises: exception.PciDeviceRequestFailed if this compute node cannot
             satisfy the given request.
         """
-        if not all(self._apply_request(self.pools, r, numa_cells)
-                   for r in requests):
+        counts = [pool['count'] for pool in self.pools]
+        applied = all(self._apply_request(self.pools, r, numa_cells)
+                      for r in requests)
+
+        # Remove the pools emptied by the requests
+        pools = [pool for pool, count in zip(self.pools, counts)
+                 if pool['count'] or not count]
+        if len(pools) != len(self.pools):
+            self.pools = pools
+            self._reset_index()
+
+        if not applied:
             raise exception.PciDeviceRequestFailed(requests=requests)
 
     def __iter__(self):
@@ -406,6 +501,7 @@ class PciDeviceStats(object):
     def clear(self):
         """Clear all the stats maintained."""
         self.pools = []
+        self._reset_index()
 
     def __eq__(self, other):
         return self.pools == other.pools
@@ -33,6 +33,10 @@ LOG = logging.getLogger(__name__)
 
 CONF = nova.conf.CONF
 
+# The resources counted by _instances_cores_ram_count(), which can be read
+# from usage counters, see [quota]/usage_counters.
+INSTANCE_RESOURCES = ('instances', 'cores', 'ram')
+
 
 class DbQuotaDriver(object):
     """Driver to perform necessary checks to enforce quotas and obtain
@@ -1124,6 +1128,10 @@ def _floating_ip_count(context, project_id):
 def _instances_cores_ram_count(context, project_id, user_id=None):
     """Get the counts of instances, cores, and ram in the database.
 
+    If [quota]/usage_counters is enabled, the counts are read from the usage
+    counters of the project and user. If the counters are missing or too old,
+    the counts are taken from the cells and the counters are reset to them.
+
     :param context: The request context for database access
     :param project_id: The project_id to count across
     :param user_id: The user_id to count across
@@ -1137,6 +1145,37 @@ def _instances_cores_ram_count(context, project_id, user_id=None):
                           'cores': <count across user>,
                           'ram': <count across user>}}
     """
+    if not CONF.quota.usage_counters:
+        return _instances_cores_ram_count_in_cells(
+            context, project_id, user_id=user_id)[0]
+
+    counts = objects.Quotas.get_usage_counters(
+        context, project_id, INSTANCE_RESOURCES, user_id=user_id,
+        max_age=CONF.quota.usage_counters_max_age)
+    if counts is not None:
+        return counts
+    counts, complete = _instances_cores_ram_count_in_cells(
+        context, project_id, user_id=user_id)
+    # NOTE: Do not store counts which are missing the instances of a cell.
+    if complete:
+        LOG.debug('Resetting the usage counters of project %(project)s and '
+                  'user %(user)s to %(counts)s',
+                  {'project': project_id, 'user': user_id, 'counts': counts})
+        objects.Quotas.reset_usage_counters(context, project_id, counts,
+                                            user_id=user_id)
+    return counts
+
+
+def _instances_cores_ram_count_in_cells(context, project_id, user_id=None):
+    """Count the instances, cores, and ram in the cells.
+
+    :param context: The request context for database access
+    :param project_id: The project_id to count across
+    :param user_id: The user_id to count across
+    :returns: A tuple of the counts, in the format returned by
+              _instances_cores_ram_count(), and of whether all the cells
+              could be counted.
+    """
     # TODO(melwitt): Counting across cells for instances means we will miss
     # counting resources if a cell is down. In the future, we should query
     # placement for cores/ram and InstanceMappings for instances (once we are
@@ -1155,6 +1194,7 @@ def _instances_cores_ram_count(context, project_id, user_id=None):
     total_counts = {'project': {'instances': 0, 'cores': 0, 'ram': 0}}
     if user_id:
         total_counts['user'] = {'instances': 0, 'cores': 0, 'ram': 0}
+    complete = True
     for result in results.values():
         if not nova_context.is_cell_failure_sentinel(result):
             for resource, count in result['project'].items():
@@ -1162,7 +1202,64 @@ def _instances_cores_ram_count(context, project_id, user_id=None):
             if user_id:
                 for resource, count in result['user'].items():
                     total_counts['user'][resource] += count
-    return total_counts
+        else:
+            complete = False
+    return total_counts, complete
+
+
+def update_usage_counters(context, project_id, user_id, deltas):
+    """Apply deltas to the usage counters of a project and user.
+
+    This is a no-op unless [quota]/usage_counters is enabled. A failure to
+    update the counters is logged rather than raised, the counters will be
+    reconciled with the actual usage once they are too old.
+
+    :param context: The request context for database access
+    :param project_id: The project_id of the counters
+    :param user_id: The user_id of the counters
+    :param deltas: A dict of {resource_name: delta, ...} to add to the
+                   counters
+    """
+    if not CONF.quota.usage_counters:
+        return
+    try:
+        objects.Quotas.update_usage_counters(context, project_id, user_id,
+                                             deltas)
+    except Exception:
+        LOG.exception('Failed to update the usage counters of project '
+                      '%(project)s and user %(user)s by %(deltas)s',
+                      {'project': project_id, 'user': user_id,
+                       'deltas': deltas})
+
+
+def update_instance_usage_counters(context, instance, sign=1):
+    """Update the usage counters for the creation of an instance.
+
+    :param context: The request context for database access
+    :param instance: The instance created, or deleted if sign is -1
+    :param sign: 1 if the instance was created, -1 if it was deleted
+    """
+    if not CONF.quota.usage_counters:
+        return
+    update_usage_counters(context, instance.project_id, instance.user_id,
+                          {'instances': sign,
+                           'cores': sign * instance.vcpus,
+                           'ram': sign * instance.memory_mb})
+
+
+def update_resize_usage_counters(context, instance, new_flavor, old_flavor):
+    """Update the usage counters for the resize of an instance.
+
+    :param context: The request context for database access
+    :param instance: The instance resized
+    :param new_flavor: The flavor the instance is resized to
+    :param old_flavor: The flavor the instance is resized from
+    """
+    if not CONF.quota.usage_counters:
+        return
+    update_usage_counters(context, instance.project_id, instance.user_id,
+                          {'cores': new_flavor.vcpus - old_flavor.vcpus,
+                           'ram': new_flavor.memory_mb - old_flavor.memory_mb})
 
 
 def _server_group_count(context, project_id, user_id=None):
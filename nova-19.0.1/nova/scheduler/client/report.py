@@ -668,7 +668,7 @@ class SchedulerReportClient(object):
                 # Don't add the created_rp to rps_to_refresh.  Since we just
                 # created it, it has no aggregates or traits.
                 # But do mark it as having just been "refreshed".
-                self._association_refresh_time[uuid] = time.time()
+                self._mark_associations_refreshed(uuid)
 
             self._provider_tree.populate_from_iterable(
                 rps_to_refresh or [created_rp])
@@ -819,7 +819,25 @@ class SchedulerReportClient(object):
                     self._refresh_associations(context, rp['uuid'],
                                                force=force,
                                                refresh_sharing=False)
-            self._association_refresh_time[rp_uuid] = time.time()
+            self._mark_associations_refreshed(rp_uuid)
+
+    def _mark_associations_refreshed(self, uuid):
+        """Record that the associations of the specified provider have just
+        been refreshed.
+
+        The refresh time is backdated by a random amount of up to
+        CONF.compute.resource_provider_association_refresh_jitter seconds, so
+        that compute services started at the same time do not keep refreshing
+        their providers in lockstep, in bursts of placement API requests.
+        """
+        # Never backdate by more than the refresh interval, which would make
+        # the associations stale right away.
+        jitter = min(CONF.compute.resource_provider_association_refresh_jitter,
+                     CONF.compute.resource_provider_association_refresh)
+        refresh_time = time.time()
+        if jitter:
+            refresh_time -= random.uniform(0, jitter)
+        self._association_refresh_time[uuid] = refresh_time
 
     def _associations_stale(self, uuid):
         """Respond True if aggregates and traits have not been refreshed
@@ -871,8 +889,11 @@ class SchedulerReportClient(object):
         self._ensure_resource_provider(
             context, rp_uuid, name=name,
             parent_provider_uuid=parent_provider_uuid)
-        # Return a *copy* of the tree.
-        return copy.deepcopy(self._provider_tree)
+        # Return a *copy* of the tree, marked clean so that only the changes
+        # made to it by the caller are flushed by update_from_provider_tree().
+        new_tree = copy.deepcopy(self._provider_tree)
+        new_tree.mark_clean()
+        return new_tree
 
     def set_inventory_for_provider(self, context, rp_uuid, inv_data):
         """Given the UUID of a provider, set the inventory records for the
@@ -1286,6 +1307,11 @@ class SchedulerReportClient(object):
         changes are flushed back to the placement service.  Upon successful
         completion, the local cache should reflect the specified ProviderTree.
 
+        Only the inventories, traits and aggregates reported as changed by
+        ProviderTree.get_dirty_fields() are compared and flushed.  For a tree
+        returned by get_provider_tree_and_ensure_root(), these are the ones
+        changed by the caller; for a tree built from scratch, all of them.
+
         This method is best-effort and not atomic.  When exceptions are raised,
         it is possible that some of the changes have been flushed back, leaving
         the placement database in an inconsistent state.  This should be
@@ -1426,14 +1452,27 @@ class SchedulerReportClient(object):
         # order ensures we at least try to process all of the providers. (We
         # get the UUIDs in bottom-up order by reversing new_uuids, which was
         # given to us in top-down order per ProviderTree.get_provider_uuids().)
+        # The fields which were not changed in new_tree are the same as in the
+        # local cache it was copied from, so they are not even compared.
+        flushed = 0
         for uuid in reversed(new_uuids):
+            dirty = new_tree.get_dirty_fields(uuid)
+            if not dirty:
+                continue
+            flushed += 1
             pd = new_tree.data(uuid)
             with catch_all(pd.uuid):
-                self.set_inventory_for_provider(
-                    context, pd.uuid, pd.inventory)
-                self.set_aggregates_for_provider(
-                    context, pd.uuid, pd.aggregates)
-                self.set_traits_for_provider(context, pd.uuid, pd.traits)
+                if provider_tree.INVENTORY in dirty:
+                    self.set_inventory_for_provider(
+                        context, pd.uuid, pd.inventory)
+                if provider_tree.AGGREGATES in dirty:
+                    self.set_aggregates_for_provider(
+                        context, pd.uuid, pd.aggregates)
+                if provider_tree.TRAITS in dirty:
+                    self.set_traits_for_provider(context, pd.uuid, pd.traits)
+        LOG.debug("Flushed changes of %(flushed)d of %(total)d resource "
+                  "providers to placement",
+                  {'flushed': flushed, 'total': len(new_uuids)})
 
     # TODO(efried): Cut users of this method over to get_allocs_for_consumer
     def get_allocations_for_consumer(self, context, consumer):
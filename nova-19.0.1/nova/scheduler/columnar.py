@@ -0,0 +1,187 @@
+# Copyright (c) 2019 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Columnar filtering and weighing of hosts.
+
+Instead of calling each filter and weigher once per host, the host states are
+viewed as columns of numpy arrays so that filters and weighers providing a
+vectorized implementation evaluate all the hosts at once. Filters and weighers
+without such an implementation are run per host as usual.
+"""
+
+from oslo_log import log as logging
+from oslo_utils import importutils
+
+from nova.scheduler import utils
+from nova.scheduler import weights
+
+np = importutils.try_import('numpy')
+
+LOG = logging.getLogger(__name__)
+
+
+def is_supported():
+    """Returns True if numpy is available to use columnar scheduling."""
+    return np is not None
+
+
+class HostColumns(object):
+    """Columnar view of a list of HostState objects.
+
+    Columns are built lazily from the host states the first time they are
+    requested and are kept when a subset of the hosts is selected, so that
+    each attribute is read at most once per host and request.
+    """
+
+    def __init__(self, hosts, columns=None):
+        self.hosts = list(hosts)
+        self._columns = columns or {}
+
+    def __len__(self):
+        return len(self.hosts)
+
+    def column(self, name, dtype=float):
+        """Returns an array of the given HostState attribute."""
+        column = self._columns.get(name)
+        if column is None:
+            column = np.array([getattr(host, name) for host in self.hosts],
+                              dtype=dtype)
+            self._columns[name] = column
+        return column
+
+    def values(self, func, dtype=float):
+        """Returns an array of the results of func for each host."""
+        return np.array([func(host) for host in self.hosts], dtype=dtype)
+
+    def aggregate_values(self, func, dtype=float):
+        """Returns an array of the results of func for each host, where the
+        result of func only depends on the aggregates of the host.
+
+        func is only called once per distinct set of aggregates.
+        """
+        results = {}
+        values = []
+        for host in self.hosts:
+            key = frozenset(agg.id for agg in host.aggregates)
+            if key not in results:
+                results[key] = func(host)
+            values.append(results[key])
+        return np.array(values, dtype=dtype)
+
+    def set_limit(self, mask, name, values):
+        """Sets the given limit of the hosts selected by a boolean array."""
+        for i in np.flatnonzero(mask):
+            self.hosts[i].limits[name] = float(values[i])
+
+    def select(self, mask):
+        """Returns the HostColumns of the hosts selected by a boolean array."""
+        indices = np.flatnonzero(mask)
+        hosts = [self.hosts[i] for i in indices]
+        columns = {name: column[indices]
+                   for name, column in self._columns.items()}
+        return HostColumns(hosts, columns)
+
+
+def get_filtered_hosts(filters, hosts, spec_obj, index=0):
+    """Filter hosts and return only ones passing all filters.
+
+    Filters providing a vectorized implementation through hosts_pass() are
+    evaluated over all the hosts at once, the other ones through filter_all().
+    """
+    host_columns = HostColumns(hosts)
+    LOG.debug("Starting with %d host(s)", len(host_columns))
+    is_rebuild = utils.request_is_rebuild(spec_obj)
+    for filter_ in filters:
+        if not filter_.run_filter_for_index(index):
+            continue
+        cls_name = filter_.__class__.__name__
+        mask = None
+        # NOTE: filter_all() already takes care of the filters which should
+        # not run for a rebuild.
+        if not is_rebuild or filter_.RUN_ON_REBUILD:
+            mask = filter_.hosts_pass(host_columns, spec_obj)
+        if mask is None:
+            objs = filter_.filter_all(host_columns.hosts, spec_obj)
+            if objs is None:
+                LOG.debug("Filter %s says to stop filtering", cls_name)
+                return
+            passed = set(id(obj) for obj in objs)
+            mask = np.array([id(host) in passed
+                             for host in host_columns.hosts], dtype=bool)
+        host_columns = host_columns.select(mask)
+        if not host_columns.hosts:
+            LOG.info("Filter %s returned 0 hosts", cls_name)
+            LOG.info("Filtering removed all hosts for the request with "
+                     "instance ID '%s'", spec_obj.instance_uuid)
+            break
+        LOG.debug("Filter %(cls_name)s returned %(obj_len)d host(s)",
+                  {'cls_name': cls_name, 'obj_len': len(host_columns)})
+    return host_columns.hosts
+
+
+def _update_bounds(weigher, weights):
+    # NOTE: Record the min and max values the same way as
+    # BaseWeigher.weigh_objects() does, so that both paths normalize the
+    # weights alike.
+    if not len(weights):
+        return
+    minval = weights.min()
+    maxval = weights.max()
+    if weigher.minval is None or minval < weigher.minval:
+        weigher.minval = minval
+    if weigher.maxval is None or maxval > weigher.maxval:
+        weigher.maxval = maxval
+
+
+def _normalize(values, minval, maxval):
+    minval = float(minval)
+    maxval = float(maxval)
+    if minval == maxval:
+        return np.zeros(len(values))
+    return (values - minval) / (maxval - minval)
+
+
+def get_weighed_hosts(weighers, hosts, spec_obj):
+    """Return a sorted (descending), normalized list of WeighedHosts.
+
+    Weighers providing a vectorized implementation through weigh_columns()
+    are evaluated over all the hosts at once, the other ones through
+    weigh_objects().
+    """
+    host_columns = HostColumns(hosts)
+    weighed_objs = [weights.WeighedHost(host, 0.0)
+                    for host in host_columns.hosts]
+    if len(weighed_objs) <= 1:
+        return weighed_objs
+
+    totals = np.zeros(len(weighed_objs))
+    for weigher in weighers:
+        values = weigher.weigh_columns(host_columns, spec_obj)
+        if values is None:
+            values = np.array(
+                weigher.weigh_objects(weighed_objs, spec_obj), dtype=float)
+            multipliers = host_columns.values(weigher.weight_multiplier)
+        else:
+            values = np.asarray(values, dtype=float)
+            _update_bounds(weigher, values)
+            multipliers = weigher.weight_multipliers(host_columns)
+        totals += multipliers * _normalize(values, weigher.minval,
+                                           weigher.maxval)
+
+    for weighed_obj, total in zip(weighed_objs, totals):
+        weighed_obj.weight = float(total)
+    order = np.argsort(-totals, kind='mergesort')
+    return [weighed_objs[i] for i in order]
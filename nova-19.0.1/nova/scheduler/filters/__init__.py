@@ -49,6 +49,14 @@ class BaseHostFilter(filters.BaseFilter):
         """
         raise NotImplementedError()
 
+    def hosts_pass(self, host_columns, spec_obj):
+        """Return a boolean array telling which hosts of the
+        nova.scheduler.columnar.HostColumns pass the filter, or None if the
+        filter has no vectorized implementation.
+        Override this in a subclass.
+        """
+        return None
+
 
 class HostFilterHandler(filters.BaseFilterHandler):
     def __init__(self):
@@ -77,3 +77,9 @@ class AggregateInstanceExtraSpecsFilter(filters.BaseHostFilter):
                            'aggregate_vals': aggregate_vals})
                 return False
         return True
+
+    def hosts_pass(self, host_columns, spec_obj):
+        # The result only depends on the aggregates of the host
+        return host_columns.aggregate_values(
+            lambda host_state: self.host_passes(host_state, spec_obj),
+            dtype=bool)
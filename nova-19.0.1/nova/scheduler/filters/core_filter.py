@@ -30,6 +30,11 @@ class BaseCoreFilter(filters.BaseHostFilter):
     def _get_cpu_allocation_ratio(self, host_state, spec_obj):
         raise NotImplementedError
 
+    def _get_cpu_allocation_ratios(self, host_columns, spec_obj):
+        return host_columns.values(
+            lambda host_state: self._get_cpu_allocation_ratio(host_state,
+                                                              spec_obj))
+
     def host_passes(self, host_state, spec_obj):
         """Return True if host has sufficient CPU cores.
 
@@ -74,6 +79,26 @@ class BaseCoreFilter(filters.BaseHostFilter):
 
         return True
 
+    def hosts_pass(self, host_columns, spec_obj):
+        """Return the hosts which have sufficient CPU cores."""
+        instance_vcpus = spec_obj.vcpus
+        host_vcpus_total = host_columns.column('vcpus_total')
+        cpu_allocation_ratio = self._get_cpu_allocation_ratios(host_columns,
+                                                               spec_obj)
+        vcpus_total = host_vcpus_total * cpu_allocation_ratio
+        has_limit = vcpus_total > 0
+
+        # Do not allow an instance to overcommit against itself, only
+        # against other instances.
+        passes = ~(has_limit & (instance_vcpus > host_vcpus_total))
+        free_vcpus = vcpus_total - host_columns.column('vcpus_used')
+        passes &= free_vcpus >= instance_vcpus
+        # Fail safe for the hosts not reporting their VCPUs
+        passes |= host_vcpus_total == 0
+
+        host_columns.set_limit(passes & has_limit, 'vcpu', vcpus_total)
+        return passes
+
 
 class CoreFilter(BaseCoreFilter):
     """DEPRECATED: CoreFilter filters based on CPU core utilization."""
@@ -90,6 +115,9 @@ class CoreFilter(BaseCoreFilter):
     def _get_cpu_allocation_ratio(self, host_state, spec_obj):
         return host_state.cpu_allocation_ratio
 
+    def _get_cpu_allocation_ratios(self, host_columns, spec_obj):
+        return host_columns.column('cpu_allocation_ratio')
+
 
 class AggregateCoreFilter(BaseCoreFilter):
     """AggregateCoreFilter with per-aggregate CPU subscription flag.
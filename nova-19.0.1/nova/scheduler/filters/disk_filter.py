@@ -41,6 +41,9 @@ class DiskFilter(filters.BaseHostFilter):
     def _get_disk_allocation_ratio(self, host_state, spec_obj):
         return host_state.disk_allocation_ratio
 
+    def _get_disk_allocation_ratios(self, host_columns, spec_obj):
+        return host_columns.column('disk_allocation_ratio')
+
     def host_passes(self, host_state, spec_obj):
         """Filter based on disk usage."""
         requested_disk = (1024 * (spec_obj.root_gb +
@@ -82,6 +85,27 @@ class DiskFilter(filters.BaseHostFilter):
         host_state.limits['disk_gb'] = disk_gb_limit
         return True
 
+    def hosts_pass(self, host_columns, spec_obj):
+        """Filter based on disk usage."""
+        requested_disk = (1024 * (spec_obj.root_gb +
+                                  spec_obj.ephemeral_gb) +
+                          spec_obj.swap)
+
+        free_disk_mb = host_columns.column('free_disk_mb')
+        total_usable_disk_mb = (
+            host_columns.column('total_usable_disk_gb') * 1024)
+        disk_allocation_ratio = self._get_disk_allocation_ratios(
+            host_columns, spec_obj)
+
+        disk_mb_limit = total_usable_disk_mb * disk_allocation_ratio
+        used_disk_mb = total_usable_disk_mb - free_disk_mb
+        usable_disk_mb = disk_mb_limit - used_disk_mb
+        passes = ((total_usable_disk_mb >= requested_disk) &
+                  (usable_disk_mb >= requested_disk))
+
+        host_columns.set_limit(passes, 'disk_gb', disk_mb_limit / 1024)
+        return passes
+
 
 class AggregateDiskFilter(DiskFilter):
     """AggregateDiskFilter with per-aggregate disk allocation ratio flag.
@@ -106,3 +130,8 @@ class AggregateDiskFilter(DiskFilter):
             ratio = host_state.disk_allocation_ratio
 
         return ratio
+
+    def _get_disk_allocation_ratios(self, host_columns, spec_obj):
+        return host_columns.values(
+            lambda host_state: self._get_disk_allocation_ratio(host_state,
+                                                               spec_obj))
@@ -10,21 +10,90 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+
 from oslo_log import log as logging
+import six
 
+import nova.conf
 from nova import objects
 from nova.objects import fields
 from nova.scheduler import filters
 from nova.virt import hardware
 
+CONF = nova.conf.CONF
 LOG = logging.getLogger(__name__)
 
 
+def _primitive_key(primitive):
+    """Return a hashable key for an object primitive.
+
+    The changes recorded in the primitives are ignored as they do not
+    change what the object requests.
+    """
+    if isinstance(primitive, dict):
+        return tuple(sorted(
+            (key, _primitive_key(value))
+            for key, value in six.iteritems(primitive)
+            if key != 'nova_object.changes'))
+    if isinstance(primitive, (set, frozenset)):
+        return tuple(sorted(primitive))
+    if isinstance(primitive, (list, tuple)):
+        return tuple(_primitive_key(value) for value in primitive)
+    return primitive
+
+
 class NUMATopologyFilter(filters.BaseHostFilter):
     """Filter on requested NUMA topology."""
 
     RUN_ON_REBUILD = True
 
+    def __init__(self):
+        super(NUMATopologyFilter, self).__init__()
+        # Results of the latest fits per (host, node), along with the NUMA
+        # topology version of the host state they were computed for, see
+        # [filter_scheduler]/numa_fit_cache_size
+        self._fits = {}
+
+    def _cached_fits(self, host_state):
+        """Return the cached fits of a host, or None if not cacheable."""
+        version = getattr(host_state, 'numa_topology_version', None)
+        if not CONF.filter_scheduler.numa_fit_cache_size or version is None:
+            return None
+        key = (host_state.host, host_state.nodename)
+        cached_version, fits = self._fits.get(key, (None, None))
+        if cached_version != version:
+            fits = collections.OrderedDict()
+            self._fits[key] = (version, fits)
+        return fits
+
+    @staticmethod
+    def _fit_key(requested_topology, limits, pci_requests):
+        return _primitive_key([
+            requested_topology.obj_to_primitive(),
+            limits.obj_to_primitive(),
+            [request.obj_to_primitive() for request in pci_requests or []]])
+
+    def _fit_instance_to_host(self, host_state, host_topology,
+                              requested_topology, limits, pci_requests):
+        """Return whether the requested topology fits on the host."""
+        fits = self._cached_fits(host_state)
+        if fits is None:
+            return bool(hardware.numa_fit_instance_to_host(
+                host_topology, requested_topology, limits=limits,
+                pci_requests=pci_requests, pci_stats=host_state.pci_stats))
+
+        key = self._fit_key(requested_topology, limits, pci_requests)
+        fit = fits.pop(key, None)
+        if fit is None:
+            fit = bool(hardware.numa_fit_instance_to_host(
+                host_topology, requested_topology, limits=limits,
+                pci_requests=pci_requests, pci_stats=host_state.pci_stats))
+        fits[key] = fit
+        while len(fits) > CONF.filter_scheduler.numa_fit_cache_size:
+            fits.popitem(last=False)
+        return fit
+
     def _satisfies_cpu_policy(self, host_state, extra_specs, image_props):
         """Check that the host_state provided satisfies any available
         CPU policy requirements.
@@ -95,12 +164,9 @@ class NUMATopologyFilter(filters.BaseHostFilter):
             if network_metadata:
                 limits.network_metadata = network_metadata
 
-            instance_topology = (hardware.numa_fit_instance_to_host(
-                        host_topology, requested_topology,
-                        limits=limits,
-                        pci_requests=pci_requests,
-                        pci_stats=host_state.pci_stats))
-            if not instance_topology:
+            if not self._fit_instance_to_host(host_state, host_topology,
+                                              requested_topology, limits,
+                                              pci_requests):
                 LOG.debug("%(host)s, %(node)s fails NUMA topology "
                           "requirements. The instance does not fit on this "
                           "host.", {'host': host_state.host,
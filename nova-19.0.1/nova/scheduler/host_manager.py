@@ -18,7 +18,9 @@ Manage hosts in the current zone.
 """
 
 import collections
+import datetime
 import functools
+import itertools
 import time
 try:
     from collections import UserDict as IterableUserDict   # Python 3
@@ -36,6 +38,7 @@ from nova import context as context_module
 from nova import exception
 from nova import objects
 from nova.pci import stats as pci_stats
+from nova.scheduler import columnar
 from nova.scheduler import filters
 from nova.scheduler import weights
 from nova import utils
@@ -46,6 +49,13 @@ CONF = nova.conf.CONF
 
 LOG = logging.getLogger(__name__)
 HOST_INSTANCE_SEMAPHORE = "host_instance"
+HOST_STATE_CACHE_SEMAPHORE = "host_state_cache"
+# Margin used when asking the cell databases for the compute nodes changed
+# since the last refresh of the host state cache, so that records written by
+# services whose clock is slightly behind ours are not missed.
+HOST_STATE_CACHE_CLOCK_SKEW = datetime.timedelta(seconds=60)
+# Source of the versions of the NUMA topologies of the host states.
+_NUMA_TOPOLOGY_VERSIONS = itertools.count(1)
 
 
 class ReadOnlyDict(IterableUserDict):
@@ -122,6 +132,10 @@ class HostState(object):
         self.vcpus_used = 0
         self.pci_stats = None
         self.numa_topology = None
+        # Changes whenever the NUMA topology or the PCI devices change, see
+        # _bump_numa_topology_version()
+        self.numa_topology_version = None
+        self._numa_topology_updated_at = None
 
         # Additional host information from the compute node stats:
         self.num_instances = 0
@@ -226,6 +240,10 @@ class HostState(object):
         self.numa_topology = compute.numa_topology
         self.pci_stats = pci_stats.PciDeviceStats(
             stats=compute.pci_device_pools)
+        if (compute.updated_at is None or
+                compute.updated_at != self._numa_topology_updated_at):
+            self._bump_numa_topology_version()
+        self._numa_topology_updated_at = compute.updated_at
 
         # All virt drivers report host_ip
         self.host_ip = compute.host_ip
@@ -320,11 +338,22 @@ class HostState(object):
         self.numa_topology = hardware.get_host_numa_usage_from_instance(
                 self, instance)
 
+        self._bump_numa_topology_version()
+        self._numa_topology_updated_at = None
+
         # NOTE(sbauza): By considering all cases when the scheduler is called
         # and when consume_from_request() is run, we can safely say that there
         # is always an IO operation because we want to move the instance
         self.num_io_ops += 1
 
+    def _bump_numa_topology_version(self):
+        """Give a new version to the NUMA topology and PCI devices.
+
+        The versions are unique across the host states, so that a version
+        is never reused even when a host state is built again for a host.
+        """
+        self.numa_topology_version = next(_NUMA_TOPOLOGY_VERSIONS)
+
     def __repr__(self):
         return ("(%(host)s, %(node)s) ram: %(free_ram)sMB "
                 "disk: %(free_disk)sMB io_ops: %(num_io_ops)s "
@@ -335,6 +364,150 @@ class HostState(object):
                  'num_instances': self.num_instances})
 
 
+class HostStateCache(object):
+    """Long-lived cache of HostState objects shared by scheduling requests.
+
+    The cache keeps the ComputeNode records last loaded from each cell, so
+    that a scheduling request only has to load the compute nodes which were
+    created, updated or deleted since the previous request. The HostState
+    objects of the compute nodes which did not change are reused as is.
+
+    The resources consumed by the scheduling requests on a cached HostState
+    are kept until its compute node reports its usage again, or until the
+    next full load of its cell once they are older than the full sync
+    interval.
+
+    The version is bumped whenever the set of cached compute nodes changes.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.full_loads = 0
+        self.delta_loads = 0
+        self.clear()
+
+    def clear(self):
+        """Drops all the cached host states."""
+        # Dict of (cell UUID, ComputeNode) tuples keyed by compute node UUID
+        self.computes = {}
+        # Set of compute node UUIDs whose HostState needs to be updated
+        self.stale = set()
+        # Dict of HostState objects keyed by (host, node)
+        self.host_states = {}
+        # Dicts of datetimes of the last loads keyed by cell UUID
+        self.last_load = {}
+        self.last_full_load = {}
+        self.version += 1
+
+    @staticmethod
+    def _interval():
+        return datetime.timedelta(
+            seconds=CONF.filter_scheduler.host_state_cache_full_sync_interval)
+
+    def changed_since(self, cell_uuids, now):
+        """Returns the datetime since when compute nodes need to be loaded for
+        the given cells, or None if all of them need to be loaded.
+        """
+        interval = self._interval()
+        since = []
+        for cell_uuid in cell_uuids:
+            last_full_load = self.last_full_load.get(cell_uuid)
+            if last_full_load is None or now - last_full_load >= interval:
+                return None
+            since.append(self.last_load[cell_uuid])
+        if not since:
+            return None
+        return min(since) - HOST_STATE_CACHE_CLOCK_SKEW
+
+    def load(self, cell_uuid, computes, now, full=False):
+        """Records the compute nodes loaded from a cell.
+
+        :param cell_uuid: UUID of the cell the compute nodes were loaded from
+        :param computes: list of ComputeNode objects, which may include deleted
+            compute nodes
+        :param now: datetime at which the load was started
+        :param full: True if computes contains all the compute nodes of the
+            cell, in which case the cached compute nodes of the cell which are
+            not part of it are removed
+        """
+        seen = set()
+        changed = False
+        for compute in computes:
+            if 'deleted' in compute and compute.deleted:
+                changed |= self._remove(compute.uuid)
+                continue
+            seen.add(compute.uuid)
+            cached = self.computes.get(compute.uuid)
+            if cached is not None:
+                old = cached[1]
+                if (old.updated_at == compute.updated_at and
+                        old.host == compute.host and
+                        old.hypervisor_hostname ==
+                        compute.hypervisor_hostname):
+                    # NOTE: The change window overlaps with the previous one,
+                    # there is no need to update the HostState again.
+                    continue
+                if (old.host, old.hypervisor_hostname) != (
+                        compute.host, compute.hypervisor_hostname):
+                    self.host_states.pop(
+                        (old.host, old.hypervisor_hostname), None)
+            self.computes[compute.uuid] = (cell_uuid, compute)
+            self.stale.add(compute.uuid)
+            changed = True
+        if full:
+            expired = now.replace(tzinfo=iso8601.UTC) - self._interval()
+            for uuid, (cached_cell_uuid, compute) in list(
+                    self.computes.items()):
+                if cached_cell_uuid != cell_uuid:
+                    continue
+                if uuid not in seen:
+                    changed |= self._remove(uuid)
+                else:
+                    self._expire_consumption(compute, expired)
+            self.last_full_load[cell_uuid] = now
+            self.full_loads += 1
+        else:
+            self.delta_loads += 1
+        self.last_load[cell_uuid] = now
+        if changed:
+            self.version += 1
+
+    def _expire_consumption(self, compute, expired):
+        # NOTE: The resources consumed by a scheduling request are released
+        # when the compute node reports its usage again, which it does not
+        # if its usage did not change, e.g. when the build never reached it.
+        # Drop the HostState of a compute node whose local consumption is
+        # older than expired, so that it is built again from the compute node.
+        state_key = (compute.host, compute.hypervisor_hostname)
+        host_state = self.host_states.get(state_key)
+        if (host_state is None or host_state.updated is None or
+                host_state.updated >= expired):
+            return
+        if (compute.updated_at is None or
+                host_state.updated > compute.updated_at):
+            del self.host_states[state_key]
+
+    def _remove(self, compute_uuid):
+        cached = self.computes.pop(compute_uuid, None)
+        self.stale.discard(compute_uuid)
+        if cached is None:
+            return False
+        compute = cached[1]
+        self.host_states.pop((compute.host, compute.hypervisor_hostname), None)
+        return True
+
+    def get_stats(self):
+        """Returns a dict of metrics about the usage of the cache."""
+        return {'version': self.version,
+                'size': len(self.computes),
+                'hits': self.hits,
+                'misses': self.misses,
+                'full_loads': self.full_loads,
+                'delta_loads': self.delta_loads}
+
+
 class HostManager(object):
     """Base HostManager class."""
 
@@ -343,6 +516,9 @@ class HostManager(object):
         return HostState(host, node, cell)
 
     def __init__(self):
+        self.host_state_cache = None
+        if CONF.filter_scheduler.host_state_cache:
+            self.host_state_cache = HostStateCache()
         self.refresh_cells_caches()
         self.filter_handler = filters.HostFilterHandler()
         filter_classes = self.filter_handler.get_matching_classes(
@@ -354,6 +530,11 @@ class HostManager(object):
         weigher_classes = self.weight_handler.get_matching_classes(
                 CONF.filter_scheduler.weight_classes)
         self.weighers = [cls() for cls in weigher_classes]
+        self.columnar = CONF.filter_scheduler.columnar_scheduling
+        if self.columnar and not columnar.is_supported():
+            LOG.warning('The [filter_scheduler]/columnar_scheduling option is '
+                        'enabled but numpy is not installed, ignoring it.')
+            self.columnar = False
         # Dict of aggregates keyed by their ID
         self.aggs_by_id = {}
         # Dict of set of aggregate IDs keyed by the name of the host belonging
@@ -591,11 +772,16 @@ class HostManager(object):
                     return []
             hosts = six.itervalues(name_to_cls_map)
 
+        if self.columnar:
+            return columnar.get_filtered_hosts(self.enabled_filters, hosts,
+                                               spec_obj, index)
         return self.filter_handler.get_filtered_objects(self.enabled_filters,
                 hosts, spec_obj, index)
 
     def get_weighed_hosts(self, hosts, spec_obj):
         """Weigh the hosts."""
+        if self.columnar:
+            return columnar.get_weighed_hosts(self.weighers, hosts, spec_obj)
         return self.weight_handler.get_weighed_objects(self.weighers,
                 hosts, spec_obj)
 
@@ -665,6 +851,10 @@ class HostManager(object):
         # or when a new cell is created as long as a SIGHUP signal is sent
         # to the scheduler.
         self.enabled_cells = [c for c in self.cells if not c.disabled]
+        # NOTE: Cells may have been added or removed, start over with the
+        # cached host states as well.
+        if self.host_state_cache is not None:
+            self.host_state_cache.clear()
         # Filtering the disabled cells only for logging purposes.
         disabled_cells = [c for c in self.cells if c.disabled]
         LOG.debug('Found %(count)i disabled cells: %(cells)s',
@@ -688,6 +878,10 @@ class HostManager(object):
         else:
             cells = self.enabled_cells
 
+        if self.host_state_cache is not None:
+            return self._get_cached_host_states(context, cells,
+                                                compute_uuids)
+
         compute_nodes, services = self._get_computes_for_cells(
             context, cells, compute_uuids=compute_uuids)
         return self._get_host_states(context, compute_nodes, services)
@@ -740,6 +934,106 @@ class HostManager(object):
 
         return (host_state_map[host] for host in seen_nodes)
 
+    @utils.synchronized(HOST_STATE_CACHE_SEMAPHORE)
+    def _refresh_host_state_cache(self, context, cells, compute_uuids):
+        """Loads the compute nodes changed since the last refresh of the host
+        state cache along with the services of the given cells.
+
+        Returns a dict of services indexed by hostname.
+        """
+        cache = self.host_state_cache
+        now = timeutils.utcnow()
+        cell_uuids = [cell.uuid for cell in cells]
+        changed_since = cache.changed_since(cell_uuids, now)
+
+        def targeted_operation(cctxt):
+            services = objects.ServiceList.get_by_binary(
+                cctxt, 'nova-compute', include_disabled=True)
+            if changed_since is None:
+                return services, objects.ComputeNodeList.get_all(cctxt)
+            return services, objects.ComputeNodeList.get_all_changed_since(
+                cctxt, changed_since)
+
+        timeout = context_module.CELL_TIMEOUT
+        results = context_module.scatter_gather_cells(context, cells, timeout,
+                                                      targeted_operation)
+        services = {}
+        for cell_uuid, result in results.items():
+            if isinstance(result, Exception):
+                LOG.warning('Failed to get computes for cell %s', cell_uuid)
+            elif result is context_module.did_not_respond_sentinel:
+                LOG.warning('Timeout getting computes for cell %s', cell_uuid)
+            else:
+                _services, _compute_nodes = result
+                cache.load(cell_uuid, _compute_nodes, now,
+                           full=changed_since is None)
+                services.update({service.host: service
+                                 for service in _services})
+
+        # NOTE: Compute nodes created by a service whose clock is too far
+        # behind ours can be missed by the change window, so load the ones
+        # placement knows about but the cache does not.
+        if compute_uuids:
+            missing = [uuid for uuid in compute_uuids
+                       if uuid not in cache.computes]
+            if missing:
+                compute_nodes, _services = self._get_computes_for_cells(
+                    context, cells, compute_uuids=missing)
+                for cell_uuid, computes in compute_nodes.items():
+                    cache.load(cell_uuid, computes, now)
+        return services
+
+    def _get_cached_host_states(self, context, cells, compute_uuids):
+        """Returns a generator over the cached HostStates of the given compute
+        nodes, refreshing only the ones whose compute node changed.
+        """
+        cache = self.host_state_cache
+        services = self._refresh_host_state_cache(context, cells,
+                                                  compute_uuids)
+        cell_uuids = set(cell.uuid for cell in cells)
+        if compute_uuids is None:
+            compute_uuids = list(cache.computes)
+
+        host_states = []
+        for compute_uuid in compute_uuids:
+            cached = cache.computes.get(compute_uuid)
+            if cached is None or cached[0] not in cell_uuids:
+                continue
+            cell_uuid, compute = cached
+            service = services.get(compute.host)
+            if not service:
+                LOG.warning(
+                    "No compute service record found for host %(host)s",
+                    {'host': compute.host})
+                continue
+            host = compute.host
+            node = compute.hypervisor_hostname
+            state_key = (host, node)
+            host_state = cache.host_states.get(state_key)
+            if host_state is None:
+                host_state = self.host_state_cls(host, node, cell_uuid,
+                                                 compute=compute)
+                cache.host_states[state_key] = host_state
+                cache.stale.add(compute_uuid)
+            if compute_uuid in cache.stale:
+                cache.misses += 1
+                cache.stale.discard(compute_uuid)
+                changed_compute = compute
+            else:
+                cache.hits += 1
+                changed_compute = None
+            # NOTE: The service, aggregates and instances of the host can
+            # change without the compute node being updated, so refresh them
+            # even if the cached HostState is reused.
+            host_state.update(changed_compute,
+                              dict(service),
+                              self._get_aggregates_info(host),
+                              self._get_instance_info(context, compute))
+            host_states.append(host_state)
+
+        LOG.debug('Host state cache stats: %s', cache.get_stats())
+        return iter(host_states)
+
     def _get_aggregates_info(self, host):
         return [self.aggs_by_id[agg_id] for agg_id in
                 self.host_aggregates_map[host]]
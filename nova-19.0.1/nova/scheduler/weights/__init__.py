@@ -33,7 +33,23 @@ class WeighedHost(weights.WeighedObject):
 
 class BaseHostWeigher(weights.BaseWeigher):
     """Base class for host weights."""
-    pass
+
+    def weigh_columns(self, host_columns, weight_properties):
+        """Return an array of the weights of the hosts of the
+        nova.scheduler.columnar.HostColumns, or None if the weigher has no
+        vectorized implementation.
+        Override this in a subclass.
+        """
+        return None
+
+    def weight_multipliers(self, host_columns):
+        """Return an array of the weight multipliers of the hosts of the
+        nova.scheduler.columnar.HostColumns.
+
+        The weight multiplier is assumed to only depend on the aggregates of
+        the host, override this in a subclass if that is not the case.
+        """
+        return host_columns.aggregate_values(self.weight_multiplier)
 
 
 class HostWeightHandler(weights.BaseWeightHandler):
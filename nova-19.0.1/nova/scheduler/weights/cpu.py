@@ -43,3 +43,8 @@ class CPUWeigher(weights.BaseHostWeigher):
         vcpus_free = (host_state.vcpus_total * host_state.cpu_allocation_ratio
                       - host_state.vcpus_used)
         return vcpus_free
+
+    def weigh_columns(self, host_columns, weight_properties):
+        return (host_columns.column('vcpus_total') *
+                host_columns.column('cpu_allocation_ratio') -
+                host_columns.column('vcpus_used'))
@@ -40,3 +40,6 @@ class DiskWeigher(weights.BaseHostWeigher):
     def _weigh_object(self, host_state, weight_properties):
         """Higher weights win.  We want spreading to be the default."""
         return host_state.free_disk_mb
+
+    def weigh_columns(self, host_columns, weight_properties):
+        return host_columns.column('free_disk_mb')
@@ -458,6 +458,36 @@ class InstanceMappingListTestCase(test.NoDBTestCase):
         self.assertEqual(sorted(uuids),
                          sorted([m.instance_uuid for m in mappings]))
 
+    def test_set_cell_mapping_bulk(self):
+        cm = create_cell_mapping(id=4)
+        db_inst_mapping1 = create_mapping(cell_id=None)
+        db_inst_mapping2 = create_mapping(cell_id=None)
+        # Create a third that we won't include
+        db_inst_mapping3 = create_mapping(cell_id=None)
+        uuids = [db_inst_mapping1.instance_uuid,
+                 db_inst_mapping2.instance_uuid]
+        instance_mapping.InstanceMappingList.set_cell_mapping_bulk(
+            self.context, uuids, cell_mapping.CellMapping(id=cm.id))
+        mappings = instance_mapping.InstanceMappingList.get_by_instance_uuids(
+            self.context, uuids + [db_inst_mapping3.instance_uuid])
+        cells = {m.instance_uuid: m.cell_mapping for m in mappings}
+        self.assertEqual(cm.uuid, cells[uuids[0]].uuid)
+        self.assertEqual(cm.uuid, cells[uuids[1]].uuid)
+        self.assertIsNone(cells[db_inst_mapping3.instance_uuid])
+
+    def test_set_cell_mapping_bulk_not_found(self):
+        cm = create_cell_mapping(id=4)
+        db_inst_mapping = create_mapping(cell_id=None)
+        uuids = [db_inst_mapping.instance_uuid, uuidsentinel.deleted_instance]
+        self.assertRaises(
+            exception.InstanceMappingNotFound,
+            instance_mapping.InstanceMappingList.set_cell_mapping_bulk,
+            self.context, uuids, cell_mapping.CellMapping(id=cm.id))
+        # None of the instances were mapped.
+        mapping = instance_mapping.InstanceMapping.get_by_instance_uuid(
+            self.context, db_inst_mapping.instance_uuid)
+        self.assertIsNone(mapping.cell_mapping)
+
     def test_get_not_deleted_by_cell_and_project(self):
         cells = []
         # Create two cells
@@ -10,8 +10,12 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import mock
+from oslo_utils.fixture import uuidsentinel as uuids
 from oslo_utils import uuidutils
 
+from nova.compute import api as compute_api
+from nova.compute import vm_states
 from nova import context
 from nova import objects
 from nova import quota
@@ -146,3 +150,127 @@ class QuotaTestCase(test.NoDBTestCase):
         self.assertEqual(2, count['user']['instances'])
         self.assertEqual(6, count['user']['cores'])
         self.assertEqual(1536, count['user']['ram'])
+
+    def _create_instance(self, ctxt, cell_mapping, **kwargs):
+        with context.target_cell(ctxt, cell_mapping) as cctxt:
+            instance = objects.Instance(context=cctxt,
+                                        project_id='fake-project',
+                                        **kwargs)
+            instance.create()
+            im = objects.InstanceMapping(context=ctxt,
+                                         instance_uuid=instance.uuid,
+                                         cell_mapping=cell_mapping,
+                                         project_id='fake-project')
+            im.create()
+        return instance
+
+    def test_instances_cores_ram_count_usage_counters(self):
+        self.flags(usage_counters=True, group='quota')
+        ctxt = context.RequestContext('fake-user', 'fake-project')
+        mapping = objects.CellMapping(context=ctxt,
+                                      uuid=uuidutils.generate_uuid(),
+                                      database_connection='cell1',
+                                      transport_url='none:///')
+        mapping.create()
+        self._create_instance(ctxt, mapping, user_id='fake-user', vcpus=2,
+                              memory_mb=512)
+
+        # The first count resets the counters
+        expected = {'project': {'instances': 1, 'cores': 2, 'ram': 512},
+                    'user': {'instances': 1, 'cores': 2, 'ram': 512}}
+        count = quota._instances_cores_ram_count(ctxt, 'fake-project',
+                                                 user_id='fake-user')
+        self.assertEqual(expected, count)
+        self.assertEqual(expected, objects.Quotas.get_usage_counters(
+            ctxt, 'fake-project', quota.INSTANCE_RESOURCES,
+            user_id='fake-user'))
+
+        # The next counts are read from the counters, which are only updated
+        # by the operations on the instances.
+        instance = self._create_instance(ctxt, mapping, user_id='fake-user',
+                                         vcpus=4, memory_mb=1024)
+        count = quota._instances_cores_ram_count(ctxt, 'fake-project',
+                                                 user_id='fake-user')
+        self.assertEqual(expected, count)
+        quota.update_instance_usage_counters(ctxt, instance)
+        expected = {'project': {'instances': 2, 'cores': 6, 'ram': 1536},
+                    'user': {'instances': 2, 'cores': 6, 'ram': 1536}}
+        count = quota._instances_cores_ram_count(ctxt, 'fake-project',
+                                                 user_id='fake-user')
+        self.assertEqual(expected, count)
+
+        # Resizing the instance updates the cores and ram
+        quota.update_resize_usage_counters(
+            ctxt, instance, objects.Flavor(vcpus=1, memory_mb=256),
+            objects.Flavor(vcpus=4, memory_mb=1024))
+        count = quota._instances_cores_ram_count(ctxt, 'fake-project')
+        self.assertEqual(
+            {'project': {'instances': 2, 'cores': 3, 'ram': 768}}, count)
+
+    @mock.patch('nova.compute.utils.check_num_instances_quota')
+    @mock.patch('nova.compute.api.API._record_action_start')
+    def test_instances_cores_ram_count_usage_counters_soft_delete(
+            self, mock_action_start, mock_check_quota):
+        self.flags(usage_counters=True, group='quota')
+        ctxt = context.RequestContext('fake-user', 'fake-project')
+        mapping = objects.CellMapping(context=ctxt,
+                                      uuid=uuidutils.generate_uuid(),
+                                      database_connection='cell1',
+                                      transport_url='none:///')
+        mapping.create()
+        instance = self._create_instance(ctxt, mapping, user_id='fake-user',
+                                         vcpus=2, memory_mb=512,
+                                         vm_state=vm_states.ACTIVE)
+        api = compute_api.API()
+        api.compute_rpcapi = mock.Mock()
+
+        def assert_counters(instances):
+            # The counters must always match the counts in the cells.
+            count = quota._instances_cores_ram_count(ctxt, 'fake-project',
+                                                     user_id='fake-user')
+            cells_count = quota._instances_cores_ram_count_in_cells(
+                ctxt, 'fake-project', user_id='fake-user')[0]
+            self.assertEqual(cells_count, count)
+            self.assertEqual(instances, count['project']['instances'])
+
+        def soft_delete(cctxt, instance):
+            api._do_soft_delete(cctxt, instance, [])
+            # The compute service soft deletes the instance.
+            instance.vm_state = vm_states.SOFT_DELETED
+            instance.save()
+
+        # The first count resets the counters
+        assert_counters(1)
+
+        with context.target_cell(ctxt, mapping) as cctxt:
+            instance = objects.Instance.get_by_uuid(cctxt, instance.uuid)
+            soft_delete(cctxt, instance)
+            assert_counters(0)
+
+            with mock.patch.object(instance, 'get_flavor'):
+                api.restore(cctxt, instance)
+            assert_counters(1)
+
+            # The soft deleted instance is deleted, then reclaimed.
+            soft_delete(cctxt, instance)
+            assert_counters(0)
+            api._do_delete(cctxt, instance, [])
+            assert_counters(0)
+            instance.destroy()
+            assert_counters(0)
+
+    @mock.patch('nova.context.scatter_gather_cells')
+    def test_instances_cores_ram_count_usage_counters_cell_failure(
+            self, mock_scatter):
+        self.flags(usage_counters=True, group='quota')
+        ctxt = context.RequestContext('fake-user', 'fake-project')
+        mock_scatter.return_value = {
+            uuids.cell1: {'project': {'instances': 1, 'cores': 2,
+                                      'ram': 512}},
+            uuids.cell2: context.did_not_respond_sentinel}
+        count = quota._instances_cores_ram_count(ctxt, 'fake-project')
+        self.assertEqual(
+            {'project': {'instances': 1, 'cores': 2, 'ram': 512}}, count)
+        # The incomplete counts were not stored
+        self.assertIsNone(objects.Quotas.get_usage_counters(
+            ctxt, 'fake-project', quota.INSTANCE_RESOURCES))
@@ -10,8 +10,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
+
+import mock
+
 from nova import context
 from nova.db.sqlalchemy import api as db_api
+from nova.db.sqlalchemy import api_models
 from nova import exception
 from nova.objects import quotas
 from nova import test
@@ -317,3 +322,86 @@ class QuotasObjectTestCase(test.TestCase,
         db_class = quotas.Quotas._get_all_class_from_db_by_name(
                         self.context, 'foo-class')
         self.assertEqual(5, db_class['instances'])
+
+    def test_get_usage_counters_missing(self):
+        self.assertIsNone(quotas.Quotas.get_usage_counters(
+            self.context, 'fake-project', ['instances', 'cores']))
+
+    def test_reset_and_get_usage_counters(self):
+        counts = {'project': {'instances': 3, 'cores': 6},
+                  'user': {'instances': 1, 'cores': 2}}
+        quotas.Quotas.reset_usage_counters(self.context, 'fake-project',
+                                           counts, user_id='fake-user')
+        self.assertEqual(counts, quotas.Quotas.get_usage_counters(
+            self.context, 'fake-project', ['instances', 'cores'],
+            user_id='fake-user'))
+        self.assertEqual({'project': counts['project']},
+                         quotas.Quotas.get_usage_counters(
+                             self.context, 'fake-project',
+                             ['instances', 'cores']))
+        # The counters of another user are missing
+        self.assertIsNone(quotas.Quotas.get_usage_counters(
+            self.context, 'fake-project', ['instances', 'cores'],
+            user_id='other-user'))
+        # Resetting replaces the counters
+        counts = {'project': {'instances': 4, 'cores': 8}}
+        quotas.Quotas.reset_usage_counters(self.context, 'fake-project',
+                                           counts)
+        self.assertEqual(counts, quotas.Quotas.get_usage_counters(
+            self.context, 'fake-project', ['instances', 'cores']))
+        self.assertEqual(
+            {None: {'instances': 4, 'cores': 8},
+             'fake-user': {'instances': 1, 'cores': 2}},
+            quotas.Quotas.get_all_usage_counters(self.context,
+                                                 'fake-project'))
+        self.assertEqual(['fake-project'],
+                         quotas.Quotas.get_usage_counter_project_ids(
+                             self.context))
+
+    def test_get_usage_counters_max_age(self):
+        counts = {'project': {'instances': 3}}
+        with mock.patch('oslo_utils.timeutils.utcnow',
+                        return_value=datetime.datetime(2019, 1, 1, 0, 0, 0)):
+            quotas.Quotas.reset_usage_counters(self.context, 'fake-project',
+                                               counts)
+        with mock.patch('oslo_utils.timeutils.utcnow',
+                        return_value=datetime.datetime(2019, 1, 1, 0, 1, 0)):
+            self.assertEqual(counts, quotas.Quotas.get_usage_counters(
+                self.context, 'fake-project', ['instances'], max_age=60))
+            self.assertIsNone(quotas.Quotas.get_usage_counters(
+                self.context, 'fake-project', ['instances'], max_age=59))
+            self.assertEqual(counts, quotas.Quotas.get_usage_counters(
+                self.context, 'fake-project', ['instances']))
+
+    def test_get_usage_counters_duplicate(self):
+        # As left by concurrent resets
+        with db_api.api_context_manager.writer.using(self.context):
+            for in_use in (1, 2):
+                self.context.session.add(api_models.QuotaUsage(
+                    project_id='fake-project', resource='instances',
+                    in_use=in_use, reserved=0))
+        self.assertIsNone(quotas.Quotas.get_usage_counters(
+            self.context, 'fake-project', ['instances']))
+        quotas.Quotas.reset_usage_counters(
+            self.context, 'fake-project', {'project': {'instances': 3}})
+        self.assertEqual({'project': {'instances': 3}},
+                         quotas.Quotas.get_usage_counters(
+                             self.context, 'fake-project', ['instances']))
+
+    def test_update_usage_counters(self):
+        counts = {'project': {'instances': 3, 'cores': 6},
+                  'user': {'instances': 1, 'cores': 2}}
+        quotas.Quotas.reset_usage_counters(self.context, 'fake-project',
+                                           counts, user_id='fake-user')
+        quotas.Quotas.reset_usage_counters(
+            self.context, 'fake-project',
+            {'user': {'instances': 2, 'cores': 4}}, user_id='other-user')
+        quotas.Quotas.update_usage_counters(
+            self.context, 'fake-project', 'fake-user',
+            {'instances': -1, 'cores': -2, 'ram': -512})
+        self.assertEqual(
+            {None: {'instances': 2, 'cores': 4},
+             'fake-user': {'instances': 0, 'cores': 0},
+             'other-user': {'instances': 2, 'cores': 4}},
+            quotas.Quotas.get_all_usage_counters(self.context,
+                                                 'fake-project'))
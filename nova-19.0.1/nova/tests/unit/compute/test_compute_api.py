@@ -4228,6 +4228,58 @@ class _ComputeAPIUnitTestMixIn(object):
             project_id=instance.project_id, user_id=instance.user_id)
         update_qfd.assert_called_once_with(self.context, instance, False)
 
+    @mock.patch('nova.quota.update_instance_usage_counters')
+    @mock.patch('nova.compute.utils.check_num_instances_quota')
+    @mock.patch('nova.objects.Instance.save')
+    @mock.patch('nova.objects.InstanceAction.action_start')
+    @mock.patch('nova.compute.api.API._update_queued_for_deletion')
+    def test_restore_usage_counters(self, update_qfd, action_start,
+                                    instance_save, check_quota,
+                                    update_counters):
+        instance = self._create_instance_obj()
+        instance.vm_state = vm_states.SOFT_DELETED
+        instance.task_state = None
+        with mock.patch.object(self.compute_api, 'compute_rpcapi'):
+            self.compute_api.restore(self.context, instance)
+        update_counters.assert_called_once_with(self.context, instance)
+
+    @mock.patch('nova.quota.update_instance_usage_counters')
+    @mock.patch('nova.compute.api.API._update_queued_for_deletion')
+    def test_do_soft_delete_usage_counters(self, update_qfd,
+                                           update_counters):
+        instance = self._create_instance_obj()
+        with mock.patch.object(self.compute_api, 'compute_rpcapi') as rpc:
+            self.compute_api._do_soft_delete(self.context, instance, [])
+            rpc.soft_delete_instance.assert_called_once_with(self.context,
+                                                             instance)
+        update_counters.assert_called_once_with(self.context, instance,
+                                                sign=-1)
+
+    @mock.patch('nova.quota.update_instance_usage_counters')
+    @mock.patch('nova.compute.api.API._update_queued_for_deletion')
+    def test_do_delete_soft_deleted_usage_counters(self, update_qfd,
+                                                   update_counters):
+        # The usage of a soft deleted instance was already removed from the
+        # counters, when it was soft deleted.
+        instance = self._create_instance_obj()
+        instance.vm_state = vm_states.SOFT_DELETED
+        with mock.patch.object(self.compute_api, 'compute_rpcapi') as rpc:
+            self.compute_api._do_delete(self.context, instance, [])
+            self.compute_api._do_force_delete(self.context, instance, [])
+            self.assertEqual(2, rpc.terminate_instance.call_count)
+        update_counters.assert_not_called()
+
+    @mock.patch('nova.quota.update_instance_usage_counters')
+    @mock.patch('nova.objects.Instance.save')
+    @mock.patch('nova.compute.api.API._update_queued_for_deletion')
+    def test_do_delete_local_usage_counters(self, update_qfd, instance_save,
+                                            update_counters):
+        instance = self._create_instance_obj()
+        self.compute_api._do_delete(self.context, instance, [], local=True)
+        self.assertEqual(vm_states.DELETED, instance.vm_state)
+        update_counters.assert_called_once_with(self.context, instance,
+                                                sign=-1)
+
     @mock.patch.object(objects.InstanceAction, 'action_start')
     def test_external_instance_event(self, mock_action_start):
         instances = [
@@ -164,6 +164,43 @@ class TestInstanceList(test.NoDBTestCase):
         mock_cm.assert_not_called()
         mock_lc.assert_called_once_with()
 
+    @mock.patch.object(instance_list, '_PROJECT_CELLS_CACHE', new=None)
+    @mock.patch('nova.context.load_cells')
+    @mock.patch('nova.objects.CellMappingList.get_by_project_id')
+    def test_get_project_cell_mappings_cached(self, mock_cm, mock_lc):
+        self.flags(instance_list_per_project_cells_cache_ttl=60, group='api')
+        mock_cm.return_value = self.cells[1:]
+        with mock.patch.object(nova_context, 'CELLS', new=self.cells):
+            for i in range(0, 2):
+                self.assertEqual(
+                    self.cells[1:],
+                    instance_list.get_project_cell_mappings(self.context,
+                                                            'fake'))
+        mock_cm.assert_called_once_with(self.context, 'fake')
+
+    @mock.patch.object(instance_list, '_PROJECT_CELLS_CACHE', new=None)
+    @mock.patch('nova.context.load_cells')
+    @mock.patch('nova.objects.CellMappingList.get_by_project_id')
+    def test_get_project_cell_mappings_unknown_cell(self, mock_cm, mock_lc):
+        self.flags(instance_list_per_project_cells_cache_ttl=60, group='api')
+        mock_cm.return_value = self.cells
+        # The last cell was created after the cells were loaded
+        with mock.patch.object(nova_context, 'CELLS', new=self.cells[:2]):
+            for i in range(0, 2):
+                self.assertEqual(
+                    self.cells,
+                    instance_list.get_project_cell_mappings(self.context,
+                                                            'fake'))
+        self.assertEqual(2, mock_cm.call_count)
+
+    @mock.patch('nova.objects.CellMappingList.get_by_project_id')
+    def test_get_project_cell_mappings_not_cached(self, mock_cm):
+        for i in range(0, 2):
+            self.assertEqual(
+                mock_cm.return_value,
+                instance_list.get_project_cell_mappings(self.context, 'fake'))
+        self.assertEqual(2, mock_cm.call_count)
+
     @mock.patch('nova.context.scatter_gather_cells')
     def test_get_instances_with_down_cells(self, mock_sg):
         inst_cell0 = self.insts[uuids.cell0]
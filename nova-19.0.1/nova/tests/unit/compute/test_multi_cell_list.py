@@ -13,6 +13,8 @@
 from contextlib import contextmanager
 import copy
 import datetime
+
+import eventlet
 import mock
 from oslo_utils.fixture import uuidsentinel as uuids
 
@@ -435,3 +437,84 @@ class TestBaseClass(test.NoDBTestCase):
         self.assertEqual(sorted([cell.uuid for cell in cells
                                  if cell.uuid != uuids.cell1]),
                          gmbv_summary['called_in_cell'])
+
+
+@mock.patch('nova.context.target_cell', new=target_cell_cheater)
+class TestPrefetching(test.NoDBTestCase):
+    def setUp(self):
+        super(TestPrefetching, self).setUp()
+        self.flags(instance_list_cells_prefetch=True, group='api')
+        self._data = [{'id': 'foo-%i' % i}
+                      for i in range(0, 1000)]
+        self._cells = [objects.CellMapping(uuid=getattr(uuids, 'cell%i' % i),
+                                           name='cell%i' % i)
+                       for i in range(0, 10)]
+
+    def test_batches(self):
+        lister = TestLister(self._data, [], [],
+                            cells=self._cells, batch_size=10)
+        ctx = context.RequestContext()
+        res = list(lister.get_records_sorted(ctx, {}, 500, None))
+        self.assertEqual(500, len(res))
+        summary = lister.call_summary('get_by_filters')
+        # All the cells were queried, and every query was for a batch
+        self.assertEqual(len(self._cells), len(summary['count_by_cell']))
+        self.assertTrue(all(limit == 10
+                            for limits in summary['limit_by_cell']
+                            for limit in limits))
+        self.assertEqual(sorted(cell.uuid for cell in self._cells),
+                         summary['called_in_cell'])
+
+    def test_batches_not_needed(self):
+        lister = TestLister(self._data, [], [],
+                            cells=self._cells, batch_size=10)
+        ctx = context.RequestContext()
+        res = list(lister.get_records_sorted(ctx, {}, 5, None))
+        self.assertEqual(5, len(res))
+        summary = lister.call_summary('get_by_filters')
+        self.assertEqual([1 for cell in self._cells],
+                         summary['count_by_cell'])
+
+    @mock.patch.object(multi_cell_list.CellPrefetcher, 'stop')
+    def test_prefetchers_stopped(self, mock_stop):
+        lister = TestLister(self._data, [], [],
+                            cells=self._cells, batch_size=10)
+        ctx = context.RequestContext()
+        res = lister.get_records_sorted(ctx, {}, 500, None)
+        next(res)
+        res.close()
+        self.assertEqual(len(self._cells), mock_stop.call_count)
+
+    def test_with_failing_cells(self):
+        cells = self._cells[:3]
+        lister = FailureLister(self._data, [], [], cells=cells)
+        lister.set_fails(uuids.cell0, [context.did_not_respond_sentinel])
+        lister.set_fails(uuids.cell1, [exception.InstanceNotFound(
+            instance_id='fake')])
+        ctx = context.RequestContext()
+        result = lister.get_records_sorted(ctx, {}, 50, None)
+        self.assertEqual(50, len(list(result)))
+        self.assertEqual([uuids.cell1], lister.cells_failed)
+        self.assertEqual([uuids.cell0], lister.cells_timed_out)
+        self.assertEqual([uuids.cell2], lister.cells_responded)
+
+    def test_prefetcher_timeout(self):
+        def slow_query(ctx):
+            eventlet.sleep(1)
+            yield 'foo'
+
+        ctx = context.RequestContext()
+        prefetcher = multi_cell_list.CellPrefetcher(ctx, self._cells[0], 0,
+                                                    10, slow_query)
+        self.assertEqual([context.did_not_respond_sentinel],
+                         [x._db_record for x in prefetcher])
+
+    def test_prefetcher_success(self):
+        def query(ctx, data):
+            for thing in data:
+                yield thing
+
+        ctx = context.RequestContext()
+        prefetcher = multi_cell_list.CellPrefetcher(ctx, self._cells[0], 60,
+                                                    2, query, [1, 2, 3])
+        self.assertEqual([1, 2, 3], list(prefetcher))
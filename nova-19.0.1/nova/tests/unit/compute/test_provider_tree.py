@@ -696,3 +696,44 @@ class TestProviderTree(test.NoDBTestCase):
         # Remove the last aggregate, and an unrelated one
         pt.remove_aggregates(cn.uuid, uuids.agg4, uuids.agg1)
         self.assertEqual(set([]), pt.data(cn.uuid).aggregates)
+
+    def test_dirty_fields(self):
+        cn = self.compute_node1
+        pt = self._pt_with_cns()
+        # Providers which were never marked clean have all fields changed.
+        self.assertEqual(
+            set([provider_tree.INVENTORY, provider_tree.TRAITS,
+                 provider_tree.AGGREGATES]),
+            pt.get_dirty_fields(cn.uuid))
+
+        pt.mark_clean()
+        self.assertEqual(set(), pt.get_dirty_fields(cn.uuid))
+        self.assertEqual(set(), pt.get_dirty_fields(self.compute_node2.uuid))
+
+        # Updates which don't change anything, including generation updates,
+        # don't make fields dirty.
+        pt.update_inventory(cn.uuid, {}, generation=1)
+        pt.update_traits(cn.uuid, [])
+        pt.update_aggregates(cn.uuid, [])
+        self.assertEqual(set(), pt.get_dirty_fields(cn.uuid))
+
+        pt.add_traits(cn.uuid, 'HW_CPU_X86_AVX')
+        self.assertEqual(set([provider_tree.TRAITS]),
+                         pt.get_dirty_fields(cn.uuid))
+        pt.update_inventory(cn.uuid, {'VCPU': {'total': 8}})
+        self.assertEqual(set([provider_tree.INVENTORY, provider_tree.TRAITS]),
+                         pt.get_dirty_fields(cn.uuid))
+        # Other providers are unaffected.
+        self.assertEqual(set(), pt.get_dirty_fields(self.compute_node2.uuid))
+
+        # A new provider is dirty even in a clean tree.
+        pt.new_child('numa1', cn.uuid, uuid=uuids.numa1)
+        self.assertEqual(
+            set([provider_tree.INVENTORY, provider_tree.TRAITS,
+                 provider_tree.AGGREGATES]),
+            pt.get_dirty_fields(uuids.numa1))
+
+        pt.mark_clean()
+        for uuid in pt.get_provider_uuids():
+            self.assertEqual(set(), pt.get_dirty_fields(uuid))
+        self.assertRaises(ValueError, pt.get_dirty_fields, uuids.non_existing)
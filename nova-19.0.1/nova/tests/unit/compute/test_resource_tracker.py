@@ -627,7 +627,8 @@ class TestUpdateAvailableResources(BaseTestCase):
         get_cn_mock.return_value = _COMPUTE_NODE_FIXTURES[0]
 
         update_mock = self._update_available_resources(startup=True)
-        update_mock.assert_called_once_with(mock.ANY, mock.ANY, startup=True)
+        update_mock.assert_called_once_with(mock.ANY, mock.ANY, startup=True,
+                                            coalesce=False)
         rdia.assert_called_once_with(
             mock.ANY, get_cn_mock.return_value,
             [], {})
@@ -660,7 +661,8 @@ class TestUpdateAvailableResources(BaseTestCase):
         migr_mock.return_value = []
 
         update_mock = self._update_available_resources(startup=True)
-        update_mock.assert_called_once_with(mock.ANY, mock.ANY, startup=True)
+        update_mock.assert_called_once_with(mock.ANY, mock.ANY, startup=True,
+                                            coalesce=False)
         rdia.assert_not_called()
 
     @mock.patch('nova.objects.InstancePCIRequests.get_by_instance',
@@ -1580,6 +1582,53 @@ class TestUpdateComputeNode(BaseTestCase):
         # The retry is restricted to _update_to_placement
         self.assertEqual(1, mock_resource_change.call_count)
 
+    @mock.patch('nova.compute.resource_tracker.ResourceTracker.'
+                '_update_to_placement')
+    @mock.patch('time.time')
+    def test_update_coalesced(self, mock_time, mock_update_to_placement):
+        self.flags(provider_update_coalesce_window=10, group='compute')
+        self._setup_rt()
+        orig_compute = _COMPUTE_NODE_FIXTURES[0].obj_clone()
+        self.rt.compute_nodes[_NODENAME] = orig_compute
+        self.rt.old_resources[_NODENAME] = orig_compute
+
+        mock_time.return_value = 100
+        self.rt._update(mock.sentinel.ctx, orig_compute)
+        mock_update_to_placement.assert_called_once_with(
+            mock.sentinel.ctx, orig_compute, False)
+
+        # Within the window, the update is coalesced with the next one...
+        mock_update_to_placement.reset_mock()
+        mock_time.return_value = 105
+        self.rt._update(mock.sentinel.ctx, orig_compute)
+        mock_update_to_placement.assert_not_called()
+        self.assertEqual(100, self.rt.placement_update_time[_NODENAME])
+
+        # ...unless it must not be...
+        self.rt._update(mock.sentinel.ctx, orig_compute, coalesce=False)
+        mock_update_to_placement.assert_called_once_with(
+            mock.sentinel.ctx, orig_compute, False)
+        self.assertEqual(105, self.rt.placement_update_time[_NODENAME])
+
+        # ...and the next one after the window is not coalesced.
+        mock_update_to_placement.reset_mock()
+        mock_time.return_value = 115
+        self.rt._update(mock.sentinel.ctx, orig_compute)
+        mock_update_to_placement.assert_called_once_with(
+            mock.sentinel.ctx, orig_compute, False)
+
+    @mock.patch('nova.compute.resource_tracker.ResourceTracker.'
+                '_update_to_placement')
+    def test_update_not_coalesced_by_default(self, mock_update_to_placement):
+        self._setup_rt()
+        orig_compute = _COMPUTE_NODE_FIXTURES[0].obj_clone()
+        self.rt.compute_nodes[_NODENAME] = orig_compute
+        self.rt.old_resources[_NODENAME] = orig_compute
+
+        self.rt._update(mock.sentinel.ctx, orig_compute)
+        self.rt._update(mock.sentinel.ctx, orig_compute)
+        self.assertEqual(2, mock_update_to_placement.call_count)
+
     def test_copy_resources_no_update_allocation_ratios(self):
         """Tests that a ComputeNode object's allocation ratio fields are
         not set if the configured allocation ratio values are default None.
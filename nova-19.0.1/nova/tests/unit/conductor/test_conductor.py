@@ -296,6 +296,44 @@ class ConductorRPCAPITestCase(_BaseTestCase, test.TestCase):
         self.conductor_manager = self.conductor_service.manager
         self.conductor = conductor_rpcapi.ConductorAPI()
 
+    def _test_object_action_save(self, objmethod='save'):
+        instance = fake_instance.fake_instance_obj(self.context)
+        instance.obj_reset_changes()
+        instance.task_state = task_states.SPAWNING
+        with mock.patch.object(self.conductor.client, 'prepare') as prepare:
+            self.conductor.object_action(self.context, instance, objmethod,
+                                         (), {})
+        call = prepare.return_value.call
+        call.assert_called_once_with(
+            self.context, 'object_action', objinst=mock.ANY,
+            objmethod=objmethod, args=(), kwargs={})
+        return instance, call.call_args[1]['objinst']
+
+    def test_object_action_save(self):
+        instance, objinst = self._test_object_action_save()
+        self.assertIs(instance, objinst)
+
+    def test_object_action_save_delta(self):
+        self.flags(object_save_deltas=True, group='conductor')
+        instance, objinst = self._test_object_action_save()
+        self.assertIsNot(instance, objinst)
+        self.assertEqual(instance.uuid, objinst.uuid)
+        self.assertEqual(instance.id, objinst.id)
+        self.assertEqual(task_states.SPAWNING, objinst.task_state)
+        self.assertFalse(objinst.obj_attr_is_set('host'))
+        self.assertEqual(set(['task_state']), objinst.obj_what_changed())
+
+    def test_object_action_save_delta_other_method(self):
+        self.flags(object_save_deltas=True, group='conductor')
+        instance, objinst = self._test_object_action_save('refresh')
+        self.assertIs(instance, objinst)
+
+    def test_object_action_save_delta_cells_v1(self):
+        self.flags(object_save_deltas=True, group='conductor')
+        self.flags(enable=True, group='cells')
+        instance, objinst = self._test_object_action_save()
+        self.assertIs(instance, objinst)
+
 
 class ConductorAPITestCase(_BaseTestCase, test.TestCase):
     """Conductor API Tests."""
@@ -1938,6 +1976,94 @@ class ConductorTaskTestCase(_BaseTaskTestCase, test_compute.BaseTestCase):
         self.assertEqual(2, build_and_run_instance.call_count)
         self.assertEqual(2, len(instance_cells))
 
+    @mock.patch('nova.compute.rpcapi.ComputeAPI.build_and_run_instance')
+    @mock.patch('nova.scheduler.rpcapi.SchedulerAPI.select_destinations')
+    def test_schedule_and_build_cast_failure_does_not_stop_others(
+            self, select_destinations, build_and_run_instance):
+        select_destinations.return_value = [[fake_selection1],
+                                            [fake_selection1]]
+        params = self.params
+        self.start_service('compute', host='host1')
+
+        # create an additional build request and request spec
+        build_request = fake_build_request.fake_req_obj(self.ctxt)
+        del build_request.instance.id
+        build_request.create()
+        params['build_requests'].objects.append(build_request)
+        im2 = objects.InstanceMapping(
+            self.ctxt, instance_uuid=build_request.instance.uuid,
+            cell_mapping=None, project_id=self.ctxt.project_id)
+        im2.create()
+        params['request_specs'].append(objects.RequestSpec(
+            instance_uuid=build_request.instance_uuid,
+            instance_group=None))
+        failed_uuid = params['build_requests'][0].instance_uuid
+
+        def _build_and_run_instance(ctxt, *args, **kwargs):
+            if kwargs['instance'].uuid == failed_uuid:
+                raise test.TestingException()
+
+        build_and_run_instance.side_effect = _build_and_run_instance
+        self.assertRaises(test.TestingException,
+                          self.conductor.schedule_and_build_instances,
+                          **params)
+        # The failure to build the first instance did not stop the build
+        # of the second one.
+        self.assertEqual(2, build_and_run_instance.call_count)
+        # Both instances were mapped to the cell they were created in.
+        mappings = objects.InstanceMappingList.get_by_instance_uuids(
+            self.ctxt, [br.instance_uuid for br in params['build_requests']])
+        self.assertEqual(
+            [self.cell_mappings['cell1'].uuid] * 2,
+            [mapping.cell_mapping.uuid for mapping in mappings])
+        self.assertEqual(0, len(objects.BuildRequestList.get_all(self.ctxt)))
+
+    @mock.patch('nova.compute.rpcapi.ComputeAPI.build_and_run_instance')
+    @mock.patch('nova.scheduler.rpcapi.SchedulerAPI.select_destinations')
+    def test_schedule_and_build_missing_mapping_does_not_stop_others(
+            self, select_destinations, build_and_run_instance):
+        select_destinations.return_value = [[fake_selection1],
+                                            [fake_selection1]]
+        params = self.params
+        self.start_service('compute', host='host1')
+
+        # create an additional build request and request spec, without an
+        # instance mapping
+        build_request = fake_build_request.fake_req_obj(self.ctxt)
+        del build_request.instance.id
+        build_request.create()
+        params['build_requests'].objects.append(build_request)
+        params['request_specs'].append(objects.RequestSpec(
+            instance_uuid=build_request.instance_uuid,
+            instance_group=None))
+        mapped_uuid = params['build_requests'][0].instance_uuid
+
+        self.assertRaises(exc.InstanceMappingNotFound,
+                          self.conductor.schedule_and_build_instances,
+                          **params)
+        # The bulk update of the mappings failed, but the instance which
+        # has a mapping was still mapped and built.
+        self.assertEqual(1, build_and_run_instance.call_count)
+        self.assertEqual(
+            mapped_uuid,
+            build_and_run_instance.call_args[1]['instance'].uuid)
+        mapping = objects.InstanceMapping.get_by_instance_uuid(
+            self.ctxt, mapped_uuid)
+        self.assertEqual(self.cell_mappings['cell1'].uuid,
+                         mapping.cell_mapping.uuid)
+
+    def test_run_concurrently(self):
+        def func(item):
+            if item == 2:
+                raise test.TestingException()
+            return item * 10
+
+        results = self.conductor._run_concurrently(func, [1, 2, 3])
+        self.assertEqual([(10, None), (30, None)],
+                         [results[0], results[2]])
+        self.assertEqual(2, results[1][0])
+        self.assertIsInstance(results[1][1][1], test.TestingException)
+
     @mock.patch('nova.compute.utils.notify_about_compute_task_error')
     @mock.patch('nova.scheduler.rpcapi.SchedulerAPI.select_destinations')
     def test_schedule_and_build_scheduler_failure(self, select_destinations,
@@ -569,6 +569,24 @@ class _TestInstanceObject(object):
             'system_metadata'])
         mock_send.assert_called_once_with(self.context, mock.ANY, mock.ANY)
 
+    @mock.patch.object(db, 'instance_update_and_get_original')
+    @mock.patch.object(db, 'instance_get_by_uuid')
+    @mock.patch('nova.metadata_cache.invalidate')
+    def test_save_invalidates_cached_metadata(self, mock_invalidate,
+                                              mock_get, mock_update_and_get):
+        self.flags(enable=False, group='cells')
+        old_ref = dict(self.fake_instance, display_name='hello')
+        new_ref = dict(old_ref, display_name='goodbye')
+        mock_get.return_value = old_ref
+        mock_update_and_get.return_value = (old_ref, new_ref)
+
+        inst = objects.Instance.get_by_uuid(self.context, old_ref['uuid'])
+        inst.display_name = 'goodbye'
+        inst.save()
+
+        mock_invalidate.assert_called_once_with(old_ref['uuid'], mock.ANY)
+        self.assertIn('display_name', mock_invalidate.call_args[0][1])
+
     @mock.patch('nova.db.api.instance_extra_update_by_uuid')
     def test_save_object_pci_requests(self, mock_instance_extra_update):
         expected_json = ('[{"count": 1, "alias_name": null, "is_new": false,'
@@ -809,6 +809,81 @@ class TestObject(_LocalTest, _TestObject):
         self.assertEqual(1, obj.foo)
         self.assertTrue(obj.deleted)
 
+    def test_obj_to_primitive_matches_oslo(self):
+        obj = MyObj(foo=1, bar='bar', readonly=2,
+                    created_at=timeutils.utcnow(),
+                    rel_object=MyOwnedObject(baz=1),
+                    rel_objects=[MyOwnedObject(baz=2)],
+                    mutable_default=['foo'])
+        obj.obj_reset_changes(['foo', 'rel_objects'])
+        obj.rel_object.baz = 3
+        expected = ovo_base.VersionedObject.obj_to_primitive(obj)
+        expected_changes = expected.pop('nova_object.changes')
+        for primitive in (obj.obj_to_primitive(),
+                          obj.obj_to_primitive(target_version='1.6')):
+            self.assertEqual(sorted(expected_changes),
+                             sorted(primitive.pop('nova_object.changes')))
+            self.assertEqual(expected, primitive)
+
+    def test_obj_to_primitive_older_version(self):
+        obj = MyObj(bar='bar')
+        primitive = obj.obj_to_primitive(target_version='1.1')
+        self.assertEqual('1.1', primitive['nova_object.version'])
+        self.assertEqual('oldbar', primitive['nova_object.data']['bar'])
+
+    def test_obj_from_primitive_coerces(self):
+        created_at = timeutils.utcnow().replace(microsecond=0)
+        primitive = MyObj(foo=1, created_at=created_at).obj_to_primitive()
+        primitive['nova_object.data']['bar'] = 123
+        primitive['nova_object.data']['unknown'] = 'foo'
+        primitive['nova_object.changes'] = ['bar', 'unknown']
+        obj = MyObj.obj_from_primitive(primitive)
+        self.assertEqual(1, obj.foo)
+        self.assertEqual('123', obj.bar)
+        self.assertIsInstance(obj.bar, six.text_type)
+        self.assertEqual(created_at, obj.created_at.replace(tzinfo=None))
+        self.assertFalse(obj.obj_attr_is_set('missing'))
+        self.assertEqual(set(['bar']), obj.obj_what_changed())
+
+    def test_obj_from_primitive_invalid_value(self):
+        primitive = MyObj(foo=1).obj_to_primitive()
+        primitive['nova_object.data']['foo'] = 'foo'
+        self.assertRaises(ValueError, MyObj.obj_from_primitive, primitive)
+
+    def test_obj_serializer_recompiled(self):
+        serializer = MyObj._obj_serializer()
+        self.assertIs(serializer, MyObj._obj_serializer())
+        self.assertIs(MyObj.fields, serializer.fields)
+        new_fields = dict(MyObj.fields, baz=fields.IntegerField())
+        with mock.patch.object(MyObj, 'fields', new=new_fields):
+            self.assertIs(new_fields, MyObj._obj_serializer().fields)
+        self.assertIsNot(serializer, MyObj._obj_serializer())
+
+    def test_obj_save_delta_not_supported(self):
+        obj = MyObj(foo=1, bar='bar')
+        self.assertIs(obj, obj.obj_save_delta())
+
+    @mock.patch.object(MyObj, 'OBJ_DELTA_FIELDS', new=('foo', 'missing'))
+    def test_obj_save_delta(self):
+        obj = MyObj(context=self.context, foo=1, bar='bar',
+                    rel_object=MyOwnedObject(baz=1))
+        obj.obj_reset_changes()
+        obj.deleted = True
+        obj.rel_object.baz = 2
+        delta = obj.obj_save_delta()
+        self.assertIsInstance(delta, MyObj)
+        self.assertIs(self.context, delta._context)
+        self.assertEqual(set(['deleted', 'rel_object']),
+                         delta.obj_what_changed())
+        self.assertEqual(['deleted', 'foo', 'rel_object'],
+                         sorted(delta.obj_to_primitive()['nova_object.data']))
+        self.assertIs(obj.rel_object, delta.rel_object)
+        self.assertFalse(delta.obj_attr_is_set('bar'))
+        # The object saved is left untouched
+        self.assertEqual(set(['deleted', 'rel_object']),
+                         obj.obj_what_changed())
+        self.assertEqual('bar', obj.bar)
+
 
 class TestObjectSerializer(_BaseTestCase):
     def test_serialize_entity_primitive(self):
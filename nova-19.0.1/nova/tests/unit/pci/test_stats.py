@@ -173,6 +173,38 @@ class PciDeviceStatsTestCase(test.NoDBTestCase):
         self.assertEqual(set([d['count'] for d in self.pci_stats]),
                          set([1, 2]))
 
+    def test_support_requests_matches_pools_once(self):
+        with mock.patch.object(stats.utils, 'pci_device_prop_match',
+                               wraps=stats.utils.pci_device_prop_match
+                               ) as mock_match:
+            for i in range(2):
+                self.assertTrue(self.pci_stats.support_requests(pci_requests))
+            # Each spec was only matched against the pool of its vendor
+            self.assertEqual(2, mock_match.call_count)
+
+            # The pools are matched again once a pool is added
+            self.pci_stats.add_device(objects.PciDevice.create(
+                None, dict(fake_pci_1, vendor_id='V1', product_id='p4',
+                           address='0000:00:00.4')))
+            requests = self._get_fake_requests(vendor_ids=['v1'], count=3)
+            self.assertTrue(self.pci_stats.support_requests(requests))
+            self.assertEqual(4, mock_match.call_count)
+
+    def test_support_requests_unindexed_spec(self):
+        spec = [{'dev_type': fields.PciDeviceType.STANDARD}]
+        self.assertTrue(self.pci_stats.support_requests(
+            [objects.InstancePCIRequest(count=4, spec=spec)]))
+        self.assertFalse(self.pci_stats.support_requests(
+            [objects.InstancePCIRequest(count=5, spec=spec)]))
+
+    @mock.patch.object(whitelist, 'Whitelist')
+    def test_dev_filter_parsed_on_first_use(self, mock_whitelist):
+        pci_stats = stats.PciDeviceStats()
+        mock_whitelist.assert_not_called()
+        self.assertEqual(mock_whitelist.return_value, pci_stats.dev_filter)
+        mock_whitelist.assert_called_once_with(
+            CONF.pci.passthrough_whitelist)
+
     def test_support_requests_numa(self):
         cells = [objects.InstanceNUMACell(id=0, cpuset=set(), memory=0),
                  objects.InstanceNUMACell(id=1, cpuset=set(), memory=0)]
@@ -2660,6 +2660,41 @@ class TestProviderOperations(SchedulerReportClientTestCase):
             self.client.get_resource_provider_name,
             self.context, uuids.rp)
 
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
+                'set_traits_for_provider')
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
+                'set_aggregates_for_provider')
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
+                'set_inventory_for_provider')
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
+                '_ensure_resource_provider')
+    def test_update_from_provider_tree_only_changes(
+            self, mock_ensure, mock_set_inv, mock_set_aggs, mock_set_traits):
+        """Only the fields changed in the tree returned by
+        get_provider_tree_and_ensure_root are flushed.
+        """
+        cache = self.client._provider_tree
+        cache.new_root('cn', uuids.cn, generation=1)
+        cache.new_child('numa0', uuids.cn, uuid=uuids.numa0, generation=1)
+        cache.new_child('numa1', uuids.cn, uuid=uuids.numa1, generation=1)
+
+        new_tree = self.client.get_provider_tree_and_ensure_root(
+            self.context, uuids.cn)
+        mock_ensure.assert_called_once_with(
+            self.context, uuids.cn, name=None, parent_provider_uuid=None)
+        new_tree.update_inventory(uuids.numa0, {'VCPU': {'total': 4}})
+        new_tree.add_traits(uuids.numa1, 'CUSTOM_GOLD')
+        # Not a change
+        new_tree.update_aggregates(uuids.cn, [])
+
+        self.client.update_from_provider_tree(self.context, new_tree)
+
+        mock_set_inv.assert_called_once_with(
+            self.context, uuids.numa0, {'VCPU': {'total': 4}})
+        mock_set_traits.assert_called_once_with(
+            self.context, uuids.numa1, set(['CUSTOM_GOLD']))
+        mock_set_aggs.assert_not_called()
+
 
 class TestAggregates(SchedulerReportClientTestCase):
     def test_get_provider_aggregates_found(self):
@@ -3090,6 +3125,41 @@ class TestAssociations(SchedulerReportClientTestCase):
             self.client._refresh_associations(self.context, uuid)
             self.assert_getters_were_called(uuid)
 
+    @mock.patch('random.uniform')
+    @mock.patch('time.time')
+    def test_refresh_associations_jitter(self, mock_time, mock_uniform):
+        """Test that the refresh time is backdated by a random jitter."""
+        self.flags(resource_provider_association_refresh=300,
+                   resource_provider_association_refresh_jitter=30,
+                   group='compute')
+        uuid = uuids.compute_node
+        self.client._provider_tree.new_root('compute', uuid, generation=1)
+        mock_time.return_value = 1000
+        mock_uniform.return_value = 20
+
+        self.client._refresh_associations(self.context, uuid)
+        self.assert_getters_were_called(uuid)
+        mock_uniform.assert_called_once_with(0, 30)
+        self.assertEqual(980, self.client._association_refresh_time[uuid])
+
+        self.reset_getter_mocks()
+        mock_time.return_value = 1279
+        self.client._refresh_associations(self.context, uuid)
+        self.assert_getters_not_called(timer_entry=uuid)
+        mock_time.return_value = 1281
+        self.client._refresh_associations(self.context, uuid)
+        self.assert_getters_were_called(uuid)
+
+    @mock.patch('random.uniform', return_value=0)
+    def test_refresh_associations_jitter_capped(self, mock_uniform):
+        self.flags(resource_provider_association_refresh=300,
+                   resource_provider_association_refresh_jitter=600,
+                   group='compute')
+        uuid = uuids.compute_node
+        self.client._provider_tree.new_root('compute', uuid, generation=1)
+        self.client._refresh_associations(self.context, uuid)
+        mock_uniform.assert_called_once_with(0, 300)
+
 
 class TestAllocations(SchedulerReportClientTestCase):
 
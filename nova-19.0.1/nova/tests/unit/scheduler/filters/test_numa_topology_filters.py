@@ -293,3 +293,53 @@ class TestNUMATopologyFilter(test.NoDBTestCase):
                                       network_metadata=network_metadata)
 
         self.assertFalse(self.filt_cls.host_passes(host, spec_obj))
+
+    def _get_cacheable_host_state(self, version):
+        return fakes.FakeHostState('host1', 'node1',
+                                   {'numa_topology': fakes.NUMA_TOPOLOGY,
+                                    'numa_topology_version': version,
+                                    'pci_stats': None,
+                                    'cpu_allocation_ratio': 16.0,
+                                    'ram_allocation_ratio': 1.5})
+
+    def _get_cacheable_spec_obj(self, memory=512):
+        instance_topology = objects.InstanceNUMATopology(
+            cells=[objects.InstanceNUMACell(id=0, cpuset=set([1]),
+                                            memory=memory)])
+        return self._get_spec_obj(numa_topology=instance_topology)
+
+    @mock.patch('nova.virt.hardware.numa_fit_instance_to_host')
+    def test_numa_topology_filter_fit_cache_disabled(self, mock_fit):
+        host = self._get_cacheable_host_state(1)
+        for i in range(2):
+            self.assertTrue(self.filt_cls.host_passes(
+                host, self._get_cacheable_spec_obj()))
+        self.assertEqual(2, mock_fit.call_count)
+
+    @mock.patch('nova.virt.hardware.numa_fit_instance_to_host')
+    def test_numa_topology_filter_fit_cache(self, mock_fit):
+        self.flags(numa_fit_cache_size=1, group='filter_scheduler')
+        mock_fit.return_value = None
+        host = self._get_cacheable_host_state(1)
+        # The same request on the same topology version is fitted once.
+        for i in range(2):
+            self.assertFalse(self.filt_cls.host_passes(
+                host, self._get_cacheable_spec_obj()))
+        self.assertEqual(1, mock_fit.call_count)
+
+        # A new topology version is fitted again, and the limits are set on
+        # the host state when the cached fit passes.
+        mock_fit.return_value = mock.sentinel.instance_topology
+        host = self._get_cacheable_host_state(2)
+        for i in range(2):
+            self.assertTrue(self.filt_cls.host_passes(
+                host, self._get_cacheable_spec_obj()))
+            self.assertIn('numa_topology', host.limits)
+        self.assertEqual(2, mock_fit.call_count)
+
+        # Another request evicts the previous one.
+        self.assertTrue(self.filt_cls.host_passes(
+            host, self._get_cacheable_spec_obj(memory=256)))
+        self.assertTrue(self.filt_cls.host_passes(
+            host, self._get_cacheable_spec_obj()))
+        self.assertEqual(4, mock_fit.call_count)
@@ -0,0 +1,155 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For columnar filtering and weighing of hosts.
+"""
+
+import random
+
+import mock
+import testtools
+
+from nova import objects
+from nova.scheduler import columnar
+from nova.scheduler.filters import aggregate_instance_extra_specs as agg_specs
+from nova.scheduler.filters import compute_filter
+from nova.scheduler.filters import core_filter
+from nova.scheduler.filters import disk_filter
+from nova.scheduler.filters import ram_filter
+from nova.scheduler import weights
+from nova.scheduler.weights import cpu
+from nova.scheduler.weights import disk
+from nova.scheduler.weights import io_ops
+from nova.scheduler.weights import ram
+from nova import test
+from nova.tests.unit.scheduler import fakes
+
+
+def _get_hosts(count, seed=42):
+    rand = random.Random(seed)
+    aggs = [objects.Aggregate(id=1, metadata={'cpu_weight_multiplier': '2.0',
+                                              'ssd': 'true'}),
+            objects.Aggregate(id=2, metadata={'ssd': 'false'})]
+    hosts = []
+    for i in range(count):
+        total_ram = rand.choice([2048, 4096, 8192])
+        total_disk = rand.choice([20, 40, 80])
+        vcpus = rand.choice([0, 2, 4, 8])
+        hosts.append(fakes.FakeHostState('host%s' % i, 'node%s' % i, {
+            'free_ram_mb': rand.randint(-1024, total_ram),
+            'total_usable_ram_mb': total_ram,
+            'ram_allocation_ratio': rand.choice([1.0, 1.5]),
+            'free_disk_mb': rand.randint(0, total_disk * 1024),
+            'total_usable_disk_gb': total_disk,
+            'disk_allocation_ratio': rand.choice([1.0, 2.0]),
+            'vcpus_total': vcpus,
+            'vcpus_used': rand.randint(0, vcpus * 2),
+            'cpu_allocation_ratio': rand.choice([1.0, 16.0]),
+            'num_io_ops': rand.randint(0, 8),
+            'aggregates': rand.choice([[], aggs[:1], aggs[1:], aggs]),
+            'service': {'disabled': False},
+        }))
+    return hosts
+
+
+@testtools.skipIf(not columnar.is_supported(), 'numpy is not installed')
+class ColumnarFilterTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(ColumnarFilterTestCase, self).setUp()
+        self.spec_obj = objects.RequestSpec(
+            flavor=objects.Flavor(memory_mb=1024, vcpus=2, root_gb=10,
+                                  ephemeral_gb=0, swap=512,
+                                  extra_specs={'ssd': 'true'}))
+
+    def _assert_same_hosts(self, filters):
+        hosts = _get_hosts(200)
+        expected = hosts
+        for filter_ in filters:
+            expected = [host for host in expected
+                        if filter_.host_passes(host, self.spec_obj)]
+        columnar_hosts = _get_hosts(200)
+        actual = columnar.get_filtered_hosts(filters, columnar_hosts,
+                                             self.spec_obj)
+        self.assertEqual([host.host for host in expected],
+                         [host.host for host in actual])
+        self.assertEqual([host.limits for host in expected],
+                         [host.limits for host in actual])
+
+    def test_ram_filter(self):
+        self._assert_same_hosts([ram_filter.RamFilter()])
+
+    def test_aggregate_ram_filter(self):
+        self._assert_same_hosts([ram_filter.AggregateRamFilter()])
+
+    def test_core_filter(self):
+        self._assert_same_hosts([core_filter.CoreFilter()])
+
+    def test_disk_filter(self):
+        self._assert_same_hosts([disk_filter.DiskFilter()])
+
+    def test_aggregate_instance_extra_specs_filter(self):
+        self._assert_same_hosts(
+            [agg_specs.AggregateInstanceExtraSpecsFilter()])
+
+    @mock.patch('nova.servicegroup.API.service_is_up', return_value=True)
+    def test_mixed_filters(self, mock_is_up):
+        # The ComputeFilter has no vectorized implementation
+        self._assert_same_hosts([ram_filter.RamFilter(),
+                                 compute_filter.ComputeFilter(),
+                                 core_filter.CoreFilter(),
+                                 disk_filter.DiskFilter()])
+
+    def test_no_host_passes(self):
+        self.spec_obj.flavor.memory_mb = 1024 * 1024
+        self.assertEqual([], columnar.get_filtered_hosts(
+            [ram_filter.RamFilter(), core_filter.CoreFilter()],
+            _get_hosts(10), self.spec_obj))
+
+    def test_filter_stops_filtering(self):
+        filter_ = mock.Mock(RUN_ON_REBUILD=False)
+        filter_.hosts_pass.return_value = None
+        filter_.filter_all.return_value = None
+        self.assertIsNone(columnar.get_filtered_hosts(
+            [filter_], _get_hosts(10), self.spec_obj))
+
+
+@testtools.skipIf(not columnar.is_supported(), 'numpy is not installed')
+class ColumnarWeigherTestCase(test.NoDBTestCase):
+
+    def _get_weighers(self):
+        return [ram.RAMWeigher(), cpu.CPUWeigher(), disk.DiskWeigher(),
+                io_ops.IoOpsWeigher()]
+
+    def test_same_weights(self):
+        expected = weights.HostWeightHandler().get_weighed_objects(
+            self._get_weighers(), _get_hosts(200), {})
+        actual = columnar.get_weighed_hosts(
+            self._get_weighers(), _get_hosts(200), {})
+        self.assertEqual([(w.obj.host, w.weight) for w in expected],
+                         [(w.obj.host, w.weight) for w in actual])
+
+    def test_weigher_without_vectorized_implementation(self):
+        weigher = ram.RAMWeigher()
+        weigher.weigh_columns = mock.Mock(return_value=None)
+        expected = weights.HostWeightHandler().get_weighed_objects(
+            [ram.RAMWeigher()], _get_hosts(20), {})
+        actual = columnar.get_weighed_hosts([weigher], _get_hosts(20), {})
+        self.assertEqual([(w.obj.host, w.weight) for w in expected],
+                         [(w.obj.host, w.weight) for w in actual])
+
+    def test_single_host(self):
+        hosts = _get_hosts(1)
+        weighed_hosts = columnar.get_weighed_hosts(self._get_weighers(),
+                                                   hosts, {})
+        self.assertEqual(1, len(weighed_hosts))
+        self.assertEqual(0.0, weighed_hosts[0].weight)
@@ -23,6 +23,7 @@ import datetime
 import mock
 from oslo_serialization import jsonutils
 from oslo_utils.fixture import uuidsentinel as uuids
+from oslo_utils import timeutils
 from oslo_utils import versionutils
 import six
 
@@ -1157,6 +1158,183 @@ class HostManagerChangedNodesTestCase(test.NoDBTestCase):
         self.assertEqual(0, num_hosts2)
 
 
+class HostManagerCacheTestCase(test.NoDBTestCase):
+    """Test case for HostManager class with the host state cache enabled."""
+
+    @mock.patch.object(host_manager.HostManager, '_init_instance_info')
+    @mock.patch.object(host_manager.HostManager, '_init_aggregates')
+    def setUp(self, mock_init_agg, mock_init_inst):
+        super(HostManagerCacheTestCase, self).setUp()
+        self.flags(host_state_cache=True, group='filter_scheduler')
+        self.host_manager = host_manager.HostManager()
+        self.cache = self.host_manager.host_state_cache
+        self.compute_nodes = [cn.obj_clone()
+                              for cn in fakes.COMPUTE_NODES[:4]]
+        self.uuids = [cn.uuid for cn in self.compute_nodes]
+
+    def _get_host_states(self):
+        # get_host_states_by_uuids returns a generator, so make a map from it
+        return {(state.host, state.nodename): state for state in
+                self.host_manager.get_host_states_by_uuids(
+                    'fake_context', self.uuids, objects.RequestSpec())}
+
+    @mock.patch('nova.objects.ServiceList.get_by_binary',
+                return_value=fakes.SERVICES)
+    @mock.patch('nova.objects.ComputeNodeList.get_all_changed_since',
+                return_value=[])
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    @mock.patch('nova.objects.InstanceList.get_uuids_by_host',
+                return_value=[])
+    def test_get_host_states_by_uuids_reuses_host_states(
+            self, mock_get_by_host, mock_get_all, mock_get_changed,
+            mock_get_by_binary):
+        mock_get_all.return_value = self.compute_nodes
+
+        host_states1 = self._get_host_states()
+        host_states2 = self._get_host_states()
+
+        self.assertEqual(4, len(host_states1))
+        self.assertEqual(host_states1, host_states2)
+        for key, state in host_states1.items():
+            self.assertIs(state, host_states2[key])
+        mock_get_all.assert_called_once_with(mock.ANY)
+        mock_get_changed.assert_called_once_with(mock.ANY, mock.ANY)
+        stats = self.cache.get_stats()
+        self.assertEqual(4, stats['misses'])
+        self.assertEqual(4, stats['hits'])
+        self.assertEqual(1, stats['full_loads'])
+        self.assertEqual(1, stats['delta_loads'])
+
+    @mock.patch('nova.objects.ServiceList.get_by_binary',
+                return_value=fakes.SERVICES)
+    @mock.patch('nova.objects.ComputeNodeList.get_all_changed_since')
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    @mock.patch('nova.objects.InstanceList.get_uuids_by_host',
+                return_value=[])
+    def test_get_host_states_by_uuids_updates_changed_nodes(
+            self, mock_get_by_host, mock_get_all, mock_get_changed,
+            mock_get_by_binary):
+        mock_get_all.return_value = self.compute_nodes
+        host_states = self._get_host_states()
+        self.assertEqual(512, host_states[('host1', 'node1')].free_ram_mb)
+        version = self.cache.version
+
+        changed = self.compute_nodes[0].obj_clone()
+        changed.free_ram_mb = 256
+        changed.updated_at = datetime.datetime(2015, 11, 11, 12, 0, 0)
+        deleted = self.compute_nodes[3].obj_clone()
+        deleted.deleted = True
+        mock_get_changed.return_value = [changed, deleted]
+
+        host_states = self._get_host_states()
+
+        self.assertEqual(3, len(host_states))
+        self.assertEqual(256, host_states[('host1', 'node1')].free_ram_mb)
+        self.assertNotIn(('host4', 'node4'), host_states)
+        self.assertGreater(self.cache.version, version)
+        stats = self.cache.get_stats()
+        self.assertEqual(5, stats['misses'])
+        self.assertEqual(2, stats['hits'])
+
+    @mock.patch('nova.objects.ServiceList.get_by_binary',
+                return_value=fakes.SERVICES)
+    @mock.patch('nova.objects.ComputeNodeList.get_all_changed_since',
+                return_value=[])
+    @mock.patch('nova.objects.ComputeNodeList.get_all_by_uuids')
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    @mock.patch('nova.objects.InstanceList.get_uuids_by_host',
+                return_value=[])
+    def test_get_host_states_by_uuids_loads_missing_nodes(
+            self, mock_get_by_host, mock_get_all, mock_get_by_uuids,
+            mock_get_changed, mock_get_by_binary):
+        mock_get_all.return_value = self.compute_nodes[:3]
+        mock_get_by_uuids.side_effect = [[], self.compute_nodes[3:]]
+        self.assertEqual(3, len(self._get_host_states()))
+        self.assertEqual(4, len(self._get_host_states()))
+        mock_get_by_uuids.assert_has_calls([
+            mock.call(mock.ANY, [uuids.cn4]),
+            mock.call(mock.ANY, [uuids.cn4])])
+
+    @mock.patch('nova.objects.ServiceList.get_by_binary',
+                return_value=fakes.SERVICES)
+    @mock.patch('nova.objects.ComputeNodeList.get_all_changed_since')
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    @mock.patch('nova.objects.InstanceList.get_uuids_by_host',
+                return_value=[])
+    def test_get_host_states_by_uuids_full_sync(
+            self, mock_get_by_host, mock_get_all, mock_get_changed,
+            mock_get_by_binary):
+        mock_get_all.side_effect = [self.compute_nodes,
+                                    self.compute_nodes[:2]]
+        now = timeutils.utcnow()
+        with mock.patch.object(timeutils, 'utcnow', return_value=now):
+            self.assertEqual(4, len(self._get_host_states()))
+        later = now + datetime.timedelta(seconds=600)
+        with mock.patch.object(timeutils, 'utcnow', return_value=later):
+            self.assertEqual(2, len(self._get_host_states()))
+
+        mock_get_changed.assert_not_called()
+        self.assertEqual(2, self.cache.get_stats()['full_loads'])
+
+    @mock.patch('nova.objects.ServiceList.get_by_binary',
+                return_value=fakes.SERVICES)
+    @mock.patch('nova.objects.ComputeNodeList.get_all_changed_since',
+                return_value=[])
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    @mock.patch('nova.objects.InstanceList.get_uuids_by_host',
+                return_value=[])
+    def test_get_host_states_by_uuids_expires_consumption(
+            self, mock_get_by_host, mock_get_all, mock_get_changed,
+            mock_get_by_binary):
+        mock_get_all.return_value = self.compute_nodes
+        spec_obj = objects.RequestSpec(
+            instance_uuid=uuids.instance,
+            flavor=objects.Flavor(root_gb=0, ephemeral_gb=0, memory_mb=128,
+                                  vcpus=1),
+            numa_topology=None,
+            pci_requests=objects.InstancePCIRequests(requests=[]))
+        now = timeutils.utcnow()
+
+        def get_free_ram_mb(seconds):
+            later = now + datetime.timedelta(seconds=seconds)
+            with mock.patch.object(timeutils, 'utcnow', return_value=later):
+                return self._get_host_states()[('host1', 'node1')].free_ram_mb
+
+        self.assertEqual(512, get_free_ram_mb(0))
+        # The build is scheduled to host1 but never lands on it, so the
+        # compute node does not report its usage again.
+        with mock.patch.object(timeutils, 'utcnow',
+                               return_value=now + datetime.timedelta(
+                                   seconds=30)):
+            self._get_host_states()[('host1', 'node1')].consume_from_request(
+                spec_obj)
+        self.assertEqual(384, get_free_ram_mb(60))
+        # The consumption is kept by the next full load, as it is more
+        # recent than the full sync interval, and released by the following
+        # one.
+        self.assertEqual(384, get_free_ram_mb(600))
+        self.assertEqual(512, get_free_ram_mb(1200))
+        self.assertEqual(3, self.cache.get_stats()['full_loads'])
+
+    def test_refresh_cells_caches_clears_host_state_cache(self):
+        self.cache.computes[uuids.cn1] = (uuids.cell, mock.sentinel.cn1)
+        self.host_manager.refresh_cells_caches()
+        self.assertEqual({}, self.cache.computes)
+
+    def test_changed_since(self):
+        now = timeutils.utcnow()
+        self.assertIsNone(self.cache.changed_since([uuids.cell1], now))
+
+        self.cache.load(uuids.cell1, [], now, full=True)
+        later = now + datetime.timedelta(seconds=30)
+        self.cache.load(uuids.cell1, [], later)
+        self.assertEqual(later - host_manager.HOST_STATE_CACHE_CLOCK_SKEW,
+                         self.cache.changed_since([uuids.cell1], later))
+        # A cell which was never loaded needs a full load
+        self.assertIsNone(
+            self.cache.changed_since([uuids.cell1, uuids.cell2], later))
+
+
 class HostStateTestCase(test.NoDBTestCase):
     """Test case for HostState class."""
 
@@ -1282,6 +1460,50 @@ class HostStateTestCase(test.NoDBTestCase):
         self.assertEqual([], host.pci_stats.pools)
         self.assertEqual(hyper_ver_int, host.hypervisor_version)
 
+    def test_numa_topology_version(self):
+        compute = objects.ComputeNode(
+            uuid=uuids.cn1,
+            stats={}, memory_mb=0, free_disk_gb=0, local_gb=0,
+            local_gb_used=0, free_ram_mb=0, vcpus=0, vcpus_used=0,
+            disk_available_least=None,
+            updated_at=datetime.datetime(2015, 11, 11, 11, 0, 0),
+            host_ip='127.0.0.1', hypervisor_type='htype',
+            hypervisor_hostname='hostname', cpu_info='cpu_info',
+            supported_hv_specs=[],
+            hypervisor_version=0, numa_topology=None,
+            pci_device_pools=None, metrics=None,
+            cpu_allocation_ratio=16.0, ram_allocation_ratio=1.5,
+            disk_allocation_ratio=1.0)
+        host = host_manager.HostState("fakehost", "fakenode", uuids.cell)
+        self.assertIsNone(host.numa_topology_version)
+
+        host.update(compute=compute)
+        version = host.numa_topology_version
+        self.assertIsNotNone(version)
+        # The versions are unique across the host states.
+        other_host = host_manager.HostState("fakehost", "fakenode",
+                                            uuids.cell)
+        other_host.update(compute=compute)
+        self.assertNotEqual(version, other_host.numa_topology_version)
+
+        # The compute node did not report anything new.
+        host.update(compute=compute)
+        self.assertEqual(version, host.numa_topology_version)
+
+        spec_obj = objects.RequestSpec(
+            instance_uuid=uuids.instance,
+            flavor=objects.Flavor(root_gb=0, ephemeral_gb=0, memory_mb=0,
+                                  vcpus=0),
+            numa_topology=None,
+            pci_requests=objects.InstancePCIRequests(requests=[]))
+        host.consume_from_request(spec_obj)
+        self.assertNotEqual(version, host.numa_topology_version)
+        version = host.numa_topology_version
+
+        compute.updated_at = timeutils.utcnow() + datetime.timedelta(hours=1)
+        host.update(compute=compute)
+        self.assertNotEqual(version, host.numa_topology_version)
+
     @mock.patch('nova.utils.synchronized',
                 side_effect=lambda a: lambda f: lambda *args: f(*args))
     @mock.patch('nova.virt.hardware.get_host_numa_usage_from_instance')
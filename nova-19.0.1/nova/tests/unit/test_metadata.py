@@ -27,6 +27,7 @@ try:
 except ImportError:
     import pickle
 
+import fixtures
 from keystoneauth1 import exceptions as ks_exceptions
 from keystoneauth1 import session
 import mock
@@ -47,6 +48,7 @@ from nova import block_device
 from nova.compute import flavors
 from nova import context
 from nova import exception
+from nova import metadata_cache
 from nova.network import model as network_model
 from nova.network.neutronv2 import api as neutronapi
 from nova import objects
@@ -1634,6 +1636,197 @@ class MetadataHandlerTestCase(test.TestCase):
         mock_get_im.assert_not_called()
         imd.assert_called_once_with(inst, 'bar')
 
+    def test_rendered_metadata(self):
+        fakes.stub_out_key_pair_funcs(self)
+        rendered = base.RenderedMetadata(self.mdinst)
+
+        for path in ('/2009-04-04', '/2009-04-04/meta-data',
+                     '/latest/meta-data/public-keys',
+                     '/latest/meta-data/public-keys/0/openssh-key',
+                     '/2009-04-04/user-data', '/openstack',
+                     '/openstack/latest', '/openstack/2012-08-10/user_data',
+                     '/openstack/latest/network_data.json',
+                     '/openstack/latest/vendor_data.json',
+                     '/openstack/latest/vendor_data2.json'):
+            self.assertIsNotNone(rendered.get_response(path))
+            expected = fake_request(self, self.mdinst, path)
+            response = fake_request(self, rendered, path)
+            self.assertEqual(expected.body, response.body, path)
+            self.assertEqual(expected.content_type, response.content_type,
+                             path)
+
+        # The random seed differs each time meta_data.json is rendered.
+        path = '/openstack/2013-04-04/meta_data.json'
+        expected = jsonutils.loads(fake_request(self, self.mdinst, path).body)
+        response = fake_request(self, rendered, path)
+        self.assertEqual('application/json', response.content_type)
+        response = jsonutils.loads(response.body)
+        del expected['random_seed'], response['random_seed']
+        self.assertEqual(expected, response)
+
+        # The paths returning callables are looked up on each request.
+        self.assertIsNone(rendered.get_response('/openstack/latest/password'))
+        response = fake_request(self, rendered, '/openstack/latest/password')
+        self.assertEqual(200, response.status_int)
+        response = fake_request(self, rendered, '/openstack/latest/foo')
+        self.assertEqual(404, response.status_int)
+
+    def test_rendered_metadata_random_seed(self):
+        fakes.stub_out_key_pair_funcs(self)
+        rendered = base.RenderedMetadata(self.mdinst)
+        path = '/openstack/latest/meta_data.json'
+
+        # Each request gets a new random seed, which is not cached.
+        seeds = set()
+        for _ in range(2):
+            response = jsonutils.loads(
+                fake_request(self, rendered, path).body)
+            seeds.add(response['random_seed'])
+        self.assertEqual(2, len(seeds))
+        self.assertNotIn(path.lstrip('/'), rendered.responses)
+
+    def _enable_metadata_cache_invalidation(self):
+        self.flags(metadata_cache_expiration=15,
+                   metadata_cache_invalidation=True, group='api')
+        self.useFixture(fixtures.MonkeyPatch(
+            'nova.metadata_cache._CLIENT', None))
+        self.useFixture(fixtures.MonkeyPatch(
+            'nova.metadata_cache.STATS', metadata_cache.CacheStats()))
+
+    @mock.patch.object(base, 'get_metadata_by_instance_id')
+    @mock.patch.object(base, 'get_metadata_by_address')
+    def test_metadata_handler_with_remote_address_rendered(self,
+                                                           get_by_address,
+                                                           get_by_uuid):
+        self._enable_metadata_cache_invalidation()
+        mdinst = fake_InstanceMetadata(self, self.instance,
+                                       address='192.192.192.2')
+        mdinst.ip_info['fixed_ips'].append('192.192.192.2')
+        get_by_address.return_value = get_by_uuid.return_value = mdinst
+        hnd = handler.MetadataRequestHandler()
+
+        self._metadata_handler_with_remote_address(hnd)
+        self._metadata_handler_with_remote_address(hnd)
+        self.assertEqual(1, get_by_address.call_count)
+        stats = metadata_cache.STATS.get_stats()
+        self.assertEqual((1, 1, 0.5),
+                         (stats['hits'], stats['misses'], stats['hit_rate']))
+
+        # The instance of the address is still cached.
+        metadata_cache.invalidate(self.instance.uuid)
+        self._metadata_handler_with_remote_address(hnd)
+        self.assertEqual(1, get_by_address.call_count)
+        get_by_uuid.assert_called_once_with(self.instance.uuid,
+                                            '192.192.192.2')
+
+    @mock.patch.object(base, 'get_metadata_by_instance_id')
+    @mock.patch.object(base, 'get_metadata_by_address')
+    def test_get_metadata_by_address_cached_instance(self, get_by_address,
+                                                     get_by_uuid):
+        self._enable_metadata_cache_invalidation()
+        metadata_cache.store_addresses(uuids.instance, ['10.0.0.2'])
+        get_by_uuid.return_value = mock.Mock(
+            ip_info={'fixed_ips': [], 'fixed_ip6s': ['10.0.0.2']})
+
+        self.assertEqual(
+            get_by_uuid.return_value,
+            handler.MetadataRequestHandler._get_metadata_by_address(
+                '10.0.0.2'))
+        get_by_uuid.assert_called_once_with(uuids.instance, '10.0.0.2')
+        self.assertFalse(get_by_address.called)
+
+    @mock.patch.object(base, 'get_metadata_by_instance_id')
+    @mock.patch.object(base, 'get_metadata_by_address')
+    def test_get_metadata_by_address_cached_instance_changed(
+            self, get_by_address, get_by_uuid):
+        self._enable_metadata_cache_invalidation()
+        metadata_cache.store_addresses(uuids.instance, ['10.0.0.2'])
+        get_by_uuid.side_effect = [
+            mock.Mock(ip_info={'fixed_ips': ['10.0.0.3'], 'fixed_ip6s': []}),
+            exception.InstanceNotFound(instance_id=uuids.instance)]
+
+        for _ in range(2):
+            self.assertEqual(
+                get_by_address.return_value,
+                handler.MetadataRequestHandler._get_metadata_by_address(
+                    '10.0.0.2'))
+        self.assertEqual(2, get_by_address.call_count)
+
+    @mock.patch.object(base, 'get_metadata_by_instance_id')
+    def test_metadata_handler_with_instance_id_rendered(self, get_by_uuid):
+        self._enable_metadata_cache_invalidation()
+        get_by_uuid.return_value = self.mdinst
+        hnd = handler.MetadataRequestHandler()
+        signed = hmac.new(
+            encodeutils.to_utf8(CONF.neutron.metadata_proxy_shared_secret),
+            encodeutils.to_utf8(self.instance.uuid),
+            hashlib.sha256).hexdigest()
+        self.flags(service_metadata_proxy=True, group='neutron')
+
+        for tenant_id, status in (('test', 200), ('test', 200),
+                                  ('other', 404)):
+            response = fake_request(
+                None, self.mdinst, relpath="/2009-04-04/user-data",
+                address="192.192.192.2", fake_get_metadata=False, app=hnd,
+                headers={'X-Forwarded-For': '192.192.192.2',
+                         'X-Instance-ID': self.instance.uuid,
+                         'X-Tenant-ID': tenant_id,
+                         'X-Instance-ID-Signature': signed})
+            self.assertEqual(status, response.status_int)
+        self.assertEqual(1, get_by_uuid.call_count)
+
+
+class MetadataCacheTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(MetadataCacheTestCase, self).setUp()
+        self.flags(metadata_cache_invalidation=True, group='api')
+        self.useFixture(fixtures.MonkeyPatch(
+            'nova.metadata_cache._CLIENT', None))
+        self.meta_data = mock.Mock(uuid=uuids.instance, address='10.0.0.2')
+        metadata_cache.store(self.meta_data)
+
+    def test_get(self):
+        self.assertEqual(self.meta_data,
+                         metadata_cache.get_by_instance_id(uuids.instance))
+        self.assertEqual(self.meta_data,
+                         metadata_cache.get_by_address('10.0.0.2'))
+        self.assertIsNone(metadata_cache.get_by_address('10.0.0.3'))
+
+    def test_store_addresses(self):
+        metadata_cache.store_addresses(uuids.other, ['10.0.0.2', '10.0.0.3'])
+        self.assertEqual(uuids.other,
+                         metadata_cache.get_instance_uuid('10.0.0.2'))
+        self.assertEqual(uuids.other,
+                         metadata_cache.get_instance_uuid('10.0.0.3'))
+        self.assertIsNone(metadata_cache.get_by_address('10.0.0.2'))
+
+    def test_get_by_address_rendered_for_another_address(self):
+        other = mock.Mock(uuid=uuids.instance, address='10.0.0.3')
+        metadata_cache.store(other)
+        self.assertIsNone(metadata_cache.get_by_address('10.0.0.2'))
+        self.assertEqual(other, metadata_cache.get_by_address('10.0.0.3'))
+
+    def test_invalidate(self):
+        metadata_cache.invalidate(uuids.instance, changes=['task_state'])
+        self.assertIsNotNone(metadata_cache.get_by_instance_id(uuids.instance))
+
+        metadata_cache.invalidate(uuids.instance,
+                                  changes=['task_state', 'metadata'])
+        self.assertIsNone(metadata_cache.get_by_instance_id(uuids.instance))
+        self.assertIsNone(metadata_cache.get_by_address('10.0.0.2'))
+
+    def test_invalidate_disabled(self):
+        self.flags(metadata_cache_invalidation=False, group='api')
+        metadata_cache.invalidate(uuids.instance)
+        self.assertIsNotNone(metadata_cache.get_by_instance_id(uuids.instance))
+
+    @mock.patch.object(metadata_cache, 'LOG')
+    def test_invalidate_fails(self, mock_log):
+        with mock.patch.object(metadata_cache._get_client(), 'delete',
+                               side_effect=Exception):
+            metadata_cache.invalidate(uuids.instance)
+        self.assertTrue(mock_log.warning.called)
+
 
 class MetadataPasswordTestCase(test.TestCase):
     def setUp(self):
@@ -2971,6 +2971,70 @@ class TestNovaManagePlacement(test.NoDBTestCase):
                       self.output.getvalue())
 
 
+class TestNovaManageQuota(test.NoDBTestCase):
+    """Unit tests for the nova-manage quota commands."""
+
+    def setUp(self):
+        super(TestNovaManageQuota, self).setUp()
+        self.output = StringIO()
+        self.useFixture(fixtures.MonkeyPatch('sys.stdout', self.output))
+        self.cli = manage.QuotaCommands()
+
+    @mock.patch('nova.quota._instances_cores_ram_count_in_cells')
+    @mock.patch('nova.objects.Quotas.get_all_usage_counters')
+    @mock.patch('nova.objects.Quotas.get_usage_counter_project_ids',
+                return_value=[uuidsentinel.project])
+    def test_check_usage_counters_no_drift(self, mock_get_projects,
+                                           mock_get_counters, mock_count):
+        mock_get_counters.return_value = {
+            None: {'instances': 2, 'cores': 4, 'ram': 1024}}
+        mock_count.return_value = (
+            {'project': {'instances': 2, 'cores': 4, 'ram': 1024}}, True)
+        self.assertEqual(0, self.cli.check_usage_counters())
+        mock_count.assert_called_once_with(
+            test.MatchType(context.RequestContext), uuidsentinel.project,
+            user_id=None)
+        self.assertEqual('', self.output.getvalue())
+
+    @mock.patch('nova.objects.Quotas.reset_usage_counters')
+    @mock.patch('nova.quota._instances_cores_ram_count_in_cells')
+    @mock.patch('nova.objects.Quotas.get_all_usage_counters')
+    def test_check_usage_counters_drift(self, mock_get_counters, mock_count,
+                                        mock_reset):
+        mock_get_counters.return_value = {
+            None: {'instances': 2, 'cores': 4, 'ram': 1024},
+            'fake-user': {'instances': 1, 'cores': 2}}
+        project_counts = {'instances': 2, 'cores': 4, 'ram': 1024}
+        user_counts = {'instances': 1, 'cores': 3, 'ram': 512}
+        mock_count.side_effect = [
+            ({'project': project_counts}, True),
+            ({'project': project_counts, 'user': user_counts}, True)]
+        self.assertEqual(1, self.cli.check_usage_counters(
+            project_id=uuidsentinel.project, fix=True))
+        output = self.output.getvalue()
+        self.assertIn('cores', output)
+        self.assertIn('ram', output)
+        self.assertNotIn('instances', output)
+        mock_reset.assert_called_once_with(
+            test.MatchType(context.RequestContext), uuidsentinel.project,
+            {'user': user_counts}, user_id='fake-user')
+
+    @mock.patch('nova.objects.Quotas.reset_usage_counters')
+    @mock.patch('nova.quota._instances_cores_ram_count_in_cells')
+    @mock.patch('nova.objects.Quotas.get_all_usage_counters')
+    def test_check_usage_counters_incomplete(self, mock_get_counters,
+                                             mock_count, mock_reset):
+        mock_get_counters.return_value = {
+            None: {'instances': 2, 'cores': 4, 'ram': 1024}}
+        mock_count.return_value = (
+            {'project': {'instances': 1, 'cores': 2, 'ram': 512}}, False)
+        self.assertEqual(2, self.cli.check_usage_counters(
+            project_id=uuidsentinel.project, fix=True))
+        self.assertIn('Unable to count the usage of project',
+                      self.output.getvalue())
+        mock_reset.assert_not_called()
+
+
 class TestNovaManageMain(test.NoDBTestCase):
     """Tests the nova-manage:main() setup code."""
 
@@ -1961,3 +1961,74 @@ class NoopQuotaDriverTestCase(test.TestCase):
                                                  quota.QUOTAS._resources,
                                                  'test_project')
         self.assertEqual(self.expected_settable_quotas, result)
+
+
+class UsageCountersTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(UsageCountersTestCase, self).setUp()
+        self.context = context.RequestContext('fake_user', 'fake_project')
+        self.instance = objects.Instance(project_id='fake_project',
+                                         user_id='fake_user',
+                                         vcpus=2, memory_mb=512)
+
+    @mock.patch('nova.objects.Quotas.update_usage_counters')
+    def test_update_usage_counters_disabled(self, mock_update):
+        quota.update_instance_usage_counters(self.context, self.instance)
+        quota.update_resize_usage_counters(self.context, self.instance,
+                                           objects.Flavor(), objects.Flavor())
+        mock_update.assert_not_called()
+
+    @mock.patch('nova.objects.Quotas.update_usage_counters')
+    def test_update_instance_usage_counters(self, mock_update):
+        self.flags(usage_counters=True, group='quota')
+        quota.update_instance_usage_counters(self.context, self.instance,
+                                             sign=-1)
+        mock_update.assert_called_once_with(
+            self.context, 'fake_project', 'fake_user',
+            {'instances': -1, 'cores': -2, 'ram': -512})
+
+    @mock.patch('nova.objects.Quotas.update_usage_counters')
+    def test_update_resize_usage_counters(self, mock_update):
+        self.flags(usage_counters=True, group='quota')
+        quota.update_resize_usage_counters(
+            self.context, self.instance,
+            objects.Flavor(vcpus=4, memory_mb=1024),
+            objects.Flavor(vcpus=2, memory_mb=512))
+        mock_update.assert_called_once_with(
+            self.context, 'fake_project', 'fake_user',
+            {'cores': 2, 'ram': 512})
+
+    @mock.patch('nova.objects.Quotas.update_usage_counters',
+                side_effect=exception.NovaException)
+    def test_update_usage_counters_failure(self, mock_update):
+        self.flags(usage_counters=True, group='quota')
+        # The failure is logged but not raised
+        quota.update_usage_counters(self.context, 'fake_project',
+                                    'fake_user', {'instances': 1})
+        mock_update.assert_called_once_with(
+            self.context, 'fake_project', 'fake_user', {'instances': 1})
+
+    @mock.patch('nova.quota._instances_cores_ram_count_in_cells')
+    @mock.patch('nova.objects.Quotas.get_usage_counters')
+    def test_instances_cores_ram_count_from_counters(self, mock_get,
+                                                     mock_count):
+        self.flags(usage_counters=True, usage_counters_max_age=30,
+                   group='quota')
+        counts = quota._instances_cores_ram_count(self.context,
+                                                  'fake_project',
+                                                  user_id='fake_user')
+        self.assertEqual(mock_get.return_value, counts)
+        mock_get.assert_called_once_with(
+            self.context, 'fake_project', quota.INSTANCE_RESOURCES,
+            user_id='fake_user', max_age=30)
+        mock_count.assert_not_called()
+
+    @mock.patch('nova.objects.Quotas.get_usage_counters')
+    @mock.patch('nova.quota._instances_cores_ram_count_in_cells')
+    def test_instances_cores_ram_count_disabled(self, mock_count, mock_get):
+        mock_count.return_value = (mock.sentinel.counts, True)
+        counts = quota._instances_cores_ram_count(self.context,
+                                                  'fake_project')
+        self.assertEqual(mock.sentinel.counts, counts)
+        mock_get.assert_not_called()
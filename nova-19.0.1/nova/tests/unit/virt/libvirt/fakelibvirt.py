@@ -157,6 +157,18 @@ VIR_DOMAIN_BLOCK_REBASE_RELATIVE = 8
 VIR_CONNECT_LIST_DOMAINS_ACTIVE = 1
 VIR_CONNECT_LIST_DOMAINS_INACTIVE = 2
 
+# getAllDomainStats stats types
+VIR_DOMAIN_STATS_STATE = 1
+VIR_DOMAIN_STATS_CPU_TOTAL = 2
+VIR_DOMAIN_STATS_BALLOON = 4
+VIR_DOMAIN_STATS_VCPU = 8
+VIR_DOMAIN_STATS_INTERFACE = 16
+VIR_DOMAIN_STATS_BLOCK = 32
+
+# getAllDomainStats flags
+VIR_CONNECT_GET_ALL_DOMAINS_STATS_ACTIVE = 1
+VIR_CONNECT_GET_ALL_DOMAINS_STATS_INACTIVE = 2
+
 # secret type
 VIR_SECRET_USAGE_TYPE_NONE = 0
 VIR_SECRET_USAGE_TYPE_VOLUME = 1
@@ -1143,6 +1155,51 @@ class Domain(object):
     def memoryStats(self):
         return {}
 
+    def _get_stats(self, stats):
+        """Build the typed parameters getAllDomainStats reports for this
+        domain, consistent with info(), vcpus(), blockStats() and
+        interfaceStats().
+        """
+        params = {}
+        info = self.info()
+        if stats & VIR_DOMAIN_STATS_STATE:
+            params['state.state'] = info[0]
+            params['state.reason'] = 0
+        if stats & VIR_DOMAIN_STATS_CPU_TOTAL:
+            params['cpu.time'] = info[4]
+        if stats & VIR_DOMAIN_STATS_BALLOON:
+            params['balloon.current'] = info[2]
+            params['balloon.maximum'] = info[1]
+        if stats & VIR_DOMAIN_STATS_VCPU:
+            params['vcpu.current'] = info[3]
+            params['vcpu.maximum'] = info[3]
+            for vcpu in self.vcpus()[0]:
+                params['vcpu.%d.state' % vcpu[0]] = vcpu[1]
+                params['vcpu.%d.time' % vcpu[0]] = vcpu[2]
+        if stats & VIR_DOMAIN_STATS_INTERFACE:
+            nics = self._def.get('devices', {}).get('nics', [])
+            params['net.count'] = len(nics)
+            for i in range(len(nics)):
+                # NOTE: this matches the target device XMLDesc() reports
+                dev = 'tap274487d1-60'
+                params['net.%d.name' % i] = dev
+                values = self.interfaceStats(dev)
+                for j, key in enumerate(('rx.bytes', 'rx.pkts', 'rx.errs',
+                                         'rx.drop', 'tx.bytes', 'tx.pkts',
+                                         'tx.errs', 'tx.drop')):
+                    params['net.%d.%s' % (i, key)] = values[j]
+        if stats & VIR_DOMAIN_STATS_BLOCK:
+            disks = self._def.get('devices', {}).get('disks', [])
+            params['block.count'] = len(disks)
+            for i, disk in enumerate(disks):
+                dev = disk.get('target_dev')
+                params['block.%d.name' % i] = dev
+                values = self.blockStats(dev)
+                for j, key in enumerate(('rd.reqs', 'rd.bytes', 'wr.reqs',
+                                         'wr.bytes', 'errors')):
+                    params['block.%d.%s' % (i, key)] = values[j]
+        return params
+
     def maxMemory(self):
         return self._def['memory']
 
@@ -1305,6 +1362,19 @@ class Connection(object):
                     vms.append(vm)
         return vms
 
+    def getAllDomainStats(self, stats=0, flags=0):
+        domains = []
+        if flags & VIR_CONNECT_GET_ALL_DOMAINS_STATS_ACTIVE:
+            domains += self.listAllDomains(VIR_CONNECT_LIST_DOMAINS_ACTIVE)
+        if flags & VIR_CONNECT_GET_ALL_DOMAINS_STATS_INACTIVE:
+            domains += self.listAllDomains(VIR_CONNECT_LIST_DOMAINS_INACTIVE)
+        if not flags:
+            domains = list(self._vms.values())
+        return self.domainListGetStats(domains, stats)
+
+    def domainListGetStats(self, doms, stats=0, flags=0):
+        return [(dom, dom._get_stats(stats)) for dom in doms]
+
     def _emit_lifecycle(self, dom, event, detail):
         if VIR_DOMAIN_EVENT_ID_LIFECYCLE not in self._event_callbacks:
             return
@@ -15754,6 +15754,82 @@ class LibvirtConnTestCase(test.NoDBTestCase,
         expected = fake_diagnostics_object(with_disks=True, with_nic=True)
         self.assertDiagnosticsEqual(expected, actual)
 
+    def test_diagnostic_cached_domain_stats(self):
+        xml = """
+                <domain type='kvm'>
+                    <devices>
+                        <disk type='file'>
+                            <source file='filename'/>
+                            <target dev='vda' bus='virtio'/>
+                        </disk>
+                        <interface type='network'>
+                            <mac address='52:54:00:a4:38:38'/>
+                            <source network='default'/>
+                            <target dev='vnet0'/>
+                        </interface>
+                    </devices>
+                </domain>
+            """
+
+        class DiagFakeDomain(FakeVirtDomain):
+
+            def __init__(self):
+                super(DiagFakeDomain, self).__init__(fake_xml=xml)
+
+            def vcpus(self):
+                raise AssertionError('vcpus should not be called')
+
+            def blockStats(self, path):
+                raise AssertionError('blockStats should not be called')
+
+            def interfaceStats(self, path):
+                raise AssertionError('interfaceStats should not be called')
+
+            def memoryStats(self):
+                return {}
+
+            def maxMemory(self):
+                return 280160
+
+        stats = {'vcpu.current': 2,
+                 'vcpu.0.state': 1, 'vcpu.0.time': 15340000000,
+                 'vcpu.1.state': 1, 'vcpu.1.time': 1640000000,
+                 'block.count': 1, 'block.0.name': 'vda',
+                 'block.0.rd.reqs': 169, 'block.0.rd.bytes': 688640,
+                 'block.0.wr.reqs': 0, 'block.0.wr.bytes': 0,
+                 'net.count': 1, 'net.0.name': 'vnet0',
+                 'net.0.rx.bytes': 4408, 'net.0.rx.pkts': 82,
+                 'net.0.rx.errs': 0, 'net.0.rx.drop': 0,
+                 'net.0.tx.bytes': 0, 'net.0.tx.pkts': 0,
+                 'net.0.tx.errs': 0, 'net.0.tx.drop': 0}
+        self.stub_out('nova.virt.libvirt.host.Host._get_domain',
+                      lambda self, instance: DiagFakeDomain())
+        self.stub_out('nova.virt.libvirt.host.Host.get_domain_stats',
+                      lambda self, guest: libvirt_guest.DomainStats(
+                          guest._domain, stats))
+
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        instance = objects.Instance(**self.test_instance)
+        actual = drvr.get_diagnostics(instance)
+        expect = {'cpu0_time': 15340000000,
+                  'cpu1_time': 1640000000,
+                  'vda_read': 688640,
+                  'vda_read_req': 169,
+                  'vda_write': 0,
+                  'vda_write_req': 0,
+                  'vda_errors': -1,
+                  'memory': 280160,
+                  'vnet0_rx': 4408,
+                  'vnet0_rx_drop': 0,
+                  'vnet0_rx_errors': 0,
+                  'vnet0_rx_packets': 82,
+                  'vnet0_tx': 0,
+                  'vnet0_tx_drop': 0,
+                  'vnet0_tx_errors': 0,
+                  'vnet0_tx_packets': 0,
+                  }
+        self.assertEqual(expect, actual)
+
     def test_diagnostic_blockstats_exception(self):
         xml = """
                 <domain type='kvm'>
@@ -16224,8 +16300,10 @@ class LibvirtConnTestCase(test.NoDBTestCase,
 
         self.assertDiagnosticsEqual(expected, actual)
 
+    @mock.patch.object(fakelibvirt.Connection, "getAllDomainStats",
+                       side_effect=fakelibvirt.libvirtError("fake-error"))
     @mock.patch.object(host.Host, "list_instance_domains")
-    def test_failing_vcpu_count(self, mock_list):
+    def test_failing_vcpu_count(self, mock_list, mock_stats):
         """Domain can fail to return the vcpu description in case it's
         just starting up or shutting down. Make sure None is handled
         gracefully.
@@ -16256,7 +16334,24 @@ class LibvirtConnTestCase(test.NoDBTestCase,
         drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
 
         self.assertEqual(6, drvr._get_vcpu_used())
-        mock_list.assert_called_with(only_guests=True, only_running=True)
+        mock_list.assert_called_with(only_guests=False)
+
+    @mock.patch.object(host.Host, "get_all_domain_stats")
+    def test_vcpu_count_bulk_stats(self, mock_stats):
+        dom1 = mock.Mock()
+        dom2 = mock.Mock()
+        dom2.vcpus.side_effect = fakelibvirt.libvirtError("fake-error")
+        mock_stats.return_value = [
+            libvirt_guest.DomainStats(dom1, {'vcpu.current': 4}),
+            libvirt_guest.DomainStats(dom2, {})]
+
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+
+        self.assertEqual(5, drvr._get_vcpu_used())
+        mock_stats.assert_called_once_with()
+        # The vcpus of dom1 were part of the bulk statistics.
+        dom1.vcpus.assert_not_called()
+        dom2.vcpus.assert_called_once_with()
 
     def _test_get_instance_capabilities(self, want):
         '''Base test for 'get_capabilities' function. '''
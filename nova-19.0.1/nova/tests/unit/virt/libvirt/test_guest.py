@@ -872,6 +872,76 @@ class GuestBlockTestCase(test.NoDBTestCase):
         self.domain.blockStats.assert_called_once_with('vda')
 
 
+class DomainStatsTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(DomainStatsTestCase, self).setUp()
+
+        self.useFixture(fakelibvirt.FakeLibvirtFixture())
+        self.host = host.Host("qemu:///system")
+        self.domain = mock.Mock(spec=fakelibvirt.virDomain)
+
+    def test_get_domain_info(self):
+        stats = libvirt_guest.DomainStats(self.domain, {
+            'state.state': 1, 'balloon.maximum': 2048,
+            'balloon.current': 1024, 'vcpu.current': 2, 'cpu.time': 42})
+        self.assertEqual([1, 2048, 1024, 2, 42],
+                         stats._get_domain_info(self.host))
+        self.domain.info.assert_not_called()
+
+    def test_get_domain_info_not_reported(self):
+        self.domain.info.return_value = [1, 2048, 1024, 2, 42]
+        stats = libvirt_guest.DomainStats(self.domain, {'state.state': 1})
+        self.assertEqual([1, 2048, 1024, 2, 42],
+                         stats._get_domain_info(self.host))
+
+    def test_get_vcpus_info(self):
+        stats = libvirt_guest.DomainStats(self.domain, {
+            'vcpu.current': 2, 'vcpu.0.state': 1, 'vcpu.0.time': 10,
+            'vcpu.1.state': 1, 'vcpu.1.time': 20})
+        vcpus = list(stats.get_vcpus_info())
+        self.assertEqual([0, 1], [vcpu.id for vcpu in vcpus])
+        self.assertEqual([10, 20], [vcpu.time for vcpu in vcpus])
+        self.domain.vcpus.assert_not_called()
+
+    def test_get_vcpus_info_not_reported(self):
+        self.domain.vcpus.side_effect = fakelibvirt.libvirtError('fake')
+        stats = libvirt_guest.DomainStats(self.domain, {})
+        self.assertIsNone(stats.vcpus)
+        self.assertRaises(fakelibvirt.libvirtError,
+                          list, stats.get_vcpus_info())
+
+    def test_get_block_stats(self):
+        stats = libvirt_guest.DomainStats(self.domain, {
+            'block.count': 2,
+            'block.0.name': 'vda', 'block.0.rd.reqs': 1,
+            'block.0.rd.bytes': 2, 'block.0.wr.reqs': 3,
+            'block.0.wr.bytes': 4,
+            'block.1.name': 'vdb', 'block.1.rd.reqs': 5,
+            'block.1.rd.bytes': 6, 'block.1.wr.reqs': 7,
+            'block.1.wr.bytes': 8, 'block.1.errors': 9})
+        self.assertEqual((1, 2, 3, 4, -1), stats.get_block_stats('vda'))
+        self.assertEqual((5, 6, 7, 8, 9), stats.get_block_stats('vdb'))
+        self.domain.blockStats.assert_not_called()
+
+        self.domain.blockStats.return_value = (0, 0, 0, 0, 0)
+        self.assertEqual((0, 0, 0, 0, 0), stats.get_block_stats('vdc'))
+        self.domain.blockStats.assert_called_once_with('vdc')
+
+    def test_get_interface_stats(self):
+        stats = libvirt_guest.DomainStats(self.domain, {
+            'net.count': 1, 'net.0.name': 'tap0',
+            'net.0.rx.bytes': 1, 'net.0.rx.pkts': 2, 'net.0.rx.errs': 3,
+            'net.0.rx.drop': 4, 'net.0.tx.bytes': 5, 'net.0.tx.pkts': 6,
+            'net.0.tx.errs': 7, 'net.0.tx.drop': 8})
+        self.assertEqual((1, 2, 3, 4, 5, 6, 7, 8),
+                         stats.get_interface_stats('tap0'))
+        self.domain.interfaceStats.assert_not_called()
+
+        stats.get_interface_stats('tap1')
+        self.domain.interfaceStats.assert_called_once_with('tap1')
+
+
 class JobInfoTestCase(test.NoDBTestCase):
 
     def setUp(self):
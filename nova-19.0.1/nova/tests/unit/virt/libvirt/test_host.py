@@ -16,6 +16,7 @@
 
 import eventlet
 from eventlet import greenthread
+import fixtures
 import mock
 from oslo_utils.fixture import uuidsentinel as uuids
 from oslo_utils import uuidutils
@@ -572,6 +573,144 @@ class HostTestCase(test.NoDBTestCase):
         self.assertEqual(dom0, result[0]._domain)
         self.assertEqual(dom1, result[1]._domain)
 
+    def _create_domain(self, name, vcpus, memory_kb):
+        xml = ("<domain type='kvm'>"
+               "  <name>%s</name>"
+               "  <uuid>%s</uuid>"
+               "  <vcpu>%d</vcpu>"
+               "  <memory>%d</memory>"
+               "  <devices>"
+               "    <disk type='file' device='disk'>"
+               "      <source file='/path/to/disk'/>"
+               "      <target dev='vda' bus='virtio'/>"
+               "    </disk>"
+               "  </devices>"
+               "</domain>") % (name, uuidutils.generate_uuid(), vcpus,
+                               memory_kb)
+        return self.host.get_connection().createXML(xml, 0)
+
+    def test_get_all_domain_stats(self):
+        dom1 = self._create_domain('instance00000001', 2, 2048)
+        dom2 = self._create_domain('instance00000002', 4, 4096)
+
+        stats = self.host.get_all_domain_stats()
+
+        self.assertEqual(sorted([dom1.UUIDString(), dom2.UUIDString()]),
+                         sorted([s.uuid for s in stats]))
+        for s in stats:
+            self.assertIsInstance(s, libvirt_guest.DomainStats)
+        by_uuid = {s.uuid: s for s in stats}
+        dom2_stats = by_uuid[dom2.UUIDString()]
+        self.assertEqual(4, dom2_stats.vcpus)
+        self.assertEqual(4, len(list(dom2_stats.get_vcpus_info())))
+        self.assertEqual(dom2.info(),
+                         dom2_stats._get_domain_info(self.host))
+        self.assertEqual(tuple(dom2.blockStats('vda')),
+                         dom2_stats.get_block_stats('vda'))
+
+    @mock.patch.object(fakelibvirt.Connection, "getAllDomainStats")
+    def test_get_all_domain_stats_bulk(self, mock_stats):
+        vm0 = FakeVirtDomain(id=0, name="Domain-0")  # Xen dom-0
+        vm1 = FakeVirtDomain(id=3, name="instance00000001")
+        mock_stats.return_value = [(vm0, {}), (vm1, {'vcpu.current': 2})]
+
+        stats = self.host.get_all_domain_stats()
+
+        mock_stats.assert_called_once_with(
+            fakelibvirt.VIR_DOMAIN_STATS_STATE |
+            fakelibvirt.VIR_DOMAIN_STATS_CPU_TOTAL |
+            fakelibvirt.VIR_DOMAIN_STATS_BALLOON |
+            fakelibvirt.VIR_DOMAIN_STATS_VCPU |
+            fakelibvirt.VIR_DOMAIN_STATS_INTERFACE |
+            fakelibvirt.VIR_DOMAIN_STATS_BLOCK,
+            fakelibvirt.VIR_CONNECT_GET_ALL_DOMAINS_STATS_ACTIVE)
+        self.assertEqual(1, len(stats))
+        self.assertEqual(vm1, stats[0]._domain)
+        self.assertEqual(2, stats[0].vcpus)
+
+        # Without caching every call collects the statistics again.
+        stats = self.host.get_all_domain_stats(only_guests=False)
+        self.assertEqual(2, mock_stats.call_count)
+        self.assertEqual([vm0, vm1], [s._domain for s in stats])
+
+    @mock.patch.object(host.Host, "list_instance_domains")
+    @mock.patch.object(fakelibvirt.Connection, "getAllDomainStats",
+                       side_effect=fakelibvirt.libvirtError("fake-error"))
+    def test_get_all_domain_stats_unsupported(self, mock_stats, mock_list):
+        vm1 = FakeVirtDomain(id=3, name="instance00000001")
+        mock_list.return_value = [vm1]
+
+        stats = self.host.get_all_domain_stats()
+
+        mock_list.assert_called_once_with(only_guests=False)
+        self.assertEqual(1, len(stats))
+        self.assertEqual(vm1, stats[0]._domain)
+        self.assertIsNone(stats[0].vcpus)
+
+    @mock.patch('time.time')
+    @mock.patch.object(fakelibvirt.Connection, "getAllDomainStats",
+                       return_value=[])
+    def test_get_all_domain_stats_cached(self, mock_stats, mock_time):
+        self.flags(domain_stats_cache_ttl=10, group='libvirt')
+        mock_time.return_value = 100
+
+        self.host.get_all_domain_stats()
+        mock_time.return_value = 109
+        self.host.get_all_domain_stats(only_guests=False)
+        self.assertEqual(1, mock_stats.call_count)
+
+        mock_time.return_value = 110
+        self.host.get_all_domain_stats()
+        self.assertEqual(2, mock_stats.call_count)
+
+    def test_get_domain_stats_not_cached(self):
+        dom = self._create_domain('instance00000001', 2, 2048)
+        guest = libvirt_guest.Guest(dom)
+
+        self.assertIsNone(self.host.get_domain_stats(guest))
+
+    def test_get_domain_stats_cached(self):
+        self.flags(domain_stats_cache_ttl=60, group='libvirt')
+        dom1 = self._create_domain('instance00000001', 2, 2048)
+        dom2 = self._create_domain('instance00000002', 4, 4096)
+        conn = self.host.get_connection()
+        mock_list_stats = self.useFixture(fixtures.MockPatchObject(
+            conn, 'domainListGetStats',
+            wraps=conn.domainListGetStats)).mock
+
+        # Nothing was collected yet, so only the guest is queried.
+        stats = self.host.get_domain_stats(libvirt_guest.Guest(dom1))
+        self.assertEqual(dom1.UUIDString(), stats.uuid)
+        self.assertEqual(2, stats.vcpus)
+        mock_list_stats.assert_called_once_with(
+            [dom1], self.host._domain_stats_types())
+
+        self.host.get_all_domain_stats()
+        mock_list_stats.reset_mock()
+        stats = self.host.get_domain_stats(libvirt_guest.Guest(dom2))
+        self.assertEqual(dom2.UUIDString(), stats.uuid)
+        self.assertEqual(4, stats.vcpus)
+        mock_list_stats.assert_not_called()
+
+    @mock.patch('time.time')
+    def test_get_hardware_info_cached(self, mock_time):
+        mock_time.return_value = 100
+        with mock.patch.object(host.Host, "get_connection") as mock_conn:
+            mock_conn().getInfo.return_value = ['zero', 'one', 'two']
+            self.host._get_hardware_info()
+            self.host._get_hardware_info()
+            self.assertEqual(2, mock_conn().getInfo.call_count)
+
+            self.flags(domain_stats_cache_ttl=10, group='libvirt')
+            mock_time.return_value = 109
+            self.host._get_hardware_info()
+            self.assertEqual(2, mock_conn().getInfo.call_count)
+
+            mock_time.return_value = 110
+            self.host._get_hardware_info()
+            self.host._get_hardware_info()
+            self.assertEqual(3, mock_conn().getInfo.call_count)
+
     def test_cpu_features_bug_1217630(self):
         self.host.get_connection()
 
@@ -798,7 +937,7 @@ Active:          8381604 kB
         with test.nested(
                 mock.patch.object(six.moves.builtins, "open", m, create=True),
                 mock.patch.object(host.Host,
-                                  "list_guests"),
+                                  "get_all_domain_stats"),
                 mock.patch.object(libvirt_driver.LibvirtDriver,
                                   "_conn"),
                 mock.patch('sys.platform', 'linux2'),
@@ -843,7 +982,7 @@ Active:          8381604 kB
 
         with test.nested(
                 mock.patch.object(host.Host,
-                                  "list_guests"),
+                                  "get_all_domain_stats"),
                 mock.patch('sys.platform', 'linux2'),
         ) as (mock_list, mock_platform):
             mock_list.return_value = [
@@ -16,8 +16,10 @@
 
 import contextlib
 import os
+import shutil
 import time
 
+from keystoneauth1 import loading as ks_loading
 import mock
 from oslo_concurrency import lockutils
 from oslo_concurrency import processutils
@@ -31,6 +33,7 @@ import nova.conf
 from nova import context
 from nova import objects
 from nova import test
+from nova.tests import fixtures as nova_fixtures
 from nova.tests.unit import fake_instance
 from nova import utils
 from nova.virt.libvirt import imagecache
@@ -237,6 +240,39 @@ class ImageCacheManagerTestCase(test.NoDBTestCase):
         self.assertRaises(processutils.ProcessExecutionError,
                           image_cache_manager._list_backing_images)
 
+    @mock.patch('nova.virt.libvirt.utils.get_disk_backing_file',
+                return_value='e97222e91fc4241f49a7f520d1dcf446751129b3')
+    def test_list_backing_images_indexed(self, mock_backing):
+        with utils.tempdir() as tmpdir:
+            self.flags(instances_path=tmpdir)
+            instance_dir = os.path.join(tmpdir, 'instance-00000001')
+            disk_path = os.path.join(instance_dir, 'disk')
+            os.mkdir(instance_dir)
+            open(disk_path, 'w').close()
+            found = os.path.join(tmpdir, CONF.image_cache_subdirectory_name,
+                                 'e97222e91fc4241f49a7f520d1dcf446751129b3')
+
+            image_cache_manager = imagecache.ImageCacheManager()
+            image_cache_manager.instance_names = self.stock_instance_names
+
+            # The backing file is only read once from an unchanged disk
+            for i in range(2):
+                self.assertEqual([found],
+                                 image_cache_manager._list_backing_images())
+            mock_backing.assert_called_once_with(disk_path)
+
+            # and read again from a disk which was replaced
+            open(disk_path + '.new', 'w').close()
+            os.rename(disk_path + '.new', disk_path)
+            self.assertEqual([found],
+                             image_cache_manager._list_backing_images())
+            self.assertEqual(2, mock_backing.call_count)
+
+            # A disk which is gone is forgotten
+            shutil.rmtree(instance_dir)
+            self.assertEqual([], image_cache_manager._list_backing_images())
+            self.assertEqual({}, image_cache_manager._backing_files)
+
     def test_find_base_file_nothing(self):
         self.stub_out('os.path.exists', lambda x: False)
 
@@ -612,6 +648,98 @@ class ImageCacheManagerTestCase(test.NoDBTestCase):
             mock_bdms.assert_called_once_with(ctxt,
                 [uuids.instance_1, uuids.instance_2])
 
+    @mock.patch('nova.privsep.path.utime')
+    def test_verify_base_images_prefetched(self, mock_utime):
+        self.flags(image_cache_prefetch_images=[uuids.image], group='libvirt')
+        base_dir = '/instance_path/_base'
+        base_file = os.path.join(base_dir,
+                                 imagecache.get_cache_fname(uuids.image))
+
+        image_cache_manager = imagecache.ImageCacheManager()
+        image_cache_manager.unexplained_images = [base_file]
+        with test.nested(
+                mock.patch.object(os.path, 'exists',
+                                  side_effect=lambda path: path == base_file),
+                mock.patch.object(image_cache_manager, '_list_backing_images',
+                                  return_value=[])):
+            image_cache_manager._age_and_verify_cached_images(None, [],
+                                                              base_dir)
+
+        self.assertEqual([base_file], image_cache_manager.active_base_files)
+        self.assertEqual([], image_cache_manager.removable_base_files)
+        mock_utime.assert_called_once_with(base_file)
+
+    @mock.patch('nova.virt.libvirt.utils.fetch_image')
+    @mock.patch.object(ks_loading, 'load_auth_from_conf_options')
+    def test_prefetch_images(self, mock_load_auth, mock_fetch):
+        self.useFixture(nova_fixtures.SpawnIsSynchronousFixture())
+        with utils.tempdir() as tmpdir:
+            self.flags(instances_path=tmpdir)
+            self.flags(image_cache_prefetch_images=[uuids.cached,
+                                                    uuids.missing],
+                       group='libvirt')
+            base_dir = os.path.join(tmpdir, CONF.image_cache_subdirectory_name)
+            os.mkdir(base_dir)
+            open(os.path.join(base_dir,
+                              imagecache.get_cache_fname(uuids.cached)),
+                 'w').close()
+
+            image_cache_manager = imagecache.ImageCacheManager()
+            image_cache_manager._prefetch_images()
+
+            mock_load_auth.assert_called_once_with(CONF, 'service_user')
+            mock_fetch.assert_called_once_with(
+                mock.ANY,
+                os.path.join(base_dir,
+                             imagecache.get_cache_fname(uuids.missing)),
+                uuids.missing)
+            ctxt = mock_fetch.call_args[0][0]
+            self.assertEqual(mock_load_auth.return_value,
+                             ctxt.get_auth_plugin())
+            self.assertEqual(set(), image_cache_manager._prefetching)
+
+    @mock.patch('nova.virt.libvirt.utils.fetch_image')
+    @mock.patch.object(ks_loading, 'load_auth_from_conf_options')
+    def test_prefetch_images_max_concurrent_disk_ops(self, mock_load_auth,
+                                                     mock_fetch):
+        self.useFixture(nova_fixtures.SpawnIsSynchronousFixture())
+        with utils.tempdir() as tmpdir:
+            self.flags(instances_path=tmpdir)
+            self.flags(image_cache_prefetch_images=[uuids.image_1,
+                                                    uuids.image_2],
+                       group='libvirt')
+            self.flags(max_concurrent_disk_ops=1, group='compute')
+
+            image_cache_manager = imagecache.ImageCacheManager()
+
+            def _fetch_image(context, target, image_id):
+                # The download holds the only slot
+                self.assertTrue(
+                    image_cache_manager._prefetch_semaphore.locked())
+
+            mock_fetch.side_effect = _fetch_image
+            image_cache_manager._prefetch_images()
+
+            self.assertEqual(2, mock_fetch.call_count)
+            self.assertFalse(image_cache_manager._prefetch_semaphore.locked())
+            self.assertEqual(set(), image_cache_manager._prefetching)
+
+    @mock.patch('nova.virt.libvirt.utils.fetch_image')
+    @mock.patch.object(ks_loading, 'load_auth_from_conf_options',
+                       return_value=None)
+    def test_prefetch_images_no_service_user(self, mock_load_auth,
+                                             mock_fetch):
+        with utils.tempdir() as tmpdir:
+            self.flags(instances_path=tmpdir)
+            self.flags(image_cache_prefetch_images=[uuids.missing],
+                       group='libvirt')
+
+            image_cache_manager = imagecache.ImageCacheManager()
+            image_cache_manager._prefetch_images()
+
+            mock_load_auth.assert_called_once_with(CONF, 'service_user')
+            mock_fetch.assert_not_called()
+
     def test_verify_base_images_no_base(self):
         self.flags(instances_path='/tmp/no/such/dir/name/please')
         image_cache_manager = imagecache.ImageCacheManager()
@@ -2025,6 +2025,50 @@ class VirtNUMAHostTopologyTestCase(test.NoDBTestCase):
         self.assertIsInstance(instance_topology, objects.InstanceNUMATopology)
         self.assertEqual(1, instance_topology.cells[0].id)
 
+    def test_get_fitting_fits_each_pair_of_cells_once(self):
+        host = objects.NUMATopology(cells=[
+            objects.NUMACell(id=i, cpuset=set([2 * i, 2 * i + 1]),
+                             memory=2048, cpu_usage=0, memory_usage=0,
+                             mempages=[], siblings=[set([2 * i]),
+                                                    set([2 * i + 1])],
+                             pinned_cpus=set())
+            for i in range(3)])
+        instance = objects.InstanceNUMATopology(cells=[
+            objects.InstanceNUMACell(id=0, cpuset=set([0, 1]), memory=1024),
+            objects.InstanceNUMACell(id=1, cpuset=set([2, 3]), memory=1024)])
+        pci_reqs = [objects.InstancePCIRequest(count=1,
+                                               spec=[{'vendor_id': '8086'}])]
+        pci_stats = stats.PciDeviceStats()
+
+        with test.nested(
+            mock.patch.object(hw, '_numa_fit_instance_cell',
+                              wraps=hw._numa_fit_instance_cell),
+            mock.patch.object(stats.PciDeviceStats, 'support_requests',
+                              return_value=False),
+        ) as (mock_fit_cell, mock_support):
+            fitted_instance = hw.numa_fit_instance_to_host(
+                host, instance, pci_requests=pci_reqs, pci_stats=pci_stats)
+
+        self.assertIsNone(fitted_instance)
+        # All the 6 permutations were tried but each of the 6 pairs of cells
+        # was only fitted once.
+        self.assertEqual(6, mock_support.call_count)
+        self.assertEqual(6, mock_fit_cell.call_count)
+        # The requested topology was not modified by the fitting
+        self.assertEqual([0, 1], [cell.id for cell in instance.cells])
+
+    def test_fitting_permutations(self):
+        def fits(host_index, instance_index):
+            return (host_index, instance_index) != (0, 0)
+
+        fits_mock = mock.Mock(side_effect=fits)
+        self.assertEqual(
+            [(1, 0), (1, 2), (2, 0), (2, 1)],
+            list(hw._fitting_permutations(3, 2, fits_mock)))
+        # The permutations starting with host cell 0 were pruned at once
+        fits_mock.assert_has_calls([mock.call(0, 0), mock.call(1, 0)])
+        self.assertEqual(7, fits_mock.call_count)
+
 
 class NumberOfSerialPortsTest(test.NoDBTestCase):
     def test_flavor(self):
@@ -1699,6 +1699,39 @@ def _numa_cells_support_network_metadata(
     return True
 
 
+def _fitting_permutations(num_host_cells, num_instance_cells, fits):
+    """Generate the placements of the instance cells on the host cells.
+
+    The placements are generated in the order of itertools.permutations
+    but the permutations starting with an instance cell which does not fit
+    on its host cell are skipped as a whole.
+
+    :param num_host_cells: the number of host cells
+    :param num_instance_cells: the number of instance cells
+    :param fits: a callable taking a host cell index and an instance cell
+                 index and returning whether the instance cell fits on the
+                 host cell
+
+    :returns: a generator of tuples of host cell indexes, one per instance
+              cell
+    """
+    chosen = []
+
+    def _search():
+        if len(chosen) == num_instance_cells:
+            yield tuple(chosen)
+            return
+        for host_index in range(num_host_cells):
+            if host_index in chosen or not fits(host_index, len(chosen)):
+                continue
+            chosen.append(host_index)
+            for placement in _search():
+                yield placement
+            chosen.pop()
+
+    return _search()
+
+
 def numa_fit_instance_to_host(
         host_topology, instance_topology, limits=None,
         pci_requests=None, pci_stats=None):
@@ -1749,38 +1782,44 @@ def numa_fit_instance_to_host(
         host_cells = sorted(host_cells, key=lambda cell: cell.id in [
             pool['numa_node'] for pool in pci_stats.pools])
 
-    # TODO(ndipanov): We may want to sort permutations differently
-    # depending on whether we want packing/spreading over NUMA nodes
-    for host_cell_perm in itertools.permutations(
-            host_cells, len(instance_topology)):
-        chosen_instance_cells = []
-        chosen_host_cells = []
-        for host_cell, instance_cell in zip(
-                host_cell_perm, instance_topology.cells):
+    # NOTE: Whether an instance cell fits on a host cell only depends on
+    # that pair of cells, so it is computed once for the request and every
+    # permutation sharing a pair which does not fit is pruned. The instance
+    # cells are fitted on copies as fitting modifies them.
+    fitted_cells = {}
+
+    def _fit_cell(host_index, instance_index):
+        key = (host_index, instance_index)
+        if key not in fitted_cells:
+            cpuset_reserved = 0
+            if (instance_topology.emulator_threads_isolated and
+                    instance_index == 0):
+                # For the case of isolate emulator threads, to
+                # make predictable where that CPU overhead is
+                # located we always configure it to be on host
+                # NUMA node associated to the guest NUMA node
+                # 0.
+                cpuset_reserved = 1
             try:
-                cpuset_reserved = 0
-                if (instance_topology.emulator_threads_isolated
-                    and len(chosen_instance_cells) == 0):
-                    # For the case of isolate emulator threads, to
-                    # make predictable where that CPU overhead is
-                    # located we always configure it to be on host
-                    # NUMA node associated to the guest NUMA node
-                    # 0.
-                    cpuset_reserved = 1
-                got_cell = _numa_fit_instance_cell(
-                    host_cell, instance_cell, limits, cpuset_reserved)
+                fitted_cells[key] = _numa_fit_instance_cell(
+                    host_cells[host_index],
+                    instance_topology.cells[instance_index].obj_clone(),
+                    limits, cpuset_reserved)
             except exception.MemoryPageSizeNotSupported:
                 # This exception will been raised if instance cell's
                 # custom pagesize is not supported with host cell in
                 # _numa_cell_supports_pagesize_request function.
-                break
-            if got_cell is None:
-                break
-            chosen_host_cells.append(host_cell)
-            chosen_instance_cells.append(got_cell)
+                fitted_cells[key] = None
+        return fitted_cells[key]
 
-        if len(chosen_instance_cells) != len(host_cell_perm):
-            continue
+    # TODO(ndipanov): We may want to sort permutations differently
+    # depending on whether we want packing/spreading over NUMA nodes
+    for host_indexes in _fitting_permutations(
+            len(host_cells), len(instance_topology), _fit_cell):
+        chosen_host_cells = [host_cells[index] for index in host_indexes]
+        chosen_instance_cells = [
+            _fit_cell(host_index, instance_index)
+            for instance_index, host_index in enumerate(host_indexes)]
 
         if pci_requests and pci_stats and not pci_stats.support_requests(
                 pci_requests, chosen_instance_cells):
@@ -5831,7 +5831,11 @@ class LibvirtDriver(driver.ComputeDriver):
         #
         # Thus when getting an exception we always report 1 as the
         # vCPU count, as the least worst value.
-        for guest in self._host.list_guests():
+        #
+        # The vCPUs are counted from the statistics collected in bulk for
+        # all the domains, the domain is only queried when they were not
+        # reported.
+        for guest in self._host.get_all_domain_stats():
             try:
                 vcpus = guest.get_vcpus_info()
                 total += len(list(vcpus))
@@ -9065,12 +9069,15 @@ class LibvirtDriver(driver.ComputeDriver):
         # virDomain object to use nova.virt.libvirt.Guest.
         # We should be able to remove domain at the end.
         domain = guest._domain
+        # NOTE: Use the statistics collected in bulk when they are cached,
+        # they fall back to querying the domain for anything not reported.
+        guest_stats = self._host.get_domain_stats(guest) or guest
         output = {}
         # get cpu time, might launch an exception if the method
         # is not supported by the underlying hypervisor being
         # used by libvirt
         try:
-            for vcpu in guest.get_vcpus_info():
+            for vcpu in guest_stats.get_vcpus_info():
                 output["cpu" + str(vcpu.id) + "_time"] = vcpu.time
         except libvirt.libvirtError:
             pass
@@ -9082,7 +9089,7 @@ class LibvirtDriver(driver.ComputeDriver):
                 # blockStats might launch an exception if the method
                 # is not supported by the underlying hypervisor being
                 # used by libvirt
-                stats = domain.blockStats(guest_disk)
+                stats = guest_stats.get_block_stats(guest_disk)
                 output[guest_disk + "_read_req"] = stats[0]
                 output[guest_disk + "_read"] = stats[1]
                 output[guest_disk + "_write_req"] = stats[2]
@@ -9095,7 +9102,7 @@ class LibvirtDriver(driver.ComputeDriver):
                 # interfaceStats might launch an exception if the method
                 # is not supported by the underlying hypervisor being
                 # used by libvirt
-                stats = domain.interfaceStats(interface)
+                stats = guest_stats.get_interface_stats(interface)
                 output[interface + "_rx"] = stats[0]
                 output[interface + "_rx_packets"] = stats[1]
                 output[interface + "_rx_errors"] = stats[2]
@@ -9121,10 +9128,9 @@ class LibvirtDriver(driver.ComputeDriver):
     def get_instance_diagnostics(self, instance):
         guest = self._host.get_guest(instance)
 
-        # TODO(sahid): We are converting all calls from a
-        # virDomain object to use nova.virt.libvirt.Guest.
-        # We should be able to remove domain at the end.
-        domain = guest._domain
+        # NOTE: Use the statistics collected in bulk when they are cached,
+        # they fall back to querying the domain for anything not reported.
+        guest_stats = self._host.get_domain_stats(guest) or guest
 
         xml = guest.get_xml_desc()
         xml_doc = etree.fromstring(xml)
@@ -9133,7 +9139,7 @@ class LibvirtDriver(driver.ComputeDriver):
         # be done since a mapping STATE_MAP LIBVIRT_POWER_STATE is
         # needed.
         (state, max_mem, mem, num_cpu, cpu_time) = \
-            guest._get_domain_info(self._host)
+            guest_stats._get_domain_info(self._host)
         config_drive = configdrive.required_by(instance)
         launched_at = timeutils.normalize_time(instance.launched_at)
         uptime = timeutils.delta_seconds(launched_at,
@@ -9152,7 +9158,7 @@ class LibvirtDriver(driver.ComputeDriver):
         # is not supported by the underlying hypervisor being
         # used by libvirt
         try:
-            for vcpu in guest.get_vcpus_info():
+            for vcpu in guest_stats.get_vcpus_info():
                 diags.add_cpu(id=vcpu.id, time=vcpu.time)
         except libvirt.libvirtError:
             pass
@@ -9163,7 +9169,7 @@ class LibvirtDriver(driver.ComputeDriver):
                 # blockStats might launch an exception if the method
                 # is not supported by the underlying hypervisor being
                 # used by libvirt
-                stats = domain.blockStats(guest_disk)
+                stats = guest_stats.get_block_stats(guest_disk)
                 diags.add_disk(read_bytes=stats[1],
                                read_requests=stats[0],
                                write_bytes=stats[3],
@@ -9188,7 +9194,7 @@ class LibvirtDriver(driver.ComputeDriver):
                     # interfaceStats might launch an exception if the
                     # method is not supported by the underlying hypervisor
                     # being used by libvirt
-                    stats = domain.interfaceStats(dev)
+                    stats = guest_stats.get_interface_stats(dev)
                     diags.add_nic(mac_address=mac_address,
                                   rx_octets=stats[0],
                                   rx_errors=stats[2],
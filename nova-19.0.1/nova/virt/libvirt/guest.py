@@ -261,6 +261,25 @@ class Guest(object):
             yield VCPUInfo(
                 id=vcpu[0], cpu=vcpu[3], state=vcpu[1], time=vcpu[2])
 
+    def get_block_stats(self, dev):
+        """Returns the I/O statistics of a guest disk.
+
+        :param dev: The target device name of the disk, e.g. vda
+
+        :returns: (rd_req, rd_bytes, wr_req, wr_bytes, errors)
+        """
+        return self._domain.blockStats(dev)
+
+    def get_interface_stats(self, dev):
+        """Returns the network statistics of a guest interface.
+
+        :param dev: The target device name of the interface, e.g. tap0
+
+        :returns: (rx_bytes, rx_packets, rx_errors, rx_drop,
+                   tx_bytes, tx_packets, tx_errors, tx_drop)
+        """
+        return self._domain.interfaceStats(dev)
+
     def delete_configuration(self, support_uefi=False):
         """Undefines a domain from hypervisor."""
         try:
@@ -729,6 +748,74 @@ class Guest(object):
             return JobInfo._get_job_stats_compat(self._domain)
 
 
+class DomainStats(Guest):
+    """A Guest whose statistics were collected in bulk.
+
+    The statistics are the typed parameters reported for the domain by
+    virConnectGetAllDomainStats or virDomainListGetStats. Whatever they
+    do not include, e.g. because the hypervisor does not support that
+    group of statistics, is read from the domain as for any other Guest.
+    """
+
+    _BLOCK_KEYS = ('rd.reqs', 'rd.bytes', 'wr.reqs', 'wr.bytes')
+    _INTERFACE_KEYS = ('rx.bytes', 'rx.pkts', 'rx.errs', 'rx.drop',
+                       'tx.bytes', 'tx.pkts', 'tx.errs', 'tx.drop')
+
+    def __init__(self, domain, stats):
+        super(DomainStats, self).__init__(domain)
+        self._stats = stats
+
+    @property
+    def vcpus(self):
+        """The number of online vcpus, or None if it was not reported."""
+        return self._stats.get('vcpu.current')
+
+    def _get_domain_info(self, host):
+        try:
+            return [self._stats['state.state'],
+                    self._stats['balloon.maximum'],
+                    self._stats['balloon.current'],
+                    self._stats['vcpu.current'],
+                    self._stats['cpu.time']]
+        except KeyError:
+            return super(DomainStats, self)._get_domain_info(host)
+
+    def get_vcpus_info(self):
+        if self.vcpus is None:
+            for vcpu in super(DomainStats, self).get_vcpus_info():
+                yield vcpu
+            return
+        for i in range(self.vcpus):
+            # NOTE: The host cpu a vcpu runs on is not part of the bulk
+            # statistics.
+            yield VCPUInfo(id=i, cpu=-1,
+                           state=self._stats.get('vcpu.%d.state' % i, 0),
+                           time=self._stats.get('vcpu.%d.time' % i, 0))
+
+    def _find_device(self, prefix, dev):
+        for i in range(self._stats.get('%s.count' % prefix, 0)):
+            if self._stats.get('%s.%d.name' % (prefix, i)) == dev:
+                return i
+
+    def get_block_stats(self, dev):
+        i = self._find_device('block', dev)
+        if i is None:
+            return super(DomainStats, self).get_block_stats(dev)
+        stats = [self._stats.get('block.%d.%s' % (i, key), 0)
+                 for key in self._BLOCK_KEYS]
+        # NOTE: as blockStats, report -1 when the hypervisor does not
+        # count errors.
+        stats.append(self._stats.get('block.%d.errors' % i, -1))
+        return tuple(stats)
+
+    def get_interface_stats(self, dev):
+        i = self._find_device('net', dev)
+        if i is None:
+            return super(DomainStats, self).get_interface_stats(dev)
+        return tuple(self._stats.get('net.%d.%s' % (i, key), 0)
+                     for key in self._INTERFACE_KEYS)
+
+
 class BlockDevice(object):
     """Wrapper around block device API"""
 
@@ -32,6 +32,7 @@ import os
 import socket
 import sys
 import threading
+import time
 import traceback
 
 from eventlet import greenio
@@ -92,6 +93,10 @@ class Host(object):
         self._lifecycle_event_handler = lifecycle_event_handler
         self._caps = None
         self._hostname = None
+        self._hardware_info = None
+        self._hardware_info_time = 0
+        self._domain_stats = None
+        self._domain_stats_time = 0
 
         self._wrapped_conn = None
         self._wrapped_conn_lock = threading.Lock()
@@ -432,6 +437,8 @@ class Host(object):
                 try:
                     # This will raise if it fails to get a connection
                     self._wrapped_conn = self._get_new_connection()
+                    # The cached statistics refer to the old connection.
+                    self._domain_stats = None
                 except Exception as ex:
                     with excutils.save_and_reraise_exception():
                         # If we previously had a connection and it went down,
@@ -615,6 +622,81 @@ class Host(object):
 
         return doms
 
+    @staticmethod
+    def _is_fresh(collected_at):
+        ttl = CONF.libvirt.domain_stats_cache_ttl
+        return ttl > 0 and time.time() - collected_at < ttl
+
+    def _domain_stats_types(self):
+        return (libvirt.VIR_DOMAIN_STATS_STATE |
+                libvirt.VIR_DOMAIN_STATS_CPU_TOTAL |
+                libvirt.VIR_DOMAIN_STATS_BALLOON |
+                libvirt.VIR_DOMAIN_STATS_VCPU |
+                libvirt.VIR_DOMAIN_STATS_INTERFACE |
+                libvirt.VIR_DOMAIN_STATS_BLOCK)
+
+    def _collect_domain_stats(self):
+        conn = self.get_connection()
+        try:
+            return [libvirt_guest.DomainStats(dom, stats)
+                    for dom, stats in conn.getAllDomainStats(
+                        self._domain_stats_types(),
+                        libvirt.VIR_CONNECT_GET_ALL_DOMAINS_STATS_ACTIVE)]
+        except libvirt.libvirtError as e:
+            # NOTE: Without bulk statistics every DomainStats reads what
+            # it is asked for from its domain, as a Guest would.
+            LOG.debug("Unable to collect domain statistics in bulk, "
+                      "falling back to per-domain queries: %s", e)
+            return [libvirt_guest.DomainStats(dom, {})
+                    for dom in self.list_instance_domains(only_guests=False)]
+
+    def get_all_domain_stats(self, only_guests=True):
+        """Get the statistics of all the running domains
+
+        The statistics are collected with a single bulk query and, when
+        [libvirt]/domain_stats_cache_ttl is set, cached for that many
+        seconds.
+
+        :param only_guests: True to filter out any host domain (eg Dom-0)
+
+        :returns: list of DomainStats objects
+        """
+        if self._domain_stats is None or not self._is_fresh(
+                self._domain_stats_time):
+            self._domain_stats = self._collect_domain_stats()
+            self._domain_stats_time = time.time()
+        if only_guests:
+            return [stats for stats in self._domain_stats if stats.id != 0]
+        return list(self._domain_stats)
+
+    def get_domain_stats(self, guest):
+        """Get the statistics of a single guest
+
+        The cached statistics are returned if they are still fresh,
+        otherwise the statistics of the guest are collected with a single
+        query.
+
+        :param guest: a Guest object
+
+        :returns: a DomainStats object, or None if statistics are not
+                  cached, i.e. [libvirt]/domain_stats_cache_ttl is 0
+        """
+        if CONF.libvirt.domain_stats_cache_ttl <= 0:
+            return None
+        if self._domain_stats is not None and self._is_fresh(
+                self._domain_stats_time):
+            for stats in self._domain_stats:
+                if stats.uuid == guest.uuid:
+                    return stats
+        try:
+            (dom, stats), = self.get_connection().domainListGetStats(
+                [guest._domain], self._domain_stats_types())
+        except libvirt.libvirtError as e:
+            LOG.debug("Unable to collect the statistics of domain %(uuid)s: "
+                      "%(ex)s", {'uuid': guest.uuid, 'ex': e})
+            return None
+        return libvirt_guest.DomainStats(dom, stats)
+
     def get_online_cpus(self):
         """Get the set of CPUs that are online on the host
 
@@ -775,8 +857,14 @@ class Host(object):
         """Returns hardware information about the Node.
 
         Note that the memory size is reported in MiB instead of KiB.
+
+        The result is cached for [libvirt]/domain_stats_cache_ttl seconds.
         """
-        return self.get_connection().getInfo()
+        if self._hardware_info is None or not self._is_fresh(
+                self._hardware_info_time):
+            self._hardware_info = self.get_connection().getInfo()
+            self._hardware_info_time = time.time()
+        return self._hardware_info
 
     def get_cpu_count(self):
         """Returns the total numbers of cpu in the host."""
@@ -799,7 +887,7 @@ class Host(object):
         to get real used memory within dom0 within xen
         """
         used = 0
-        for guest in self.list_guests(only_guests=False):
+        for guest in self.get_all_domain_stats(only_guests=False):
             try:
                 # TODO(sahid): Use get_info...
                 dom_mem = int(guest._get_domain_info(self)[2])
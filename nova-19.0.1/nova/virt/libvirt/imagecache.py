@@ -25,13 +25,18 @@ import os
 import re
 import time
 
+import eventlet.semaphore
+from keystoneauth1 import loading as ks_loading
 from oslo_concurrency import lockutils
 from oslo_concurrency import processutils
 from oslo_log import log as logging
 from oslo_utils import encodeutils
+from oslo_utils import fileutils
 import six
 
+from nova.compute import utils as compute_utils
 import nova.conf
+from nova import context as nova_context
 import nova.privsep.path
 from nova import utils
 from nova.virt import imagecache
@@ -87,6 +92,19 @@ class ImageCacheManager(imagecache.ImageCacheManager):
     def __init__(self):
         super(ImageCacheManager, self).__init__()
         self.lock_path = os.path.join(CONF.instances_path, 'locks')
+        # The backing files of the instance disks, indexed by the path of the
+        # disks, along with the device and inode of the disks they were read
+        # from.
+        self._backing_files = {}
+        # The images being prefetched, and the auth plugin they are
+        # downloaded with.
+        self._prefetching = set()
+        self._prefetch_auth = None
+        if CONF.compute.max_concurrent_disk_ops != 0:
+            self._prefetch_semaphore = eventlet.semaphore.Semaphore(
+                CONF.compute.max_concurrent_disk_ops)
+        else:
+            self._prefetch_semaphore = compute_utils.UnlimitedSemaphore()
         self._reset_state()
 
     def _reset_state(self):
@@ -161,18 +179,41 @@ class ImageCacheManager(imagecache.ImageCacheManager):
             else:
                 self._store_swap_image(ent)
 
+    def _get_disk_backing_file(self, disk_path):
+        """Get the backing file of an instance disk.
+
+        The backing file of a disk is only read from the disk when it was not
+        seen by a previous pass, or was replaced since, as reading it means
+        running qemu-img.
+        """
+        try:
+            stat = os.stat(disk_path)
+        except OSError:
+            # Let the backing file lookup report what happened to the disk.
+            return libvirt_utils.get_disk_backing_file(disk_path)
+
+        inode = (stat.st_dev, stat.st_ino)
+        indexed = self._backing_files.get(disk_path)
+        if indexed is not None and indexed[0] == inode:
+            return indexed[1]
+
+        backing_file = libvirt_utils.get_disk_backing_file(disk_path)
+        self._backing_files[disk_path] = (inode, backing_file)
+        return backing_file
+
     def _list_backing_images(self):
         """List the backing images currently in use."""
         inuse_images = []
+        disk_paths = set()
         for ent in os.listdir(CONF.instances_path):
             if ent in self.instance_names:
                 LOG.debug('%s is a valid instance name', ent)
                 disk_path = os.path.join(CONF.instances_path, ent, 'disk')
                 if os.path.exists(disk_path):
                     LOG.debug('%s has a disk file', ent)
+                    disk_paths.add(disk_path)
                     try:
-                        backing_file = libvirt_utils.get_disk_backing_file(
-                            disk_path)
+                        backing_file = self._get_disk_backing_file(disk_path)
                     except processutils.ProcessExecutionError:
                         # (for bug 1261442)
                         if not os.path.exists(disk_path):
@@ -201,6 +242,10 @@ class ImageCacheManager(imagecache.ImageCacheManager):
                                         {'instance': ent,
                                          'backing': backing_file})
                             self.unexplained_images.remove(backing_path)
+
+        # Forget about the disks which are gone
+        for disk_path in set(self._backing_files) - disk_paths:
+            del self._backing_files[disk_path]
         return inuse_images
 
     def _find_base_file(self, base_dir, fingerprint):
@@ -346,8 +391,10 @@ class ImageCacheManager(imagecache.ImageCacheManager):
 
     def _age_and_verify_cached_images(self, context, all_instances, base_dir):
         LOG.debug('Verify base images')
-        # Determine what images are on disk because they're in use
-        for img in self.used_images:
+        # Determine what images are on disk because they're in use, or
+        # prefetched
+        for img in set(self.used_images).union(
+                CONF.libvirt.image_cache_prefetch_images):
             fingerprint = hashlib.sha1(
                     encodeutils.safe_encode(img)).hexdigest()
             LOG.debug('Image id %(id)s yields fingerprint %(fingerprint)s',
@@ -403,7 +450,78 @@ class ImageCacheManager(imagecache.ImageCacheManager):
             return
         return base_dir
 
+    def _get_prefetch_context(self):
+        """Get a context to download the prefetched images with, or None."""
+        if self._prefetch_auth is None:
+            self._prefetch_auth = ks_loading.load_auth_from_conf_options(
+                CONF, nova.conf.service_token.SERVICE_USER_GROUP)
+            if self._prefetch_auth is None:
+                return None
+        return nova_context.RequestContext(
+            is_admin=True, user_auth_plugin=self._prefetch_auth)
+
+    def _prefetch_image(self, context, image_id, base_dir):
+        """Download an image to the image cache, unless it is there."""
+        filename = get_cache_fname(image_id)
+        base_file = os.path.join(base_dir, filename)
+
+        # NOTE: This is the lock imagebackend.Image.cache() holds while
+        # downloading the image, so a boot from the image waits for the
+        # download instead of downloading the image again.
+        @utils.synchronized(filename, external=True,
+                            lock_path=self.lock_path)
+        def _inner_prefetch_image():
+            if os.path.exists(base_file):
+                return
+            LOG.info('Prefetching image %(id)s to %(base_file)s',
+                     {'id': image_id, 'base_file': base_file})
+            libvirt_utils.fetch_image(context, base_file, image_id)
+
+        try:
+            # NOTE: Only the conversion of the images is bounded by the disk
+            # operations semaphore, the downloads are bounded here. The file
+            # lock is taken once the download can start, so a boot from the
+            # image does not wait for the other prefetched images.
+            with self._prefetch_semaphore:
+                _inner_prefetch_image()
+        except Exception as e:
+            LOG.warning('Failed to prefetch image %(id)s, error was '
+                        '%(error)s', {'id': image_id, 'error': e})
+        finally:
+            self._prefetching.discard(image_id)
+
+    def _prefetch_images(self):
+        """Start downloading the prefetched images missing in the cache."""
+        if CONF.libvirt.images_type == 'rbd':
+            LOG.debug('Skipping prefetch, the instance disks are not backed '
+                      'by the image cache')
+            return
+
+        base_dir = os.path.join(CONF.instances_path,
+                                CONF.image_cache_subdirectory_name)
+        image_ids = [
+            image_id
+            for image_id in CONF.libvirt.image_cache_prefetch_images
+            if image_id not in self._prefetching and not os.path.exists(
+                os.path.join(base_dir, get_cache_fname(image_id)))]
+        if not image_ids:
+            return
+
+        context = self._get_prefetch_context()
+        if context is None:
+            LOG.warning('Unable to load auth from [service_user] '
+                        'configuration, images %s cannot be prefetched.',
+                        ', '.join(image_ids))
+            return
+
+        fileutils.ensure_tree(base_dir)
+        for image_id in image_ids:
+            self._prefetching.add(image_id)
+            utils.spawn_n(self._prefetch_image, context, image_id, base_dir)
+
     def update(self, context, all_instances):
+        if CONF.libvirt.image_cache_prefetch_images:
+            self._prefetch_images()
         base_dir = self._get_base()
         if not base_dir:
             return
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Count the libvirt calls made by the host and domain statistics collection.
+
+The host information and domain statistics read by a periodic resource
+update (the host cpu count, memory and frequency, the vCPUs used and the
+memory used by the domains) are collected from a fake libvirt connection
+with a number of running domains:
+
+* per-domain: without bulk domain statistics, i.e. every domain is queried
+  on its own, as when getAllDomainStats is not supported.
+* bulk: with a single getAllDomainStats call per consumer.
+* bulk+cache: as bulk, with [libvirt]/domain_stats_cache_ttl set so that
+  the consumers of a periodic run share the statistics.
+
+Run like:
+
+    python tools/benchmarks/libvirt_domain_stats.py --domains 50 200 500
+"""
+
+from __future__ import print_function
+
+import argparse
+import collections
+import functools
+import time
+
+import fixtures
+from oslo_utils import uuidutils
+
+import nova.conf
+from nova.tests.unit.virt.libvirt import fakelibvirt
+from nova.virt.libvirt import host
+
+CONF = nova.conf.CONF
+
+COUNTED = {
+    fakelibvirt.Connection: ('getInfo', 'getCPUStats', 'listAllDomains',
+                             'getAllDomainStats', 'domainListGetStats'),
+    fakelibvirt.Domain: ('info', 'vcpus', 'blockStats', 'interfaceStats'),
+}
+
+DOMAIN_XML = """<domain type='kvm'>
+  <name>instance%(index)08x</name>
+  <uuid>%(uuid)s</uuid>
+  <vcpu>4</vcpu>
+  <memory>4194304</memory>
+  <devices>
+    <disk type='file' device='disk'>
+      <source file='/var/lib/nova/instances/%(uuid)s/disk'/>
+      <target dev='vda' bus='virtio'/>
+    </disk>
+  </devices>
+</domain>"""
+
+
+class CallCounter(fixtures.Fixture):
+    """Counts the calls made to the fake libvirt API.
+
+    Only the calls made by nova are counted, not the ones the fake libvirt
+    API makes to itself, e.g. to build the bulk statistics.
+    """
+
+    def __init__(self):
+        self.calls = collections.Counter()
+        self._depth = 0
+
+    def _counted(self, name, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self._depth:
+                self.calls[name] += 1
+            self._depth += 1
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._depth -= 1
+        return wrapper
+
+    def setUp(self):
+        super(CallCounter, self).setUp()
+        for cls, names in COUNTED.items():
+            for name in names:
+                self.useFixture(fixtures.MonkeyPatch(
+                    '%s.%s.%s' % (cls.__module__, cls.__name__, name),
+                    self._counted(name, getattr(cls, name))))
+
+
+def unsupported(*args, **kwargs):
+    raise fakelibvirt.make_libvirtError(
+        fakelibvirt.libvirtError, 'this function is not supported',
+        error_code=fakelibvirt.VIR_ERR_NO_SUPPORT,
+        error_domain=fakelibvirt.VIR_FROM_QEMU)
+
+
+def periodic_run(drv_host):
+    """Read what a periodic resource update reads from libvirt."""
+    drv_host.get_cpu_count()
+    drv_host.get_memory_mb_total()
+    drv_host.get_cpu_stats()
+    # Mirrors LibvirtDriver._get_vcpu_used()
+    vcpus = 0
+    for guest in drv_host.get_all_domain_stats():
+        try:
+            vcpus += len(list(guest.get_vcpus_info()))
+        except fakelibvirt.libvirtError:
+            vcpus += 1
+    drv_host._sum_domain_memory_mb(include_host=False)
+    return vcpus
+
+
+def run(mode, count, runs):
+    with fixtures.Fixture() as fixture:
+        fixture.useFixture(fakelibvirt.FakeLibvirtFixture())
+        CONF.set_override('domain_stats_cache_ttl',
+                          60 if mode == 'bulk+cache' else 0,
+                          group='libvirt')
+        if mode == 'per-domain':
+            fixture.useFixture(fixtures.MonkeyPatch(
+                'nova.tests.unit.virt.libvirt.fakelibvirt.Connection.'
+                'getAllDomainStats', unsupported))
+        drv_host = host.Host('qemu:///system')
+        conn = drv_host.get_connection()
+        for i in range(count):
+            conn.createXML(DOMAIN_XML % {'index': i,
+                                         'uuid': uuidutils.generate_uuid()},
+                           0)
+
+        counter = fixture.useFixture(CallCounter())
+        start = time.time()
+        for i in range(runs):
+            if mode == 'bulk+cache':
+                # Each periodic run starts with an expired cache.
+                drv_host._domain_stats = None
+                drv_host._hardware_info = None
+            periodic_run(drv_host)
+        elapsed = time.time() - start
+        CONF.clear_override('domain_stats_cache_ttl', group='libvirt')
+    return (sum(counter.calls.values()) / float(runs),
+            elapsed / runs * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--domains', type=int, nargs='+',
+                        default=[50, 200, 500],
+                        help='Numbers of running domains to benchmark')
+    parser.add_argument('--runs', type=int, default=5,
+                        help='Number of periodic runs for each measure')
+    args = parser.parse_args()
+    CONF([], project='nova')
+
+    modes = ('per-domain', 'bulk', 'bulk+cache')
+    print('%8s %12s %22s %22s' % ('domains', 'mode', 'libvirt calls per run',
+                                  'time per run (ms)'))
+    for count in args.domains:
+        for mode in modes:
+            calls, elapsed = run(mode, count, args.runs)
+            print('%8d %12s %22.1f %22.2f' % (count, mode, calls, elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Measure the fit of instance NUMA topologies onto host NUMA topologies.
+
+The hosts have 8 CPUs and 16GB of memory per NUMA node, and the first half
+of their NUMA nodes is almost full. The instances request a NUMA node for
+every two host NUMA nodes, with 4 vCPUs and 2GB of memory each, and either
+pinned CPUs, 2MB huge pages or a PCI device only found on the last host
+NUMA node. They are fitted:
+
+* exhaustive: by fitting the instance cells on every permutation of the
+  host cells, as before the fits were pruned.
+* pruned: with nova.virt.hardware.numa_fit_instance_to_host.
+* pruned+cache: with the NUMATopologyFilter and
+  [filter_scheduler]/numa_fit_cache_size set, i.e. the same request is
+  only fitted once as long as the host does not change.
+
+Run like:
+
+    python tools/benchmarks/numa_fit.py --nodes 2 4 8
+"""
+
+from __future__ import print_function
+
+import argparse
+import collections
+import functools
+import itertools
+import time
+
+import fixtures
+from oslo_utils import uuidutils
+
+import nova.conf
+from nova import exception
+from nova import objects
+from nova.objects import fields
+from nova.pci import stats
+from nova.scheduler.filters import numa_topology_filter
+from nova.scheduler import host_manager
+from nova.virt import hardware
+
+CONF = nova.conf.CONF
+
+CPUS_PER_NODE = 8
+MEMORY_PER_NODE = 16384
+HUGEPAGES_PER_NODE = 2048
+
+
+class FitCounter(fixtures.Fixture):
+    """Counts the fits of instance cells onto host cells."""
+
+    def __init__(self):
+        self.calls = collections.Counter()
+
+    def setUp(self):
+        super(FitCounter, self).setUp()
+        func = hardware._numa_fit_instance_cell
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            self.calls['fit'] += 1
+            return func(*args, **kwargs)
+
+        self.useFixture(fixtures.MonkeyPatch(
+            'nova.virt.hardware._numa_fit_instance_cell', wrapper))
+
+
+def make_host_cell(node, used):
+    cpuset = set(range(node * CPUS_PER_NODE, (node + 1) * CPUS_PER_NODE))
+    siblings = [set([cpu, cpu + 1]) for cpu in sorted(cpuset)[::2]]
+    pinned_cpus = set(sorted(cpuset)[2:]) if used else set()
+    return objects.NUMACell(
+        id=node, cpuset=cpuset, siblings=siblings, pinned_cpus=pinned_cpus,
+        memory=MEMORY_PER_NODE,
+        cpu_usage=len(pinned_cpus),
+        memory_usage=MEMORY_PER_NODE - 2048 if used else 0,
+        mempages=[
+            objects.NUMAPagesTopology(
+                size_kb=4, total=(MEMORY_PER_NODE - 4096) * 256,
+                used=(MEMORY_PER_NODE - 6144) * 256 if used else 0),
+            objects.NUMAPagesTopology(
+                size_kb=2048, total=HUGEPAGES_PER_NODE,
+                used=HUGEPAGES_PER_NODE if used else 0)])
+
+
+def make_host_state(nodes):
+    host_state = host_manager.HostState('host%d' % nodes, 'node', None)
+    host_state.numa_topology = objects.NUMATopology(
+        cells=[make_host_cell(node, node < nodes // 2)
+               for node in range(nodes)])
+    host_state.pci_stats = stats.PciDeviceStats(
+        stats=objects.PciDevicePoolList(objects=[objects.PciDevicePool(
+            product_id='1520', vendor_id='8086', numa_node=nodes - 1,
+            tags={}, count=4)]))
+    host_state.cpu_allocation_ratio = 1.0
+    host_state.ram_allocation_ratio = 1.0
+    host_state._bump_numa_topology_version()
+    return host_state
+
+
+def make_request(nodes, kind):
+    cells = []
+    for node in range(max(1, nodes // 2)):
+        cell = objects.InstanceNUMACell(
+            id=node, cpuset=set(range(node * 4, node * 4 + 4)), memory=2048)
+        if kind == 'pinned':
+            cell.cpu_policy = fields.CPUAllocationPolicy.DEDICATED
+        elif kind == 'hugepage':
+            cell.pagesize = 2048
+        cells.append(cell)
+    pci_requests = []
+    if kind == 'pci':
+        pci_requests = [objects.InstancePCIRequest(
+            count=1, spec=[{'vendor_id': '8086', 'product_id': '1520'}],
+            request_id=None)]
+    return objects.RequestSpec(
+        instance_uuid=uuidutils.generate_uuid(),
+        numa_topology=objects.InstanceNUMATopology(cells=cells),
+        pci_requests=objects.InstancePCIRequests(requests=pci_requests),
+        flavor=objects.Flavor(extra_specs={}),
+        image=objects.ImageMeta(properties=objects.ImageMetaProps()))
+
+
+def exhaustive_fit(host_topology, instance_topology, limits, pci_requests,
+                   pci_stats):
+    """Fit the instance on every permutation of the host cells."""
+    for host_cell_perm in itertools.permutations(
+            host_topology.cells, len(instance_topology)):
+        chosen_instance_cells = []
+        for host_cell, instance_cell in zip(
+                host_cell_perm, instance_topology.cells):
+            try:
+                got_cell = hardware._numa_fit_instance_cell(
+                    host_cell, instance_cell, limits)
+            except exception.MemoryPageSizeNotSupported:
+                break
+            if got_cell is None:
+                break
+            chosen_instance_cells.append(got_cell)
+        if len(chosen_instance_cells) != len(host_cell_perm):
+            continue
+        if pci_requests and not pci_stats.support_requests(
+                pci_requests, chosen_instance_cells):
+            continue
+        return objects.InstanceNUMATopology(cells=chosen_instance_cells)
+
+
+def run(mode, nodes, kind, runs):
+    host_state = make_host_state(nodes)
+    spec_obj = make_request(nodes, kind)
+    limits = objects.NUMATopologyLimits(cpu_allocation_ratio=1.0,
+                                        ram_allocation_ratio=1.0)
+    filt = numa_topology_filter.NUMATopologyFilter()
+    CONF.set_override('numa_fit_cache_size', 16, group='filter_scheduler')
+
+    with fixtures.Fixture() as fixture:
+        counter = fixture.useFixture(FitCounter())
+        fitted = 0
+        start = time.time()
+        for i in range(runs):
+            requested_topology = spec_obj.numa_topology.obj_clone()
+            pci_requests = spec_obj.pci_requests.requests
+            if mode == 'exhaustive':
+                fitted += bool(exhaustive_fit(
+                    host_state.numa_topology, requested_topology, limits,
+                    pci_requests, host_state.pci_stats))
+            elif mode == 'pruned':
+                fitted += bool(hardware.numa_fit_instance_to_host(
+                    host_state.numa_topology, requested_topology,
+                    limits=limits, pci_requests=pci_requests,
+                    pci_stats=host_state.pci_stats))
+            else:
+                fitted += filt.host_passes(host_state, spec_obj)
+        elapsed = time.time() - start
+    CONF.clear_override('numa_fit_cache_size', group='filter_scheduler')
+    return (fitted == runs, counter.calls['fit'] / float(runs),
+            elapsed / runs * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--nodes', type=int, nargs='+', default=[2, 4, 8],
+                        help='Numbers of host NUMA nodes to benchmark')
+    parser.add_argument('--runs', type=int, default=20,
+                        help='Number of fits for each measure')
+    args = parser.parse_args()
+    CONF([], project='nova')
+    objects.register_all()
+
+    modes = ('exhaustive', 'pruned', 'pruned+cache')
+    print('%6s %9s %13s %7s %16s %16s' % ('nodes', 'request', 'mode',
+                                           'fitted', 'cell fits per fit',
+                                           'time per fit (ms)'))
+    for nodes in args.nodes:
+        for kind in ('pinned', 'hugepage', 'pci'):
+            for mode in modes:
+                fitted, calls, elapsed = run(mode, nodes, kind, args.runs)
+                print('%6d %9s %13s %7s %16.1f %16.3f' % (
+                    nodes, kind, mode, fitted, calls, elapsed))
+
+
+if __name__ == '__main__':
+    main()
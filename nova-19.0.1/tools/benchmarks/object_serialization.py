@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Measure the serialization of typical instance payloads sent over RPC.
+
+The payloads are serialized and deserialized with the nova RPC serializer,
+either with the serializers compiled for the nova object classes (nova) or
+with the generic oslo.versionedobjects conversion (oslo):
+
+* instance: an instance with its flavor, as sent to and by compute.
+* instances: an InstanceList, as sent by the periodic tasks of compute.
+* bdms: a BlockDeviceMappingList, as sent along with the builds.
+
+The size of the instance sent to conductor to save a task state change is
+also reported, whole and in delta mode, see [conductor]/object_save_deltas.
+
+Run like:
+
+    python tools/benchmarks/object_serialization.py --instances 10 100
+"""
+
+from __future__ import print_function
+
+import argparse
+import time
+
+import fixtures
+from oslo_serialization import jsonutils
+from oslo_utils import uuidutils
+from oslo_versionedobjects import base as ovo_base
+
+from nova.compute import task_states
+import nova.conf
+from nova import context as nova_context
+from nova import objects
+from nova.objects import base
+from nova.tests.unit import fake_block_device
+from nova.tests.unit import fake_instance
+
+CONF = nova.conf.CONF
+
+
+class OsloSerialization(fixtures.Fixture):
+    """Use the generic oslo.versionedobjects primitive conversion."""
+
+    def setUp(self):
+        super(OsloSerialization, self).setUp()
+        self.useFixture(fixtures.MonkeyPatch(
+            'nova.objects.base.NovaObject.obj_to_primitive',
+            ovo_base.VersionedObject.obj_to_primitive))
+        self.useFixture(fixtures.MonkeyPatch(
+            'nova.objects.base.NovaObject._obj_from_primitive',
+            ovo_base.VersionedObject.__dict__['_obj_from_primitive']))
+
+
+def make_instance(context):
+    return fake_instance.fake_instance_obj(
+        context, uuid=uuidutils.generate_uuid(),
+        expected_attrs=['metadata', 'system_metadata', 'info_cache'])
+
+
+def make_payloads(context, count):
+    bdms = [fake_block_device.fake_bdm_object(
+        context, {'source_type': 'volume', 'destination_type': 'volume',
+                  'volume_id': uuidutils.generate_uuid(),
+                  'device_name': '/dev/vd%s' % chr(ord('a') + i),
+                  'boot_index': i})
+        for i in range(min(count, 26))]
+    return {
+        'instance': make_instance(context),
+        'instances': objects.InstanceList(
+            objects=[make_instance(context) for i in range(count)]),
+        'bdms': objects.BlockDeviceMappingList(objects=bdms),
+    }
+
+
+def measure(context, payload, runs):
+    serializer = base.NovaObjectSerializer()
+    start = time.time()
+    for i in range(runs):
+        primitive = serializer.serialize_entity(context, payload)
+    serialize = time.time() - start
+    start = time.time()
+    for i in range(runs):
+        serializer.deserialize_entity(context, primitive)
+    deserialize = time.time() - start
+    return runs / serialize, runs / deserialize
+
+
+def save_sizes(context):
+    instance = make_instance(context)
+    instance.task_state = task_states.SPAWNING
+    serializer = base.NovaObjectSerializer()
+    return [len(jsonutils.dumps(serializer.serialize_entity(context, obj)))
+            for obj in (instance, instance.obj_save_delta())]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--instances', type=int, nargs='+',
+                        default=[10, 100],
+                        help='Numbers of instances in the lists')
+    parser.add_argument('--runs', type=int, default=50,
+                        help='Number of runs for each measure')
+    args = parser.parse_args()
+    CONF([], project='nova')
+    objects.register_all()
+    context = nova_context.get_admin_context()
+
+    print('%10s %10s %6s %18s %18s' % ('payload', 'instances', 'mode',
+                                       'serialize (ops/s)',
+                                       'deserialize (ops/s)'))
+    for count in args.instances:
+        payloads = make_payloads(context, count)
+        for name in sorted(payloads):
+            for mode in ('oslo', 'nova'):
+                with fixtures.Fixture() as fixture:
+                    if mode == 'oslo':
+                        fixture.useFixture(OsloSerialization())
+                    to_ops, from_ops = measure(context, payloads[name],
+                                               args.runs)
+                print('%10s %10d %6s %18.1f %18.1f' % (name, count, mode,
+                                                       to_ops, from_ops))
+
+    whole, delta = save_sizes(context)
+    print()
+    print('instance saved to conductor: %d bytes whole, %d bytes in delta '
+          'mode' % (whole, delta))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Compare the per-host and the columnar filtering and weighing of hosts.
+
+The RamFilter, CoreFilter, DiskFilter and AggregateInstanceExtraSpecsFilter
+filters and the RAM, CPU, disk and IO ops weighers are run over fake host
+states with both implementations, and the mean time per request is reported.
+
+Run like:
+
+    python tools/benchmarks/scheduler_columnar.py --hosts 1000 5000 10000
+"""
+
+from __future__ import print_function
+
+import argparse
+import random
+import timeit
+
+import nova.conf
+from nova import objects
+from nova.scheduler import columnar
+from nova.scheduler import filters as scheduler_filters
+from nova.scheduler.filters import aggregate_instance_extra_specs as agg_specs
+from nova.scheduler.filters import core_filter
+from nova.scheduler.filters import disk_filter
+from nova.scheduler.filters import ram_filter
+from nova.scheduler import host_manager
+from nova.scheduler import weights
+from nova.scheduler.weights import cpu
+from nova.scheduler.weights import disk
+from nova.scheduler.weights import io_ops
+from nova.scheduler.weights import ram
+
+CONF = nova.conf.CONF
+
+
+def make_hosts(count, seed):
+    rand = random.Random(seed)
+    aggs = [objects.Aggregate(id=i, hosts=[],
+                              metadata={'ssd': rand.choice(['true', 'false'])})
+            for i in range(10)]
+    hosts = []
+    for i in range(count):
+        host = host_manager.HostState('host%d' % i, 'node%d' % i, None)
+        host.total_usable_ram_mb = rand.choice([131072, 262144, 524288])
+        host.free_ram_mb = rand.randint(0, host.total_usable_ram_mb)
+        host.ram_allocation_ratio = 1.5
+        host.total_usable_disk_gb = rand.choice([1024, 2048])
+        host.free_disk_mb = rand.randint(0, host.total_usable_disk_gb * 1024)
+        host.disk_allocation_ratio = 1.0
+        host.vcpus_total = rand.choice([32, 48, 64])
+        host.vcpus_used = rand.randint(0, host.vcpus_total * 4)
+        host.cpu_allocation_ratio = 16.0
+        host.num_io_ops = rand.randint(0, 8)
+        host.aggregates = rand.sample(aggs, 2)
+        hosts.append(host)
+    return hosts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--hosts', type=int, nargs='+',
+                        default=[1000, 5000, 10000],
+                        help='Numbers of hosts to benchmark')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of requests to time for each run')
+    args = parser.parse_args()
+    CONF([], project='nova')
+
+    if not columnar.is_supported():
+        parser.error('numpy is required to run the columnar path')
+
+    objects.register_all()
+    filters = [ram_filter.RamFilter(), core_filter.CoreFilter(),
+               disk_filter.DiskFilter(),
+               agg_specs.AggregateInstanceExtraSpecsFilter()]
+    weighers = [ram.RAMWeigher(), cpu.CPUWeigher(), disk.DiskWeigher(),
+                io_ops.IoOpsWeigher()]
+    handler = scheduler_filters.HostFilterHandler()
+    weight_handler = weights.HostWeightHandler()
+    spec_obj = objects.RequestSpec(
+        flavor=objects.Flavor(memory_mb=4096, vcpus=4, root_gb=40,
+                              ephemeral_gb=0, swap=0,
+                              extra_specs={'ssd': 'true'}),
+        instance_uuid='00000000-0000-0000-0000-000000000000')
+
+    def per_host(hosts):
+        hosts = handler.get_filtered_objects(filters, hosts, spec_obj)
+        return weight_handler.get_weighed_objects(weighers, hosts, spec_obj)
+
+    def columnar_path(hosts):
+        hosts = columnar.get_filtered_hosts(filters, hosts, spec_obj)
+        return columnar.get_weighed_hosts(weighers, hosts, spec_obj)
+
+    print('%8s %14s %14s %8s' % ('hosts', 'per-host (ms)', 'columnar (ms)',
+                                 'speedup'))
+    for count in args.hosts:
+        hosts = make_hosts(count, seed=count)
+        results = []
+        for func in (per_host, columnar_path):
+            elapsed = timeit.timeit(lambda: func(hosts), number=args.repeat)
+            results.append(elapsed / args.repeat * 1000)
+        print('%8d %14.1f %14.1f %7.1fx' % (count, results[0], results[1],
+                                            results[0] / results[1]))
+
+
+if __name__ == '__main__':
+    main()
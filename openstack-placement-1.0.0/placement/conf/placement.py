@@ -32,6 +32,40 @@ are returned in a deterministic but undefined order. That is, all things
 being equal, two requests for allocation candidates will return the same
 results in the same order; but no guarantees are made as to how that order
 is determined.
+"""),
+    cfg.BoolOpt(
+        'allocation_candidates_snapshot',
+        default=False,
+        help="""
+If True, allocation candidates are computed against an in-memory snapshot of
+the resource providers, with their inventories, usages, traits and aggregates,
+instead of querying the database for each part of the request. The snapshot
+is shared by the requests handled by a placement process and is refreshed,
+for the providers whose generation changed or whose allocations were removed
+by the process, whenever the database changes.
+"""),
+    cfg.IntOpt(
+        'allocation_candidates_snapshot_resync_interval',
+        default=60,
+        min=0,
+        help="""
+Interval in seconds between the reloads of the usages of all the resource
+providers in the snapshot used when ``allocation_candidates_snapshot`` is
+True.
+
+Removing allocations does not change the generation of the resource
+providers. The snapshot of a placement process reloads the usages of the
+providers whose allocations were removed by that process right away, but only
+notices the allocations removed by the other placement processes when all the
+usages are reloaded. Until then, these providers may be reported with less
+capacity than they have.
+
+Possible values:
+
+* 0: the usages of all the providers are never reloaded. Only use it when a
+  single placement process handles the requests.
+* Any positive integer: the maximum number of seconds the allocations removed
+  by other placement processes go unnoticed.
 """),
     # TODO(mriedem): When placement is split out of nova, this should be
     # deprecated since then [oslo_policy]/policy_file can be used.
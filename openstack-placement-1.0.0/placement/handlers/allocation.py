@@ -491,6 +491,130 @@ def set_allocations_for_consumer(req):
     return _set_allocations_for_consumer(req, schema.ALLOCATION_SCHEMA_V1_28)
 
 
+def _consumer_error(exc):
+    """Returns the result of writing the allocations of a consumer which
+    failed with the supplied webob HTTP exception, in the form of the errors
+    in the body of a failed response.
+    """
+    return {
+        'status': exc.code,
+        'title': exc.title,
+        'detail': exc.detail,
+        'code': exc.comment or errors.DEFAULT,
+    }
+
+
+def _write_error(consumer_uuid, exc):
+    """Returns the webob HTTP exception corresponding to the exception which
+    prevented the allocations of a consumer from being written.
+    """
+    if isinstance(exc, exception.NotFound):
+        return webob.exc.HTTPBadRequest(
+            _("Unable to allocate inventory for consumer %(consumer_uuid)s: "
+              "%(error)s") % {'consumer_uuid': consumer_uuid, 'error': exc})
+    if isinstance(exc, exception.InvalidInventory):
+        return webob.exc.HTTPConflict(
+            _('Unable to allocate inventory: %(error)s') % {'error': exc})
+    return webob.exc.HTTPConflict(
+        _('Inventory and/or allocations changed while attempting to '
+          'allocate: %(error)s') % {'error': exc},
+        comment=errors.CONCURRENT_UPDATE)
+
+
+def _set_allocations_per_consumer(req, data, want_version):
+    """Writes the allocations of each consumer in a POST /allocations request
+    independently of the other consumers and returns a response with the
+    result for each consumer:
+
+    {
+        'consumers': {
+            CONSUMER_UUID_1: {
+                'status': 204
+            },
+            CONSUMER_UUID_2: {
+                'status': 409,
+                'title': 'Conflict',
+                'detail': 'Unable to allocate inventory: ...',
+                'code': 'placement.undefined_code'
+            }
+        }
+    }
+    """
+    context = req.environ['placement.context']
+    results = {}
+
+    # Look each resource provider up once for all the consumers.
+    rp_uuids = set()
+    for consumer_data in data.values():
+        rp_uuids |= set(consumer_data['allocations'])
+    rp_objs = {}
+    for rp_uuid in rp_uuids:
+        try:
+            rp_objs[rp_uuid] = rp_obj.ResourceProvider.get_by_uuid(
+                context, rp_uuid)
+        except exception.NotFound:
+            pass
+
+    alloc_lists = {}
+    new_consumers = {}
+    for consumer_uuid, consumer_data in data.items():
+        allocations = consumer_data['allocations']
+        missing = set(allocations) - set(rp_objs)
+        try:
+            if missing:
+                raise webob.exc.HTTPBadRequest(
+                    _("Allocation for resource provider '%(rp_uuid)s' "
+                      "that does not exist.") %
+                    {'rp_uuid': ', '.join(sorted(missing))})
+            consumer, new_consumer_created = data_util.ensure_consumer(
+                context, consumer_uuid, consumer_data['project_id'],
+                consumer_data['user_id'],
+                consumer_data.get('consumer_generation'), want_version)
+        except webob.exc.HTTPException as exc:
+            results[consumer_uuid] = _consumer_error(exc)
+            continue
+        if new_consumer_created:
+            new_consumers[consumer_uuid] = consumer
+        if allocations:
+            alloc_list = []
+            for rp_uuid, allocation in allocations.items():
+                alloc_list.extend(_new_allocations(
+                    context, rp_objs[rp_uuid], consumer,
+                    allocation['resources']))
+        else:
+            # The allocations are empty, which means wipe them out.
+            # Internal to the allocation object this is signalled by a
+            # used value of 0.
+            alloc_list = alloc_obj.get_all_by_consumer_id(
+                context, consumer_uuid)
+            for allocation in alloc_list:
+                allocation.used = 0
+        if alloc_list:
+            alloc_lists[consumer_uuid] = alloc_list
+        else:
+            # Nothing to remove
+            results[consumer_uuid] = {'status': 204}
+
+    failed = alloc_obj.replace_all_per_consumer(context, alloc_lists)
+    for consumer_uuid in alloc_lists:
+        if consumer_uuid in failed:
+            results[consumer_uuid] = _consumer_error(
+                _write_error(consumer_uuid, failed[consumer_uuid]))
+        else:
+            results[consumer_uuid] = {'status': 204}
+    LOG.debug("Wrote allocations of %d consumer(s), %d failed",
+              len(alloc_lists) - len(failed), len(failed))
+    delete_consumers([consumer
+                      for consumer_uuid, consumer in new_consumers.items()
+                      if results[consumer_uuid]['status'] != 204])
+
+    req.response.status = 200
+    req.response.body = encodeutils.to_utf8(
+        jsonutils.dumps({'consumers': results}))
+    req.response.content_type = 'application/json'
+    return req.response
+
+
 @wsgi_wrapper.PlacementWsgify
 @microversion.version_handler('1.13')
 @util.require_content('application/json')
@@ -501,8 +625,15 @@ def set_allocations(req):
     want_schema = schema.POST_ALLOCATIONS_V1_13
     if want_version.matches((1, 28)):
         want_schema = schema.POST_ALLOCATIONS_V1_28
+    atomic = True
+    if want_version.matches((1, 32)):
+        util.validate_query_params(req, schema.POST_ALLOCATIONS_QS_V1_32)
+        atomic = req.GET.get('atomic', 'true') == 'true'
     data = util.extract_json(req.body, want_schema)
 
+    if not atomic:
+        return _set_allocations_per_consumer(req, data, want_version)
+
     consumers, new_consumers_created = inspect_consumers(
         context, data, want_version)
     # Create a sequence of allocation objects to be used in one
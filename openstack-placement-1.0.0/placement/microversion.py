@@ -79,6 +79,7 @@ VERSIONS = [
              # inventories and allocations.
     '1.31',  # Add in_tree and in_tree<N> queryparam on
              # `GET /allocation_candidates` API
+    '1.32',  # Add atomic queryparam on `POST /allocations` API
 ]
 
 
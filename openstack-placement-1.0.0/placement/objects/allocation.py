@@ -22,6 +22,7 @@ from placement import db_api
 from placement import exception
 from placement.objects import consumer as consumer_obj
 from placement.objects import project as project_obj
+from placement.objects import provider_snapshot
 from placement.objects import resource_provider as rp_obj
 from placement.objects import user as user_obj
 from placement import resource_class_cache as rc_cache
@@ -55,14 +56,36 @@ class Allocation(object):
         self.created_at = created_at
 
 
+def _note_removed_allocations(ctx, where):
+    """Lets the provider snapshot know which providers the allocations
+    matching the supplied condition are removed from, as removing allocations
+    does not bump the generation of the providers.
+    """
+    if not ctx.config.placement.allocation_candidates_snapshot:
+        return
+    sel = sa.select([_ALLOC_TBL.c.resource_provider_id]).where(where)
+    rp_ids = [r[0] for r in ctx.session.execute(sel.distinct())]
+    provider_snapshot.allocations_removed(ctx, rp_ids)
+
+
 @db_api.placement_context_manager.writer
 def _delete_allocations_for_consumer(ctx, consumer_id):
     """Deletes any existing allocations that correspond to the allocations to
     be written. This is wrapped in a transaction, so if the write subsequently
     fails, the deletion will also be rolled back.
     """
-    del_sql = _ALLOC_TBL.delete().where(
-        _ALLOC_TBL.c.consumer_id == consumer_id)
+    where = _ALLOC_TBL.c.consumer_id == consumer_id
+    _note_removed_allocations(ctx, where)
+    del_sql = _ALLOC_TBL.delete().where(where)
+    ctx.session.execute(del_sql)
+
+
+@db_api.placement_context_manager.writer
+def _delete_allocations_for_consumers(ctx, consumer_ids):
+    """Deletes any existing allocations of the supplied consumers."""
+    where = _ALLOC_TBL.c.consumer_id.in_(consumer_ids)
+    _note_removed_allocations(ctx, where)
+    del_sql = _ALLOC_TBL.delete().where(where)
     ctx.session.execute(del_sql)
 
 
@@ -71,7 +94,9 @@ def _delete_allocations_by_ids(ctx, alloc_ids):
     """Deletes allocations having an internal id value in the set of supplied
     IDs
     """
-    del_sql = _ALLOC_TBL.delete().where(_ALLOC_TBL.c.id.in_(alloc_ids))
+    where = _ALLOC_TBL.c.id.in_(alloc_ids)
+    _note_removed_allocations(ctx, where)
+    del_sql = _ALLOC_TBL.delete().where(where)
     ctx.session.execute(del_sql)
 
 
@@ -244,6 +269,150 @@ def _check_capacity_exceeded(ctx, allocs):
     return res_providers
 
 
+def _get_usages_for_consumers(ctx, provider_ids, rc_ids, consumer_ids):
+    """Returns a tuple of (usage records, old allocations) for the supplied
+    providers and resource classes, where allocations of the supplied
+    consumers are not counted in the usage records but returned separately,
+    as the consumers' allocations are being replaced.
+
+    The usage records are in a dict, keyed by (provider ID, resource class
+    ID), of inventory records including the generation of the provider and
+    the amount used by other consumers. The old allocations are in a dict,
+    keyed by consumer UUID, of dicts, keyed by (provider ID, resource class
+    ID), of amounts used by that consumer.
+    """
+    # This is the same query as in _check_capacity_exceeded(), but for the
+    # usage of the consumers whose allocations are not being replaced.
+    usage = sa.select([_ALLOC_TBL.c.resource_provider_id,
+                       _ALLOC_TBL.c.resource_class_id,
+                       sql.func.sum(_ALLOC_TBL.c.used).label('used')])
+    usage = usage.where(
+        sa.and_(_ALLOC_TBL.c.resource_class_id.in_(rc_ids),
+                _ALLOC_TBL.c.resource_provider_id.in_(provider_ids),
+                ~_ALLOC_TBL.c.consumer_id.in_(consumer_ids)))
+    usage = usage.group_by(_ALLOC_TBL.c.resource_provider_id,
+                           _ALLOC_TBL.c.resource_class_id)
+    usage = sa.alias(usage, name='usage')
+
+    inv_join = sql.join(
+        _RP_TBL, _INV_TBL,
+        sql.and_(_RP_TBL.c.id == _INV_TBL.c.resource_provider_id,
+                 _INV_TBL.c.resource_class_id.in_(rc_ids)))
+    primary_join = sql.outerjoin(
+        inv_join, usage,
+        sql.and_(
+            _INV_TBL.c.resource_provider_id == usage.c.resource_provider_id,
+            _INV_TBL.c.resource_class_id == usage.c.resource_class_id)
+    )
+    cols_in_output = [
+        _RP_TBL.c.id.label('resource_provider_id'),
+        _RP_TBL.c.generation,
+        _INV_TBL.c.resource_class_id,
+        _INV_TBL.c.total,
+        _INV_TBL.c.reserved,
+        _INV_TBL.c.allocation_ratio,
+        _INV_TBL.c.min_unit,
+        _INV_TBL.c.max_unit,
+        _INV_TBL.c.step_size,
+        usage.c.used,
+    ]
+    sel = sa.select(cols_in_output).select_from(primary_join)
+    sel = sel.where(
+        sa.and_(_RP_TBL.c.id.in_(provider_ids),
+                _INV_TBL.c.resource_class_id.in_(rc_ids)))
+    usage_map = {}
+    for record in ctx.session.execute(sel):
+        key = (record['resource_provider_id'], record['resource_class_id'])
+        usage_map[key] = record
+
+    sel = sa.select([_ALLOC_TBL.c.consumer_id,
+                     _ALLOC_TBL.c.resource_provider_id,
+                     _ALLOC_TBL.c.resource_class_id,
+                     _ALLOC_TBL.c.used])
+    sel = sel.where(
+        sa.and_(_ALLOC_TBL.c.resource_class_id.in_(rc_ids),
+                _ALLOC_TBL.c.resource_provider_id.in_(provider_ids),
+                _ALLOC_TBL.c.consumer_id.in_(consumer_ids)))
+    old_allocs = collections.defaultdict(
+        lambda: collections.defaultdict(int))
+    for record in ctx.session.execute(sel):
+        key = (record['resource_provider_id'], record['resource_class_id'])
+        old_allocs[record['consumer_id']][key] += record['used']
+    return usage_map, old_allocs
+
+
+def _check_capacity_per_consumer(alloc_lists, usage_map, old_allocs):
+    """Checks, consumer by consumer, whether replacing the allocations of
+    the consumer would exceed the capacity of the inventories involved.
+
+    Unlike _check_capacity_exceeded(), a consumer whose allocations don't
+    fit does not prevent the allocations of the other consumers from being
+    written: the consumers are considered in turn, each against the usage
+    left by the consumers accepted before it. The allocations of a rejected
+    consumer stay in place, so they are counted for the other consumers, as
+    are the allocations of the consumers not considered yet.
+
+    :param alloc_lists: A dict, keyed by consumer UUID, of lists of
+                        `Allocation` objects to check.
+    :param usage_map: The usage records returned by
+                      _get_usages_for_consumers().
+    :param old_allocs: The old allocations returned by
+                       _get_usages_for_consumers().
+    :returns: A tuple of (list of the UUIDs of the consumers whose allocations
+              fit, dict, keyed by consumer UUID, of the exception explaining
+              why the allocations of that consumer do not fit)
+    """
+    used = collections.defaultdict(int)
+    for key, record in usage_map.items():
+        used[key] = record['used'] or 0
+    for consumer_allocs in old_allocs.values():
+        for key, amount in consumer_allocs.items():
+            used[key] += amount
+
+    accepted = []
+    rejected = {}
+    for consumer_uuid, allocs in alloc_lists.items():
+        needed = collections.defaultdict(int)
+        try:
+            for alloc in allocs:
+                # No use checking usage if we're not asking for anything
+                if alloc.used == 0:
+                    continue
+                rp = alloc.resource_provider
+                rc_id = rc_cache.RC_CACHE.id_from_string(alloc.resource_class)
+                key = (rp.id, rc_id)
+                usage = usage_map.get(key)
+                if usage is None:
+                    raise exception.InvalidInventory(
+                        resource_class=alloc.resource_class,
+                        resource_provider=rp.uuid)
+                if (alloc.used < usage['min_unit'] or
+                        alloc.used > usage['max_unit'] or
+                        alloc.used % usage['step_size'] != 0):
+                    raise exception.InvalidAllocationConstraintsViolated(
+                        resource_class=alloc.resource_class,
+                        resource_provider=rp.uuid)
+                needed[key] += alloc.used
+                capacity = ((usage['total'] - usage['reserved']) *
+                            usage['allocation_ratio'])
+                old_used = old_allocs.get(consumer_uuid, {}).get(key, 0)
+                if capacity < used[key] - old_used + needed[key]:
+                    raise exception.InvalidAllocationCapacityExceeded(
+                        resource_class=alloc.resource_class,
+                        resource_provider=rp.uuid)
+        except exception.InvalidInventory as exc:
+            LOG.debug("Rejecting allocations of consumer %s: %s",
+                      consumer_uuid, exc)
+            rejected[consumer_uuid] = exc
+            continue
+        accepted.append(consumer_uuid)
+        for key, amount in old_allocs.get(consumer_uuid, {}).items():
+            used[key] -= amount
+        for key, amount in needed.items():
+            used[key] += amount
+    return accepted, rejected
+
+
 @db_api.placement_context_manager.reader
 def _get_allocations_by_provider_id(ctx, rp_id):
     allocs = sa.alias(_ALLOC_TBL, name="a")
@@ -486,6 +655,115 @@ def _set_allocations(context, allocs):
         context, consumers_to_check)
 
 
+@oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
+@db_api.placement_context_manager.writer
+def _set_allocations_per_consumer(context, alloc_lists):
+    """Write the allocations of several consumers in a single transaction,
+    where the allocations of each consumer are written or not independently
+    of the other consumers.
+
+    The usage of all the providers involved is read at once, the generation
+    of each provider is incremented once for all the consumers allocating
+    from it and the allocation records are inserted together.
+
+    If the generation of a provider changed since its usage was read, the
+    consumers allocating from that provider are skipped, to be retried in
+    another transaction, and the capacity of the providers is checked again
+    for the others. The generation of a provider (or consumer) may thus be
+    incremented although the allocations of the consumers accepted first
+    ended up not being written, which only causes spurious conflicts.
+
+    :param alloc_lists: A dict, keyed by consumer UUID, of lists of
+                        `Allocation` objects.
+    :returns: A tuple of (dict, keyed by consumer UUID, of the exception that
+              prevented the allocations of that consumer from being written,
+              set of the UUIDs of the consumers to retry because of resource
+              provider generation conflicts)
+    """
+    consumer_ids = set(alloc_lists)
+    allocs = [alloc for allocs in alloc_lists.values() for alloc in allocs]
+    provider_ids = set(alloc.resource_provider.id for alloc in allocs)
+    rc_ids = set(rc_cache.RC_CACHE.id_from_string(alloc.resource_class)
+                 for alloc in allocs)
+    usage_map, old_allocs = _get_usages_for_consumers(
+        context, provider_ids, rc_ids, consumer_ids)
+    generations = dict((key[0], record['generation'])
+                       for key, record in usage_map.items())
+
+    failed = {}
+    retried = set()
+    conflicting_rps = set()
+    visited_rps = set()
+    visited_consumers = set()
+    while True:
+        accepted, rejected = _check_capacity_per_consumer(
+            dict((consumer_id, consumer_allocs)
+                 for consumer_id, consumer_allocs in alloc_lists.items()
+                 if consumer_id not in failed and consumer_id not in retried),
+            usage_map, old_allocs)
+        failed.update(rejected)
+        # Generation checking happens here, for the providers and consumers
+        # of the allocations that fit. If the inventory or allocations of a
+        # resource provider changed out from under us, the usage read above
+        # is stale so the consumers allocating from that provider are left
+        # for another transaction.
+        new_retried = set()
+        new_failed = {}
+        for consumer_id in accepted:
+            rps = dict((alloc.resource_provider.id, alloc.resource_provider)
+                       for alloc in alloc_lists[consumer_id])
+            for rp_id, rp in rps.items():
+                if rp_id in visited_rps:
+                    continue
+                if rp_id not in conflicting_rps:
+                    # Check against the generation the usage was read with.
+                    rp.generation = generations.get(rp_id, rp.generation)
+                    try:
+                        rp.increment_generation()
+                        visited_rps.add(rp_id)
+                        continue
+                    except exception.ResourceProviderConcurrentUpdateDetected:
+                        conflicting_rps.add(rp_id)
+                new_retried.add(consumer_id)
+            if consumer_id in new_retried or consumer_id in visited_consumers:
+                continue
+            consumer = alloc_lists[consumer_id][0].consumer
+            try:
+                consumer.increment_generation()
+                visited_consumers.add(consumer_id)
+            except exception.ConcurrentUpdateDetected as exc:
+                new_failed[consumer_id] = exc
+        if not new_retried and not new_failed:
+            break
+        # Check the capacity again without these consumers, whose allocations
+        # then stay in place.
+        retried |= new_retried
+        failed.update(new_failed)
+
+    if accepted:
+        # Replace the allocations of the consumers whose allocations fit.
+        _delete_allocations_for_consumers(context, accepted)
+        records = [
+            dict(resource_provider_id=alloc.resource_provider.id,
+                 resource_class_id=rc_cache.RC_CACHE.id_from_string(
+                     alloc.resource_class),
+                 consumer_id=consumer_id,
+                 used=alloc.used)
+            for consumer_id in accepted
+            for alloc in alloc_lists[consumer_id]
+            # If alloc.used is set to zero that is a signal that we don't want
+            # to (re-)create any allocations for this resource class.
+            if alloc.used > 0]
+        if records:
+            context.session.execute(_ALLOC_TBL.insert(), records)
+        # If any consumers ended up having no allocations, delete the
+        # consumer records.
+        cons_with_allocs = set(record['consumer_id'] for record in records)
+        consumer_obj.delete_consumers_if_no_allocations(
+            context, set(accepted) - cons_with_allocs)
+    return failed, retried
+
+
 def get_all_by_resource_provider(context, rp):
     _create_incomplete_consumers_for_provider(context, rp.id)
     db_allocs = _get_allocations_by_provider_id(context, rp.id)
@@ -613,6 +891,59 @@ def replace_all(context, alloc_list):
         raise exception.ResourceProviderConcurrentUpdateDetected()
 
 
+def replace_all_per_consumer(context, alloc_lists):
+    """Replace the allocations of several consumers, independently of each
+    other.
+
+    Unlike replace_all(), a failure to write the allocations of one consumer,
+    for lack of capacity or because of a generation conflict, does not
+    prevent the allocations of the other consumers from being written. The
+    allocations of all the consumers are written in as few transactions as
+    possible: on resource provider generation conflicts, only the consumers
+    allocating from the providers in conflict are retried.
+
+    :note: The Allocation.id attribute of the Allocation objects is not set.
+    :param alloc_lists: A dict, keyed by consumer UUID, of lists of
+                        Allocation objects replacing the allocations of that
+                        consumer. An empty list is not allowed: an allocation
+                        with a used value of zero is used to remove the
+                        allocations of a consumer instead.
+    :returns: A dict, keyed by consumer UUID, of the exception that prevented
+              the allocations of that consumer from being written. The
+              allocations of the consumers not in the dict were written.
+    """
+    failed = {}
+    pending = {}
+    for consumer_id, allocs in alloc_lists.items():
+        try:
+            for alloc in allocs:
+                rc_cache.RC_CACHE.id_from_string(alloc.resource_class)
+        except exception.ResourceClassNotFound as exc:
+            failed[consumer_id] = exc
+            continue
+        pending[consumer_id] = allocs
+
+    retries = RP_CONFLICT_RETRY_COUNT
+    while pending and retries:
+        retries -= 1
+        write_failed, retried = _set_allocations_per_consumer(
+            context, pending)
+        failed.update(write_failed)
+        pending = dict((consumer_id, pending[consumer_id])
+                       for consumer_id in retried)
+        if pending:
+            LOG.debug('Retrying allocations write for %d consumer(s) on '
+                      'resource provider generation conflict', len(pending))
+    if pending:
+        LOG.warning('Exceeded retry limit of %d on allocations write for '
+                    'consumers %s', RP_CONFLICT_RETRY_COUNT,
+                    ', '.join(sorted(pending)))
+        for consumer_id in pending:
+            failed[consumer_id] = (
+                exception.ResourceProviderConcurrentUpdateDetected())
+    return failed
+
+
 def delete_all(context, alloc_list):
     consumer_uuids = set(alloc.consumer.uuid for alloc in alloc_list)
     alloc_ids = [alloc.id for alloc in alloc_list]
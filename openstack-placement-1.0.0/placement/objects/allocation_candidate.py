@@ -25,6 +25,7 @@ from sqlalchemy import sql
 from placement.db.sqlalchemy import models
 from placement import db_api
 from placement.i18n import _
+from placement.objects import provider_snapshot
 from placement.objects import resource_provider as rp_obj
 from placement.objects import trait as trait_obj
 from placement import resource_class_cache as rc_cache
@@ -89,13 +90,18 @@ class AllocationCandidates(object):
         )
 
     @staticmethod
-    def _get_by_one_request(context, request, sharing_providers, has_trees):
+    def _get_by_one_request(context, rp_view, summaries, request,
+                            sharing_providers, has_trees):
         """Get allocation candidates for one RequestGroup.
 
         Must be called from within an placement_context_manager.reader
         (or writer) context.
 
         :param context: Nova RequestContext.
+        :param rp_view: Object used to look up resource providers, either a
+                        _DBProviderView or a ProviderSnapshot
+        :param summaries: _ProviderSummaries object recording the usages and
+                          traits of the providers involved in the request
         :param request: One placement.lib.RequestGroup
         :param sharing_providers: dict, keyed by resource class internal ID, of
                                   the set of provider IDs containing shared
@@ -103,8 +109,7 @@ class AllocationCandidates(object):
         :param has_trees: bool indicating there is some level of nesting in the
                           environment (if there isn't, we take faster, simpler
                           code paths)
-        :return: A tuple of (allocation_requests, provider_summaries)
-                 satisfying `request`.
+        :return: An iterable of allocation requests satisfying `request`.
         """
         # Transform resource string names to internal integer IDs
         resources = {
@@ -124,11 +129,12 @@ class AllocationCandidates(object):
         member_of = request.member_of
         tree_root_id = None
         if request.in_tree:
-            tree_ids = rp_obj.provider_ids_from_uuid(context, request.in_tree)
+            tree_ids = rp_view.provider_ids_from_uuid(context,
+                                                      request.in_tree)
             if tree_ids is None:
                 # List operations should simply return an empty list when a
                 # non-existing resource provider UUID is given for in_tree.
-                return [], []
+                return []
             tree_root_id = tree_ids.root_id
             LOG.debug("getting allocation candidates in the same tree "
                       "with the root provider %s", tree_ids.root_uuid)
@@ -146,26 +152,27 @@ class AllocationCandidates(object):
                 # it should be possible to further optimize this attempt at
                 # a quick return, but we leave that to future patches for
                 # now.
-                trait_rps = rp_obj.get_provider_ids_having_any_trait(
+                trait_rps = rp_view.get_provider_ids_having_any_trait(
                     context, required_trait_map)
                 if not trait_rps:
-                    return [], []
-            rp_candidates = rp_obj.get_trees_matching_all(
+                    return []
+            rp_candidates = rp_view.get_trees_matching_all(
                 context, resources, required_trait_map, forbidden_trait_map,
                 sharing_providers, member_of, tree_root_id)
             return _alloc_candidates_multiple_providers(
-                context, resources, required_trait_map, forbidden_trait_map,
-                rp_candidates)
+                context, rp_view, summaries, resources, required_trait_map,
+                forbidden_trait_map, rp_candidates)
 
         # Either we are processing a single-RP request group, or there are no
         # sharing providers that (help) satisfy the request.  Get a list of
         # tuples of (internal provider ID, root provider ID) that have ALL
         # the requested resources and more efficiently construct the
         # allocation requests.
-        rp_tuples = rp_obj.get_provider_ids_matching(
+        rp_tuples = rp_view.get_provider_ids_matching(
             context, resources, required_trait_map, forbidden_trait_map,
             member_of, tree_root_id)
-        return _alloc_candidates_single_provider(context, resources, rp_tuples)
+        return _alloc_candidates_single_provider(context, rp_view, summaries,
+                                                 resources, rp_tuples)
 
     @classmethod
     # TODO(efried): This is only a writer context because it accesses the
@@ -175,6 +182,10 @@ class AllocationCandidates(object):
     @db_api.placement_context_manager.writer
     def _get_by_requests(cls, context, requests, limit=None,
                          group_policy=None):
+        if context.config.placement.allocation_candidates_snapshot:
+            rp_view = provider_snapshot.get_snapshot(context)
+        else:
+            rp_view = _DBProviderView()
         # TODO(jaypipes): Make a RequestGroupContext object and put these
         # pieces of information in there, passing the context to the various
         # internal functions handling that part of the request.
@@ -184,14 +195,23 @@ class AllocationCandidates(object):
             for rc_name, amount in request.resources.items():
                 rc_id = rc_cache.RC_CACHE.id_from_string(rc_name)
                 if rc_id not in sharing:
-                    sharing[rc_id] = rp_obj.get_providers_with_shared_capacity(
-                        context, rc_id, amount, member_of)
-        has_trees = rp_obj.has_provider_trees(context)
+                    sharing[rc_id] = (
+                        rp_view.get_providers_with_shared_capacity(
+                            context, rc_id, amount, member_of))
+        has_trees = rp_view.has_provider_trees(context)
 
+        summaries = _ProviderSummaries(context, rp_view)
         candidates = {}
         for suffix, request in requests.items():
-            alloc_reqs, summaries = cls._get_by_one_request(
-                context, request, sharing, has_trees)
+            alloc_reqs = cls._get_by_one_request(
+                context, rp_view, summaries, request, sharing, has_trees)
+            if len(requests) == 1:
+                # NOTE: The allocation requests of a single RequestGroup
+                # need no merging, so they are only built as they are
+                # consumed by _limit_results().
+                candidates[suffix] = alloc_reqs
+                break
+            alloc_reqs = list(alloc_reqs)
             LOG.debug("%s (suffix '%s') returned %d matches",
                       str(request), str(suffix), len(alloc_reqs))
             if not alloc_reqs:
@@ -203,48 +223,66 @@ class AllocationCandidates(object):
             # single provider.  We'll need this later to evaluate group_policy.
             for areq in alloc_reqs:
                 areq.use_same_provider = request.use_same_provider
-            candidates[suffix] = alloc_reqs, summaries
+            candidates[suffix] = alloc_reqs
 
-        # At this point, each (alloc_requests, summary_obj) in `candidates` is
+        # At this point, each list of alloc_requests in `candidates` is
         # independent of the others. We need to fold them together such that
         # each allocation request satisfies *all* the incoming `requests`.  The
         # `candidates` dict is guaranteed to contain entries for all suffixes,
         # or we would have short-circuited above.
-        alloc_request_objs, summary_objs = _merge_candidates(
-            candidates, group_policy=group_policy)
+        alloc_requests = _merge_candidates(candidates, summaries,
+                                           group_policy=group_policy)
 
-        return cls._limit_results(context, alloc_request_objs, summary_objs,
-                                  limit)
+        return cls._limit_results(context, alloc_requests, summaries, limit)
 
     @staticmethod
-    def _limit_results(context, alloc_request_objs, summary_objs, limit):
-        # Limit the number of allocation request objects. We do this after
-        # creating all of them so that we can do a random slice without
-        # needing to mess with the complex sql above or add additional
-        # columns to the DB.
-        if limit and limit < len(alloc_request_objs):
-            if context.config.placement.randomize_allocation_candidates:
-                alloc_request_objs = random.sample(alloc_request_objs, limit)
-            else:
-                alloc_request_objs = alloc_request_objs[:limit]
-            # Limit summaries to only those mentioned in the allocation reqs.
-            kept_summary_objs = []
-            alloc_req_rp_uuids = set()
-            # Extract resource provider uuids from the resource requests.
-            for aro in alloc_request_objs:
-                for arr in aro.resource_requests:
-                    alloc_req_rp_uuids.add(arr.resource_provider.uuid)
-            for summary in summary_objs:
-                rp_uuid = summary.resource_provider.uuid
-                # Skip a summary if we are limiting and haven't selected an
-                # allocation request that uses the resource provider.
-                if rp_uuid not in alloc_req_rp_uuids:
-                    continue
-                kept_summary_objs.append(summary)
-            summary_objs = kept_summary_objs
-        elif context.config.placement.randomize_allocation_candidates:
+    def _limit_results(context, alloc_requests, summaries, limit):
+        """Returns a tuple of (allocation_requests, provider_summaries) with
+        at most `limit` of the supplied allocation requests and the summaries
+        of the providers involved in them.
+
+        :param context: placement.context.RequestContext object
+        :param alloc_requests: An iterable of AllocationRequest objects. It is
+                               only consumed up to one element past the limit,
+                               unless the results are randomized.
+        :param summaries: _ProviderSummaries object which the ProviderSummary
+                          objects are built from
+        :param limit: An integer, N, representing the maximum number of
+                      allocation requests to return, or None
+        """
+        randomize = context.config.placement.randomize_allocation_candidates
+        if limit and randomize:
+            # Pick a random sample without holding all the allocation requests
+            # in memory at once.
+            alloc_request_objs, total = _reservoir_sample(alloc_requests,
+                                                          limit)
+        elif limit:
+            # Knowing there is one more allocation request than the limit is
+            # enough to know the results are limited.
+            alloc_request_objs = list(
+                itertools.islice(alloc_requests, limit + 1))
+            total = len(alloc_request_objs)
+            alloc_request_objs = alloc_request_objs[:limit]
+        else:
+            alloc_request_objs = list(alloc_requests)
+            total = len(alloc_request_objs)
+        if randomize:
             random.shuffle(alloc_request_objs)
 
+        if limit and limit < total:
+            # Limit summaries to only those mentioned in the allocation reqs.
+            rp_ids = set(arr.resource_provider.id
+                         for aro in alloc_request_objs
+                         for arr in aro.resource_requests)
+            summary_objs = summaries.for_providers(rp_ids)
+        else:
+            # Include the summaries of all the providers in the trees the
+            # allocation requests draw from.
+            tree_uuids = set(arr.resource_provider.root_provider_uuid
+                             for aro in alloc_request_objs
+                             for arr in aro.resource_requests)
+            summary_objs = summaries.for_trees(tree_uuids)
+
         return alloc_request_objs, summary_objs
 
 
@@ -330,13 +368,13 @@ class ProviderSummaryResource(object):
 
 
 def _alloc_candidates_multiple_providers(
-    ctx, requested_resources, required_traits, forbidden_traits,
-        rp_candidates):
-    """Returns a tuple of (allocation requests, provider summaries) for a
-    supplied set of requested resource amounts and tuples of
-    (rp_id, root_id, rc_id). The supplied resource provider trees have
-    capacity to satisfy ALL of the resources in the requested resources as
-    well as ALL required traits that were requested by the user.
+    ctx, rp_view, summaries, requested_resources, required_traits,
+        forbidden_traits, rp_candidates):
+    """Returns an iterable of allocation requests for a supplied set of
+    requested resource amounts and tuples of (rp_id, root_id, rc_id). The
+    supplied resource provider trees have capacity to satisfy ALL of the
+    resources in the requested resources as well as ALL required traits that
+    were requested by the user.
 
     This is a code path to get results for a RequestGroup with
     use_same_provider=False. In this scenario, we are able to use multiple
@@ -344,6 +382,10 @@ def _alloc_candidates_multiple_providers(
     satisfy different resources involved in a single request group.
 
     :param ctx: placement.context.RequestContext object
+    :param rp_view: Object used to look up resource providers, either a
+                    _DBProviderView or a ProviderSnapshot
+    :param summaries: _ProviderSummaries object the usages and traits of the
+                      providers in the trees are recorded in
     :param requested_resources: dict, keyed by resource class ID, of amounts
                                 being requested for that resource class
     :param required_traits: A map, keyed by trait string name, of required
@@ -357,7 +399,7 @@ def _alloc_candidates_multiple_providers(
                           that satisfy the request for resources.
     """
     if not rp_candidates:
-        return [], []
+        return []
 
     # Get all the root resource provider IDs. We should include the first
     # values of rp_tuples because while sharing providers are root providers,
@@ -365,50 +407,60 @@ def _alloc_candidates_multiple_providers(
     root_ids = rp_candidates.all_rps
 
     # Grab usage summaries for each provider in the trees
-    usages = _get_usages_by_provider_tree(ctx, root_ids)
+    usages = rp_view.get_usages_by_provider_tree(ctx, root_ids)
 
     # Get a dict, keyed by resource provider internal ID, of trait string names
     # that provider has associated with it
-    prov_traits = trait_obj.get_traits_by_provider_tree(ctx, root_ids)
+    prov_traits = rp_view.get_traits_by_provider_tree(ctx, root_ids)
 
-    # Get a dict, keyed by resource provider internal ID, of ProviderSummary
-    # objects for all providers
-    summaries = _build_provider_summaries(ctx, usages, prov_traits)
+    summaries.add(usages, prov_traits)
 
     # Get a dict, keyed by root provider internal ID, of a dict, keyed by
-    # resource class internal ID, of lists of AllocationRequestResource objects
+    # resource class internal ID, of lists of resource provider internal IDs
     tree_dict = collections.defaultdict(lambda: collections.defaultdict(list))
-
     for rp in rp_candidates.rps_info:
-        rp_summary = summaries[rp.id]
-        tree_dict[rp.root_id][rp.rc_id].append(
-            AllocationRequestResource(
-                resource_provider=rp_summary.resource_provider,
-                resource_class=rc_cache.RC_CACHE.string_from_id(rp.rc_id),
-                amount=requested_resources[rp.rc_id]))
+        tree_dict[rp.root_id][rp.rc_id].append(rp.id)
+
+    return _alloc_requests_for_trees(summaries, requested_resources,
+                                     required_traits, forbidden_traits,
+                                     prov_traits, tree_dict)
 
+
+def _alloc_requests_for_trees(summaries, requested_resources, required_traits,
+                              forbidden_traits, prov_traits, tree_dict):
+    """Generates the allocation requests combining the providers of each tree
+    in `tree_dict`, one tree at a time.
+
+    See _alloc_candidates_multiple_providers() for the parameters. The
+    tree_dict is a dict, keyed by root provider internal ID, of dicts, keyed
+    by resource class internal ID, of lists of the internal IDs of the
+    providers of that tree having capacity for that resource class.
+    """
     # Next, build up a set of allocation requests. These allocation requests
     # are AllocationRequest objects, containing resource provider UUIDs,
     # resource class names and amounts to consume from that resource provider
-    alloc_requests = set()
 
     # Let's look into each tree
-    for root_id, alloc_dict in tree_dict.items():
+    for root_id, rp_ids_by_rc in tree_dict.items():
         # Get request_groups, which is a list of lists of
         # AllocationRequestResource(ARR) per requested resource class(rc).
-        # For example, if we have the alloc_dict:
-        # {rc1_id: [ARR(rc1, rp1), ARR(rc1, rp2)],
-        #  rc2_id: [ARR(rc2, rp1), ARR(rc2, rp2)],
-        #  rc3_id: [ARR(rc3, rp1)]}
+        # For example, if we have the rp_ids_by_rc:
+        # {rc1_id: [rp1, rp2],
+        #  rc2_id: [rp1, rp2],
+        #  rc3_id: [rp1]}
         # then the request_groups would be something like
         # [[ARR(rc1, rp1), ARR(rc1, rp2)],
         #  [ARR(rc2, rp1), ARR(rc2, rp2)],
         #  [ARR(rc3, rp1)]]
         # , which should be ordered by the resource class id.
-        request_groups = [val for key, val in sorted(alloc_dict.items())]
-
-        root_summary = summaries[root_id]
-        root_uuid = root_summary.resource_provider.uuid
+        request_groups = [
+            [AllocationRequestResource(
+                resource_provider=summaries.provider(rp_id),
+                resource_class=rc_cache.RC_CACHE.string_from_id(rc_id),
+                amount=requested_resources[rc_id]) for rp_id in rp_ids]
+            for rc_id, rp_ids in sorted(rp_ids_by_rc.items())]
+
+        root_uuid = summaries.provider(root_id).uuid
         root_alloc_reqs = set()
 
         # Using itertools.product, we get all the combinations of resource
@@ -420,80 +472,92 @@ def _alloc_candidates_multiple_providers(
         #  (ARR(rc1, ss2), ARR(rc2, ss2), ARR(rc3, ss1))]
         for res_requests in itertools.product(*request_groups):
             if not _check_traits_for_alloc_request(
-                    res_requests, summaries, prov_traits, required_traits,
+                    res_requests, prov_traits, required_traits,
                     forbidden_traits):
                 # This combination doesn't satisfy trait constraints
                 continue
-            root_alloc_reqs.add(
-                AllocationRequest(resource_requests=list(res_requests),
-                                  anchor_root_provider_uuid=root_uuid))
+            areq = AllocationRequest(resource_requests=list(res_requests),
+                                     anchor_root_provider_uuid=root_uuid)
+            if areq in root_alloc_reqs:
+                continue
+            root_alloc_reqs.add(areq)
+            yield areq
         LOG.debug("got %d allocation requests under root provider %s",
                   len(root_alloc_reqs), root_uuid)
-        alloc_requests |= root_alloc_reqs
-    return list(alloc_requests), list(summaries.values())
 
 
-def _alloc_candidates_single_provider(ctx, requested_resources, rp_tuples):
-    """Returns a tuple of (allocation requests, provider summaries) for a
-    supplied set of requested resource amounts and resource providers. The
-    supplied resource providers have capacity to satisfy ALL of the resources
-    in the requested resources as well as ALL required traits that were
-    requested by the user.
+def _alloc_candidates_single_provider(ctx, rp_view, summaries,
+                                      requested_resources, rp_tuples):
+    """Returns an iterable of allocation requests for a supplied set of
+    requested resource amounts and resource providers. The supplied resource
+    providers have capacity to satisfy ALL of the resources in the requested
+    resources as well as ALL required traits that were requested by the user.
 
     This is used in two circumstances:
     - To get results for a RequestGroup with use_same_provider=True.
     - As an optimization when no sharing providers satisfy any of the requested
       resources, and nested providers are not in play.
     In these scenarios, we can more efficiently build the list of
-    AllocationRequest and ProviderSummary objects due to not having to
-    determine requests across multiple providers.
+    AllocationRequest objects due to not having to determine requests across
+    multiple providers.
 
     :param ctx: placement.context.RequestContext object
+    :param rp_view: Object used to look up resource providers, either a
+                    _DBProviderView or a ProviderSnapshot
+    :param summaries: _ProviderSummaries object the usages and traits of the
+                      providers in the trees are recorded in
     :param requested_resources: dict, keyed by resource class ID, of amounts
                                 being requested for that resource class
     :param rp_tuples: List of two-tuples of (provider ID, root provider ID)s
                       for providers that matched the requested resources
     """
     if not rp_tuples:
-        return [], []
+        return []
 
     # Get all root resource provider IDs.
     root_ids = set(p[1] for p in rp_tuples)
 
     # Grab usage summaries for each provider
-    usages = _get_usages_by_provider_tree(ctx, root_ids)
+    usages = rp_view.get_usages_by_provider_tree(ctx, root_ids)
 
     # Get a dict, keyed by resource provider internal ID, of trait string names
     # that provider has associated with it
-    prov_traits = trait_obj.get_traits_by_provider_tree(ctx, root_ids)
+    prov_traits = rp_view.get_traits_by_provider_tree(ctx, root_ids)
 
-    # Get a dict, keyed by resource provider internal ID, of ProviderSummary
-    # objects for all providers
-    summaries = _build_provider_summaries(ctx, usages, prov_traits)
+    summaries.add(usages, prov_traits)
 
+    return _alloc_requests_for_providers(ctx, rp_view, summaries,
+                                         requested_resources, prov_traits,
+                                         rp_tuples)
+
+
+def _alloc_requests_for_providers(ctx, rp_view, summaries, requested_resources,
+                                  prov_traits, rp_tuples):
+    """Generates the allocation requests of each provider in `rp_tuples`.
+
+    See _alloc_candidates_single_provider() for the parameters.
+    """
     # Next, build up a list of allocation requests. These allocation requests
     # are AllocationRequest objects, containing resource provider UUIDs,
     # resource class names and amounts to consume from that resource provider
-    alloc_requests = []
     for rp_id, root_id in rp_tuples:
-        rp_summary = summaries[rp_id]
+        provider = summaries.provider(rp_id)
         req_obj = _allocation_request_for_provider(
-            ctx, requested_resources, rp_summary.resource_provider)
-        alloc_requests.append(req_obj)
+            ctx, requested_resources, provider)
+        yield req_obj
         # If this is a sharing provider, we have to include an extra
         # AllocationRequest for every possible anchor.
-        traits = [trait.name for trait in rp_summary.traits]
+        traits = prov_traits.get(rp_id, [])
         if os_traits.MISC_SHARES_VIA_AGGREGATE in traits:
-            anchors = set([p[1] for p in rp_obj.anchors_for_sharing_providers(
-                ctx, [rp_summary.resource_provider.id])])
+            anchors = set([p[1] for p in rp_view.anchors_for_sharing_providers(
+                ctx, [rp_id])])
             for anchor in anchors:
                 # We already added self
-                if anchor == rp_summary.resource_provider.root_provider_uuid:
+                if anchor == provider.root_provider_uuid:
                     continue
                 req_obj = copy.copy(req_obj)
                 req_obj.anchor_root_provider_uuid = anchor
-                alloc_requests.append(req_obj)
-    return alloc_requests, list(summaries.values())
+                yield req_obj
 
 
 def _allocation_request_for_provider(ctx, requested_resources, provider):
@@ -522,81 +586,136 @@ def _allocation_request_for_provider(ctx, requested_resources, provider):
         anchor_root_provider_uuid=provider.root_provider_uuid)
 
 
-def _build_provider_summaries(context, usages, prov_traits):
-    """Given a list of dicts of usage information and a map of providers to
-    their associated string traits, returns a dict, keyed by resource provider
-    ID, of ProviderSummary objects.
-
-    :param context: placement.context.RequestContext object
-    :param usages: A list of dicts with the following format:
+class _ProviderSummaries(object):
+    """Builds the ProviderSummary objects of the providers involved in a
+    request for allocation candidates.
 
-        {
-            'resource_provider_id': <internal resource provider ID>,
-            'resource_provider_uuid': <UUID>,
-            'resource_class_id': <internal resource class ID>,
-            'total': integer,
-            'reserved': integer,
-            'allocation_ratio': float,
-        }
-    :param prov_traits: A dict, keyed by internal resource provider ID, of
-                        string trait names associated with that provider
+    The usages and traits of the providers are recorded as each RequestGroup
+    is processed, but the ResourceProvider and ProviderSummary objects of a
+    provider are only built the first time they are needed. Limited results
+    thus only build the summaries of the providers of the allocation requests
+    returned.
     """
-    # Before we go creating provider summary objects, first grab all the
-    # provider information (including root, parent and UUID information) for
-    # all providers involved in our operation
-    rp_ids = set(usage['resource_provider_id'] for usage in usages)
-    provider_ids = rp_obj.provider_ids_from_rp_ids(context, rp_ids)
-
-    # Build up a dict, keyed by internal resource provider ID, of
-    # ProviderSummary objects containing one or more ProviderSummaryResource
-    # objects representing the resources the provider has inventory for.
-    summaries = {}
-    for usage in usages:
-        rp_id = usage['resource_provider_id']
-        summary = summaries.get(rp_id)
-        if not summary:
-            pids = provider_ids[rp_id]
-            summary = ProviderSummary(
-                resource_provider=rp_obj.ResourceProvider(
-                    context, id=pids.id, uuid=pids.uuid,
-                    root_provider_uuid=pids.root_uuid,
-                    parent_provider_uuid=pids.parent_uuid),
-                resources=[],
-            )
-            summaries[rp_id] = summary
-
-        traits = prov_traits[rp_id]
-        summary.traits = [trait_obj.Trait(context, name=tname)
-                          for tname in traits]
-
-        rc_id = usage['resource_class_id']
-        if rc_id is None:
-            # NOTE(tetsuro): This provider doesn't have any inventory itself.
-            # But we include this provider in summaries since another
-            # provider in the same tree will be in the "allocation_request".
-            # Let's skip the following and leave "ProviderSummary.resources"
-            # field empty.
-            continue
-        # NOTE(jaypipes): usage['used'] may be None due to the LEFT JOIN of
-        # the usages subquery, so we coerce NULL values to 0 here. It may
-        # also be a Decimal, as that's the type that mysql tends to return
-        # when func.sum is used in a query. We need an int, otherwise later
-        # JSON serialization will not work.
-        used = int(usage['used'] or 0)
-        allocation_ratio = usage['allocation_ratio']
-        cap = int((usage['total'] - usage['reserved']) * allocation_ratio)
-        rc_name = rc_cache.RC_CACHE.string_from_id(rc_id)
-        rpsr = ProviderSummaryResource(
-            resource_class=rc_name,
-            capacity=cap,
-            used=used,
-            max_unit=usage['max_unit'],
+
+    def __init__(self, context, rp_view):
+        self.context = context
+        self.rp_view = rp_view
+        # Dicts, keyed by resource provider internal ID, of the usage records
+        # and string trait names of the provider, its ProviderIds and, once
+        # built, its ResourceProvider and ProviderSummary objects
+        self._usages = {}
+        self._traits = {}
+        self._provider_ids = {}
+        self._providers = {}
+        self._summaries = {}
+
+    def add(self, usages, prov_traits):
+        """Records the usages and traits of providers.
+
+        :param usages: A list of dicts with the following format:
+
+            {
+                'resource_provider_id': <internal resource provider ID>,
+                'resource_provider_uuid': <UUID>,
+                'resource_class_id': <internal resource class ID>,
+                'total': integer,
+                'reserved': integer,
+                'allocation_ratio': float,
+            }
+        :param prov_traits: A dict, keyed by internal resource provider ID, of
+                            string trait names associated with that provider
+        """
+        new_usages = collections.defaultdict(list)
+        for usage in usages:
+            rp_id = usage['resource_provider_id']
+            # Several RequestGroups may involve the same trees.
+            if rp_id not in self._usages:
+                new_usages[rp_id].append(usage)
+        if not new_usages:
+            return
+        self._usages.update(new_usages)
+        for rp_id in new_usages:
+            self._traits[rp_id] = prov_traits.get(rp_id, [])
+        # Grab the provider information (including root, parent and UUID
+        # information) for all the providers involved in our operation
+        self._provider_ids.update(self.rp_view.provider_ids_from_rp_ids(
+            self.context, set(new_usages)))
+
+    def provider(self, rp_id):
+        """Returns the ResourceProvider object of a provider."""
+        provider = self._providers.get(rp_id)
+        if provider is None:
+            pids = self._provider_ids[rp_id]
+            provider = rp_obj.ResourceProvider(
+                self.context, id=pids.id, uuid=pids.uuid,
+                root_provider_uuid=pids.root_uuid,
+                parent_provider_uuid=pids.parent_uuid)
+            self._providers[rp_id] = provider
+        return provider
+
+    def summary(self, rp_id):
+        """Returns the ProviderSummary object of a provider."""
+        summary = self._summaries.get(rp_id)
+        if summary is not None:
+            return summary
+        summary = ProviderSummary(
+            resource_provider=self.provider(rp_id),
+            resources=[],
+            traits=[trait_obj.Trait(self.context, name=tname)
+                    for tname in self._traits[rp_id]],
         )
-        summary.resources.append(rpsr)
-    return summaries
+        self._summaries[rp_id] = summary
+        for usage in self._usages[rp_id]:
+            rc_id = usage['resource_class_id']
+            if rc_id is None:
+                # NOTE(tetsuro): This provider doesn't have any inventory
+                # itself. But we include this provider in summaries since
+                # another provider in the same tree will be in the
+                # "allocation_request". Let's skip the following and leave
+                # "ProviderSummary.resources" field empty.
+                continue
+            # NOTE(jaypipes): usage['used'] may be None due to the LEFT JOIN of
+            # the usages subquery, so we coerce NULL values to 0 here. It may
+            # also be a Decimal, as that's the type that mysql tends to return
+            # when func.sum is used in a query. We need an int, otherwise later
+            # JSON serialization will not work.
+            used = int(usage['used'] or 0)
+            allocation_ratio = usage['allocation_ratio']
+            cap = int((usage['total'] - usage['reserved']) * allocation_ratio)
+            rc_name = rc_cache.RC_CACHE.string_from_id(rc_id)
+            rpsr = ProviderSummaryResource(
+                resource_class=rc_name,
+                capacity=cap,
+                used=used,
+                max_unit=usage['max_unit'],
+            )
+            summary.resources.append(rpsr)
+        return summary
+
+    def resource(self, provider, rc_name):
+        """Returns the ProviderSummaryResource of a resource class of a
+        provider, or None if the provider has no inventory of that class.
+        """
+        for psum_res in self.summary(provider.id).resources:
+            if psum_res.resource_class == rc_name:
+                return psum_res
+
+    def for_providers(self, rp_ids):
+        """Returns a list of the ProviderSummary objects of the providers
+        with the supplied internal IDs.
+        """
+        return [self.summary(rp_id) for rp_id in rp_ids]
+
+    def for_trees(self, root_uuids):
+        """Returns a list of the ProviderSummary objects of all the providers
+        in the trees with the supplied root provider UUIDs.
+        """
+        return [self.summary(rp_id)
+                for rp_id, pids in self._provider_ids.items()
+                if pids.root_uuid in root_uuids]
 
 
-def _check_traits_for_alloc_request(res_requests, summaries, prov_traits,
+def _check_traits_for_alloc_request(res_requests, prov_traits,
                                     required_traits, forbidden_traits):
     """Given a list of AllocationRequestResource objects, check if that
     combination can provide trait constraints. If it can, returns all
@@ -609,9 +728,6 @@ def _check_traits_for_alloc_request(res_requests, summaries, prov_traits,
                          resource providers to be checked if they collectively
                          satisfy trait constraints in the required_traits and
                          forbidden_traits parameters.
-    :param summaries: dict, keyed by resource provider ID, of ProviderSummary
-                      objects containing usage and trait information for
-                      resource providers involved in the overall request
     :param prov_traits: A dict, keyed by internal resource provider ID, of
                         string trait names associated with that provider
     :param required_traits: A map, keyed by trait string name, of required
@@ -625,10 +741,7 @@ def _check_traits_for_alloc_request(res_requests, summaries, prov_traits,
     all_prov_ids = []
     all_traits = set()
     for res_req in res_requests:
-        rp_uuid = res_req.resource_provider.uuid
-        for rp_id, summary in summaries.items():
-            if summary.resource_provider.uuid == rp_uuid:
-                break
+        rp_id = res_req.resource_provider.id
         rp_traits = set(prov_traits.get(rp_id, []))
 
         # Check if there are forbidden_traits
@@ -775,7 +888,29 @@ def _get_usages_by_provider_tree(ctx, root_ids):
     return ctx.session.execute(query).fetchall()
 
 
-def _exceeds_capacity(areq, psum_res_by_rp_rc):
+class _DBProviderView(object):
+    """Looks up resource providers in the database.
+
+    This has the same interface as provider_snapshot.ProviderSnapshot, which
+    looks them up in memory instead.
+    """
+    has_provider_trees = staticmethod(rp_obj.has_provider_trees)
+    provider_ids_from_uuid = staticmethod(rp_obj.provider_ids_from_uuid)
+    provider_ids_from_rp_ids = staticmethod(rp_obj.provider_ids_from_rp_ids)
+    get_providers_with_shared_capacity = staticmethod(
+        rp_obj.get_providers_with_shared_capacity)
+    get_provider_ids_having_any_trait = staticmethod(
+        rp_obj.get_provider_ids_having_any_trait)
+    get_provider_ids_matching = staticmethod(rp_obj.get_provider_ids_matching)
+    get_trees_matching_all = staticmethod(rp_obj.get_trees_matching_all)
+    anchors_for_sharing_providers = staticmethod(
+        rp_obj.anchors_for_sharing_providers)
+    get_usages_by_provider_tree = staticmethod(_get_usages_by_provider_tree)
+    get_traits_by_provider_tree = staticmethod(
+        trait_obj.get_traits_by_provider_tree)
+
+
+def _exceeds_capacity(areq, summaries):
     """Checks a (consolidated) AllocationRequest against the provider summaries
     to ensure that it does not exceed capacity.
 
@@ -785,13 +920,13 @@ def _exceeds_capacity(areq, psum_res_by_rp_rc):
 
     :param areq: An AllocationRequest produced by the
             `_consolidate_allocation_requests` method.
-    :param psum_res_by_rp_rc: A dict, keyed by provider + resource class via
-            _rp_rc_key, of ProviderSummaryResource.
+    :param summaries: The _ProviderSummaries object recording the usages of
+            the providers.
     :return: True if areq exceeds capacity; False otherwise.
     """
     for arr in areq.resource_requests:
-        key = _rp_rc_key(arr.resource_provider, arr.resource_class)
-        psum_res = psum_res_by_rp_rc[key]
+        psum_res = summaries.resource(arr.resource_provider,
+                                      arr.resource_class)
         if psum_res.used + arr.amount > psum_res.capacity:
             LOG.debug('Excluding the following AllocationRequest because used '
                       '(%d) + amount (%d) > capacity (%d) for resource class '
@@ -808,27 +943,36 @@ def _exceeds_capacity(areq, psum_res_by_rp_rc):
     return False
 
 
-def _merge_candidates(candidates, group_policy=None):
-    """Given a dict, keyed by RequestGroup suffix, of tuples of
-    (allocation_requests, provider_summaries), produce a single tuple of
-    (allocation_requests, provider_summaries) that appropriately incorporates
-    the elements from each.
-
-    Each (alloc_reqs, prov_sums) in `candidates` satisfies one RequestGroup.
-    This method creates a list of alloc_reqs, *each* of which satisfies *all*
-    of the RequestGroups.
+def _merge_candidates(candidates, summaries, group_policy=None):
+    """Given a dict, keyed by RequestGroup suffix, of iterables of
+    allocation_requests, generate the allocation requests that appropriately
+    incorporate the elements from each.
 
-    For that merged list of alloc_reqs, a corresponding provider_summaries is
-    produced.
+    Each iterable of alloc_reqs in `candidates` satisfies one RequestGroup.
+    This method generates alloc_reqs, *each* of which satisfies *all* of the
+    RequestGroups, without duplicates.
 
-    :param candidates: A dict, keyed by integer suffix or '', of tuples of
-            (allocation_requests, provider_summaries) to be merged.
+    :param candidates: A dict, keyed by integer suffix or '', of iterables of
+            allocation_requests to be merged.
+    :param summaries: The _ProviderSummaries object recording the usages of
+            the providers involved in the allocation requests.
     :param group_policy: String indicating how RequestGroups should interact
             with each other.  If the value is "isolate", we will filter out
             candidates where AllocationRequests that came from RequestGroups
             keyed by nonempty suffixes are satisfied by the same provider.
-    :return: A tuple of (allocation_requests, provider_summaries).
     """
+    seen = set()
+    if len(candidates) == 1:
+        # NOTE: There is nothing to merge the allocation requests of a single
+        # RequestGroup with, so they already fit in the capacity of their
+        # providers and the group policy. They are only duplicated when
+        # sharing providers anchored to several trees satisfy them.
+        for areq in next(iter(candidates.values())):
+            if areq not in seen:
+                seen.add(areq)
+                yield areq
+        return
+
     # Build a dict, keyed by anchor root provider UUID, of dicts, keyed by
     # suffix, of nonempty lists of AllocationRequest.  Each inner dict must
     # possess all of the suffix keys to be viable (i.e. contains at least
@@ -845,26 +989,13 @@ def _merge_candidates(candidates, group_policy=None):
     #   }
     areq_lists_by_anchor = collections.defaultdict(
         lambda: collections.defaultdict(list))
-    # Save off all the provider summaries lists - we'll use 'em later.
-    all_psums = []
-    # Construct a dict, keyed by resource provider + resource class, of
-    # ProviderSummaryResource.  This will be used to do a final capacity
-    # check/filter on each merged AllocationRequest.
-    psum_res_by_rp_rc = {}
-    for suffix, (areqs, psums) in candidates.items():
+    for suffix, areqs in candidates.items():
         for areq in areqs:
             anchor = areq.anchor_root_provider_uuid
             areq_lists_by_anchor[anchor][suffix].append(areq)
-        for psum in psums:
-            all_psums.append(psum)
-            for psum_res in psum.resources:
-                key = _rp_rc_key(
-                    psum.resource_provider, psum_res.resource_class)
-                psum_res_by_rp_rc[key] = psum_res
 
     # Create all combinations picking one AllocationRequest from each list
     # for each anchor.
-    areqs = set()
     all_suffixes = set(candidates)
     num_granular_groups = len(all_suffixes - set(['']))
     for areq_lists_by_suffix in areq_lists_by_anchor.values():
@@ -911,30 +1042,38 @@ def _merge_candidates(candidates, group_policy=None):
             # We needed that to be present for the previous filter; we need it
             # to be *absent* for the next one (and for the final output).
             areq = _consolidate_allocation_requests(areq_list)
+            if areq in seen:
+                continue
             # Since we sourced this AllocationRequest from multiple
             # *independent* queries, it's possible that the combined result
             # now exceeds capacity where amounts of the same RP+RC were
             # folded together.  So do a final capacity check/filter.
-            if _exceeds_capacity(areq, psum_res_by_rp_rc):
+            if _exceeds_capacity(areq, summaries):
                 continue
-            areqs.add(areq)
+            seen.add(areq)
+            yield areq
 
-    # It's possible we've filtered out everything.  If so, short out.
-    if not areqs:
-        return [], []
 
-    # Now we have to produce provider summaries.  The provider summaries in
-    # the candidates input contain all the information; we just need to
-    # filter it down to only the providers in trees represented by our merged
-    # list of allocation requests.
-    tree_uuids = set()
-    for areq in areqs:
-        for arr in areq.resource_requests:
-            tree_uuids.add(arr.resource_provider.root_provider_uuid)
-    psums = [psum for psum in all_psums if
-             psum.resource_provider.root_provider_uuid in tree_uuids]
+def _reservoir_sample(iterable, k):
+    """Returns a tuple of (a random sample of k elements of `iterable`, the
+    number of elements in `iterable`), holding no more than k elements in
+    memory at a time.
 
-    return list(areqs), psums
+    If `iterable` has fewer than k elements, all of them are returned.
+    """
+    sample = []
+    count = 0
+    for count, item in enumerate(iterable, 1):
+        if count <= k:
+            sample.append(item)
+            continue
+        # Each element replaces one of the sample with a probability of
+        # k/count, which leaves every element seen so far in the sample with
+        # the same probability.
+        i = random.randrange(count)
+        if i < k:
+            sample[i] = item
+    return sample, count
 
 
 def _rp_rc_key(rp, rc):
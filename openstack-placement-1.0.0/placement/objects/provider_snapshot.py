@@ -0,0 +1,660 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""In-memory snapshot of the resource providers used to compute allocation
+candidates.
+
+A ProviderSnapshot holds the provider trees along with their inventories,
+usages, traits and aggregates, and answers the same lookups as the SQL
+helpers in placement.objects.resource_provider used by
+placement.objects.allocation_candidate, without any further round-trip to
+the database.
+
+The snapshot is shared by all the requests of the process and is refreshed
+when a cheap stamp of the database changes. Inventories, usages, traits and
+aggregates are only reloaded for the providers whose generation changed.
+
+Removing allocations does not bump the generation of the providers they were
+removed from, so the transactions removing allocations record these
+providers with allocations_removed(), and their usages are reloaded by the
+next refresh. The removals made by other placement processes cannot be
+recorded that way, and are only noticed when all the usages are reloaded,
+at most every [placement]/allocation_candidates_snapshot_resync_interval.
+Setting aggregates at old microversions does not bump the generation of the
+providers either, so the stamp also accounts for the aggregate associations,
+which are reloaded as a whole when they change.
+
+Providers not having their root provider ID populated yet are considered to
+be their own root, like provider_ids_from_rp_ids() does.
+"""
+
+import collections
+import copy
+import time
+
+import os_traits
+from oslo_concurrency import lockutils
+from oslo_log import log as logging
+from oslo_utils import excutils
+import sqlalchemy as sa
+from sqlalchemy import sql
+
+from placement.db.sqlalchemy import models
+from placement import db_api
+from placement.i18n import _
+from placement.objects import resource_provider as rp_obj
+from placement.objects import rp_candidates
+
+_AGG_TBL = models.PlacementAggregate.__table__
+_ALLOC_TBL = models.Allocation.__table__
+_INV_TBL = models.Inventory.__table__
+_RP_TBL = models.ResourceProvider.__table__
+_RP_AGG_TBL = models.ResourceProviderAggregate.__table__
+_RP_TRAIT_TBL = models.ResourceProviderTrait.__table__
+_TRAIT_TBL = models.Trait.__table__
+
+_LOCKNAME = 'provider_snapshot'
+
+LOG = logging.getLogger(__name__)
+
+# The latest snapshot, shared by all the requests
+_SNAPSHOT = None
+
+# IDs of the providers whose allocations were removed since the latest
+# refresh of the snapshot
+_USAGES_CHANGED = set()
+
+Inventory = collections.namedtuple(
+    'Inventory',
+    'total reserved min_unit max_unit step_size allocation_ratio')
+
+Stamp = collections.namedtuple('Stamp', 'providers aggregates')
+
+
+@db_api.placement_context_manager.reader
+def get_snapshot(ctx):
+    """Returns a ProviderSnapshot consistent with the database as seen by the
+    supplied context, refreshing the shared snapshot if needed.
+
+    :param ctx: `placement.context.RequestContext` that may be used to grab a
+                DB connection.
+    """
+    global _SNAPSHOT
+    # NOTE: The providers whose allocations were removed are taken before
+    # anything is read by this transaction, so that it sees the removals.
+    usages_changed = set(_USAGES_CHANGED)
+    _USAGES_CHANGED.difference_update(usages_changed)
+    interval = (
+        ctx.config.placement.allocation_candidates_snapshot_resync_interval)
+    now = time.time()
+    try:
+        stamp = _get_stamp(ctx)
+        snapshot = _SNAPSHOT
+        if (snapshot is not None and snapshot.stamp == stamp and
+                not usages_changed and
+                not snapshot.needs_resync(interval, now)):
+            return snapshot
+        with lockutils.lock(_LOCKNAME):
+            # Another request may have refreshed the snapshot while we were
+            # waiting for the lock.
+            snapshot = _SNAPSHOT or ProviderSnapshot()
+            resync = snapshot.needs_resync(interval, now)
+            if snapshot.stamp != stamp or usages_changed or resync:
+                snapshot = snapshot.refresh(ctx, stamp, usages_changed,
+                                            resync_usages=resync)
+                _SNAPSHOT = snapshot
+    except Exception:
+        with excutils.save_and_reraise_exception():
+            # Let the next refresh reload them.
+            _USAGES_CHANGED.update(usages_changed)
+    return snapshot
+
+
+def allocations_removed(ctx, rp_ids):
+    """Records that the transaction of the supplied context removes
+    allocations from the supplied providers.
+
+    Removing allocations does not bump the generation of the providers, so
+    their usages are reloaded by the next refresh of the snapshot, once the
+    transaction is committed.
+    """
+    rp_ids = set(rp_ids)
+    if not rp_ids:
+        return
+
+    def _committed(session):
+        _USAGES_CHANGED.update(rp_ids)
+
+    sa.event.listen(ctx.session, 'after_commit', _committed, once=True)
+
+
+def _get_stamp(ctx):
+    """Returns a Stamp summarizing the state of the resource providers and of
+    the aggregate associations with a single query.
+    """
+    def scalar(expr):
+        return sa.select([expr]).as_scalar()
+
+    exprs = [
+        scalar(sql.func.count(_RP_TBL.c.id)),
+        scalar(sql.func.max(_RP_TBL.c.id)),
+        scalar(sql.func.sum(_RP_TBL.c.generation)),
+        scalar(sql.func.count(_RP_TBL.c.parent_provider_id)),
+        scalar(sql.func.count(_RP_AGG_TBL.c.aggregate_id)),
+        scalar(sql.func.sum(_RP_AGG_TBL.c.aggregate_id)),
+        scalar(sql.func.max(_RP_AGG_TBL.c.created_at)),
+    ]
+    row = tuple(ctx.session.execute(sa.select(exprs)).fetchone())
+    return Stamp(providers=row[0:4], aggregates=row[4:7])
+
+
+def _execute_for_providers(ctx, sel, rp_id_col, rp_ids):
+    """Executes the supplied select, restricted to the supplied providers if
+    rp_ids is not None.
+    """
+    if rp_ids is not None:
+        if not rp_ids:
+            return []
+        sel = sel.where(rp_id_col.in_(rp_ids))
+    return ctx.session.execute(sel).fetchall()
+
+
+def _has_capacity(inv, used, amount):
+    return (used + amount <= (inv.total - inv.reserved) * inv.allocation_ratio
+            and inv.min_unit <= amount <= inv.max_unit
+            and amount % inv.step_size == 0)
+
+
+class ProviderSnapshot(object):
+    """An immutable, in-memory view of the resource providers.
+
+    The lookup methods mirror the signature and the results of their SQL
+    counterparts and therefore take a context they do not use.
+    """
+
+    def __init__(self):
+        self.stamp = None
+        # time at which the usages of all the providers were last loaded
+        self.usages_loaded_at = None
+        # dict, keyed by provider ID, of its generation
+        self.generations = {}
+        # dict, keyed by provider ID, of rp_obj.ProviderIds
+        self.providers = {}
+        self.ids_by_uuid = {}
+        # dict, keyed by root provider ID, of the set of IDs of the providers
+        # in that tree
+        self.trees = {}
+        self.has_trees = False
+        # dict, keyed by provider ID, of dicts, keyed by resource class ID, of
+        # Inventory
+        self.inventories = {}
+        # dict, keyed by resource class ID, of the set of IDs of the providers
+        # having inventory of that class
+        self.providers_by_rc = {}
+        # dict, keyed by provider ID, of dicts, keyed by resource class ID, of
+        # the amount used
+        self.usages = {}
+        # dict, keyed by provider ID, of dicts, keyed by trait ID, of trait
+        # names
+        self.traits = {}
+        # dict, keyed by provider ID, of the set of its aggregate IDs
+        self.aggregates = {}
+        # dict, keyed by aggregate ID, of the set of its provider IDs
+        self.providers_by_agg = {}
+        # dict, keyed by aggregate UUID, of aggregate IDs
+        self.agg_ids = {}
+
+    def needs_resync(self, interval, now):
+        """Returns whether the usages of all the providers were loaded more
+        than interval seconds before now, unless interval is 0.
+        """
+        return bool(interval and self.usages_loaded_at is not None and
+                    now - self.usages_loaded_at >= interval)
+
+    def refresh(self, ctx, stamp, usages_changed=(), resync_usages=False):
+        """Returns a new ProviderSnapshot, built from this one, reflecting the
+        database in the state described by stamp.
+
+        This snapshot is left untouched so that requests still using it are
+        not affected.
+
+        :param usages_changed: IDs of the providers whose allocations were
+                               removed since this snapshot was built.
+        :param resync_usages: whether to reload the usages of all the
+                              providers.
+        """
+        snapshot = copy.copy(self)
+        snapshot.stamp = stamp
+        full = self.stamp is None
+        providers_changed = full or self.stamp.providers != stamp.providers
+        changed = set()
+        if providers_changed:
+            changed = snapshot._load_providers(ctx)
+            if full or len(changed) > len(snapshot.providers) // 2:
+                changed = None
+            LOG.debug("Refreshing the inventories, usages, traits and "
+                      "aggregates of %s providers",
+                      'all' if changed is None else len(changed))
+            snapshot._load_inventories(ctx, changed)
+            snapshot._load_traits(ctx, changed)
+        if changed is None or resync_usages:
+            snapshot._load_usages(ctx, None)
+            snapshot.usages_loaded_at = time.time()
+        else:
+            snapshot._load_usages(ctx, changed | set(usages_changed))
+        if changed is None or self.stamp.aggregates != stamp.aggregates:
+            snapshot._load_aggregates(ctx, None)
+        elif providers_changed:
+            snapshot._load_aggregates(ctx, changed)
+        return snapshot
+
+    def _merge(self, current, loaded, rp_ids):
+        """Returns a dict, keyed by provider ID, with the values loaded for
+        rp_ids replacing the current ones, and without removed providers.
+        """
+        if rp_ids is None:
+            return loaded
+        merged = {rp_id: value for rp_id, value in current.items()
+                  if rp_id in self.providers and rp_id not in rp_ids}
+        merged.update(loaded)
+        return merged
+
+    def _load_providers(self, ctx):
+        """Loads all the providers, and returns the set of IDs of the new
+        providers and of the ones whose generation changed.
+        """
+        sel = sa.select([_RP_TBL.c.id, _RP_TBL.c.uuid, _RP_TBL.c.generation,
+                         _RP_TBL.c.parent_provider_id,
+                         _RP_TBL.c.root_provider_id])
+        rows = ctx.session.execute(sel).fetchall()
+        uuids = {r[0]: r[1] for r in rows}
+        generations = {}
+        providers = {}
+        trees = collections.defaultdict(set)
+        for rp_id, uuid, generation, parent_id, root_id in rows:
+            if root_id is None:
+                root_id = rp_id
+            generations[rp_id] = generation
+            providers[rp_id] = rp_obj.ProviderIds(
+                id=rp_id, uuid=uuid, parent_id=parent_id,
+                parent_uuid=uuids.get(parent_id), root_id=root_id,
+                root_uuid=uuids.get(root_id))
+            trees[root_id].add(rp_id)
+        changed = set(rp_id for rp_id, generation in generations.items()
+                      if self.generations.get(rp_id) != generation)
+        self.generations = generations
+        self.providers = providers
+        self.ids_by_uuid = {uuid: rp_id for rp_id, uuid in uuids.items()}
+        self.trees = dict(trees)
+        self.has_trees = any(p.parent_id is not None
+                             for p in providers.values())
+        return changed
+
+    def _load_inventories(self, ctx, rp_ids):
+        sel = sa.select([_INV_TBL.c.resource_provider_id,
+                         _INV_TBL.c.resource_class_id,
+                         _INV_TBL.c.total,
+                         _INV_TBL.c.reserved,
+                         _INV_TBL.c.min_unit,
+                         _INV_TBL.c.max_unit,
+                         _INV_TBL.c.step_size,
+                         _INV_TBL.c.allocation_ratio])
+        loaded = collections.defaultdict(dict)
+        for r in _execute_for_providers(
+                ctx, sel, _INV_TBL.c.resource_provider_id, rp_ids):
+            loaded[r[0]][r[1]] = Inventory(*r[2:])
+        self.inventories = self._merge(self.inventories, dict(loaded), rp_ids)
+        providers_by_rc = collections.defaultdict(set)
+        for rp_id, invs in self.inventories.items():
+            for rc_id in invs:
+                providers_by_rc[rc_id].add(rp_id)
+        self.providers_by_rc = dict(providers_by_rc)
+
+    def _load_usages(self, ctx, rp_ids):
+        sel = sa.select([_ALLOC_TBL.c.resource_provider_id,
+                         _ALLOC_TBL.c.resource_class_id,
+                         sql.func.sum(_ALLOC_TBL.c.used)])
+        sel = sel.group_by(_ALLOC_TBL.c.resource_provider_id,
+                           _ALLOC_TBL.c.resource_class_id)
+        loaded = collections.defaultdict(dict)
+        for r in _execute_for_providers(
+                ctx, sel, _ALLOC_TBL.c.resource_provider_id, rp_ids):
+            # NOTE: mysql returns a Decimal for SUM()
+            loaded[r[0]][r[1]] = int(r[2])
+        self.usages = self._merge(self.usages, dict(loaded), rp_ids)
+
+    def _load_traits(self, ctx, rp_ids):
+        join = sa.join(_RP_TRAIT_TBL, _TRAIT_TBL,
+                       _RP_TRAIT_TBL.c.trait_id == _TRAIT_TBL.c.id)
+        sel = sa.select([_RP_TRAIT_TBL.c.resource_provider_id,
+                         _TRAIT_TBL.c.id, _TRAIT_TBL.c.name]).select_from(join)
+        loaded = collections.defaultdict(dict)
+        for r in _execute_for_providers(
+                ctx, sel, _RP_TRAIT_TBL.c.resource_provider_id, rp_ids):
+            loaded[r[0]][r[1]] = r[2]
+        self.traits = self._merge(self.traits, dict(loaded), rp_ids)
+
+    def _load_aggregates(self, ctx, rp_ids):
+        join = sa.join(_RP_AGG_TBL, _AGG_TBL,
+                       _RP_AGG_TBL.c.aggregate_id == _AGG_TBL.c.id)
+        sel = sa.select([_RP_AGG_TBL.c.resource_provider_id,
+                         _AGG_TBL.c.id, _AGG_TBL.c.uuid]).select_from(join)
+        loaded = collections.defaultdict(set)
+        agg_ids = {} if rp_ids is None else dict(self.agg_ids)
+        for rp_id, agg_id, agg_uuid in _execute_for_providers(
+                ctx, sel, _RP_AGG_TBL.c.resource_provider_id, rp_ids):
+            loaded[rp_id].add(agg_id)
+            agg_ids[agg_uuid] = agg_id
+        self.aggregates = self._merge(self.aggregates, dict(loaded), rp_ids)
+        providers_by_agg = collections.defaultdict(set)
+        for rp_id, rp_agg_ids in self.aggregates.items():
+            for agg_id in rp_agg_ids:
+                providers_by_agg[agg_id].add(rp_id)
+        self.providers_by_agg = dict(providers_by_agg)
+        # Forget the aggregates no provider is associated with anymore
+        self.agg_ids = {agg_uuid: agg_id
+                        for agg_uuid, agg_id in agg_ids.items()
+                        if agg_id in self.providers_by_agg}
+
+    def _used(self, rp_id, rc_id):
+        return self.usages.get(rp_id, {}).get(rc_id, 0)
+
+    def has_provider_trees(self, ctx):
+        """Returns whether nested resource providers are in use."""
+        return self.has_trees
+
+    def provider_ids_from_uuid(self, ctx, uuid):
+        """Returns the ProviderIds of the provider with the supplied UUID, or
+        None if it does not exist.
+        """
+        rp_id = self.ids_by_uuid.get(uuid)
+        if rp_id is None:
+            return None
+        return self.providers[rp_id]
+
+    def provider_ids_from_rp_ids(self, ctx, rp_ids):
+        """Returns a dict, keyed by internal provider ID, of the ProviderIds
+        of the supplied providers.
+        """
+        return {rp_id: self.providers[rp_id] for rp_id in rp_ids
+                if rp_id in self.providers}
+
+    def provider_ids_matching_aggregates(self, ctx, member_of, rp_ids=None):
+        """Returns the set of IDs of the providers associated with at least
+        one aggregate of each list of aggregate UUIDs in member_of.
+        """
+        agg_id_sets = []
+        for members in member_of:
+            agg_ids = set(self.agg_ids[member] for member in members
+                          if member in self.agg_ids)
+            if not agg_ids:
+                return set()
+            agg_id_sets.append(agg_ids)
+        if rp_ids:
+            rp_ids = [rp_id for rp_id in rp_ids if rp_id in self.aggregates]
+        else:
+            rp_ids = self.aggregates
+        return set(rp_id for rp_id in rp_ids
+                   if all(not agg_ids.isdisjoint(self.aggregates[rp_id])
+                          for agg_ids in agg_id_sets))
+
+    def get_providers_with_shared_capacity(self, ctx, rc_id, amount,
+                                           member_of=None):
+        """Returns a list of IDs of the providers sharing their inventory via
+        aggregates which have capacity for amount of the resource class.
+        """
+        rp_ids = [rp_id for rp_id in self.providers_by_rc.get(rc_id, ())
+                  if os_traits.MISC_SHARES_VIA_AGGREGATE in
+                  self.traits.get(rp_id, {}).values()
+                  and _has_capacity(self.inventories[rp_id][rc_id],
+                                    self._used(rp_id, rc_id), amount)]
+        if member_of and rp_ids:
+            rps_in_aggs = self.provider_ids_matching_aggregates(
+                ctx, member_of, rp_ids=rp_ids)
+            rp_ids = [rp_id for rp_id in rp_ids if rp_id in rps_in_aggs]
+        return rp_ids
+
+    def get_provider_ids_having_any_trait(self, ctx, traits):
+        """Returns the set of IDs of the providers having any of the supplied
+        traits.
+
+        :param traits: A map, keyed by trait string name, of trait internal
+                       IDs.
+        :raise ValueError: If traits is empty or None.
+        """
+        if not traits:
+            raise ValueError(_('traits must not be empty'))
+        trait_ids = set(traits.values())
+        return set(rp_id for rp_id, rp_traits in self.traits.items()
+                   if not trait_ids.isdisjoint(rp_traits))
+
+    def _get_provider_ids_having_all_traits(self, ctx, required_traits):
+        if not required_traits:
+            raise ValueError(_('required_traits must not be empty'))
+        trait_ids = set(required_traits.values())
+        return set(rp_id for rp_id, rp_traits in self.traits.items()
+                   if trait_ids.issubset(rp_traits))
+
+    def get_provider_ids_for_traits_and_aggs(self, ctx, required_traits,
+                                             forbidden_traits, member_of):
+        """See rp_obj.get_provider_ids_for_traits_and_aggs()."""
+        filtered_rps = set()
+        if required_traits:
+            filtered_rps = self._get_provider_ids_having_all_traits(
+                ctx, required_traits)
+            if not filtered_rps:
+                return None, []
+
+        if member_of:
+            rps_in_aggs = self.provider_ids_matching_aggregates(ctx, member_of)
+            if filtered_rps:
+                filtered_rps &= rps_in_aggs
+            else:
+                filtered_rps = rps_in_aggs
+            if not filtered_rps:
+                return None, []
+
+        forbidden_rp_ids = set()
+        if forbidden_traits:
+            forbidden_rp_ids = self.get_provider_ids_having_any_trait(
+                ctx, forbidden_traits)
+            if filtered_rps:
+                filtered_rps -= forbidden_rp_ids
+                if not filtered_rps:
+                    return None, []
+
+        return filtered_rps, forbidden_rp_ids
+
+    def get_providers_with_resource(self, ctx, rc_id, amount,
+                                    tree_root_id=None):
+        """Returns a list of tuples of (provider ID, root provider ID) of the
+        providers having capacity for amount of the resource class.
+        """
+        rp_ids = self.providers_by_rc.get(rc_id, set())
+        if tree_root_id is not None:
+            rp_ids = rp_ids & self.trees.get(tree_root_id, set())
+        return [(rp_id, self.providers[rp_id].root_id) for rp_id in rp_ids
+                if _has_capacity(self.inventories[rp_id][rc_id],
+                                 self._used(rp_id, rc_id), amount)]
+
+    def get_provider_ids_matching(self, ctx, resources, required_traits,
+                                  forbidden_traits, member_of, tree_root_id):
+        """See rp_obj.get_provider_ids_matching()."""
+        filtered_rps, forbidden_rp_ids = (
+            self.get_provider_ids_for_traits_and_aggs(
+                ctx, required_traits, forbidden_traits, member_of))
+        if filtered_rps is None:
+            return []
+
+        provs_with_resource = set()
+        first = True
+        for rc_id, amount in resources.items():
+            provs_with_resource = self.get_providers_with_resource(
+                ctx, rc_id, amount, tree_root_id=tree_root_id)
+            if not provs_with_resource:
+                return []
+
+            rc_rp_ids = set(p[0] for p in provs_with_resource)
+            if first:
+                first = False
+                if filtered_rps:
+                    filtered_rps &= rc_rp_ids
+                else:
+                    filtered_rps = rc_rp_ids - forbidden_rp_ids
+            else:
+                filtered_rps &= rc_rp_ids
+
+            if not filtered_rps:
+                return []
+
+        return [rpids for rpids in provs_with_resource
+                if rpids[0] in filtered_rps]
+
+    def anchors_for_sharing_providers(self, ctx, rp_ids, get_id=False):
+        """Returns a set of tuples of (sharing provider UUID, anchor provider
+        UUID), or of internal IDs if get_id is True, where each anchor is the
+        root of a tree associated with the same aggregate as the sharing
+        provider.
+        """
+        anchors = set()
+        for rp_id in rp_ids:
+            if rp_id not in self.providers:
+                continue
+            sharing = self.providers[rp_id]
+            for agg_id in self.aggregates.get(rp_id, ()):
+                for other_id in self.providers_by_agg[agg_id]:
+                    other = self.providers[other_id]
+                    if get_id:
+                        anchors.add((sharing.id, other.root_id))
+                    else:
+                        anchors.add((sharing.uuid, other.root_uuid))
+        return anchors
+
+    def _get_trees_with_traits(self, ctx, rp_ids, required_traits,
+                               forbidden_traits):
+        """See rp_obj._get_trees_with_traits()."""
+        required = set(required_traits.values()) if required_traits else set()
+        forbidden = (set(forbidden_traits.values()) if forbidden_traits
+                     else set())
+        # dict, keyed by root provider ID, of the required traits found on the
+        # providers of that tree without any forbidden trait
+        found_by_tree = collections.defaultdict(set)
+        for rp_id in rp_ids:
+            if rp_id not in self.providers:
+                continue
+            rp_traits = self.traits.get(rp_id, {})
+            if not forbidden.isdisjoint(rp_traits):
+                continue
+            found = required.intersection(rp_traits)
+            if required and not found:
+                continue
+            found_by_tree[self.providers[rp_id].root_id] |= found
+        return [(rp_id, root_id)
+                for root_id, found in found_by_tree.items()
+                if found == required
+                for rp_id in self.trees.get(root_id, ())]
+
+    def get_trees_matching_all(self, ctx, resources, required_traits,
+                               forbidden_traits, sharing, member_of,
+                               tree_root_id):
+        """See rp_obj.get_trees_matching_all()."""
+        provs_with_inv = rp_candidates.RPCandidateList()
+
+        for rc_id, amount in resources.items():
+            provs_with_inv_rc = rp_candidates.RPCandidateList()
+            rc_provs_with_inv = self.get_providers_with_resource(
+                ctx, rc_id, amount, tree_root_id=tree_root_id)
+            provs_with_inv_rc.add_rps(rc_provs_with_inv, rc_id)
+            if not provs_with_inv_rc:
+                return rp_candidates.RPCandidateList()
+
+            sharing_providers = sharing.get(rc_id)
+            if sharing_providers and tree_root_id is None:
+                rc_provs_with_inv = self.anchors_for_sharing_providers(
+                    ctx, sharing_providers, get_id=True)
+                provs_with_inv_rc.add_rps(rc_provs_with_inv, rc_id)
+
+            provs_with_inv.merge_common_trees(provs_with_inv_rc)
+            if not provs_with_inv:
+                return rp_candidates.RPCandidateList()
+
+        if member_of:
+            rps_in_aggs = self.provider_ids_matching_aggregates(
+                ctx, member_of, rp_ids=provs_with_inv.all_rps)
+            if not rps_in_aggs:
+                return rp_candidates.RPCandidateList()
+            provs_with_inv.filter_by_rp_or_tree(rps_in_aggs)
+
+        if (not required_traits and not forbidden_traits) or (
+                any(sharing.values())):
+            return provs_with_inv
+
+        rp_tuples_with_trait = self._get_trees_with_traits(
+            ctx, provs_with_inv.rps, required_traits, forbidden_traits)
+        provs_with_inv.filter_by_rp(rp_tuples_with_trait)
+        return provs_with_inv
+
+    def get_usages_by_provider_tree(self, ctx, root_ids):
+        """Returns a list of dicts of usage records, like the rows returned by
+        allocation_candidate._get_usages_by_provider_tree(), for all the
+        providers in the trees of root_ids as well as the providers in
+        root_ids.
+        """
+        root_ids = set(root_ids)
+        rp_ids = set(rp_id for rp_id in root_ids if rp_id in self.providers)
+        for root_id in root_ids:
+            rp_ids |= self.trees.get(root_id, set())
+        usages = []
+        for rp_id in rp_ids:
+            uuid = self.providers[rp_id].uuid
+            invs = self.inventories.get(rp_id)
+            if not invs:
+                usages.append({
+                    'resource_provider_id': rp_id,
+                    'resource_provider_uuid': uuid,
+                    'resource_class_id': None,
+                    'total': None,
+                    'reserved': None,
+                    'allocation_ratio': None,
+                    'max_unit': None,
+                    'used': None,
+                })
+                continue
+            rp_usages = self.usages.get(rp_id, {})
+            for rc_id, inv in invs.items():
+                usages.append({
+                    'resource_provider_id': rp_id,
+                    'resource_provider_uuid': uuid,
+                    'resource_class_id': rc_id,
+                    'total': inv.total,
+                    'reserved': inv.reserved,
+                    'allocation_ratio': inv.allocation_ratio,
+                    'max_unit': inv.max_unit,
+                    'used': rp_usages.get(rc_id),
+                })
+        return usages
+
+    def get_traits_by_provider_tree(self, ctx, root_ids):
+        """Returns a dict, keyed by provider ID, of the string trait names of
+        all the providers in the trees of root_ids.
+
+        :raises: ValueError when root_ids is empty.
+        """
+        if not root_ids:
+            raise ValueError(_("Expected root_ids to be a list of root "
+                               "resource provider internal IDs, but got an "
+                               "empty list."))
+        res = collections.defaultdict(list)
+        for root_id in set(root_ids):
+            for rp_id in self.trees.get(root_id, ()):
+                if rp_id in self.traits:
+                    res[rp_id] = list(self.traits[rp_id].values())
+        return res
@@ -167,3 +167,17 @@ POST_ALLOCATIONS_V1_28 = copy.deepcopy(POST_ALLOCATIONS_V1_13)
 POST_ALLOCATIONS_V1_28["patternProperties"] = {
     common.UUID_PATTERN: REQUIRED_GENERATION_ALLOCS_POST
 }
+
+# The "atomic" query parameter was added to POST /allocations in this version.
+# When false, the allocations of each consumer are written independently of
+# the other consumers.
+POST_ALLOCATIONS_QS_V1_32 = {
+    "type": "object",
+    "properties": {
+        "atomic": {
+            "type": "string",
+            "enum": ["true", "false"]
+        }
+    },
+    "additionalProperties": False
+}
@@ -10,6 +10,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+
 import mock
 import os_resource_classes as orc
 from oslo_utils.fixture import uuidsentinel
@@ -18,6 +20,7 @@ from placement import exception
 from placement.objects import allocation as alloc_obj
 from placement.objects import consumer as consumer_obj
 from placement.objects import inventory as inv_obj
+from placement.objects import resource_provider as rp_obj
 from placement.objects import usage as usage_obj
 from placement.tests.functional.db import test_base as tb
 
@@ -664,3 +667,203 @@ class TestAllocationListCreateDelete(tb.PlacementDbBaseTestCase):
         new_rp = alloc_list[0].resource_provider
         self.assertEqual(original_generation, rp1.generation)
         self.assertEqual(original_generation + 1, new_rp.generation)
+
+
+class TestReplaceAllPerConsumer(tb.PlacementDbBaseTestCase):
+
+    def _create_consumer(self, consumer_uuid):
+        consumer = consumer_obj.Consumer(
+            self.ctx, uuid=consumer_uuid, user=self.user_obj,
+            project=self.project_obj)
+        consumer.create()
+        return consumer
+
+    def _allocations(self, consumer, rp, **resources):
+        return [
+            alloc_obj.Allocation(
+                consumer=consumer, resource_provider=rp,
+                resource_class=rc, used=used)
+            for rc, used in resources.items()]
+
+    def _usage(self, rp):
+        return dict(
+            (usage.resource_class, usage.usage)
+            for usage in usage_obj.get_all_by_resource_provider_uuid(
+                self.ctx, rp.uuid))
+
+    def test_capacity_exceeded_for_some_consumers(self):
+        rp = self._create_provider('rp')
+        tb.add_inventory(rp, orc.VCPU, 4)
+        tb.add_inventory(rp, orc.MEMORY_MB, 2048, step_size=256)
+        generation = rp.generation
+
+        alloc_lists = collections.OrderedDict()
+        for name, vcpu, memory in (('inst1', 3, 1024),
+                                   ('inst2', 2, 512),
+                                   ('inst3', 1, 100),
+                                   ('inst4', 1, 1024)):
+            consumer = self._create_consumer(getattr(uuidsentinel, name))
+            alloc_lists[consumer.uuid] = self._allocations(
+                consumer, rp, VCPU=vcpu, MEMORY_MB=memory)
+
+        failed = alloc_obj.replace_all_per_consumer(self.ctx, alloc_lists)
+
+        self.assertEqual(set([uuidsentinel.inst2, uuidsentinel.inst3]),
+                         set(failed))
+        self.assertIsInstance(
+            failed[uuidsentinel.inst2],
+            exception.InvalidAllocationCapacityExceeded)
+        self.assertIsInstance(
+            failed[uuidsentinel.inst3],
+            exception.InvalidAllocationConstraintsViolated)
+        self.assertEqual({orc.VCPU: 4, orc.MEMORY_MB: 2048}, self._usage(rp))
+        for consumer_uuid in (uuidsentinel.inst2, uuidsentinel.inst3):
+            self.assertEqual(
+                [], alloc_obj.get_all_by_consumer_id(self.ctx, consumer_uuid))
+        # The generation of the provider is incremented once for all the
+        # consumers.
+        rp = rp_obj.ResourceProvider.get_by_uuid(self.ctx, rp.uuid)
+        self.assertEqual(generation + 1, rp.generation)
+
+    def test_replace_and_remove_existing_allocations(self):
+        rp = self._create_provider('rp')
+        tb.add_inventory(rp, orc.VCPU, 4)
+        inst1 = self._create_consumer(uuidsentinel.inst1)
+        inst2 = self._create_consumer(uuidsentinel.inst2)
+        self.allocate_from_provider(rp, orc.VCPU, 3, consumer=inst1)
+        self.allocate_from_provider(rp, orc.VCPU, 1, consumer=inst2)
+        rp = rp_obj.ResourceProvider.get_by_uuid(self.ctx, rp.uuid)
+        inst1 = consumer_obj.Consumer.get_by_uuid(self.ctx, inst1.uuid)
+        inst2 = consumer_obj.Consumer.get_by_uuid(self.ctx, inst2.uuid)
+        inst3 = self._create_consumer(uuidsentinel.inst3)
+
+        # inst2 only fits because the allocations of inst1, which come
+        # first, are removed, and so does inst3 thanks to inst2 shrinking.
+        alloc_lists = collections.OrderedDict([
+            (inst1.uuid, self._allocations(inst1, rp, VCPU=0)),
+            (inst2.uuid, self._allocations(inst2, rp, VCPU=3)),
+            (inst3.uuid, self._allocations(inst3, rp, VCPU=1)),
+        ])
+
+        failed = alloc_obj.replace_all_per_consumer(self.ctx, alloc_lists)
+
+        self.assertEqual({}, failed)
+        self.assertEqual({orc.VCPU: 4}, self._usage(rp))
+        self.assertEqual(
+            [], alloc_obj.get_all_by_consumer_id(self.ctx, inst1.uuid))
+        # The consumer without allocations is deleted.
+        self.assertRaises(exception.ConsumerNotFound,
+                          consumer_obj.Consumer.get_by_uuid,
+                          self.ctx, inst1.uuid)
+        allocs = alloc_obj.get_all_by_consumer_id(self.ctx, inst2.uuid)
+        self.assertEqual([3], [alloc.used for alloc in allocs])
+
+    def test_consumer_generation_conflict(self):
+        rp = self._create_provider('rp')
+        tb.add_inventory(rp, orc.VCPU, 4)
+        inst1 = self._create_consumer(uuidsentinel.inst1)
+        inst2 = self._create_consumer(uuidsentinel.inst2)
+        # Somebody else updated the allocations of inst2.
+        consumer_obj.Consumer.get_by_uuid(
+            self.ctx, inst2.uuid).increment_generation()
+
+        alloc_lists = {
+            inst1.uuid: self._allocations(inst1, rp, VCPU=2),
+            inst2.uuid: self._allocations(inst2, rp, VCPU=2),
+        }
+
+        failed = alloc_obj.replace_all_per_consumer(self.ctx, alloc_lists)
+
+        self.assertEqual([inst2.uuid], list(failed))
+        self.assertIsInstance(failed[inst2.uuid],
+                              exception.ConcurrentUpdateDetected)
+        self.assertEqual({orc.VCPU: 2}, self._usage(rp))
+
+    def test_resource_class_not_found(self):
+        rp = self._create_provider('rp')
+        tb.add_inventory(rp, orc.VCPU, 4)
+        inst1 = self._create_consumer(uuidsentinel.inst1)
+        inst2 = self._create_consumer(uuidsentinel.inst2)
+
+        alloc_lists = {
+            inst1.uuid: self._allocations(inst1, rp, CUSTOM_UNKNOWN=1),
+            inst2.uuid: self._allocations(inst2, rp, VCPU=2),
+        }
+
+        failed = alloc_obj.replace_all_per_consumer(self.ctx, alloc_lists)
+
+        self.assertEqual([inst1.uuid], list(failed))
+        self.assertIsInstance(failed[inst1.uuid],
+                              exception.ResourceClassNotFound)
+        self.assertEqual({orc.VCPU: 2}, self._usage(rp))
+
+    def test_provider_generation_conflict_retries_consumers(self):
+        rp1 = self._create_provider('rp1')
+        tb.add_inventory(rp1, orc.VCPU, 4)
+        rp2 = self._create_provider('rp2')
+        tb.add_inventory(rp2, orc.VCPU, 4)
+        inst1 = self._create_consumer(uuidsentinel.inst1)
+        inst2 = self._create_consumer(uuidsentinel.inst2)
+        alloc_lists = {
+            inst1.uuid: self._allocations(inst1, rp1, VCPU=2),
+            inst2.uuid: self._allocations(inst2, rp2, VCPU=2),
+        }
+
+        # Simulate another writer changing rp2 between the moment the usage
+        # is read and the moment the generation of rp2 is incremented, the
+        # first time only.
+        unmocked_get = alloc_obj._get_usages_for_consumers
+        calls = []
+
+        def get_usages(ctx, *args, **kwargs):
+            result = unmocked_get(ctx, *args, **kwargs)
+            calls.append(args)
+            if len(calls) == 1:
+                rp_obj.ResourceProvider.get_by_uuid(
+                    ctx, rp2.uuid).increment_generation()
+            return result
+
+        with mock.patch.object(alloc_obj, '_get_usages_for_consumers',
+                               side_effect=get_usages):
+            failed = alloc_obj.replace_all_per_consumer(self.ctx, alloc_lists)
+
+        self.assertEqual({}, failed)
+        self.assertEqual(2, len(calls))
+        # Only the consumer allocating from rp2 was retried.
+        self.assertEqual(set([inst2.uuid]), calls[1][2])
+        self.assertEqual({orc.VCPU: 2}, self._usage(rp1))
+        self.assertEqual({orc.VCPU: 2}, self._usage(rp2))
+
+    @mock.patch('placement.objects.allocation.LOG')
+    def test_provider_generation_conflict_retry_limit(self, mock_log):
+        rp1 = self._create_provider('rp1')
+        tb.add_inventory(rp1, orc.VCPU, 4)
+        rp2 = self._create_provider('rp2')
+        tb.add_inventory(rp2, orc.VCPU, 4)
+        inst1 = self._create_consumer(uuidsentinel.inst1)
+        inst2 = self._create_consumer(uuidsentinel.inst2)
+        alloc_lists = {
+            inst1.uuid: self._allocations(inst1, rp1, VCPU=2),
+            inst2.uuid: self._allocations(inst2, rp2, VCPU=2),
+        }
+        unmocked_set = alloc_obj._set_allocations_per_consumer
+
+        def set_allocations(ctx, alloc_lists):
+            failed, retried = unmocked_set(ctx, alloc_lists)
+            return failed, retried | set([inst2.uuid])
+
+        with mock.patch.object(alloc_obj, 'RP_CONFLICT_RETRY_COUNT', 2):
+            with mock.patch.object(alloc_obj, '_set_allocations_per_consumer',
+                                   side_effect=set_allocations) as mock_set:
+                failed = alloc_obj.replace_all_per_consumer(
+                    self.ctx, alloc_lists)
+                self.assertEqual(2, mock_set.call_count)
+
+        self.assertEqual([inst2.uuid], list(failed))
+        self.assertIsInstance(
+            failed[inst2.uuid],
+            exception.ResourceProviderConcurrentUpdateDetected)
+        mock_log.warning.assert_called_once_with(
+            'Exceeded retry limit of %d on allocations write for consumers '
+            '%s', 2, inst2.uuid)
+        self.assertEqual({orc.VCPU: 2}, self._usage(rp1))
@@ -10,6 +10,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import mock
 import os_resource_classes as orc
 import os_traits
 from oslo_utils.fixture import uuidsentinel as uuids
@@ -1102,6 +1103,34 @@ class AllocationCandidatesTestCase(tb.PlacementDbBaseTestCase):
         # provider summaries should have two rps
         self.assertEqual(expected_length, len(alloc_cands.provider_summaries))
 
+    def test_all_local_limit_builds_limited_summaries(self):
+        """Only the provider summaries of the allocation requests returned are
+        built when limiting results, randomized or not.
+        """
+        for i in range(10):
+            cn = self._create_provider('cn%d' % i)
+            tb.add_inventory(cn, orc.VCPU, 24, allocation_ratio=16.0)
+            tb.add_inventory(cn, orc.MEMORY_MB, 32768, min_unit=64,
+                             step_size=64, allocation_ratio=1.5)
+            tb.add_inventory(cn, orc.DISK_GB, 2000, reserved=100,
+                             min_unit=10, step_size=10)
+
+        for randomize in (False, True):
+            self.conf_fixture.config(randomize_allocation_candidates=randomize,
+                                     group='placement')
+            with mock.patch.object(ac_obj, 'ProviderSummary',
+                                   wraps=ac_obj.ProviderSummary) as mock_psum:
+                alloc_cands = self._get_allocation_candidates(limit=2)
+            self.assertEqual(2, len(alloc_cands.allocation_requests))
+            self.assertEqual(2, len(alloc_cands.provider_summaries))
+            self.assertEqual(2, mock_psum.call_count)
+            rp_uuids = set(arr.resource_provider.uuid
+                           for areq in alloc_cands.allocation_requests
+                           for arr in areq.resource_requests)
+            self.assertEqual(rp_uuids, set(
+                psum.resource_provider.uuid
+                for psum in alloc_cands.provider_summaries))
+
     def test_local_with_shared_disk(self):
         """Create some resource providers that can satisfy the request for
         resources with local VCPU and MEMORY_MB but rely on a shared storage
@@ -2759,3 +2788,15 @@ class AllocationCandidatesTestCase(tb.PlacementDbBaseTestCase):
             ]),
         }
         self._validate_provider_summary_resources(expected, alloc_cands)
+
+
+class SnapshotAllocationCandidatesTestCase(AllocationCandidatesTestCase):
+    """Runs the AllocationCandidatesTestCase scenarios against an in-memory
+    snapshot of the resource providers, which must give the same results as
+    the SQL queries.
+    """
+
+    def setUp(self):
+        super(SnapshotAllocationCandidatesTestCase, self).setUp()
+        self.conf_fixture.config(allocation_candidates_snapshot=True,
+                                 group='placement')
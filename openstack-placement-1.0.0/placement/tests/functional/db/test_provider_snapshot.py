@@ -0,0 +1,411 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import random
+
+import fixtures
+import mock
+import os_resource_classes as orc
+import os_traits
+from oslo_utils import fixture as utils_fixture
+from oslo_utils.fixture import uuidsentinel as uuids
+
+from placement import lib as placement_lib
+from placement.objects import allocation as alloc_obj
+from placement.objects import allocation_candidate as ac_obj
+from placement.objects import provider_snapshot
+from placement import resource_class_cache as rc_cache
+from placement.tests.functional.db import test_base as tb
+
+
+class ProviderSnapshotTestCase(tb.PlacementDbBaseTestCase):
+
+    def setUp(self):
+        super(ProviderSnapshotTestCase, self).setUp()
+        # The removed allocations are only recorded when the snapshot is used
+        self.conf_fixture.config(allocation_candidates_snapshot=True,
+                                 group='placement')
+
+    def _create_compute_node(self, name, *aggs, **kwargs):
+        cn = self._create_provider(name, *aggs, **kwargs)
+        tb.add_inventory(cn, orc.VCPU, 8)
+        tb.add_inventory(cn, orc.MEMORY_MB, 2048)
+        return cn
+
+    def test_snapshot_reused(self):
+        self._create_compute_node('cn1')
+        snapshot = provider_snapshot.get_snapshot(self.ctx)
+        self.assertIs(snapshot, provider_snapshot.get_snapshot(self.ctx))
+
+    def test_snapshot_content(self):
+        cn1 = self._create_compute_node('cn1', uuids.agg1)
+        tb.set_traits(cn1, os_traits.HW_CPU_X86_AVX2)
+        numa = self._create_provider('cn1_numa0', parent=cn1.uuid)
+        self.allocate_from_provider(cn1, orc.VCPU, 2)
+        vcpu_id = rc_cache.RC_CACHE.id_from_string(orc.VCPU)
+
+        snapshot = provider_snapshot.get_snapshot(self.ctx)
+
+        self.assertTrue(snapshot.has_provider_trees(self.ctx))
+        ids = snapshot.provider_ids_from_uuid(self.ctx, numa.uuid)
+        self.assertEqual((numa.id, cn1.id, cn1.id, cn1.uuid),
+                         (ids.id, ids.parent_id, ids.root_id, ids.root_uuid))
+        self.assertEqual(set([cn1.id, numa.id]), snapshot.trees[cn1.id])
+        self.assertEqual(8, snapshot.inventories[cn1.id][vcpu_id].total)
+        self.assertEqual(2, snapshot.usages[cn1.id][vcpu_id])
+        self.assertEqual([os_traits.HW_CPU_X86_AVX2],
+                         list(snapshot.traits[cn1.id].values()))
+        self.assertEqual(
+            set([cn1.id]),
+            snapshot.provider_ids_matching_aggregates(self.ctx,
+                                                      [[uuids.agg1]]))
+
+    def test_refresh_on_generation_bump(self):
+        cn1 = self._create_compute_node('cn1')
+        snapshot = provider_snapshot.get_snapshot(self.ctx)
+
+        tb.set_traits(cn1, os_traits.HW_CPU_X86_AVX2)
+
+        new_snapshot = provider_snapshot.get_snapshot(self.ctx)
+        self.assertIsNot(snapshot, new_snapshot)
+        self.assertEqual([os_traits.HW_CPU_X86_AVX2],
+                         list(new_snapshot.traits[cn1.id].values()))
+        # The previous snapshot is left untouched for the requests using it
+        self.assertNotIn(cn1.id, snapshot.traits)
+
+    def test_refresh_only_changed_providers(self):
+        cns = [self._create_compute_node('cn%d' % i) for i in range(4)]
+        provider_snapshot.get_snapshot(self.ctx)
+
+        tb.add_inventory(cns[1], orc.DISK_GB, 100)
+        disk_id = rc_cache.RC_CACHE.id_from_string(orc.DISK_GB)
+
+        orig_load = provider_snapshot.ProviderSnapshot._load_inventories
+        with mock.patch.object(provider_snapshot.ProviderSnapshot,
+                               '_load_inventories', autospec=True,
+                               side_effect=orig_load) as mock_load:
+            snapshot = provider_snapshot.get_snapshot(self.ctx)
+        mock_load.assert_called_once_with(snapshot, self.ctx,
+                                          set([cns[1].id]))
+        self.assertEqual(set([cns[1].id]), snapshot.providers_by_rc[disk_id])
+        self.assertEqual(4, len(snapshot.inventories))
+
+    def test_refresh_on_deleted_provider(self):
+        cn1 = self._create_compute_node('cn1')
+        cn2 = self._create_compute_node('cn2')
+        provider_snapshot.get_snapshot(self.ctx)
+
+        cn1.destroy()
+
+        snapshot = provider_snapshot.get_snapshot(self.ctx)
+        self.assertEqual([cn2.id], list(snapshot.providers))
+        self.assertEqual([cn2.id], list(snapshot.inventories))
+
+    def _get_snapshot_loading(self, *methods):
+        """Returns the refreshed snapshot along with a dict, keyed by name,
+        of the mocks of the supplied ProviderSnapshot load methods.
+        """
+        mocks = {}
+        for method in methods:
+            orig_load = getattr(provider_snapshot.ProviderSnapshot, method)
+            mocks[method] = self.useFixture(fixtures.MockPatchObject(
+                provider_snapshot.ProviderSnapshot, method, autospec=True,
+                side_effect=orig_load)).mock
+        return provider_snapshot.get_snapshot(self.ctx), mocks
+
+    def test_refresh_on_deleted_allocations(self):
+        cn1 = self._create_compute_node('cn1')
+        self._create_compute_node('cn2')
+        allocs = self.allocate_from_provider(cn1, orc.VCPU, 2)
+        vcpu_id = rc_cache.RC_CACHE.id_from_string(orc.VCPU)
+        snapshot = provider_snapshot.get_snapshot(self.ctx)
+        self.assertEqual(2, snapshot.usages[cn1.id][vcpu_id])
+
+        # Deleting allocations does not bump the provider generation, the
+        # provider is recorded once the deletion is committed.
+        alloc_obj.delete_all(self.ctx, allocs)
+        self.assertEqual(set([cn1.id]), provider_snapshot._USAGES_CHANGED)
+
+        snapshot, mocks = self._get_snapshot_loading('_load_usages')
+        mocks['_load_usages'].assert_called_once_with(snapshot, self.ctx,
+                                                      set([cn1.id]))
+        self.assertNotIn(cn1.id, snapshot.usages)
+        self.assertEqual(set(), provider_snapshot._USAGES_CHANGED)
+
+    def test_refresh_on_replaced_allocations(self):
+        cn1 = self._create_compute_node('cn1')
+        cn2 = self._create_compute_node('cn2')
+        self._create_compute_node('cn3')
+        self.allocate_from_provider(cn1, orc.VCPU, 2,
+                                    consumer_id=uuids.consumer)
+        vcpu_id = rc_cache.RC_CACHE.id_from_string(orc.VCPU)
+        provider_snapshot.get_snapshot(self.ctx)
+
+        # Moving the allocations of a consumer bumps the generation of the
+        # provider they are moved to, but not of the one they are removed
+        # from.
+        self.allocate_from_provider(cn2, orc.VCPU, 2,
+                                    consumer_id=uuids.consumer)
+
+        snapshot, mocks = self._get_snapshot_loading('_load_usages')
+        mocks['_load_usages'].assert_called_once_with(
+            snapshot, self.ctx, set([cn1.id, cn2.id]))
+        self.assertNotIn(cn1.id, snapshot.usages)
+        self.assertEqual(2, snapshot.usages[cn2.id][vcpu_id])
+
+    def test_refresh_on_new_allocations(self):
+        cns = [self._create_compute_node('cn%d' % i, uuids.agg1)
+               for i in range(4)]
+        vcpu_id = rc_cache.RC_CACHE.id_from_string(orc.VCPU)
+        provider_snapshot.get_snapshot(self.ctx)
+
+        self.allocate_from_provider(cns[1], orc.VCPU, 2)
+
+        snapshot, mocks = self._get_snapshot_loading('_load_usages',
+                                                     '_load_aggregates')
+        # Only the provider allocated from is reloaded
+        for mock_load in mocks.values():
+            mock_load.assert_called_once_with(snapshot, self.ctx,
+                                              set([cns[1].id]))
+        self.assertEqual(2, snapshot.usages[cns[1].id][vcpu_id])
+        self.assertEqual(
+            set(cn.id for cn in cns),
+            snapshot.provider_ids_matching_aggregates(self.ctx,
+                                                      [[uuids.agg1]]))
+
+    def test_refresh_resyncs_usages(self):
+        cn1 = self._create_compute_node('cn1')
+        allocs = self.allocate_from_provider(cn1, orc.VCPU, 2)
+        vcpu_id = rc_cache.RC_CACHE.id_from_string(orc.VCPU)
+        snapshot = provider_snapshot.get_snapshot(self.ctx)
+        loaded_at = snapshot.usages_loaded_at
+
+        # The allocations removed by another placement process are not
+        # recorded by this one.
+        alloc_obj.delete_all(self.ctx, allocs)
+        provider_snapshot._USAGES_CHANGED.clear()
+
+        with mock.patch.object(provider_snapshot.time, 'time',
+                               return_value=loaded_at + 59):
+            snapshot = provider_snapshot.get_snapshot(self.ctx)
+        self.assertEqual(2, snapshot.usages[cn1.id][vcpu_id])
+
+        with mock.patch.object(provider_snapshot.time, 'time',
+                               return_value=loaded_at + 60):
+            snapshot = provider_snapshot.get_snapshot(self.ctx)
+        self.assertNotIn(cn1.id, snapshot.usages)
+
+    def test_refresh_on_aggregates_without_generation_bump(self):
+        cn1 = self._create_compute_node('cn1')
+        provider_snapshot.get_snapshot(self.ctx)
+
+        cn1.set_aggregates([uuids.agg1], increment_generation=False)
+
+        snapshot = provider_snapshot.get_snapshot(self.ctx)
+        self.assertEqual(
+            set([cn1.id]),
+            snapshot.provider_ids_matching_aggregates(self.ctx,
+                                                      [[uuids.agg1]]))
+
+    def _test_refresh_on_swapped_aggregates(self, increment_generation):
+        time_fixture = self.useFixture(utils_fixture.TimeFixture())
+        cn1 = self._create_compute_node('cn1', uuids.agg1)
+        cn2 = self._create_compute_node('cn2', uuids.agg2)
+        provider_snapshot.get_snapshot(self.ctx)
+
+        # Swapping the aggregates of the providers leaves the number of
+        # associations and the sum of their aggregate IDs unchanged.
+        time_fixture.advance_time_seconds(1)
+        cn1.set_aggregates([uuids.agg2],
+                           increment_generation=increment_generation)
+        cn2.set_aggregates([uuids.agg1],
+                           increment_generation=increment_generation)
+
+        snapshot = provider_snapshot.get_snapshot(self.ctx)
+        self.assertEqual(
+            set([cn2.id]),
+            snapshot.provider_ids_matching_aggregates(self.ctx,
+                                                      [[uuids.agg1]]))
+        self.assertEqual(
+            set([cn1.id]),
+            snapshot.provider_ids_matching_aggregates(self.ctx,
+                                                      [[uuids.agg2]]))
+
+    def test_refresh_on_swapped_aggregates(self):
+        self._test_refresh_on_swapped_aggregates(True)
+
+    def test_refresh_on_swapped_aggregates_without_generation_bump(self):
+        self._test_refresh_on_swapped_aggregates(False)
+
+
+def _as_sets(alloc_cands):
+    """Returns the allocation requests and provider summaries of the supplied
+    AllocationCandidates as sets of hashable tuples, to be compared regardless
+    of their order.
+    """
+    areqs = set(
+        frozenset((arr.resource_provider.uuid, arr.resource_class, arr.amount)
+                  for arr in areq.resource_requests)
+        for areq in alloc_cands.allocation_requests)
+    psums = set(
+        (psum.resource_provider.uuid,
+         psum.resource_provider.parent_provider_uuid,
+         psum.resource_provider.root_provider_uuid,
+         frozenset((res.resource_class, res.capacity, res.used, res.max_unit)
+                   for res in psum.resources),
+         frozenset(trait.name for trait in psum.traits))
+        for psum in alloc_cands.provider_summaries)
+    return areqs, psums
+
+
+class ProviderSnapshotParityTestCase(tb.PlacementDbBaseTestCase):
+    """Checks that allocation candidates computed against a snapshot of the
+    providers are the same as the ones computed with SQL queries, over a
+    randomly generated deployment mixing nested and sharing providers.
+    """
+
+    AGGS = [uuids.agg1, uuids.agg2, uuids.agg3]
+    TRAITS = [os_traits.HW_CPU_X86_AVX2, os_traits.HW_CPU_X86_SSE42,
+              os_traits.STORAGE_DISK_SSD]
+
+    def setUp(self):
+        super(ProviderSnapshotParityTestCase, self).setUp()
+        self.rand = random.Random(42)
+        self.compute_nodes = []
+        for i in range(12):
+            self._create_compute_node_tree(i)
+        for i in range(2):
+            ss = self._create_provider(
+                'ss%d' % i, *self.rand.sample(self.AGGS, 1))
+            tb.add_inventory(ss, orc.DISK_GB, 2000)
+            tb.set_traits(ss, os_traits.MISC_SHARES_VIA_AGGREGATE,
+                          os_traits.STORAGE_DISK_SSD)
+            self.allocate_from_provider(ss, orc.DISK_GB,
+                                        self.rand.randint(0, 1500) or 1)
+
+    def _create_compute_node_tree(self, i):
+        rand = self.rand
+        aggs = rand.sample(self.AGGS, rand.randint(0, 2))
+        cn = self._create_provider('cn%d' % i, *aggs)
+        tb.add_inventory(cn, orc.VCPU, rand.choice([4, 8, 16]),
+                         allocation_ratio=rand.choice([1.0, 16.0]))
+        tb.add_inventory(cn, orc.MEMORY_MB, rand.choice([2048, 4096]),
+                         max_unit=rand.choice([1024, 2048]))
+        # Only the even compute nodes have local disk
+        if i % 2 == 0:
+            tb.add_inventory(cn, orc.DISK_GB, rand.choice([500, 2000]),
+                             reserved=rand.choice([0, 100]))
+        traits = rand.sample(self.TRAITS, rand.randint(0, 2))
+        if traits:
+            tb.set_traits(cn, *traits)
+        for rc in (orc.VCPU, orc.MEMORY_MB):
+            used = rand.randint(0, 3)
+            if used:
+                self.allocate_from_provider(cn, rc, used)
+        if rand.random() < 0.5:
+            for j in range(2):
+                pf = self._create_provider('cn%d_pf%d' % (i, j),
+                                           parent=cn.uuid)
+                tb.add_inventory(pf, orc.SRIOV_NET_VF, rand.choice([2, 8]))
+                if rand.random() < 0.5:
+                    tb.set_traits(pf, os_traits.HW_NIC_OFFLOAD_GENEVE)
+        self.compute_nodes.append(cn)
+
+    def _requests(self):
+        return [
+            {'': placement_lib.RequestGroup(
+                use_same_provider=False,
+                resources={orc.VCPU: 2, orc.MEMORY_MB: 512})},
+            {'': placement_lib.RequestGroup(
+                use_same_provider=False,
+                resources={orc.VCPU: 1, orc.MEMORY_MB: 512,
+                           orc.DISK_GB: 100})},
+            {'': placement_lib.RequestGroup(
+                use_same_provider=False,
+                resources={orc.VCPU: 1, orc.DISK_GB: 100},
+                required_traits=set([os_traits.STORAGE_DISK_SSD]),
+                forbidden_traits=set([os_traits.HW_CPU_X86_SSE42]))},
+            {'': placement_lib.RequestGroup(
+                use_same_provider=False,
+                resources={orc.VCPU: 1, orc.MEMORY_MB: 256},
+                member_of=[[uuids.agg1, uuids.agg2]])},
+            {'': placement_lib.RequestGroup(
+                use_same_provider=False,
+                resources={orc.VCPU: 1, orc.SRIOV_NET_VF: 1},
+                required_traits=set([os_traits.HW_NIC_OFFLOAD_GENEVE]))},
+            {'': placement_lib.RequestGroup(
+                use_same_provider=False,
+                resources={orc.VCPU: 1},
+                in_tree=self.compute_nodes[0].uuid)},
+            {'': placement_lib.RequestGroup(
+                use_same_provider=False,
+                resources={orc.VCPU: 1, orc.MEMORY_MB: 256}),
+             '1': placement_lib.RequestGroup(
+                 use_same_provider=True,
+                 resources={orc.SRIOV_NET_VF: 1}),
+             '2': placement_lib.RequestGroup(
+                 use_same_provider=True,
+                 resources={orc.SRIOV_NET_VF: 1})},
+        ]
+
+    def _get_allocation_candidates(self, requests, snapshot, limit=None,
+                                   group_policy=None):
+        self.conf_fixture.config(allocation_candidates_snapshot=snapshot,
+                                 group='placement')
+        return ac_obj.AllocationCandidates.get_by_requests(
+            self.ctx, requests, limit=limit, group_policy=group_policy)
+
+    def _assert_parity(self):
+        for requests in self._requests():
+            for group_policy in ('none', 'isolate'):
+                expected = self._get_allocation_candidates(
+                    requests, False, group_policy=group_policy)
+                actual = self._get_allocation_candidates(
+                    requests, True, group_policy=group_policy)
+                self.assertEqual(len(expected.allocation_requests),
+                                 len(actual.allocation_requests))
+                self.assertEqual(_as_sets(expected), _as_sets(actual))
+
+    def test_parity(self):
+        self._assert_parity()
+
+    def test_parity_after_changes(self):
+        self._assert_parity()
+        cn0, cn1 = self.compute_nodes[:2]
+        allocs = self.allocate_from_provider(cn0, orc.VCPU, 2)
+        tb.add_inventory(cn1, orc.DISK_GB, 1000)
+        tb.set_traits(cn1, os_traits.STORAGE_DISK_SSD)
+        cn1.set_aggregates([uuids.agg1], increment_generation=False)
+        self._assert_parity()
+        alloc_obj.delete_all(self.ctx, allocs)
+        self._create_compute_node_tree(12)
+        self._assert_parity()
+
+    def test_parity_with_limit(self):
+        for requests in self._requests():
+            expected = self._get_allocation_candidates(requests, False)
+            expected_areqs, expected_psums = _as_sets(expected)
+            limit = max(len(expected_areqs) - 1, 1)
+            actual = self._get_allocation_candidates(requests, True,
+                                                     limit=limit)
+            actual_areqs, actual_psums = _as_sets(actual)
+            self.assertEqual(min(limit, len(expected_areqs)),
+                             len(actual_areqs))
+            self.assertTrue(actual_areqs.issubset(expected_areqs))
+            self.assertTrue(actual_psums.issubset(expected_psums))
+            # The summaries are limited to the providers of the candidates
+            # returned, like without a snapshot.
+            if len(actual_areqs) < len(expected_areqs):
+                rp_uuids = set(arr[0] for areq in actual_areqs
+                               for arr in areq)
+                self.assertEqual(rp_uuids,
+                                 set(psum[0] for psum in actual_psums))
@@ -23,29 +23,82 @@ class TestAllocationCandidatesNoDB(base.TestCase):
         aro_in = [
             mock.Mock(
                 resource_requests=[
-                    mock.Mock(resource_provider=mock.Mock(uuid=uuid))
-                    for uuid in (1, 0, 4, 8)]),
+                    mock.Mock(resource_provider=mock.Mock(id=id))
+                    for id in (1, 0, 4, 8)]),
             mock.Mock(
                 resource_requests=[
-                    mock.Mock(resource_provider=mock.Mock(uuid=uuid))
-                    for uuid in (4, 8, 5)]),
+                    mock.Mock(resource_provider=mock.Mock(id=id))
+                    for id in (4, 8, 5)]),
             mock.Mock(
                 resource_requests=[
-                    mock.Mock(resource_provider=mock.Mock(uuid=uuid))
-                    for uuid in (1, 7, 6, 4, 8, 5)]),
+                    mock.Mock(resource_provider=mock.Mock(id=id))
+                    for id in (1, 7, 6, 4, 8, 5)]),
         ]
-        sum1 = mock.Mock(resource_provider=mock.Mock(uuid=1))
-        sum0 = mock.Mock(resource_provider=mock.Mock(uuid=0))
-        sum4 = mock.Mock(resource_provider=mock.Mock(uuid=4))
-        sum8 = mock.Mock(resource_provider=mock.Mock(uuid=8))
-        sum5 = mock.Mock(resource_provider=mock.Mock(uuid=5))
-        sum7 = mock.Mock(resource_provider=mock.Mock(uuid=7))
-        sum6 = mock.Mock(resource_provider=mock.Mock(uuid=6))
-        sum_in = [sum1, sum0, sum4, sum8, sum5, sum7, sum6]
+        summaries = mock.Mock()
         aro, sum = allocation_candidate.AllocationCandidates._limit_results(
-            self.context, aro_in, sum_in, 2)
+            self.context, iter(aro_in), summaries, 2)
         self.assertEqual(aro_in[:2], aro)
-        self.assertEqual(set([sum1, sum0, sum4, sum8, sum5]), set(sum))
+        self.assertEqual(summaries.for_providers.return_value, sum)
+        summaries.for_providers.assert_called_once_with(
+            set([1, 0, 4, 8, 5]))
+        summaries.for_trees.assert_not_called()
+
+    def test_limit_results_not_limited(self):
+        aro_in = [
+            mock.Mock(
+                resource_requests=[
+                    mock.Mock(resource_provider=mock.Mock(
+                        root_provider_uuid=uuid))
+                    for uuid in (1, 2)]),
+            mock.Mock(
+                resource_requests=[
+                    mock.Mock(resource_provider=mock.Mock(
+                        root_provider_uuid=uuid))
+                    for uuid in (1, 3)]),
+        ]
+        summaries = mock.Mock()
+        aro, sum = allocation_candidate.AllocationCandidates._limit_results(
+            self.context, iter(aro_in), summaries, 2)
+        self.assertEqual(aro_in, aro)
+        self.assertEqual(summaries.for_trees.return_value, sum)
+        summaries.for_trees.assert_called_once_with(set([1, 2, 3]))
+        summaries.for_providers.assert_not_called()
+
+    def test_limit_results_consumes_one_past_limit(self):
+        aro_in = iter([mock.Mock(resource_requests=[]) for i in range(10)])
+        aro, sum = allocation_candidate.AllocationCandidates._limit_results(
+            self.context, aro_in, mock.Mock(), 2)
+        self.assertEqual(2, len(aro))
+        # Only one more allocation request than the limit was built
+        self.assertEqual(7, len(list(aro_in)))
+
+    def test_limit_results_randomized(self):
+        self.conf_fixture.config(randomize_allocation_candidates=True,
+                                 group='placement')
+        aro_in = [mock.Mock(resource_requests=[]) for i in range(10)]
+        summaries = mock.Mock()
+        aro, sum = allocation_candidate.AllocationCandidates._limit_results(
+            self.context, iter(aro_in), summaries, 3)
+        self.assertEqual(3, len(aro))
+        self.assertEqual(3, len(set(aro)))
+        self.assertTrue(set(aro).issubset(set(aro_in)))
+        summaries.for_providers.assert_called_once_with(set())
+
+    @mock.patch('random.randrange')
+    def test_reservoir_sample(self, mock_randrange):
+        # The 4th element replaces the 2nd one, the 5th one is discarded
+        mock_randrange.side_effect = [1, 4]
+        sample, count = allocation_candidate._reservoir_sample(
+            iter(range(5)), 3)
+        self.assertEqual([0, 3, 2], sample)
+        self.assertEqual(5, count)
+        mock_randrange.assert_has_calls([mock.call(4), mock.call(5)])
+
+    def test_reservoir_sample_fewer_elements(self):
+        sample, count = allocation_candidate._reservoir_sample(
+            iter(range(2)), 3)
+        self.assertEqual([0, 1], sample)
+        self.assertEqual(2, count)
 
 
 class TestProviderSummaryNoDB(base.TestCase):